@@ -0,0 +1,468 @@
+"""
+Lokaler Simulator für die externen Webservices (DNB, Google Books, OpenLibrary,
+Wikipedia-Citation, SIGEL).
+
+Liefert Fixture-Daten im jeweiligen Antwortformat der echten Dienste und kann
+gezielt Störungen einspielen: Latenzverteilungen (fest, gleichverteilt,
+lognormal), 429-Bursts mit ``Retry-After``, zufällige 429/500-Antworten,
+hängende Anfragen (Client-Timeout) und Ausfallfenster (503). Damit lassen sich
+Retry-/Backoff-Logik, Rate-Limiter und ``benchmark_api_limits`` reproduzierbar
+testen, ohne die echten APIs zu belasten.
+
+Alle Clients lesen ihre Basis-URL aus ``utilities.api_endpoints``; mit
+``FHP_API_BASE_URL=http://localhost:8099`` zeigen ``enrich_metadata``,
+``check_isbn.isbn_exists`` und ``validate_isil_codes`` auf den Simulator.
+
+Aufruf:
+    python api_simulator.py --port 8099 --latency lognormal --latency-ms 150 \\
+        --burst-every 500 --burst-length 20 --retry-after 2 --outage 60:90
+"""
+
+import argparse
+import html
+import json
+import math
+import random
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlparse
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from utilities.api_endpoints import (
+    DNB_PATH,
+    GOOGLE_BOOKS_PATH,
+    OPENLIBRARY_PATH,
+    SIGEL_PATH,
+    WIKIPEDIA_PATH,
+)
+
+DEFAULT_SIMULATOR_PORT = 8099
+STATS_PATH = "/_simulator/stats"
+
+# Beispiel-Fixtures (ISBN-13 -> kanonische isbnlib-Felder, ISIL -> Name).
+# Eigene Fixtures per --fixtures als JSON mit denselben Schlüsseln laden.
+DEFAULT_FIXTURES: Dict[str, Dict[str, Any]] = {
+    "isbns": {
+        "9783453350618": {
+            "Title": "Beispieltitel für die Anreicherung",
+            "Authors": ["Mustermann, Max"],
+            "Publisher": "Heyne",
+            "Year": "2005",
+            "Language": "ger",
+        },
+        "9780306406157": {
+            "Title": "Sample Title",
+            "Authors": ["Doe, Jane"],
+            "Publisher": "Plenum Press",
+            "Year": "1994",
+            "Language": "eng",
+        },
+    },
+    "isils": {
+        "DE-202": "Beispielbibliothek Berlin",
+        "DE-1a": "Staatsbibliothek zu Berlin",
+    },
+}
+
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "lognormal")
+STATUS_OUTCOMES = ("ok", "not_found", "http_429", "http_500", "outage", "timeout")
+FAULT_STATUS = {"http_429": 429, "http_500": 500, "outage": 503}
+
+
+class FaultProfile:
+    """Störungsprofil für einen Service.
+
+    Args:
+        latency: Verteilung der Antwortzeit (``fixed``, ``uniform``, ``lognormal``)
+        latency_ms: feste Latenz bzw. Mittelwert (uniform) bzw. Median (lognormal)
+        latency_jitter_ms: halbe Breite der Gleichverteilung
+        latency_sigma: Streuung der Lognormalverteilung (sigma des Logarithmus)
+        rate_429: Wahrscheinlichkeit einer einzelnen 429-Antwort
+        burst_every: nach je so vielen Anfragen beginnt ein 429-Burst (0 = aus)
+        burst_length: Anzahl aufeinanderfolgender 429-Antworten pro Burst
+        retry_after: Wert des ``Retry-After``-Headers in Sekunden
+        error_rate: Wahrscheinlichkeit einer 500-Antwort
+        timeout_rate: Wahrscheinlichkeit, dass die Antwort ``timeout_seconds`` hängt
+        timeout_seconds: Hängezeit; größer als das Client-Timeout wählen
+        outages: Ausfallfenster als (Start, Ende) in Sekunden ab Serverstart (503)
+    """
+
+    def __init__(
+        self,
+        latency: str = "fixed",
+        latency_ms: float = 0.0,
+        latency_jitter_ms: float = 0.0,
+        latency_sigma: float = 0.5,
+        rate_429: float = 0.0,
+        burst_every: int = 0,
+        burst_length: int = 0,
+        retry_after: int = 1,
+        error_rate: float = 0.0,
+        timeout_rate: float = 0.0,
+        timeout_seconds: float = 30.0,
+        outages: Iterable[Tuple[float, float]] = (),
+    ):
+        if latency not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"Unbekannte Latenzverteilung: {latency}")
+        self.latency = latency
+        self.latency_ms = latency_ms
+        self.latency_jitter_ms = latency_jitter_ms
+        self.latency_sigma = latency_sigma
+        self.rate_429 = rate_429
+        self.burst_every = burst_every
+        self.burst_length = burst_length
+        self.retry_after = retry_after
+        self.error_rate = error_rate
+        self.timeout_rate = timeout_rate
+        self.timeout_seconds = timeout_seconds
+        self.outages = [(float(start), float(end)) for start, end in outages]
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "FaultProfile":
+        """Erzeugt ein Profil aus einem JSON-Dict (Schlüssel wie die Argumente)."""
+        return cls(**data)
+
+    def sample_latency(self, rng: random.Random) -> float:
+        """Zieht eine Antwortzeit in Sekunden."""
+        if self.latency == "uniform":
+            ms = rng.uniform(self.latency_ms - self.latency_jitter_ms, self.latency_ms + self.latency_jitter_ms)
+        elif self.latency == "lognormal" and self.latency_ms > 0:
+            ms = rng.lognormvariate(math.log(self.latency_ms), self.latency_sigma)
+        else:
+            ms = self.latency_ms
+        return max(ms, 0.0) / 1000.0
+
+    def in_outage(self, elapsed: float) -> bool:
+        return any(start <= elapsed < end for start, end in self.outages)
+
+
+def isbn10_to_isbn13(isbn: str) -> str:
+    """Wandelt eine ISBN-10 in die ISBN-13 um (ohne Prüfung der ISBN-10)."""
+    core = "978" + isbn[:9]
+    total = sum(int(d) * (1 if i % 2 == 0 else 3) for i, d in enumerate(core))
+    return core + str((10 - total % 10) % 10)
+
+
+def _normalize_isbn(value: str) -> str:
+    isbn = re.sub(r"[^0-9Xx]", "", value).upper()
+    return isbn10_to_isbn13(isbn) if len(isbn) == 10 else isbn
+
+
+def load_fixtures(path: str) -> Dict[str, Dict[str, Any]]:
+    """Liest Fixtures aus einer JSON-Datei (``{"isbns": {...}, "isils": {...}}``)."""
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+class ApiSimulator:
+    """Zustand des Simulators: Fixtures, Störungsprofile, Zähler.
+
+    Entscheidungen über Störungen sind threadsicher und mit ``seed``
+    reproduzierbar (bei gleicher Anfragereihenfolge). ``service_faults``
+    überschreibt ``faults`` für einzelne Services (``dnb``, ``google_books``,
+    ``openlibrary``, ``wikipedia``, ``sigel``).
+    """
+
+    def __init__(
+        self,
+        fixtures: Optional[Dict[str, Dict[str, Any]]] = None,
+        faults: Optional[FaultProfile] = None,
+        service_faults: Optional[Dict[str, FaultProfile]] = None,
+        seed: Optional[int] = None,
+    ):
+        fixtures = fixtures if fixtures is not None else DEFAULT_FIXTURES
+        self.isbns = {_normalize_isbn(k): v for k, v in fixtures.get("isbns", {}).items()}
+        self.isils = dict(fixtures.get("isils", {}))
+        self.faults = faults or FaultProfile()
+        self.service_faults = dict(service_faults or {})
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._started = time.monotonic()
+        self._request_counts: Dict[str, int] = {}
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    def profile_for(self, service: str) -> FaultProfile:
+        return self.service_faults.get(service, self.faults)
+
+    def decide(self, service: str) -> Tuple[str, float, Dict[str, str]]:
+        """Legt für die nächste Anfrage an ``service`` die Störung fest.
+
+        Returns:
+            (Ergebnis aus ``FAULT_STATUS`` bzw. ``ok``/``timeout``, Verzögerung in s, Zusatz-Header)
+        """
+        profile = self.profile_for(service)
+        with self._lock:
+            n = self._request_counts.get(service, 0)
+            self._request_counts[service] = n + 1
+            elapsed = time.monotonic() - self._started
+            delay = profile.sample_latency(self._rng)
+            roll = self._rng.random()
+
+        retry_after = {"Retry-After": str(profile.retry_after)}
+        if profile.in_outage(elapsed):
+            return "outage", 0.0, {}
+        if profile.burst_every and profile.burst_length and n >= profile.burst_every:
+            if (n - profile.burst_every) % profile.burst_every < profile.burst_length:
+                return "http_429", delay, retry_after
+        if roll < profile.rate_429:
+            return "http_429", delay, retry_after
+        roll -= profile.rate_429
+        if roll < profile.timeout_rate:
+            return "timeout", profile.timeout_seconds, {}
+        roll -= profile.timeout_rate
+        if roll < profile.error_rate:
+            return "http_500", delay, {}
+        return "ok", delay, {}
+
+    def record(self, service: str, outcome: str) -> None:
+        with self._lock:
+            counts = self._stats.setdefault(service, {key: 0 for key in ("requests",) + STATUS_OUTCOMES})
+            counts["requests"] += 1
+            counts[outcome] += 1
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {service: dict(counts) for service, counts in self._stats.items()}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._started = time.monotonic()
+            self._request_counts.clear()
+            self._stats.clear()
+
+    # -- Antwortformate der echten Dienste ---------------------------------
+
+    def google_books(self, isbn: str) -> Tuple[int, Any]:
+        rec = self.isbns.get(isbn)
+        if not rec:
+            return 200, {"kind": "books#volumes", "totalItems": 0}
+        volume = {
+            "title": rec.get("Title", ""),
+            "authors": list(rec.get("Authors", [])),
+            "publisher": rec.get("Publisher", ""),
+            "publishedDate": rec.get("Year", ""),
+            "language": rec.get("Language", ""),
+            "industryIdentifiers": [{"type": "ISBN_13", "identifier": isbn}],
+        }
+        return 200, {"kind": "books#volumes", "totalItems": 1, "items": [{"volumeInfo": volume}]}
+
+    def openlibrary(self, isbn: str) -> Tuple[int, Any]:
+        rec = self.isbns.get(isbn)
+        if not rec:
+            return 200, {}
+        return 200, {
+            f"ISBN:{isbn}": {
+                "title": rec.get("Title", ""),
+                "authors": [{"name": a} for a in rec.get("Authors", [])],
+                "publishers": [{"name": rec.get("Publisher", "")}],
+                "publish_date": rec.get("Year", ""),
+            }
+        }
+
+    def wikipedia(self, isbn: str) -> Tuple[int, Any]:
+        rec = self.isbns.get(isbn)
+        if not rec:
+            return 404, {"type": "https://mediawiki.org/wiki/HyperSwitch/errors/not_found"}
+        return 200, [{
+            "title": rec.get("Title", ""),
+            "author": [a.split(", ")[::-1] for a in rec.get("Authors", [])],
+            "publisher": rec.get("Publisher", ""),
+            "date": rec.get("Year", ""),
+        }]
+
+    def dnb(self, isbn: str) -> Tuple[int, str]:
+        """HTML-Vollanzeige wie ``portal.dnb.de`` (Zeilen, die isbnlib-dnb parst)."""
+        rec = self.isbns.get(isbn)
+        if not rec:
+            return 200, "<html><body><p>Ihre Suche ergab keinen Treffer.</p></body></html>"
+        esc = html.escape
+        authors = "<br/>".join(f"{esc(a)} (Verfasser)" for a in rec.get("Authors", []))
+        rows = [
+            f"<td width=\"25%\" ><strong>Titel</strong></td><td >{esc(rec.get('Title', ''))} / "
+            f"{esc('; '.join(rec.get('Authors', [])))}</td></tr>",
+            f"<td width=\"25%\" ><strong>Person(en)</strong></td><td >{authors}</td></tr>",
+            f"<td width=\"25%\" ><strong>Verlag</strong></td><td >Ort : {esc(rec.get('Publisher', ''))}</td></tr>",
+            f"<td width=\"25%\" ><strong>Zeitliche Einordnung</strong></td>"
+            f"<td >Erscheinungsdatum: {esc(rec.get('Year', ''))}</td></tr>",
+        ]
+        if rec.get("Language"):
+            rows.append(f"<td width=\"25%\" ><strong>Sprache(n)</strong></td> <td > ({esc(rec['Language'])}) </td></tr>")
+        return 200, "<html><body><table>" + "".join(f"<tr>{row}\n" for row in rows) + "</table></body></html>"
+
+    def sigel(self, code: str) -> Tuple[int, Any]:
+        name = self.isils.get(code)
+        if not name:
+            return 404, {"error": "not found"}
+        return 200, {"member": [{"isil": code, "name": name}]}
+
+
+class SimulatorRequestHandler(BaseHTTPRequestHandler):
+    """Routet Anfragen auf die Dienst-Nachbildungen und spielt Störungen ein."""
+
+    server_version = "FHPApiSimulator/1.0"
+
+    @property
+    def simulator(self) -> ApiSimulator:
+        return self.server.simulator  # type: ignore[attr-defined]
+
+    def log_message(self, format: str, *args: Any) -> None:  # noqa: A002
+        pass
+
+    def do_GET(self) -> None:  # noqa: N802
+        parsed = urlparse(self.path)
+        if parsed.path == STATS_PATH:
+            self._send(200, self.simulator.stats())
+            return
+
+        route = self._route(parsed)
+        if route is None:
+            self._send(404, {"error": "unknown endpoint"})
+            return
+        service, key = route
+
+        outcome, delay, headers = self.simulator.decide(service)
+        if delay:
+            time.sleep(delay)
+        if outcome == "timeout":
+            # Client hat längst aufgegeben; Verbindung ohne Antwort schließen
+            self.simulator.record(service, outcome)
+            self.close_connection = True
+            return
+        if outcome in FAULT_STATUS:
+            self.simulator.record(service, outcome)
+            self._send(FAULT_STATUS[outcome], {"error": outcome}, headers)
+            return
+
+        body_status, body = getattr(self.simulator, service)(key)
+        known = self.simulator.isils if service == "sigel" else self.simulator.isbns
+        self.simulator.record(service, "ok" if key in known else "not_found")
+        self._send(body_status, body)
+
+    def _route(self, parsed) -> Optional[Tuple[str, str]]:
+        query = parse_qs(parsed.query)
+        path = parsed.path
+        if path == GOOGLE_BOOKS_PATH:
+            q = query.get("q", [""])[0]
+            return "google_books", _normalize_isbn(q.split("isbn:", 1)[-1])
+        if path == OPENLIBRARY_PATH:
+            bibkeys = query.get("bibkeys", [""])[0]
+            return "openlibrary", _normalize_isbn(bibkeys.split("ISBN:", 1)[-1])
+        if path.startswith(WIKIPEDIA_PATH):
+            return "wikipedia", _normalize_isbn(unquote(path[len(WIKIPEDIA_PATH):]))
+        if path == DNB_PATH:
+            result_id = query.get("currentResultId", [""])[0]
+            match = re.search(r"[0-9Xx]{10,13}", result_id)
+            return "dnb", _normalize_isbn(match.group(0) if match else "")
+        if path.startswith(SIGEL_PATH) and path.endswith(".jsonld"):
+            return "sigel", unquote(path[len(SIGEL_PATH):-len(".jsonld")])
+        return None
+
+    def _send(self, status: int, body: Any, headers: Optional[Dict[str, str]] = None) -> None:
+        if isinstance(body, str):
+            payload = body.encode("utf-8")
+            content_type = "text/html; charset=utf-8"
+        else:
+            payload = json.dumps(body, ensure_ascii=False).encode("utf-8")
+            content_type = "application/json; charset=utf-8"
+        try:
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(payload)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(payload)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # Client hat nach einem Timeout bereits aufgegeben
+
+
+def start_simulator(
+    port: int = 0,
+    host: str = "localhost",
+    fixtures: Optional[Dict[str, Dict[str, Any]]] = None,
+    faults: Optional[FaultProfile] = None,
+    service_faults: Optional[Dict[str, FaultProfile]] = None,
+    seed: Optional[int] = None,
+) -> ThreadingHTTPServer:
+    """Startet den Simulator in einem Daemon-Thread.
+
+    ``port=0`` wählt einen freien Port. Der Server trägt ``simulator``
+    (:class:`ApiSimulator`) und ``base_url`` (für ``FHP_API_BASE_URL``).
+    Beenden mit ``server.shutdown()`` und ``server.server_close()``.
+    """
+    server = ThreadingHTTPServer((host, port), SimulatorRequestHandler)
+    server.daemon_threads = True
+    server.simulator = ApiSimulator(fixtures, faults, service_faults, seed)  # type: ignore[attr-defined]
+    server.base_url = f"http://{host}:{server.server_address[1]}"  # type: ignore[attr-defined]
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+def _parse_outage(value: str) -> Tuple[float, float]:
+    start, end = value.split(":", 1)
+    return float(start), float(end)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Lokaler Simulator für DNB, Google Books, OpenLibrary und SIGEL")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=DEFAULT_SIMULATOR_PORT)
+    parser.add_argument("--fixtures", help="JSON-Datei mit {'isbns': {...}, 'isils': {...}}")
+    parser.add_argument("--service-faults", help="JSON-Datei mit Störungsprofilen pro Service")
+    parser.add_argument("--seed", type=int, help="Zufallssaat für reproduzierbare Störungen")
+    parser.add_argument("--latency", choices=LATENCY_DISTRIBUTIONS, default="fixed")
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--latency-jitter-ms", type=float, default=0.0)
+    parser.add_argument("--latency-sigma", type=float, default=0.5)
+    parser.add_argument("--rate-429", type=float, default=0.0, help="Anteil zufälliger 429-Antworten")
+    parser.add_argument("--burst-every", type=int, default=0, help="429-Burst nach je N Anfragen")
+    parser.add_argument("--burst-length", type=int, default=0, help="Länge eines 429-Bursts")
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After in Sekunden")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Anteil von 500-Antworten")
+    parser.add_argument("--timeout-rate", type=float, default=0.0, help="Anteil hängender Anfragen")
+    parser.add_argument("--timeout-seconds", type=float, default=30.0)
+    parser.add_argument("--outage", action="append", type=_parse_outage, default=[],
+                        help="Ausfallfenster START:ENDE in Sekunden ab Start (mehrfach möglich)")
+    args = parser.parse_args(argv)
+
+    faults = FaultProfile(
+        latency=args.latency,
+        latency_ms=args.latency_ms,
+        latency_jitter_ms=args.latency_jitter_ms,
+        latency_sigma=args.latency_sigma,
+        rate_429=args.rate_429,
+        burst_every=args.burst_every,
+        burst_length=args.burst_length,
+        retry_after=args.retry_after,
+        error_rate=args.error_rate,
+        timeout_rate=args.timeout_rate,
+        timeout_seconds=args.timeout_seconds,
+        outages=args.outage,
+    )
+    service_faults = None
+    if args.service_faults:
+        with open(args.service_faults, encoding="utf-8") as f:
+            service_faults = {name: FaultProfile.from_dict(cfg) for name, cfg in json.load(f).items()}
+    fixtures = load_fixtures(args.fixtures) if args.fixtures else None
+
+    server = start_simulator(args.port, args.host, fixtures, faults, service_faults, args.seed)
+    print(f"✓ API-Simulator läuft auf {server.base_url}")
+    print(f"  Clients umleiten mit: FHP_API_BASE_URL={server.base_url}")
+    print(f"  Zähler: {server.base_url}{STATS_PATH}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print("\nSimulator beendet.")
+        server.shutdown()
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+"""
+API-Performance-Benchmark für die Metadaten-Anreicherung.
+
+Führt eine Gittersuche über Thread-Anzahl (``MAX_WORKERS``) und Mindestabstand
+zwischen Anfragen (``RATE_LIMIT_SECONDS``) durch. Jede Konfiguration läuft eine
+feste Zeit gegen eine austauschbare Abruffunktion (Standard: isbnlib-Service);
+gemessen werden Anfragen pro Sekunde, Fehler- und 429-Quote sowie
+Latenz-Perzentile. Zum Schluss wird die schnellste Konfiguration ohne
+Rate-Limit-Probleme als Empfehlung für ``enrich_metadata`` ausgegeben.
+
+Aufruf:
+    python benchmark_api_limits.py --workers 4,8,16,32 --rates 0.1,0.05,0.02 --duration 30
+"""
+
+import argparse
+import itertools
+import json
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from metadata_enrichment.enrichment_metrics import LatencyHistogram
+
+# Beispiel-ISBNs (deutschsprachige Literatur aus dem VÖB-Bestand)
+DEFAULT_TEST_ISBNS = [
+    "9783453350618",
+    "9783442735914",
+    "9783938046869",
+    "9783870244439",
+    "9780306406157",
+]
+DEFAULT_WORKER_COUNTS = [4, 8, 16, 32]
+DEFAULT_RATE_LIMITS = [0.1, 0.05, 0.02]
+DEFAULT_TEST_DURATION = 30
+TOTAL_ISBNS_IN_DUMP = 831973  # Datensätze mit ISBN im VÖB-Abzug vom 27.10.2024
+
+
+class RateLimiter:
+    """Globaler, threadsicherer Mindestabstand zwischen zwei Anfragen.
+
+    Entspricht ``_acquire_rate_slot`` in ``enrich_metadata``, aber als Objekt,
+    damit jede Benchmark-Konfiguration einen eigenen Limiter bekommt.
+    """
+
+    def __init__(self, requests_per_second: float):
+        self.rate_limit_seconds = 1.0 / requests_per_second if requests_per_second > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next_allowed = 0.0
+
+    @classmethod
+    def from_interval(cls, rate_limit_seconds: float) -> "RateLimiter":
+        """Erzeugt einen Limiter aus dem Mindestabstand in Sekunden."""
+        return cls(1.0 / rate_limit_seconds if rate_limit_seconds > 0 else 0.0)
+
+    def acquire(self) -> float:
+        """Blockiert bis zum nächsten freien Slot; liefert die Wartezeit in Sekunden."""
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_allowed)
+            self._next_allowed = slot + self.rate_limit_seconds
+        wait = slot - now
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+def fetch_isbn_data(isbn: str, service: str = "dnb") -> Optional[Dict[str, Any]]:
+    """Standard-Abruffunktion: Metadaten über isbnlib von ``service`` holen."""
+    import isbnlib
+    if service == "dnb":
+        import isbnlib_dnb  # noqa: F401  (registriert den DNB-Service)
+    return isbnlib.meta(isbn, service=service) or None
+
+
+def _is_rate_limited(error: BaseException) -> bool:
+    text = str(error).lower()
+    return "429" in text or "too many requests" in text
+
+
+def test_configuration(
+    max_workers: int,
+    rate_limit_seconds: float,
+    test_isbns: Sequence[str],
+    test_duration: float,
+    fetch_func: Optional[Callable[[str], Any]] = None,
+) -> Dict[str, Any]:
+    """Misst eine Konfiguration für ``test_duration`` Sekunden.
+
+    Die ISBNs werden reihum abgefragt, bis die Zeit abgelaufen ist.
+
+    Args:
+        max_workers: Anzahl paralleler Threads
+        rate_limit_seconds: Mindestabstand zwischen zwei Anfragen (global)
+        test_isbns: ISBNs, die reihum abgefragt werden
+        test_duration: Messdauer in Sekunden
+        fetch_func: Abruffunktion ``f(isbn)``; Standard ist ``fetch_isbn_data``
+
+    Returns:
+        dict mit Durchsatz, Fehler-/429-Quote und Latenz-Perzentilen
+    """
+    fetch = fetch_func or fetch_isbn_data
+    limiter = RateLimiter.from_interval(rate_limit_seconds)
+    latency = LatencyHistogram()
+    counts = {"requests": 0, "hits": 0, "misses": 0, "errors": 0, "http_429": 0}
+    lock = threading.Lock()
+    isbn_cycle = itertools.cycle(list(test_isbns))
+
+    start = time.monotonic()
+    deadline = start + test_duration
+
+    def worker() -> None:
+        while test_isbns:
+            limiter.acquire()
+            if time.monotonic() >= deadline:
+                return
+            with lock:
+                isbn = next(isbn_cycle)
+            request_start = time.perf_counter()
+            try:
+                outcome = "hits" if fetch(isbn) else "misses"
+            except Exception as e:
+                outcome = "http_429" if _is_rate_limited(e) else "errors"
+            elapsed = time.perf_counter() - request_start
+            with lock:
+                counts["requests"] += 1
+                counts[outcome] += 1
+                latency.observe(elapsed)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for _ in range(max_workers):
+            executor.submit(worker)
+
+    total_time = time.monotonic() - start
+    requests_made = counts["requests"]
+    requests_per_second = requests_made / total_time if total_time > 0 else 0.0
+    failed = counts["errors"] + counts["http_429"]
+
+    return {
+        "max_workers": max_workers,
+        "rate_limit_seconds": rate_limit_seconds,
+        "total_time": round(total_time, 3),
+        "requests_made": requests_made,
+        "successful": counts["hits"],
+        "not_found": counts["misses"],
+        "errors": counts["errors"],
+        "http_429": counts["http_429"],
+        "error_rate": round(failed / requests_made, 4) if requests_made else 0.0,
+        "rate_429": round(counts["http_429"] / requests_made, 4) if requests_made else 0.0,
+        "requests_per_second": round(requests_per_second, 3),
+        "latency_ms": latency.summary(),
+        "estimated_time_for_1m_isbns": (
+            round(1_000_000 / requests_per_second, 1) if requests_per_second > 0 else None
+        ),
+    }
+
+
+# Kein pytest-Test, auch wenn der Name mit "test_" beginnt
+test_configuration.__test__ = False
+
+
+def run_sweep(
+    worker_counts: Iterable[int],
+    rate_limits: Iterable[float],
+    test_isbns: Sequence[str],
+    test_duration: float,
+    fetch_func: Optional[Callable[[str], Any]] = None,
+    cooldown: float = 0.0,
+) -> List[Dict[str, Any]]:
+    """Misst alle Kombinationen aus ``worker_counts`` x ``rate_limits``.
+
+    ``cooldown`` wartet zwischen zwei Konfigurationen, damit ein vorheriger
+    429-Zustand des Servers die nächste Messung nicht verfälscht.
+    """
+    results = []
+    configs = list(itertools.product(worker_counts, rate_limits))
+    for i, (workers, rate) in enumerate(configs, 1):
+        print(f"[{i}/{len(configs)}] MAX_WORKERS={workers}, RATE_LIMIT_SECONDS={rate} ...", flush=True)
+        result = test_configuration(workers, rate, test_isbns, test_duration, fetch_func=fetch_func)
+        print(
+            f"   {result['requests_per_second']:.2f} req/s | Fehler {result['error_rate'] * 100:.1f}% | "
+            f"429 {result['rate_429'] * 100:.1f}% | p95 {result['latency_ms']['p95_ms']:.0f} ms",
+            flush=True,
+        )
+        results.append(result)
+        if cooldown and i < len(configs):
+            time.sleep(cooldown)
+    return results
+
+
+def recommend_configuration(
+    results: Iterable[Dict[str, Any]],
+    max_error_rate: float = 0.02,
+    max_429_rate: float = 0.0,
+) -> Optional[Dict[str, Any]]:
+    """Wählt die schnellste Konfiguration, die die Fehlergrenzen einhält.
+
+    Bei gleichem Durchsatz gewinnt die Konfiguration mit weniger Threads und
+    größerem Abstand (schonender für die API). ``None``, wenn keine sicher ist.
+    """
+    safe = [
+        r for r in results
+        if r.get("requests_made", 0) > 0
+        and r.get("error_rate", 0.0) <= max_error_rate
+        and r.get("rate_429", 0.0) <= max_429_rate
+    ]
+    if not safe:
+        return None
+    return max(
+        safe,
+        key=lambda r: (r["requests_per_second"], -r["max_workers"], r["rate_limit_seconds"]),
+    )
+
+
+def _parse_list(value: str, cast: Callable[[str], Any]) -> List[Any]:
+    return [cast(v) for v in value.split(",") if v.strip()]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="API-Limits für die Metadaten-Anreicherung messen")
+    parser.add_argument("--workers", default=",".join(map(str, DEFAULT_WORKER_COUNTS)),
+                        help="Thread-Anzahlen, kommagetrennt")
+    parser.add_argument("--rates", default=",".join(map(str, DEFAULT_RATE_LIMITS)),
+                        help="Mindestabstände zwischen Anfragen in Sekunden, kommagetrennt")
+    parser.add_argument("--duration", type=float, default=DEFAULT_TEST_DURATION,
+                        help="Messdauer pro Konfiguration in Sekunden")
+    parser.add_argument("--service", default="dnb", help="isbnlib-Service (dnb, goob, openl, ...)")
+    parser.add_argument("--isbns-file", help="Datei mit einer ISBN pro Zeile")
+    parser.add_argument("--cooldown", type=float, default=5.0,
+                        help="Pause zwischen zwei Konfigurationen in Sekunden")
+    parser.add_argument("--max-error-rate", type=float, default=0.02)
+    parser.add_argument("--max-429-rate", type=float, default=0.0)
+    parser.add_argument("--output", default="benchmark_results.json", help="JSON-Ausgabedatei")
+    args = parser.parse_args()
+
+    test_isbns = DEFAULT_TEST_ISBNS
+    if args.isbns_file:
+        with open(args.isbns_file, encoding="utf-8") as f:
+            test_isbns = [line.strip() for line in f if line.strip()]
+
+    def fetch(isbn: str) -> Optional[Dict[str, Any]]:
+        return fetch_isbn_data(isbn, service=args.service)
+
+    results = run_sweep(
+        _parse_list(args.workers, int),
+        _parse_list(args.rates, float),
+        test_isbns,
+        args.duration,
+        fetch_func=fetch,
+        cooldown=args.cooldown,
+    )
+    best = recommend_configuration(results, args.max_error_rate, args.max_429_rate)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({"service": args.service, "results": results, "recommended": best}, f, indent=2)
+    print(f"\n✓ Ergebnisse gespeichert in: {args.output}")
+
+    if best is None:
+        print("⚠ Keine Konfiguration blieb unter den Fehlergrenzen - Abstand erhöhen oder Threads reduzieren.")
+        return
+    hours = TOTAL_ISBNS_IN_DUMP / best["requests_per_second"] / 3600
+    print("\nEmpfohlene Einstellungen für metadata_enrichment/enrich_metadata.py:")
+    print(f"   MAX_WORKERS = {best['max_workers']}")
+    print(f"   RATE_LIMIT_SECONDS = {best['rate_limit_seconds']}")
+    print(f"   ({best['requests_per_second']:.2f} req/s, ca. {hours:.1f} h für {TOTAL_ISBNS_IN_DUMP:,} ISBNs)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,66 @@
+import argparse
 import csv
+import os
+import sys
+from pathlib import Path
+from typing import Dict
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from data_analysis.analyze_possession_counts import DEFAULT_CSV_FILE, distribution_file
 
-def count_occurrences(csv_file: str, target_value: int = 1) -> int:
-    """Count how often a specific value occurs in the 'Anzahl 049' column."""
 
-    count = 0
+def count_distribution(csv_file: str) -> Dict[int, int]:
+    """Count all values of the 'Anzahl 049' column in one pass over the per-record CSV."""
+
+    distribution: Dict[int, int] = {}
 
     with open(csv_file, mode='r', newline='', encoding='utf-8-sig') as file:
         reader = csv.DictReader(file, delimiter=';')
-        
+
         for row in reader:
             try:
                 anzahl_049 = int(row['Anzahl 049'])
-                if anzahl_049 == target_value:
-                    count += 1
             except ValueError:
                 # Skip rows with invalid integer values
-                pass
+                continue
+            distribution[anzahl_049] = distribution.get(anzahl_049, 0) + 1
+
+    return dict(sorted(distribution.items()))
+
+
+def load_distribution(csv_file: str) -> Dict[int, int]:
+    """Read the distribution written by ``analyze_possession_counts`` (one row per value)."""
+    with open(csv_file, mode='r', newline='', encoding='utf-8-sig') as file:
+        reader = csv.DictReader(file, delimiter=';')
+        return {int(row['Anzahl 049']): int(row['Datensätze']) for row in reader}
+
+
+def read_distribution(csv_file: str) -> Dict[int, int]:
+    """Distribution for ``csv_file``: from its ``_distribution.csv`` if that is up to date.
+
+    The summary written by ``analyze_possession_counts`` is used when the
+    per-record CSV is missing or not newer than it; a leftover summary of an
+    earlier run never hides a newer per-record CSV.
+    """
+    summary = distribution_file(csv_file)
+    if os.path.exists(summary) and (
+        not os.path.exists(csv_file) or os.path.getmtime(summary) >= os.path.getmtime(csv_file)
+    ):
+        return load_distribution(summary)
+    return count_distribution(csv_file)
+
+
+def count_occurrences(csv_file: str, target_value: int = 1) -> int:
+    """Count how often a specific value occurs in the 'Anzahl 049' column."""
+    return count_distribution(csv_file).get(target_value, 0)
 
-    return count
 
 if __name__ == '__main__':
-    occurrences = count_occurrences('possession_counts.csv')
-    print(f"Anzahl der Vorkommen von 1 in 'Anzahl 049': {occurrences}")
+    parser = argparse.ArgumentParser(description="Verteilung der Werte in 'Anzahl 049'")
+    parser.add_argument('csv_file', nargs='?', default=DEFAULT_CSV_FILE, help='per-record CSV of analyze_possession_counts')
+    args = parser.parse_args()
+
+    # Die beim Zählen geschriebene Verteilung genügt, solange die Datensatz-CSV nicht neuer ist
+    distribution = read_distribution(args.csv_file)
+    for value, occurrences in distribution.items():
+        print(f"Anzahl der Vorkommen von {value} in 'Anzahl 049': {occurrences}")
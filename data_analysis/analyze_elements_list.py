@@ -1,27 +1,76 @@
-import xml.etree.ElementTree as ET
+import argparse
+import html
+import mmap
+import os
+import re
 import sys
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from utilities.record_offsets import shard_ranges
 from utilities.tag_meanings import tag_meanings
 
-def parse_marc21(file_path, output_file):
-    ns = {'marc': 'http://www.loc.gov/MARC21/slim'}
-    elements_found = set()
+SCAN_CHUNK_BYTES = 64 * 1024 * 1024
+
+# Start-Tags von Kontroll- und Datenfeldern (mit oder ohne Namensraum-Präfix)
+FIELD_TAG = re.compile(rb"<(?:[\w.-]+:)?(?:controlfield|datafield)[\s/][^>]*>")
+FIELD_NAME = re.compile(rb"<(?:[\w.-]+:)?(\w+)")
+ATTRIBUTE = re.compile(rb"""([\w.:-]+)\s*=\s*(?:"([^"]*)"|'([^']*)')""")
+
+
+def _element_key(start_tag):
+    """Wandelt einen Start-Tag in den Schlüssel (tag, ind1, ind2) um."""
+    name = FIELD_NAME.match(start_tag).group(1)
+    attributes = {
+        key.decode(): html.unescape((double or single).decode('utf-8'))
+        for key, double, single in ATTRIBUTE.findall(start_tag)
+    }
+    if name == b'controlfield':
+        return (attributes.get('tag'), '', '')
+    return (attributes.get('tag'), attributes.get('ind1'), attributes.get('ind2'))
+
 
-    for event, elem in ET.iterparse(file_path, events=('end',)):
-        tag_clean = elem.tag.replace(f"{{{ns['marc']}}}", "")
-        
-        if tag_clean == "controlfield":
-            tag = elem.get('tag')
-            elements_found.add((tag, '', ''))
+def scan_elements(file_path, begin=0, stop=None):
+    """Sammelt die distinkten Elemente im Byte-Bereich [begin, stop) ohne XML-Parser.
+
+    Die Datei wird per ``mmap`` in Blöcken durchsucht; jeder Block endet
+    hinter einem ``>``, sodass kein Start-Tag zerschnitten wird. Ein Tag, der
+    über ``stop`` hinausreicht, gehört noch zu diesem Bereich.
+    """
+    start_tags = set()
+    with open(file_path, 'rb') as f:
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # leere Datei
+            return set()
+        with mm:
+            stop = len(mm) if stop is None else min(stop, len(mm))
+            pos = begin
+            while pos < stop:
+                end = min(pos + SCAN_CHUNK_BYTES, stop)
+                close = mm.find(b'>', end - 1)
+                end = len(mm) if close == -1 else close + 1
+                start_tags.update(FIELD_TAG.findall(mm, pos, end))
+                pos = end
+    return {_element_key(start_tag) for start_tag in start_tags}
+
+
+def collect_elements(file_path, workers=None):
+    """Distinkte (tag, ind1, ind2) der gesamten Datei, auf ``workers`` Prozesse verteilt."""
+    workers = workers or os.cpu_count() or 1
+    ranges = shard_ranges(file_path, workers)
+    if len(ranges) == 1:
+        return scan_elements(file_path)
+    elements_found = set()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        begins, stops = zip(*ranges)
+        for part in executor.map(scan_elements, [file_path] * len(ranges), begins, stops):
+            elements_found |= part
+    return elements_found
 
-        elif tag_clean == "datafield":
-            tag = elem.get('tag')
-            ind1 = elem.get('ind1')
-            ind2 = elem.get('ind2')
-            elements_found.add((tag, ind1, ind2))
 
-        elem.clear()
+def parse_marc21(file_path, output_file, workers=None):
+    elements_found = collect_elements(file_path, workers)
 
     with open(output_file, 'w', encoding='utf-8') as f:
         for tag, ind1, ind2 in sorted(elements_found):
@@ -32,4 +81,9 @@ def parse_marc21(file_path, output_file):
                 f.write(f'<controlfield tag="{tag}"> -> {description}\n')
 
 if __name__ == '__main__':
-    parse_marc21('voebvoll-20241027.xml', 'elements_list.txt')
+    parser = argparse.ArgumentParser(description='Metadatenelemente auflisten')
+    parser.add_argument('file', nargs='?', default='voebvoll-20241027.xml', help='XML file to analyze')
+    parser.add_argument('--output', default='elements_list.txt', help='result text file')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: all cores)')
+    args = parser.parse_args()
+    parse_marc21(args.file, args.output, workers=args.workers)
@@ -1,11 +1,19 @@
-import xml.etree.ElementTree as ET
+import argparse
 import csv
-from collections import defaultdict
+import math
+import os
 import sys
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from utilities.dense_counter import DenseCounter
+from utilities.record_offsets import collection_namespaces, iter_record_bytes, parse_record, shard_ranges
+from utilities.sampling import DEFAULT_SAMPLE_FRACTION, BlockSample, estimate_ratio, estimate_total
 from utilities.tag_meanings import tag_meanings
 
+DEBUG_SAMPLES = 5  # erste 008-/969-Felder zur Kontrolle ausgeben
+DENSE_COUNTERS = ('elements', 'details_008', 'details_969', 'pub_status', 'pub_country', 'language')
+
 # Common language codes used in MARC21 field 008
 LANG_CODES = {
     "ger": "Deutsch",
@@ -21,6 +29,45 @@ LANG_CODES = {
     "por": "Portugiesisch",
 }
 
+# Field 008/06: type of date / publication status
+PUB_STATUS_MEANINGS = {
+    'b': 'Keine Datumsangaben vorhanden',
+    'c': 'Aktuell erscheinend',
+    'd': 'Eingestellt',
+    'e': 'Detailliertes Datum',
+    'i': 'Ungenaues Datum',
+    'm': 'Mehrere Daten',
+    'n': 'Unbekanntes Datum',
+    'p': 'Verteilungsdatum/Produktionsdatum',
+    'q': 'Fragliches Datum',
+    'r': 'Nachdruck/Reproduktionsdatum',
+    's': 'Einzelnes bekanntes Datum',
+    't': 'Publikationsdatum und Copyright-Datum',
+    'u': 'Unbekannt'
+}
+
+# Field 008/15-17: common place of publication codes
+COUNTRY_CODES = {
+    'gw': 'Deutschland',
+    'au': 'Österreich',
+    'sz': 'Schweiz',
+    'xxu': 'USA',
+    'nyu': 'New York (USA)',
+    'cau': 'Kalifornien (USA)',
+    'xxk': 'Großbritannien',
+    'enk': 'England',
+    'fr': 'Frankreich',
+    'it': 'Italien',
+    'sp': 'Spanien',
+    'ne': 'Niederlande',
+    'be': 'Belgien',
+    'po': 'Polen',
+    'ru': 'Russland',
+    'ja': 'Japan',
+    'ch': 'China'
+}
+
+
 def parse_008_field(field_content):
     if not field_content:
         return {}
@@ -39,23 +86,8 @@ def parse_008_field(field_content):
     # Publikationstyp/Datum-Typ (Position 6)
     if field_len > 6:
         pub_status = field_content[6]
-        pub_status_meanings = {
-            'b': 'Keine Datumsangaben vorhanden',
-            'c': 'Aktuell erscheinend',
-            'd': 'Eingestellt',
-            'e': 'Detailliertes Datum',
-            'i': 'Ungenaues Datum',
-            'm': 'Mehrere Daten',
-            'n': 'Unbekanntes Datum',
-            'p': 'Verteilungsdatum/Produktionsdatum',
-            'q': 'Fragliches Datum',
-            'r': 'Nachdruck/Reproduktionsdatum',
-            's': 'Einzelnes bekanntes Datum',
-            't': 'Publikationsdatum und Copyright-Datum',
-            'u': 'Unbekannt'
-        }
-        if pub_status and pub_status in pub_status_meanings:
-            analysis['Publikationsstatus'] = f"{pub_status} ({pub_status_meanings[pub_status]})"
+        if pub_status and pub_status in PUB_STATUS_MEANINGS:
+            analysis['Publikationsstatus'] = f"{pub_status} ({PUB_STATUS_MEANINGS[pub_status]})"
     
     # Publikationsjahr 1 (Positionen 7-10)
     if field_len > 10:
@@ -73,27 +105,7 @@ def parse_008_field(field_content):
     if field_len > 17:
         pub_place = field_content[15:18]
         if pub_place and pub_place.strip() and pub_place != '   ':
-            # Häufige Ländercodes erweitert
-            country_codes = {
-                'gw': 'Deutschland',
-                'au': 'Österreich', 
-                'sz': 'Schweiz',
-                'xxu': 'USA',
-                'nyu': 'New York (USA)',
-                'cau': 'Kalifornien (USA)',
-                'xxk': 'Großbritannien',
-                'enk': 'England',
-                'fr': 'Frankreich',
-                'it': 'Italien',
-                'sp': 'Spanien',
-                'ne': 'Niederlande',
-                'be': 'Belgien',
-                'po': 'Polen',
-                'ru': 'Russland',
-                'ja': 'Japan',
-                'ch': 'China'
-            }
-            country_name = country_codes.get(pub_place.lower(), pub_place)
+            country_name = COUNTRY_CODES.get(pub_place.lower(), pub_place)
             analysis['Publikationsland'] = f"{pub_place} ({country_name})"
     
     if field_len >= 39:
@@ -145,94 +157,174 @@ def parse_969_field(datafield_elem):
 
     return analysis
 
-def parse_marc21_quantity(file_path, output_csv):
-    ns = {'marc': 'http://www.loc.gov/MARC21/slim'}
-    element_counter = defaultdict(int)
-    field_008_counter = defaultdict(int)  # Für detaillierte 008-Analyse
-    field_969_counter = defaultdict(int)  # Für detaillierte 969-Analyse
-    
-    # Neue Counter für distinkte Werte
-    pub_status_values = defaultdict(int)
-    pub_country_values = defaultdict(int)
-    language_values = defaultdict(int)
-    
-    total_records = 0
-    total_008_fields = 0
-    total_969_fields = 0
+def _print_008_sample(number, field_content, analysis):
+    print(f"008-Feld #{number}: '{field_content}' (Länge: {len(field_content)})")
+    print(f"  Positionen 0-5 (Eingabedatum): '{field_content[0:6] if len(field_content) > 5 else 'zu kurz'}'")
+    print(f"  Position 6 (Pub-Status): '{field_content[6] if len(field_content) > 6 else 'zu kurz'}'")
+    print(f"  Positionen 7-10 (Jahr 1): '{field_content[7:11] if len(field_content) > 10 else 'zu kurz'}'")
+    print(f"  Positionen 11-14 (Jahr 2): '{field_content[11:15] if len(field_content) > 14 else 'zu kurz'}'")
+    print(f"  Positionen 15-17 (Land): '{field_content[15:18] if len(field_content) > 17 else 'zu kurz'}'")
+    print(f"  Positionen 35-37 (Sprache): '{field_content[35:38] if len(field_content) > 37 else 'zu kurz'}'")
+    print(f"  Letzte 3 Zeichen: '{field_content[-3:] if len(field_content) >= 3 else 'zu kurz'}'")
+    print(f"Analyse: {analysis}")
+    print()
+
+
+def count_elements(file_path, begin=0, stop=None):
+    """Map-Schritt: zählt alle Datensätze, deren Beginn im Byte-Bereich [begin, stop) liegt.
+
+    Schlüssel werden in ``DenseCounter`` auf fortlaufende Integer-IDs
+    abgebildet und in NumPy-Arrays gezählt; das Ergebnis ist picklebar und
+    wird mit ``merge_counts`` in Dateireihenfolge zusammengeführt.
+    """
+    return count_record_elements(
+        (data for _, _, data in iter_record_bytes(file_path, begin, stop)), collection_namespaces(file_path)
+    )
+
+
+def count_record_elements(records, namespaces=None, boundaries=None):
+    """Zählt wie ``count_elements`` über beliebige Datensätze als Rohbytes (z. B. nur geänderte).
+
+    ``namespaces`` sind die Namensraum-Deklarationen der Collection (siehe
+    ``collection_namespaces``), damit die Datensätze wie mit ``iterparse``
+    über die ganze Datei geparst werden. In eine übergebene Liste
+    ``boundaries`` wird nach jedem Datensatz die Anzahl der bekannten
+    Schlüssel je Zähler angehängt; die Schlüssel, die Datensatz ``i`` als
+    erster liefert, sind damit ``keys[boundaries[i - 1][name]:boundaries[i][name]]``.
+    """
+    counts = {
+        'records': 0,
+        'fields_008': 0,
+        'fields_969': 0,
+        'elements': DenseCounter(),
+        'details_008': DenseCounter(),
+        'details_969': DenseCounter(),
+        'pub_status': DenseCounter(),
+        'pub_country': DenseCounter(),
+        'language': DenseCounter(),
+        'samples_008': [],
+        'samples_969': [],
+    }
+    elements = counts['elements']
+    details_008 = counts['details_008']
+    details_969 = counts['details_969']
+    distinct_008 = {
+        'Publikationsstatus': counts['pub_status'],
+        'Publikationsland': counts['pub_country'],
+        'Sprache': counts['language'],
+    }
+
+    for data in records:
+        record = parse_record(data, namespaces)
+        counts['records'] += 1
+        # dict statt set: jedes Element einmal pro Datensatz, in Dokumentreihenfolge
+        seen_elements = {}
+
+        for child in record:
+            child_tag_clean = child.tag.rpartition('}')[2]
+
+            if child_tag_clean == "controlfield":
+                tag = child.get('tag')
+                seen_elements[(tag, '', '')] = None
+
+                # Spezielle Behandlung für 008-Feld
+                if tag == '008':
+                    counts['fields_008'] += 1
+                    field_content = child.text or ''
+                    analysis = parse_008_field(field_content)
+                    details_008.update(analysis)
+                    # Sammle distinkte Werte für spezielle Felder
+                    for subfield_name, value in analysis.items():
+                        if subfield_name in distinct_008:
+                            distinct_008[subfield_name].add(value)
+                    if len(counts['samples_008']) < DEBUG_SAMPLES:
+                        counts['samples_008'].append((field_content, analysis))
+
+            elif child_tag_clean == "datafield":
+                tag = child.get('tag')
+                seen_elements[(tag, child.get('ind1'), child.get('ind2'))] = None
+
+                if tag == '969':
+                    counts['fields_969'] += 1
+                    analysis = parse_969_field(child)
+                    details_969.update(analysis)
+                    if len(counts['samples_969']) < DEBUG_SAMPLES:
+                        counts['samples_969'].append(analysis)
+
+        elements.update(seen_elements)
+        if boundaries is not None:
+            boundaries.append({name: len(counts[name]) for name in DENSE_COUNTERS})
+
+    return counts
+
+
+def merge_counts(parts):
+    """Reduce-Schritt: Teilergebnisse in Dateireihenfolge zusammenführen."""
+    parts = iter(parts)
+    total = next(parts)
+    for part in parts:
+        for key, value in part.items():
+            if isinstance(value, DenseCounter):
+                total[key].merge(value)
+            elif isinstance(value, list):
+                total[key].extend(value[:DEBUG_SAMPLES - len(total[key])])
+            else:
+                total[key] += value
+    return total
+
+
+def _element_label(key):
+    tag, ind1, ind2 = key
+    if ind1 or ind2:
+        return f'<datafield tag="{tag}" ind1="{ind1}" ind2="{ind2}">'
+    return f'<controlfield tag="{tag}">'
 
-    for event, elem in ET.iterparse(file_path, events=('end',)):
-        tag_clean = elem.tag.replace(f"{{{ns['marc']}}}", "")
-        
-        if tag_clean == "record":
-            total_records += 1
-            
-            seen_elements = set()
-            
-            for child in elem:
-                child_tag_clean = child.tag.replace(f"{{{ns['marc']}}}", "")
-
-                if child_tag_clean == "controlfield":
-                    tag = child.get('tag')
-                    key = (tag, '', '')
-                    seen_elements.add(key)
-                    
-                    # Spezielle Behandlung für 008-Feld
-                    if tag == '008':
-                        total_008_fields += 1
-                        field_content = child.text or ''
-                        analysis = parse_008_field(field_content)
-                        
-                        # Zähle jedes gefundene Unterelement
-                        for subfield_name, value in analysis.items():
-                            field_008_counter[subfield_name] += 1
-                            
-                            # Sammle distinkte Werte für spezielle Felder
-                            if subfield_name == 'Publikationsstatus':
-                                pub_status_values[value] += 1
-                            elif subfield_name == 'Publikationsland':
-                                pub_country_values[value] += 1
-                            elif subfield_name == 'Sprache':
-                                language_values[value] += 1
-                        
-                        # Debug: Zeige erste paar 008-Felder zur Kontrolle
-                        if total_008_fields <= 5:
-                            print(f"008-Feld #{total_008_fields}: '{field_content}' (Länge: {len(field_content)})")
-                            print(f"  Positionen 0-5 (Eingabedatum): '{field_content[0:6] if len(field_content) > 5 else 'zu kurz'}'")
-                            print(f"  Position 6 (Pub-Status): '{field_content[6] if len(field_content) > 6 else 'zu kurz'}'")
-                            print(f"  Positionen 7-10 (Jahr 1): '{field_content[7:11] if len(field_content) > 10 else 'zu kurz'}'")
-                            print(f"  Positionen 11-14 (Jahr 2): '{field_content[11:15] if len(field_content) > 14 else 'zu kurz'}'")
-                            print(f"  Positionen 15-17 (Land): '{field_content[15:18] if len(field_content) > 17 else 'zu kurz'}'")
-                            print(f"  Positionen 35-37 (Sprache): '{field_content[35:38] if len(field_content) > 37 else 'zu kurz'}'")
-                            print(f"  Letzte 3 Zeichen: '{field_content[-3:] if len(field_content) >= 3 else 'zu kurz'}'")
-                            print(f"Analyse: {analysis}")
-                            print()
-
-                elif child_tag_clean == "datafield":
-                    tag = child.get('tag')
-                    ind1 = child.get('ind1')
-                    ind2 = child.get('ind2')
-                    key = (tag, ind1, ind2)
-                    seen_elements.add(key)
-
-                    if tag == '969':
-                        total_969_fields += 1
-                        analysis = parse_969_field(child)
-
-                        for subfield_name in analysis:
-                            field_969_counter[subfield_name] += 1
-
-                        if total_969_fields <= 5:
-                            print(f"969-Feld #{total_969_fields}: {analysis}")
-
-            for key in seen_elements:
-                element_counter[key] += 1
-
-            elem.clear()
+
+def parse_marc21_quantity(file_path, output_csv, workers=None):
+    """Zählt Elemente, 008- und 969-Details und schreibt die vier CSV-Dateien.
+
+    Die Datei wird in Byte-Bereiche aufgeteilt, die ``workers`` Prozesse
+    (Standard: alle Kerne) parallel zählen.
+    """
+    workers = workers or os.cpu_count() or 1
+    ranges = shard_ranges(file_path, workers)
+    if len(ranges) == 1:
+        counts = count_elements(file_path)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            begins, stops = zip(*ranges)
+            counts = merge_counts(executor.map(count_elements, [file_path] * len(ranges), begins, stops))
+
+    # Debug: Zeige erste paar 008- und 969-Felder zur Kontrolle
+    for number, (field_content, analysis) in enumerate(counts['samples_008'], 1):
+        _print_008_sample(number, field_content, analysis)
+    for number, analysis in enumerate(counts['samples_969'], 1):
+        print(f"969-Feld #{number}: {analysis}")
+
+    write_quantity_reports(counts, output_csv)
+
+
+def write_quantity_reports(counts, output_csv):
+    """Schreibt die vier CSV-Dateien aus den Zählungen von ``count_elements``.
+
+    Die Zähler brauchen nur ``items()`` und ``most_common()``; neben
+    ``DenseCounter`` passen daher auch ``collections.Counter`` (siehe
+    ``data_processing/diff_dumps.py``).
+    """
+    total_records = counts['records']
+    total_008_fields = counts['fields_008']
+    total_969_fields = counts['fields_969']
+    element_counter = counts['elements']
+    field_008_counter = counts['details_008']
+    field_969_counter = counts['details_969']
+    pub_status_values = counts['pub_status']
+    pub_country_values = counts['pub_country']
+    language_values = counts['language']
 
     # Sortieren der Ergebnisse nach Anzahl absteigend
-    sorted_elements = sorted(element_counter.items(), key=lambda x: x[1], reverse=True)
-    sorted_008_elements = sorted(field_008_counter.items(), key=lambda x: x[1], reverse=True)
-    sorted_969_elements = sorted(field_969_counter.items(), key=lambda x: x[1], reverse=True)
+    sorted_elements = element_counter.most_common()
+    sorted_008_elements = field_008_counter.most_common()
+    sorted_969_elements = field_969_counter.most_common()
 
     # Hauptdatei: CSV-Datei mit UTF-8-BOM schreiben für Excel-Kompatibilität
     with open(output_csv, 'w', newline='', encoding='utf-8-sig') as csvfile:
@@ -240,16 +332,9 @@ def parse_marc21_quantity(file_path, output_csv):
         writer.writerow(['Element', 'Beschreibung', 'Anzahl Befüllung', 'Befüllung in %'])
 
         for key, count in sorted_elements:
-            tag, ind1, ind2 = key
             desc = tag_meanings.get(key, 'Beschreibung unbekannt')
             percent = (count / total_records) * 100
-
-            if ind1 or ind2:
-                element_str = f'<datafield tag="{tag}" ind1="{ind1}" ind2="{ind2}">'
-            else:
-                element_str = f'<controlfield tag="{tag}">'
-
-            writer.writerow([element_str, desc, count, f'{percent:.2f}%'])
+            writer.writerow([_element_label(key), desc, count, f'{percent:.2f}%'])
 
     # Zusätzliche Datei für detaillierte 008-Feld-Analyse
     output_008_csv = output_csv.replace('.csv', '_008_details.csv')
@@ -342,5 +427,69 @@ def parse_marc21_quantity(file_path, output_csv):
             percent = (count / total_008_fields) * 100 if total_008_fields > 0 else 0
             print(f'  {value}: {count} ({percent:.1f}%)')
 
+def preview_elements_quantity(file_path, fraction=DEFAULT_SAMPLE_FRACTION, seed=0):
+    """Schätzt die Befüllung aller Elemente aus einer Blockstichprobe (``--preview``).
+
+    Jeder gezogene Byte-Block wird mit ``count_elements`` gezählt. Liefert
+    ``(Datensätze, [(Element, Anzahl, Anteil), ...])`` mit ``Estimate``-Werten
+    (95 %-Intervall), nach geschätzter Anzahl absteigend.
+    """
+    sample = BlockSample(file_path, fraction, seed=seed)
+    parts = [count_elements(file_path, begin, stop) for begin, stop in sample.blocks]
+    records = [part['records'] for part in parts]
+    blocks = sample.population_blocks
+
+    block_counts = [dict(part['elements'].items()) for part in parts]
+    keys = {}
+    for counts in block_counts:
+        keys.update(dict.fromkeys(counts))
+    rows = []
+    for key in keys:
+        per_block = [counts.get(key, 0) for counts in block_counts]
+        rows.append((key, estimate_total(per_block, blocks), estimate_ratio(per_block, records, blocks)))
+    rows.sort(key=lambda row: row[1].value, reverse=True)
+    return estimate_total(records, blocks), rows
+
+
+def preview_file(output_csv):
+    return output_csv.replace('.csv', '_preview.csv')
+
+
+def write_preview(file_path, output_csv, fraction=DEFAULT_SAMPLE_FRACTION, seed=0):
+    """Schreibt die Vorschau nach ``*_preview.csv``.
+
+    Ohne Fehlerschranke (nur ein Block einer größeren Datei gezogen) steht
+    in den ±-Spalten ``n/a``.
+    """
+    records, rows = preview_elements_quantity(file_path, fraction, seed)
+    with open(preview_file(output_csv), 'w', newline='', encoding='utf-8-sig') as csvfile:
+        writer = csv.writer(csvfile, delimiter=';', quoting=csv.QUOTE_MINIMAL)
+        writer.writerow(['Element', 'Beschreibung', 'Anzahl Befüllung (geschätzt)', '± (95%)',
+                         'Befüllung in %', '± Prozentpunkte'])
+        for key, count, share in rows:
+            writer.writerow([_element_label(key), tag_meanings.get(key, 'Beschreibung unbekannt'),
+                             round(count.value), 'n/a' if math.isnan(count.margin) else round(count.margin),
+                             f'{share.value * 100:.2f}%',
+                             'n/a' if math.isnan(share.margin) else f'{share.margin * 100:.2f}'])
+
+    print(f'Vorschau aus {fraction:.0%} der Datei: ca. {records} Datensätze.')
+    for key, count, share in rows[:10]:
+        print(f'  {_element_label(key)}: ca. {count} ({share.percent()})')
+    print(f'Vorschau gespeichert in: {preview_file(output_csv)}')
+
+
 if __name__ == '__main__':
-    parse_marc21_quantity('voebvoll-20241027.xml', 'elements_quantity.csv')
+    parser = argparse.ArgumentParser(description='Metadatenelemente (Menge) analysieren')
+    parser.add_argument('file', nargs='?', default='voebvoll-20241027.xml', help='XML file to analyze')
+    parser.add_argument('--output', default='elements_quantity.csv', help='main CSV result file')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: all cores)')
+    parser.add_argument('--preview', action='store_true',
+                        help='estimate from a block sample in seconds (writes *_preview.csv)')
+    parser.add_argument('--sample-fraction', type=float, default=DEFAULT_SAMPLE_FRACTION,
+                        help='share of the file read in preview mode')
+    parser.add_argument('--seed', type=int, default=0, help='random seed of the preview sample')
+    args = parser.parse_args()
+    if args.preview:
+        write_preview(args.file, args.output, args.sample_fraction, args.seed)
+    else:
+        parse_marc21_quantity(args.file, args.output, workers=args.workers)
@@ -0,0 +1,63 @@
+import argparse
+import csv
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from data_analysis.analyze_elements_quantity import COUNTRY_CODES, LANG_CODES, PUB_STATUS_MEANINGS
+from data_quality.check_date_field import DATE_PREFIX
+from data_quality.check_leader import LEADER_PREFIX
+from utilities.fixed_fields import F008_POSITIONS, LEADER_POSITIONS, FixedFields, extract_fixed_fields
+
+DEFAULT_FILE_NAME = "voebvoll-20241027.xml"
+DEFAULT_OUTPUT_FILE = "fixed_fields_histograms.csv"
+
+# Bezeichnungen der Werte je Position (falls bekannt)
+VALUE_MEANINGS = {
+    ("008", "publication_status"): PUB_STATUS_MEANINGS,
+    ("008", "country"): COUNTRY_CODES,
+    ("008", "language"): LANG_CODES,
+}
+
+
+def fixed_field_histograms(fields: FixedFields):
+    """Liefert Zeilen (Feld, Position, Wert, Bedeutung, Anzahl) für alle Positionsbereiche."""
+    rows = []
+    for field, positions, histogram in (
+        ("Leader", LEADER_POSITIONS, fields.leader_histogram),
+        ("008", F008_POSITIONS, fields.f008_histogram),
+    ):
+        for name, (start, end) in positions.items():
+            meanings = VALUE_MEANINGS.get((field, name), {})
+            position = f"{start:02d}" if end - start == 1 else f"{start:02d}-{end - 1:02d}"
+            counts = histogram(name)
+            for value, count in sorted(counts.items(), key=lambda item: (-item[1], item[0])):
+                rows.append((field, f"{position} {name}", value, meanings.get(value.lower(), ""), count))
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Positionshistogramme für Leader und 008 (ein Durchlauf)")
+    parser.add_argument("file", nargs="?", default=DEFAULT_FILE_NAME, help="XML file to analyze")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT_FILE, help="CSV result file")
+    args = parser.parse_args()
+
+    fields = extract_fixed_fields(args.file)
+    total = len(fields)
+    rows = fixed_field_histograms(fields)
+
+    with open(args.output, mode="w", newline="", encoding="utf-8-sig") as file:
+        writer = csv.writer(file, delimiter=";", quoting=csv.QUOTE_MINIMAL)
+        writer.writerow(["Feld", "Position", "Wert", "Bedeutung", "Anzahl"])
+        writer.writerows(rows)
+
+    leader_ok = int(fields.leader_prefix(LEADER_PREFIX).sum())
+    date_ok = int(fields.f008_prefix(DATE_PREFIX).sum())
+    print(f"Datensätze: {total}")
+    for label, matching in ((f"Leader beginnt mit '{LEADER_PREFIX}'", leader_ok), (f"008 beginnt mit '{DATE_PREFIX}'", date_ok)):
+        percentage = matching / total * 100 if total else 0.0
+        print(f"{label}: {matching} ({percentage:.2f}%)")
+    print(f"Histogramme geschrieben nach: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,34 +1,193 @@
-import xml.etree.ElementTree as ET
+import argparse
 import csv
+import heapq
+import html
+import mmap
+import re
+import sys
+import tempfile
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
 
-def count_049_tags(input_file: str = 'voebvoll-20241027.xml', csv_file: str = 'possession_counts.csv') -> None:
-    """Count occurrences of the 049 tag in each record and save results to a CSV file, including record ID from tag 001."""
-
-    occurrences_049 = []
-
-    context = ET.iterparse(input_file, events=("end",))
-    _, root = next(context)  # Holen des root-Elements
-
-    for event, elem in context:
-        if elem.tag == "record":
-            # Finde die Datensatz-ID
-            record_id = elem.findtext('controlfield[@tag="001"]', default='Unknown').strip()
-            
-            # Zähle 049-Tags
-            count_049 = len(elem.findall('datafield[@tag="049"]'))
-            occurrences_049.append((record_id, count_049))
-            
-            # Elemente bereinigen, um Speicher freizugeben
-            elem.clear()
-            root.clear()
-    # Sortiere die Ergebnisse nach der Anzahl der 049-Tags, absteigend
-    occurrences_049.sort(key=lambda x: x[1], reverse=True)
-    
-    # Schreibe Ergebnisse in CSV-Datei
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from utilities.external_sort import DEFAULT_MAX_MEMORY_BYTES, ExternalSorter
+from utilities.record_offsets import iter_record_bytes
+
+DEFAULT_FILE_NAME = 'voebvoll-20241027.xml'
+DEFAULT_CSV_FILE = 'possession_counts.csv'
+DEFAULT_TOP_K = 100
+
+FIELD_001 = re.compile(rb"""<(?:[\w.-]+:)?controlfield\s+tag\s*=\s*["']001["']\s*>([^<]*)<""")
+FIELD_049 = re.compile(rb"""<(?:[\w.-]+:)?datafield\s[^>]*?\btag\s*=\s*["']049["']""")
+
+# Sortierschlüssel der Datensatz-CSV: Anzahl absteigend, bei Gleichstand Dateireihenfolge
+RECORD_DTYPE = np.dtype([
+    ('neg_count', '<i4'),
+    ('position', '<u4'),
+    ('id_offset', '<u8'),
+    ('id_length', '<u4'),
+])
+
+
+class PossessionStats:
+    """Histogramm der 049-Anzahlen und die ``top_k`` Datensätze mit den meisten 049.
+
+    Der Speicherbedarf hängt nur von ``top_k`` und der größten Anzahl ab,
+    nicht von der Zahl der Datensätze.
+    """
+
+    def __init__(self, top_k: int = DEFAULT_TOP_K) -> None:
+        self.top_k = top_k
+        self.histogram = np.zeros(16, dtype=np.int64)
+        self.total_records = 0
+        self.total_049 = 0
+        # Min-Heap über (Anzahl, -Position, ID): die Wurzel ist der schwächste Treffer
+        self._heap: List[Tuple[int, int, str]] = []
+
+    def add(self, position: int, record_id: str, count: int) -> None:
+        if count >= len(self.histogram):
+            grown = np.zeros(max(count + 1, 2 * len(self.histogram)), dtype=np.int64)
+            grown[: len(self.histogram)] = self.histogram
+            self.histogram = grown
+        self.histogram[count] += 1
+        self.total_records += 1
+        self.total_049 += count
+        if self.top_k <= 0:
+            return
+        entry = (count, -position, record_id)
+        if len(self._heap) < self.top_k:
+            heapq.heappush(self._heap, entry)
+        elif entry > self._heap[0]:
+            heapq.heapreplace(self._heap, entry)
+
+    def distribution(self) -> Dict[int, int]:
+        """Anzahl der Datensätze je 049-Anzahl (nur vorkommende Werte)."""
+        return {int(value): int(records) for value, records in enumerate(self.histogram.tolist()) if records}
+
+    def top(self) -> List[Tuple[str, int]]:
+        """Die schwersten Datensätze wie in der sortierten Datensatz-CSV: (ID, Anzahl)."""
+        return [(record_id, count) for count, _, record_id in sorted(self._heap, reverse=True)]
+
+
+def _record_id(data: bytes) -> str:
+    match = FIELD_001.search(data)
+    if match is None:
+        return 'Unknown'
+    return html.unescape(match.group(1).decode('utf-8')).strip()
+
+
+def iter_possession_counts(input_file: str):
+    """Liefert (Position, Datensatz-ID aus 001, Anzahl 049) für jeden Datensatz."""
+    for position, (_, _, data) in enumerate(iter_record_bytes(input_file)):
+        yield position, _record_id(data), len(FIELD_049.findall(data))
+
+
+def analyze_possession_counts(input_file: str = DEFAULT_FILE_NAME, top_k: int = DEFAULT_TOP_K) -> PossessionStats:
+    """Zählt die 049-Felder aller Datensätze in einem Durchlauf ohne Datensatzliste."""
+    stats = PossessionStats(top_k)
+    for position, record_id, count in iter_possession_counts(input_file):
+        stats.add(position, record_id, count)
+    return stats
+
+
+def count_049_tags(
+    input_file: str = DEFAULT_FILE_NAME,
+    csv_file: str = DEFAULT_CSV_FILE,
+    top_k: int = DEFAULT_TOP_K,
+    max_memory_mb: Optional[float] = None,
+    tmp_dir: Optional[str] = None,
+) -> PossessionStats:
+    """Count occurrences of the 049 tag in each record and save results to a CSV file, including record ID from tag 001.
+
+    Die Datensätze werden extern sortiert (höchstens ``max_memory_mb`` im
+    Speicher); die IDs liegen dabei in einer temporären Datei und werden
+    beim Schreiben über ihren Offset gelesen.
+    """
+    max_memory = int(max_memory_mb * 1024 * 1024) if max_memory_mb else DEFAULT_MAX_MEMORY_BYTES
+    stats = PossessionStats(top_k)
+
+    with tempfile.TemporaryFile(dir=tmp_dir) as ids, ExternalSorter(RECORD_DTYPE, max_memory, tmp_dir) as sorter:
+        id_offset = 0
+        for position, record_id, count in iter_possession_counts(input_file):
+            stats.add(position, record_id, count)
+            encoded = record_id.encode('utf-8')
+            ids.write(encoded)
+            sorter.append((-count, position, id_offset, len(encoded)))
+            id_offset += len(encoded)
+        ids.flush()
+
+        with open(csv_file, mode='w', newline='', encoding='utf-8-sig') as file:
+            writer = csv.writer(file, delimiter=';', quoting=csv.QUOTE_MINIMAL)
+            writer.writerow(['Datensatz ID', 'Anzahl 049'])
+            # mmap cannot map an empty file (no records or only empty IDs)
+            id_map = mmap.mmap(ids.fileno(), 0, access=mmap.ACCESS_READ) if id_offset else b''
+            try:
+                for neg_count, _, offset, length in sorter:
+                    writer.writerow([id_map[offset:offset + length].decode('utf-8'), -neg_count])
+            finally:
+                if id_offset:
+                    id_map.close()
+
+    return stats
+
+
+def write_distribution(stats: PossessionStats, csv_file: str) -> None:
+    """Schreibt die Verteilung der 049-Anzahlen (alle Werte auf einmal)."""
+    with open(csv_file, mode='w', newline='', encoding='utf-8-sig') as file:
+        writer = csv.writer(file, delimiter=';', quoting=csv.QUOTE_MINIMAL)
+        writer.writerow(['Anzahl 049', 'Datensätze', 'Anteil in %'])
+        for value, records in stats.distribution().items():
+            percent = records / stats.total_records * 100 if stats.total_records else 0
+            writer.writerow([value, records, f'{percent:.2f}%'])
+
+
+def write_top(stats: PossessionStats, csv_file: str) -> None:
     with open(csv_file, mode='w', newline='', encoding='utf-8-sig') as file:
         writer = csv.writer(file, delimiter=';', quoting=csv.QUOTE_MINIMAL)
         writer.writerow(['Datensatz ID', 'Anzahl 049'])
-        writer.writerows(occurrences_049)
+        writer.writerows(stats.top())
+
+
+def distribution_file(csv_file: str) -> str:
+    """``<name>_distribution.csv`` next to ``csv_file`` (never ``csv_file`` itself)."""
+    path = Path(csv_file)
+    return str(path.with_name(path.stem + '_distribution.csv'))
+
+
+def top_file(csv_file: str) -> str:
+    """``<name>_top.csv`` next to ``csv_file`` (never ``csv_file`` itself)."""
+    path = Path(csv_file)
+    return str(path.with_name(path.stem + '_top.csv'))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Besitznachweise (049) je Datensatz zählen')
+    parser.add_argument('file', nargs='?', default=DEFAULT_FILE_NAME, help='XML file to analyze')
+    parser.add_argument('--output', default=DEFAULT_CSV_FILE,
+                        help='per-record CSV; distribution and top-k are written next to it')
+    parser.add_argument('--top', type=int, default=DEFAULT_TOP_K, help='number of records with most 049 fields')
+    parser.add_argument('--full-csv', action='store_true',
+                        help='also write the sorted per-record CSV (external sort)')
+    parser.add_argument('--max-memory-mb', type=float, default=None, help='memory budget for the external sort')
+    parser.add_argument('--tmp-dir', default=None, help='directory for sorted runs')
+    args = parser.parse_args()
+
+    if args.full_csv:
+        stats = count_049_tags(args.file, args.output, args.top, args.max_memory_mb, args.tmp_dir)
+    else:
+        stats = analyze_possession_counts(args.file, args.top)
+    write_distribution(stats, distribution_file(args.output))
+    write_top(stats, top_file(args.output))
+
+    print(f'{stats.total_records} Datensätze, {stats.total_049} Besitznachweise (049)')
+    for value, records in stats.distribution().items():
+        print(f'  {value} x 049: {records} Datensätze')
+    print(f'Verteilung: {distribution_file(args.output)}, Top {args.top}: {top_file(args.output)}')
+    if args.full_csv:
+        print(f'Datensatz-CSV: {args.output}')
+
 
 if __name__ == '__main__':
-    count_049_tags()
+    main()
@@ -0,0 +1,177 @@
+import argparse
+import csv
+import html
+import mmap
+import re
+import sys
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from utilities.sketches import HyperLogLog, SpaceSaving
+
+DEFAULT_FILE_NAME = 'voebvoll-20241027.xml'
+DEFAULT_OUTPUT_FILE = 'value_profiles.csv'
+DEFAULT_TOP_K = 20
+CANDIDATES = 5  # Space-Saving-Zähler je ausgegebenem Wert
+PRECISION = 12  # HyperLogLog: 4 KB je Feld, ±3,2 % (95 %)
+SCAN_CHUNK_BYTES = 8 * 1024 * 1024  # Werte eines Blocks werden gesammelt an die Sketches übergeben
+
+# Ein Wert gilt als auffällig, wenn er in einem sonst vielfältigen Feld
+# mindestens diesen Anteil erreicht (typisch für Platzhalter und Vorbelegungen)
+DOMINANT_SHARE = 0.05
+MIN_DISTINCT = 100
+
+# Präfixe der festen Felder als eigene Profile, weil Platzhalter dort nur
+# den Anfang belegen (Leader '01234cam', 008 '991231')
+PREFIXES = {
+    'LDR': (0, 8),
+    '008': (0, 6),
+}
+
+# Leader, Kontrollfelder, Datenfeld-Start-Tags und Unterfelder in einem Regex
+FIELD_PATTERN = re.compile(
+    rb"<(?:[\w.-]+:)?(?:"
+    rb"leader\s*>([^<]*)"
+    rb"""|controlfield\b[^>]*?\btag\s*=\s*["']([^"']*)["'][^>]*>([^<]*)"""
+    rb"""|datafield\b[^>]*?\btag\s*=\s*["']([^"']*)["'][^>]*>"""
+    rb"""|subfield\b[^>]*?\bcode\s*=\s*["']([^"']*)["'][^>]*>([^<]*))"""
+)
+
+Key = Tuple[str, str]
+
+
+class FieldProfile:
+    """Top-k-Werte (Space-Saving) und Anzahl verschiedener Werte (HyperLogLog) eines Felds.
+
+    Der Speicherbedarf ist unabhängig von der Zahl der Werte: ``top_k *
+    CANDIDATES`` Zähler und ``2 ** PRECISION`` Register.
+    """
+
+    def __init__(self, top_k: int = DEFAULT_TOP_K) -> None:
+        self.top_k = top_k
+        self.total = 0
+        self.heavy = SpaceSaving(top_k * CANDIDATES)
+        self.distinct = HyperLogLog(PRECISION)
+
+    def update(self, values: List[bytes]) -> None:
+        """Nimmt die Werte eines Blocks auf; gleiche Werte gehen gewichtet in einem Schritt ein."""
+        self.total += len(values)
+        counts = Counter(values)
+        for value, count in counts.items():
+            self.heavy.add(value, count)
+        self.distinct.add(counts)
+
+    def top(self) -> List[Tuple[bytes, int, int]]:
+        """``(Wert, mindestens, höchstens)`` der Werte, die sicher mehrfach vorkommen.
+
+        Sortiert nach der garantierten Anzahl, damit seltene Werte mit großem
+        Fehler in vielfältigen Feldern nicht vorne stehen.
+        """
+        ranked = sorted(
+            ((value, count - error, count) for value, count, error in self.heavy.top()),
+            key=lambda entry: entry[1],
+            reverse=True,
+        )
+        return [entry for entry in ranked[:self.top_k] if entry[1] > 1]
+
+    def distinct_count(self) -> float:
+        return min(self.distinct.estimate(), self.total)
+
+
+def profile_values(file_path: str = DEFAULT_FILE_NAME, top_k: int = DEFAULT_TOP_K) -> Dict[Key, FieldProfile]:
+    """Profiliert alle Werte je (Feld, Unterfeld) in einem Durchlauf über die Rohdaten.
+
+    Schlüssel sind ``('LDR', '')``, ``(Tag, '')`` für Kontrollfelder,
+    ``(Tag, Code)`` für Unterfelder und ``(Feld, 'Pos. 00-07')`` für die
+    Präfixe aus ``PREFIXES``. Die Datei wird per ``mmap`` in Blöcken von
+    ``SCAN_CHUNK_BYTES`` gelesen, die jeweils vor einem ``<`` enden; die
+    Werte werden als Bytes gezählt und erst im Bericht dekodiert.
+    """
+    profiles: Dict[Key, FieldProfile] = {}
+
+    def profile(key: Key) -> FieldProfile:
+        found = profiles.get(key)
+        if found is None:
+            found = profiles[key] = FieldProfile(top_k)
+        return found
+
+    with open(file_path, 'rb') as f:
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # leere Datei
+            return profiles
+        with mm:
+            current_tag = b''
+            pos = 0
+            while pos < len(mm):
+                end = mm.find(b'<', min(pos + SCAN_CHUNK_BYTES, len(mm)))
+                end = len(mm) if end == -1 else end
+                chunk: Dict[Tuple[bytes, bytes], List[bytes]] = defaultdict(list)
+                for leader, control_tag, control_value, data_tag, code, value in FIELD_PATTERN.findall(mm, pos, end):
+                    if code or value:
+                        chunk[(current_tag, code)].append(value)
+                    elif data_tag:
+                        current_tag = data_tag
+                    elif control_tag:
+                        chunk[(control_tag, b'')].append(control_value)
+                    else:
+                        chunk[(b'LDR', b'')].append(leader)
+                pos = end
+
+                for (tag, code), values in chunk.items():
+                    field = tag.decode('ascii', 'replace')
+                    profile((field, code.decode('ascii', 'replace'))).update(values)
+                    if not code and field in PREFIXES:
+                        start, stop = PREFIXES[field]
+                        profile((field, f'Pos. {start:02d}-{stop - 1:02d}')).update([v[start:stop] for v in values])
+    return profiles
+
+
+def _decode(value: bytes) -> str:
+    return html.unescape(value.decode('utf-8', 'replace'))
+
+
+def profile_rows(profiles: Dict[Key, FieldProfile]):
+    """Liefert CSV-Zeilen je Feld und Top-Wert, nach Feld sortiert; auffällige Werte markiert."""
+    rows = []
+    for key in sorted(profiles):
+        field_profile = profiles[key]
+        total = field_profile.total
+        distinct = field_profile.distinct_count()
+        for rank, (value, low, high) in enumerate(field_profile.top(), 1):
+            share = low / total if total else 0.0
+            dominant = share >= DOMINANT_SHARE and distinct >= MIN_DISTINCT
+            rows.append([key[0], key[1], total, round(distinct), rank, _decode(value),
+                         low, high, f'{share * 100:.2f}%', 'x' if dominant else ''])
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Häufigste Werte je Feld/Unterfeld (ein Durchlauf, begrenzter Speicher)')
+    parser.add_argument('file', nargs='?', default=DEFAULT_FILE_NAME, help='XML file to analyze')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT_FILE, help='CSV result file')
+    parser.add_argument('--top', type=int, default=DEFAULT_TOP_K, help='values reported per field')
+    args = parser.parse_args()
+
+    profiles = profile_values(args.file, args.top)
+    rows = profile_rows(profiles)
+    with open(args.output, mode='w', newline='', encoding='utf-8-sig') as file:
+        writer = csv.writer(file, delimiter=';', quoting=csv.QUOTE_MINIMAL)
+        writer.writerow(['Feld', 'Unterfeld', 'Vorkommen', 'Verschiedene Werte (ca.)', 'Rang', 'Wert',
+                         'Anzahl (mindestens)', 'Anzahl (höchstens)', 'Anteil in %', 'Auffällig'])
+        writer.writerows(rows)
+
+    print(f'{len(profiles)} Felder/Unterfelder profiliert.')
+    suspicious = [row for row in rows if row[-1]]
+    if suspicious:
+        print(f'Auffällig häufige Werte (mindestens {DOMINANT_SHARE:.0%} in Feldern mit vielen Werten):')
+        for field, code, _, distinct, _, value, low, _, share, _ in suspicious:
+            label = f'{field} ${code}' if code and not code.startswith('Pos.') else f'{field} {code}'.strip()
+            print(f"  {label}: '{value}' {low}x ({share}, ca. {distinct} verschiedene Werte)")
+    print(f'Ergebnis gespeichert in: {args.output}')
+
+
+if __name__ == '__main__':
+    main()
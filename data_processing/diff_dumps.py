@@ -0,0 +1,523 @@
+"""Diff two versions of a dump and update the statistics from the delta.
+
+``diff`` matches the records of the old and new ``voebvoll-*.xml`` by 001
+and content hash (see ``utilities.dump_diff``) and writes one CSV row per
+added, removed or changed record. If counters for the old dump exist
+(``init`` builds them once from a full pass), they are updated from the
+delta only: the contributions of removed and changed records are read from
+the old dump and subtracted, those of added and changed records are read
+from the new dump and added. The counters cover the element quantity
+(``analyze_elements_quantity``), possession (``analyze_possession_counts``,
+``split_by_possession``) and ISBN/ISSN duplicates
+(``check_duplicate_identifiers``).
+
+``--export-delta`` writes the added and changed records into a small file
+for ``enrich_metadata``; ``merge-enriched`` then combines the enriched delta
+with the previous enriched dump, so unchanged records are not enriched
+again::
+
+    python data_processing/diff_dumps.py init voebvoll-20241027.xml
+    python data_processing/diff_dumps.py diff voebvoll-20241027.xml voebvoll-20250126.xml --export-delta delta.xml
+    python metadata_enrichment/enrich_metadata.py delta.xml
+    python data_processing/diff_dumps.py merge-enriched voebvoll-20241027.xml voebvoll-20250126.xml \\
+        voebvoll-20241027_enriched.xml delta_enriched.xml
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Hashable, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from data_analysis.analyze_elements_quantity import count_record_elements, write_quantity_reports
+from data_analysis.analyze_possession_counts import (
+    FIELD_049,
+    PossessionStats,
+    write_distribution,
+    write_top,
+)
+from data_processing.split_by_possession import write_book_counts
+from data_quality.check_duplicate_identifiers import identifier_hash
+from utilities.dump_diff import DumpDiff, RecordIndex, diff_indexes, load_or_build_index
+from utilities.isbn_batch import normalize_isbn_keys
+from utilities.marc_fields import flatten_record
+from utilities.record_offsets import collection_namespaces, export_records, parse_record, read_record_bytes
+
+DEFAULT_FILE_NAME = 'voebvoll-20241027.xml'
+COUNTERS_SUFFIX = '.counters.npz'
+BATCH_RECORDS = 10000  # delta records parsed per batch
+
+ELEMENT_TOTALS = ['records', 'fields_008', 'fields_969']
+ELEMENT_COUNTERS = ['elements', 'details_008', 'details_969', 'pub_status', 'pub_country', 'language']
+ORDERED_COUNTERS = ELEMENT_COUNTERS + ['holdings']
+
+# Identifier occurrences per (identifier hash, holdings hash); the duplicate
+# statistics of check_duplicate_identifiers follow from the grouped counts
+OCCURRENCE_DTYPE = np.dtype([('hash', '<u8'), ('holdings', '<u8'), ('count', '<i8')])
+
+
+def counters_path(dump_path: str) -> str:
+    """Default location of the counters for ``dump_path``."""
+    return dump_path + COUNTERS_SUFFIX
+
+
+def holdings_hash(holdings: Iterable[str]) -> int:
+    """Stable hash of a holdings set; equal sets give equal hashes like ``HoldingsInterner`` ids."""
+    return identifier_hash('\x1f'.join(sorted(set(holdings))))
+
+
+def record_ranks(data: bytes, namespaces: Optional[Dict[str, str]] = None) -> Dict[str, Dict[Hashable, int]]:
+    """Rank of every key of the element counters within one record, in the order a full count meets them."""
+    counts = count_record_elements([data], namespaces)
+    return {name: {key: rank for rank, key in enumerate(counts[name].keys)} for name in ELEMENT_COUNTERS}
+
+
+def record_holdings(flat) -> List[str]:
+    """The holdings a record adds to ``holdings``, each once, in field order."""
+    return list(dict.fromkeys(flat.holdings or ['unknown']))
+
+
+def merge_occurrences(state: np.ndarray, hashes: List[int], holdings: List[int], sign: int) -> np.ndarray:
+    """Add (``sign=1``) or remove (``sign=-1``) occurrences; rows dropping to zero disappear."""
+    delta = np.zeros(len(hashes), dtype=OCCURRENCE_DTYPE)
+    delta['hash'] = np.array(hashes, dtype=np.uint64)
+    delta['holdings'] = np.array(holdings, dtype=np.uint64)
+    delta['count'] = sign
+    merged = np.concatenate((state, delta))
+    if not len(merged):
+        return merged
+    merged = merged[np.lexsort((merged['holdings'], merged['hash']))]
+    first = np.concatenate(([True], (merged['hash'][1:] != merged['hash'][:-1])
+                            | (merged['holdings'][1:] != merged['holdings'][:-1])))
+    starts = np.flatnonzero(first)
+    grouped = merged[starts]
+    grouped['count'] = np.add.reduceat(merged['count'], starts)
+    return grouped[grouped['count'] != 0]
+
+
+def occurrence_duplicates(state: np.ndarray) -> Tuple[int, int, int]:
+    """``(total, duplicate occurrences, real duplicates)`` as in ``analyze_identifier_duplicates``."""
+    if not len(state):
+        return 0, 0, 0
+    total = int(state['count'].sum())
+    first = np.concatenate(([True], state['hash'][1:] != state['hash'][:-1]))
+    starts = np.flatnonzero(first)
+    per_identifier = np.add.reduceat(state['count'], starts)
+    holdings_sets = np.diff(np.append(starts, len(state)))
+    real = np.count_nonzero((per_identifier > 1) & (holdings_sets == 1))
+    return total, total - len(starts), int(real)
+
+
+class DumpCounters:
+    """Statistics of one dump version that can be updated record by record.
+
+    ``possession`` holds the number of 049 fields per record in file order
+    (aligned with the ``RecordIndex``), so the distribution and the top list
+    stay exact; everything else is a sum over records. ``normalize_isbns``
+    compares ISBNs by their ISBN-13 as in ``analyze_identifier_duplicates``
+    and is stored with the counters.
+
+    ``first_seen`` maps every key of the element counters and of
+    ``holdings`` to ``(position, rank)``: the first record of the dump that
+    contains it and its rank within that record. The counters are kept in
+    this order, so equal counts in the reports come out as in a full count
+    of the same dump.
+    """
+
+    def __init__(self, normalize_isbns: bool = False) -> None:
+        self.normalize_isbns = normalize_isbns
+        self.elements: Dict = {key: 0 for key in ELEMENT_TOTALS}
+        self.elements.update({key: Counter() for key in ELEMENT_COUNTERS})
+        self.holdings: Counter = Counter()
+        self.first_seen: Dict[str, Dict[Hashable, Tuple[int, int]]] = {name: {} for name in ORDERED_COUNTERS}
+        self.possession = np.zeros(0, dtype=np.int32)
+        self.identifiers = {name: np.zeros(0, dtype=OCCURRENCE_DTYPE) for name in ('ISBN', 'ISSN')}
+        self.source_size = -1
+        self.source_mtime = -1.0
+
+    def _apply(self, records: List[bytes], sign: int, namespaces: Optional[Dict[str, str]] = None,
+               positions: Optional[List[int]] = None) -> np.ndarray:
+        """Add or subtract the records' contributions; returns their 049 counts.
+
+        With the records' ``positions`` in the dump, their keys' first-seen
+        positions are updated as well.
+        """
+        boundaries = None if positions is None else []
+        counts = count_record_elements(records, namespaces, boundaries)
+        for key in ELEMENT_TOTALS:
+            self.elements[key] += sign * counts[key]
+        for key in ELEMENT_COUNTERS:
+            counter = self.elements[key]
+            for value, count in counts[key].items():
+                counter[value] += sign * count
+            self.elements[key] = +counter
+
+        isbns: List[str] = []
+        isbn_holdings: List[int] = []
+        issn_hashes: List[int] = []
+        issn_holdings: List[int] = []
+        holdings: List[List[str]] = []
+        for data in records:
+            flat = flatten_record(0, 0, 0, parse_record(data, namespaces))
+            for isil in flat.holdings or ['unknown']:
+                self.holdings[isil] += sign
+            if positions is not None:
+                holdings.append(record_holdings(flat))
+            record_isbns = [value.strip() for tag, _, _, code, value, _ in flat.fields
+                            if tag == '020' and code == 'a' and value]
+            record_issns = [value.strip() for tag, _, _, code, value, _ in flat.fields
+                            if tag == '022' and code == 'a' and value]
+            if record_isbns or record_issns:
+                key = holdings_hash(flat.holdings)
+                isbns.extend(record_isbns)
+                isbn_holdings.extend([key] * len(record_isbns))
+                issn_hashes.extend(identifier_hash(issn) for issn in record_issns)
+                issn_holdings.extend([key] * len(record_issns))
+        self.holdings = +self.holdings
+        if self.normalize_isbns:
+            isbns = normalize_isbn_keys(isbns)
+        self.identifiers['ISBN'] = merge_occurrences(
+            self.identifiers['ISBN'], [identifier_hash(key) for key in isbns], isbn_holdings, sign
+        )
+        self.identifiers['ISSN'] = merge_occurrences(self.identifiers['ISSN'], issn_hashes, issn_holdings, sign)
+        if positions is not None:
+            self._note_first_seen(records, positions, counts, boundaries, holdings, namespaces)
+        return np.array([len(FIELD_049.findall(data)) for data in records], dtype=np.int32)
+
+    def _note_first_seen(self, records: List[bytes], positions: List[int], counts: Dict, boundaries: List[Dict],
+                         holdings: List[List[str]], namespaces: Optional[Dict[str, str]],
+                         only: Optional[Dict[str, Set]] = None) -> None:
+        """Take a batch's first occurrence of a key where it precedes the known one.
+
+        ``counts`` and ``boundaries`` come from ``count_record_elements`` over
+        the batch, ``holdings`` from ``record_holdings`` per record; ``only``
+        restricts this to some keys per counter. Ranks are computed only for
+        the few records that are a key's first one.
+        """
+        ranks: Dict[int, Dict[str, Dict[Hashable, int]]] = {}
+        for name in ELEMENT_COUNTERS:
+            first_seen = self.first_seen[name]
+            wanted = None if only is None else only[name]
+            keys = counts[name].keys
+            start = 0
+            for i, bounds in enumerate(boundaries):
+                for key in keys[start:bounds[name]]:
+                    if wanted is not None and key not in wanted:
+                        continue
+                    known = first_seen.get(key)
+                    if known is None or positions[i] < known[0]:
+                        if i not in ranks:
+                            ranks[i] = record_ranks(records[i], namespaces)
+                        first_seen[key] = (positions[i], ranks[i][name][key])
+                start = bounds[name]
+        first_seen = self.first_seen['holdings']
+        wanted = None if only is None else only['holdings']
+        for position, isils in zip(positions, holdings):
+            for rank, isil in enumerate(isils):
+                if wanted is not None and isil not in wanted:
+                    continue
+                known = first_seen.get(isil)
+                if known is None or position < known[0]:
+                    first_seen[isil] = (position, rank)
+
+    def _apply_spans(self, dump_path: str, index: RecordIndex, positions: np.ndarray, sign: int) -> np.ndarray:
+        possession = []
+        namespaces = collection_namespaces(dump_path)
+        with open(dump_path, 'rb') as f:
+            for begin in range(0, len(positions), BATCH_RECORDS):
+                batch = positions[begin:begin + BATCH_RECORDS]
+                records = [read_record_bytes(f, start, end) for start, end in index.spans(batch)]
+                possession.append(self._apply(records, sign, namespaces, batch.tolist() if sign > 0 else None))
+        return np.concatenate(possession) if possession else np.zeros(0, dtype=np.int32)
+
+    def _remap_first_seen(self, diff: DumpDiff, old_count: int) -> Dict[str, Set]:
+        """Move the first-seen positions of the remaining keys to the new dump.
+
+        Returns the keys whose first record was removed or changed, per
+        counter. If unchanged records swapped places, a mapped position need
+        not be the first one any more and every key is searched again.
+        """
+        mapping = np.full(old_count, -1, dtype=np.int64)
+        mapping[diff.unchanged_old] = diff.unchanged_new
+        reordered = bool(np.any(np.diff(diff.unchanged_old) < 0))
+        missing: Dict[str, Set] = {}
+        for name in ORDERED_COUNTERS:
+            counter = self.holdings if name == 'holdings' else self.elements[name]
+            first_seen: Dict[Hashable, Tuple[int, int]] = {}
+            missing[name] = set()
+            for key in counter:
+                position, rank = self.first_seen[name][key]
+                new_position = -1 if reordered else int(mapping[position])
+                if new_position < 0:
+                    missing[name].add(key)
+                else:
+                    first_seen[key] = (new_position, rank)
+            self.first_seen[name] = first_seen
+        return missing
+
+    def _search_first_seen(self, dump_path: str, index: RecordIndex, positions: np.ndarray,
+                           missing: Dict[str, Set]) -> None:
+        """Find the first of ``positions`` (ascending) that contains each missing key.
+
+        A missing key may already have a position from the added and changed
+        records; the search for it ends once that position is passed.
+        """
+        if not any(missing.values()):
+            return
+        namespaces = collection_namespaces(dump_path)
+        with open(dump_path, 'rb') as f:
+            for begin in range(0, len(positions), BATCH_RECORDS):
+                batch = positions[begin:begin + BATCH_RECORDS]
+                records = [read_record_bytes(f, start, end) for start, end in index.spans(batch)]
+                boundaries: List[Dict] = []
+                counts = count_record_elements(records, namespaces, boundaries)
+                holdings = [record_holdings(flatten_record(0, 0, 0, parse_record(data, namespaces)))
+                            for data in records]
+                self._note_first_seen(records, batch.tolist(), counts, boundaries, holdings, namespaces, missing)
+                last = int(batch[-1])
+                for name, keys in missing.items():
+                    first_seen = self.first_seen[name]
+                    missing[name] = {key for key in keys if key not in first_seen or first_seen[key][0] > last}
+                if not any(missing.values()):
+                    return
+
+    def _order_by_first_seen(self) -> None:
+        """Insert the keys in first-seen order, as a full count of the dump does."""
+        for name in ELEMENT_COUNTERS:
+            counter, first_seen = self.elements[name], self.first_seen[name]
+            self.elements[name] = Counter({key: counter[key] for key in sorted(counter, key=first_seen.__getitem__)})
+        first_seen = self.first_seen['holdings']
+        self.holdings = Counter({key: self.holdings[key] for key in sorted(self.holdings, key=first_seen.__getitem__)})
+
+    def _set_source(self, dump_path: str) -> None:
+        stat = os.stat(dump_path)
+        self.source_size, self.source_mtime = stat.st_size, stat.st_mtime
+
+    @classmethod
+    def build(cls, dump_path: str, index: RecordIndex, normalize_isbns: bool = False) -> 'DumpCounters':
+        """Count a whole dump (the baseline for later updates)."""
+        counters = cls(normalize_isbns)
+        counters.possession = counters._apply_spans(dump_path, index, np.arange(len(index)), 1)
+        counters._set_source(dump_path)
+        return counters
+
+    def update(self, diff: DumpDiff, old_path: str, old_index: RecordIndex,
+               new_path: str, new_index: RecordIndex) -> None:
+        """Move the counters from the old to the new dump, reading only the delta records."""
+        self._check_source(old_path)
+        self._apply_spans(old_path, old_index, diff.dropped(), -1)
+        missing = self._remap_first_seen(diff, len(old_index))
+        refreshed = diff.refreshed()
+        possession = np.zeros(len(new_index), dtype=np.int32)
+        possession[diff.unchanged_new] = self.possession[diff.unchanged_old]
+        possession[refreshed] = self._apply_spans(new_path, new_index, refreshed, 1)
+        self.possession = possession
+        self._search_first_seen(new_path, new_index, diff.unchanged_new, missing)
+        self._order_by_first_seen()
+        self._set_source(new_path)
+
+    def _check_source(self, dump_path: str) -> None:
+        stat = os.stat(dump_path)
+        if stat.st_size != self.source_size or stat.st_mtime != self.source_mtime:
+            raise ValueError(f'the counters were built for another version of {dump_path}; rebuild them')
+
+    def duplicates(self) -> Dict[str, Tuple[int, int, int]]:
+        """``(total, duplicate occurrences, real duplicates)`` for ISBN and ISSN."""
+        return {name: occurrence_duplicates(state) for name, state in self.identifiers.items()}
+
+    def possession_stats(self, index: RecordIndex, top_k: int) -> PossessionStats:
+        stats = PossessionStats(top_k)
+        for position, (record_id, count) in enumerate(zip(index.ids.tolist(), self.possession.tolist())):
+            stats.add(position, record_id.decode('utf-8') or 'Unknown', count)
+        return stats
+
+    def save(self, path: str) -> None:
+        counters = {key: self.elements[key] for key in ELEMENT_TOTALS}
+        for key in ORDERED_COUNTERS:
+            counter = self.holdings if key == 'holdings' else self.elements[key]
+            first_seen = self.first_seen[key]
+            counters[key] = [[list(value) if isinstance(value, tuple) else value, count, *first_seen[value]]
+                             for value, count in counter.items()]
+        tmp_path = path + '.tmp.npz'
+        np.savez(
+            tmp_path,
+            counters=np.array(json.dumps(counters)),
+            possession=self.possession,
+            isbn=self.identifiers['ISBN'],
+            issn=self.identifiers['ISSN'],
+            source=np.array([self.source_size, self.source_mtime], dtype=np.float64),
+            normalize_isbns=np.array(self.normalize_isbns),
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str, dump_path: Optional[str] = None) -> 'DumpCounters':
+        """Load counters; with ``dump_path`` counters of another file version are rejected."""
+        with np.load(path, allow_pickle=False) as data:
+            counters = cls(bool(data['normalize_isbns']))
+            stored = json.loads(str(data['counters']))
+            counters.possession = data['possession']
+            counters.identifiers = {'ISBN': data['isbn'], 'ISSN': data['issn']}
+            size, counters.source_mtime = data['source'].tolist()
+            counters.source_size = int(size)
+        for key in ELEMENT_TOTALS:
+            counters.elements[key] = stored[key]
+        for key in ORDERED_COUNTERS:
+            if any(len(entry) != 4 for entry in stored[key]):
+                raise ValueError(f'{path} has no first-seen positions; rebuild the counters')
+            entries = [(tuple(value) if isinstance(value, list) else value, count, (position, rank))
+                       for value, count, position, rank in stored[key]]
+            counter = Counter({value: count for value, count, _ in entries})
+            counters.first_seen[key] = {value: first for value, _, first in entries}
+            if key == 'holdings':
+                counters.holdings = counter
+            else:
+                counters.elements[key] = counter
+        if dump_path is not None:
+            counters._check_source(dump_path)
+        return counters
+
+
+def write_reports(counters: DumpCounters, index: RecordIndex, output_dir: str, top_k: int = 100) -> List[str]:
+    """Write the CSV files of the analyses from the counters; returns the paths."""
+    os.makedirs(output_dir, exist_ok=True)
+    elements_csv = os.path.join(output_dir, 'elements_quantity.csv')
+    write_quantity_reports(dict(counters.elements), elements_csv)
+    stats = counters.possession_stats(index, top_k)
+    distribution_csv = os.path.join(output_dir, 'possession_counts_distribution.csv')
+    top_csv = os.path.join(output_dir, 'possession_counts_top.csv')
+    write_distribution(stats, distribution_csv)
+    write_top(stats, top_csv)
+    book_counts_csv = os.path.join(output_dir, 'book_counts.csv')
+    write_book_counts(dict(counters.holdings), book_counts_csv)
+    return [elements_csv, distribution_csv, top_csv, book_counts_csv]
+
+
+def write_diff(diff: DumpDiff, old_index: RecordIndex, new_index: RecordIndex, csv_file: str) -> None:
+    """One row per added, removed or changed record: status, 001, old and new position."""
+    rows = [('hinzugefügt', new_index.ids[p], '', p) for p in diff.added.tolist()]
+    rows += [('geändert', new_index.ids[new], old, new)
+             for old, new in zip(diff.changed_old.tolist(), diff.changed_new.tolist())]
+    rows += [('entfernt', old_index.ids[p], p, '') for p in diff.removed.tolist()]
+    with open(csv_file, mode='w', newline='', encoding='utf-8-sig') as file:
+        writer = csv.writer(file, delimiter=';', quoting=csv.QUOTE_MINIMAL)
+        writer.writerow(['Status', 'Datensatz ID', 'Position alt', 'Position neu'])
+        for status, record_id, old, new in rows:
+            writer.writerow([status, record_id.decode('utf-8'), old, new])
+
+
+def merge_enriched(diff: DumpDiff, old_index: RecordIndex, new_index: RecordIndex,
+                   old_enriched: str, enriched_delta: str, out_path: str) -> Dict[str, int]:
+    """Write the enriched new dump from the previous enriched dump and the enriched delta.
+
+    ``enrich_metadata`` keeps every record and its order, so record ``i`` of
+    ``old_enriched`` is record ``i`` of the old dump and record ``i`` of
+    ``enriched_delta`` the ``i``-th added or changed record; the 001s are
+    checked against both. Records are written in the order of the new dump.
+    """
+    previous = RecordIndex.build(old_enriched)
+    delta = RecordIndex.build(enriched_delta)
+    refreshed = diff.refreshed()
+    if len(previous) != len(old_index) or not np.array_equal(previous.ids, old_index.ids):
+        raise ValueError(f'{old_enriched} is not the enriched version of the old dump')
+    if len(delta) != len(refreshed) or not np.array_equal(delta.ids, new_index.ids[refreshed]):
+        raise ValueError(f'{enriched_delta} does not contain the added and changed records of this diff')
+
+    # (source, start, end) per record of the new dump
+    source = np.zeros(len(new_index), dtype=np.int8)
+    starts = np.zeros(len(new_index), dtype=np.uint64)
+    ends = np.zeros(len(new_index), dtype=np.uint64)
+    starts[diff.unchanged_new] = previous.starts[diff.unchanged_old]
+    ends[diff.unchanged_new] = previous.ends[diff.unchanged_old]
+    source[refreshed] = 1
+    starts[refreshed] = delta.starts
+    ends[refreshed] = delta.ends
+
+    with open(old_enriched, 'rb') as old_file, open(enriched_delta, 'rb') as delta_file, \
+            open(out_path, 'wb') as out:
+        files = (old_file, delta_file)
+        out.write(b'<?xml version="1.0" encoding="UTF-8"?>\n')
+        out.write(b'<collection xmlns:marc="http://www.loc.gov/MARC21/slim">\n')
+        for which, start, end in zip(source.tolist(), starts.tolist(), ends.tolist()):
+            out.write(read_record_bytes(files[which], start, end))
+            out.write(b'\n')
+        out.write(b'</collection>\n')
+    return {'reused': len(diff.unchanged_new), 'enriched': len(refreshed)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Dump-Versionen vergleichen und Statistiken inkrementell fortschreiben')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    init = sub.add_parser('init', help='count a whole dump once (baseline for later diffs)')
+    init.add_argument('file', nargs='?', default=DEFAULT_FILE_NAME, help='XML file to count')
+    init.add_argument('--reports', default=None, help='also write the analysis CSVs into this directory')
+    init.add_argument('--normalize-isbns', action='store_true',
+                      help='compare valid ISBNs by their ISBN-13 (kept for later diffs)')
+
+    diff_parser = sub.add_parser('diff', help='compare two dumps and update the counters from the delta')
+    diff_parser.add_argument('old', help='previous XML dump')
+    diff_parser.add_argument('new', help='new XML dump')
+    diff_parser.add_argument('--output', default='dump_diff.csv', help='CSV with the added/removed/changed records')
+    diff_parser.add_argument('--export-delta', default=None,
+                             help='write the added and changed records to this XML file (input for enrichment)')
+    diff_parser.add_argument('--reports', default=None, help='also write the updated analysis CSVs into this directory')
+
+    merge = sub.add_parser('merge-enriched', help='combine the previous enriched dump with the enriched delta')
+    merge.add_argument('old', help='previous XML dump')
+    merge.add_argument('new', help='new XML dump')
+    merge.add_argument('old_enriched', help='enriched version of the previous dump')
+    merge.add_argument('enriched_delta', help='enriched version of the --export-delta file')
+    merge.add_argument('--output', default=None, help='target file (default: <new>_enriched.xml)')
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    if args.command == 'init':
+        index = load_or_build_index(args.file)
+        counters = DumpCounters.build(args.file, index, args.normalize_isbns)
+        counters.save(counters_path(args.file))
+        print(f'{len(index)} Datensätze gezählt in {time.perf_counter() - started:.1f} s -> {counters_path(args.file)}')
+        if args.reports:
+            print('Berichte: ' + ', '.join(write_reports(counters, index, args.reports)))
+        return
+
+    old_index = load_or_build_index(args.old)
+    new_index = load_or_build_index(args.new)
+    diff = diff_indexes(old_index, new_index)
+    if args.command == 'merge-enriched':
+        output = args.output or args.new.replace('.xml', '_enriched.xml')
+        merged = merge_enriched(diff, old_index, new_index, args.old_enriched, args.enriched_delta, output)
+        print(f"{merged['reused']} Datensätze übernommen, {merged['enriched']} neu angereichert -> {output}")
+        return
+
+    counts = diff.counts()
+    write_diff(diff, old_index, new_index, args.output)
+    print(f"Hinzugefügt: {counts['added']}, entfernt: {counts['removed']}, geändert: {counts['changed']}, "
+          f"unverändert: {counts['unchanged']} ({time.perf_counter() - started:.1f} s)")
+    print(f'Unterschiede gespeichert in: {args.output}')
+    if args.export_delta:
+        written = export_records(args.new, new_index.spans(diff.refreshed()), args.export_delta)
+        print(f'{written} Datensätze zur Anreicherung exportiert nach: {args.export_delta}')
+
+    if not os.path.exists(counters_path(args.old)):
+        print(f'Keine Zähler für {args.old} gefunden; mit "init" einmal vollständig zählen.')
+        return
+    counters = DumpCounters.load(counters_path(args.old), args.old)
+    counters.update(diff, args.old, old_index, args.new, new_index)
+    counters.save(counters_path(args.new))
+    print(f'Zähler fortgeschrieben -> {counters_path(args.new)}')
+    for name, (total, duplicates, real) in counters.duplicates().items():
+        print(f'  {name}: {total}, davon {duplicates} doppelte Vorkommen, {real} echte Dubletten')
+    if args.reports:
+        print('Berichte: ' + ', '.join(write_reports(counters, new_index, args.reports)))
+
+
+if __name__ == '__main__':
+    main()
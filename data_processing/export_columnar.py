@@ -0,0 +1,217 @@
+import argparse
+import os
+import sys
+from pathlib import Path
+from typing import Dict, List, Tuple
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from utilities.marc_fields import FlatRecord, iter_flat_records
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+DEFAULT_FILE_NAME = 'voebvoll-20241027.xml'
+DEFAULT_OUTPUT_DIR = 'voebvoll_parquet'
+BATCH_RECORDS = 20000  # records per row group
+COMPRESSION = 'zstd'
+
+FIELDS_DIR = 'fields'
+RECORDS_FILE = 'records.parquet'
+PARTITION_COLUMN = 'tag_block'  # 0xx ... 9xx, as in the MARC21 field blocks
+
+# Repeated short strings are stored once per row group (Arrow dictionaries,
+# Parquet dictionary pages)
+DICTIONARY_COLUMNS = ['tag', 'ind1', 'ind2', 'code', 'value']
+
+
+def _require_pyarrow() -> None:
+    if not PYARROW_AVAILABLE:
+        raise ImportError("Das Paket 'pyarrow' ist nicht installiert. Bitte mit 'pip install pyarrow' nachinstallieren.")
+
+
+def field_schema() -> 'pa.Schema':
+    """One row per subfield (control fields: empty code), see ``utilities.marc_fields``."""
+    _require_pyarrow()
+    text = pa.dictionary(pa.int32(), pa.string())
+    return pa.schema([
+        ('record_pos', pa.uint32()),
+        ('001', pa.string()),
+        ('tag', text),
+        ('ind1', text),
+        ('ind2', text),
+        ('code', text),
+        ('value', text),
+        ('occurrence', pa.uint16()),
+    ])
+
+
+def record_schema() -> 'pa.Schema':
+    """One row per record; ``start``/``end`` are the byte offsets in the dump."""
+    _require_pyarrow()
+    return pa.schema([
+        ('record_pos', pa.uint32()),
+        ('001', pa.string()),
+        ('leader', pa.string()),
+        ('008', pa.string()),
+        ('holdings', pa.list_(pa.string())),
+        ('holdings_count', pa.uint16()),
+        ('start', pa.uint64()),
+        ('end', pa.uint64()),
+    ])
+
+
+def _field_tables(batch: List[FlatRecord]) -> Dict[str, 'pa.Table']:
+    """Field rows of a batch, split by tag block."""
+    columns: Dict[str, Dict[str, list]] = {}
+    for record in batch:
+        for tag, ind1, ind2, code, value, occurrence in record.fields:
+            block = f'{tag[:1] or "_"}xx'
+            block_columns = columns.get(block)
+            if block_columns is None:
+                block_columns = columns[block] = {name: [] for name in field_schema().names}
+            block_columns['record_pos'].append(record.position)
+            block_columns['001'].append(record.record_id)
+            block_columns['tag'].append(tag)
+            block_columns['ind1'].append(ind1)
+            block_columns['ind2'].append(ind2)
+            block_columns['code'].append(code)
+            block_columns['value'].append(value)
+            block_columns['occurrence'].append(occurrence)
+
+    schema = field_schema()
+    tables = {}
+    for block, block_columns in columns.items():
+        arrays = []
+        for schema_field in schema:
+            values = block_columns[schema_field.name]
+            if pa.types.is_dictionary(schema_field.type):
+                arrays.append(pa.array(values, pa.string()).dictionary_encode())
+            else:
+                arrays.append(pa.array(values, schema_field.type))
+        tables[block] = pa.Table.from_arrays(arrays, schema=schema)
+    return tables
+
+
+def _record_table(batch: List[FlatRecord]) -> 'pa.Table':
+    return pa.table({
+        'record_pos': [record.position for record in batch],
+        '001': [record.record_id for record in batch],
+        'leader': [record.leader for record in batch],
+        '008': [record.f008 for record in batch],
+        'holdings': [record.holdings for record in batch],
+        'holdings_count': [len(record.holdings) for record in batch],
+        'start': [record.start for record in batch],
+        'end': [record.end for record in batch],
+    }, schema=record_schema())
+
+
+def export_columnar(
+    input_file: str = DEFAULT_FILE_NAME,
+    output_dir: str = DEFAULT_OUTPUT_DIR,
+    batch_records: int = BATCH_RECORDS,
+    compression: str = COMPRESSION,
+) -> Dict[str, int]:
+    """Stream the dump into a field table partitioned by tag block plus a per-record table.
+
+    Layout: ``<output_dir>/fields/tag_block=0xx/part-0.parquet`` ... (Hive
+    partitioning) and ``<output_dir>/records.parquet``. Only
+    ``batch_records`` records are held in memory at a time; every batch
+    becomes one row group.
+
+    Returns:
+        dict with ``records``, ``field_rows`` and ``partitions``
+    """
+    _require_pyarrow()
+    fields_dir = os.path.join(output_dir, FIELDS_DIR)
+    os.makedirs(fields_dir, exist_ok=True)
+    field_writers: Dict[str, pq.ParquetWriter] = {}
+    record_writer = pq.ParquetWriter(
+        os.path.join(output_dir, RECORDS_FILE), record_schema(), compression=compression
+    )
+    totals = {'records': 0, 'field_rows': 0}
+
+    def flush(batch: List[FlatRecord]) -> None:
+        record_writer.write_table(_record_table(batch))
+        for block, table in _field_tables(batch).items():
+            writer = field_writers.get(block)
+            if writer is None:
+                block_dir = os.path.join(fields_dir, f'{PARTITION_COLUMN}={block}')
+                os.makedirs(block_dir, exist_ok=True)
+                writer = field_writers[block] = pq.ParquetWriter(
+                    os.path.join(block_dir, 'part-0.parquet'),
+                    field_schema(),
+                    compression=compression,
+                    use_dictionary=DICTIONARY_COLUMNS,
+                )
+            writer.write_table(table)
+            totals['field_rows'] += table.num_rows
+        totals['records'] += len(batch)
+
+    try:
+        batch: List[FlatRecord] = []
+        for record in iter_flat_records(input_file):
+            batch.append(record)
+            if len(batch) >= batch_records:
+                flush(batch)
+                batch = []
+        if batch:
+            flush(batch)
+    finally:
+        record_writer.close()
+        for writer in field_writers.values():
+            writer.close()
+
+    totals['partitions'] = len(field_writers)
+    return totals
+
+
+def open_fields(export_dir: str) -> 'ds.Dataset':
+    """The field table as a dataset; filters on ``tag_block`` skip whole partitions."""
+    _require_pyarrow()
+    return ds.dataset(os.path.join(export_dir, FIELDS_DIR), format='parquet', partitioning='hive')
+
+
+def open_records(export_dir: str) -> 'ds.Dataset':
+    _require_pyarrow()
+    return ds.dataset(os.path.join(export_dir, RECORDS_FILE), format='parquet')
+
+
+def element_record_counts(export_dir: str) -> Dict[Tuple[str, str, str], int]:
+    """Records containing each (tag, ind1, ind2) as in ``analyze_elements_quantity``, as one vectorized query."""
+    table = open_fields(export_dir).to_table(columns=['record_pos', 'tag', 'ind1', 'ind2'])
+    # Every row group has its own dictionary; grouping needs a common one
+    table = table.unify_dictionaries()
+    grouped = table.group_by(['tag', 'ind1', 'ind2']).aggregate([('record_pos', 'count_distinct')])
+    return {
+        (tag, ind1, ind2): records
+        for tag, ind1, ind2, records in zip(
+            grouped['tag'].to_pylist(),
+            grouped['ind1'].to_pylist(),
+            grouped['ind2'].to_pylist(),
+            grouped['record_pos_count_distinct'].to_pylist(),
+        )
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Export MARCXML into columnar Parquet tables')
+    parser.add_argument('file', nargs='?', default=DEFAULT_FILE_NAME, help='XML file to export')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT_DIR, help='target directory')
+    parser.add_argument('--batch-records', type=int, default=BATCH_RECORDS, help='records per row group')
+    parser.add_argument('--compression', default=COMPRESSION, help='Parquet compression codec')
+    args = parser.parse_args()
+
+    if not PYARROW_AVAILABLE:
+        print("Das Paket 'pyarrow' ist nicht installiert. Bitte mit 'pip install pyarrow' nachinstallieren.")
+        sys.exit(1)
+    totals = export_columnar(args.file, args.output, args.batch_records, args.compression)
+    print(f"{totals['records']} Datensätze, {totals['field_rows']} Feldzeilen in "
+          f"{totals['partitions']} Partitionen exportiert nach: {args.output}")
+
+
+if __name__ == '__main__':
+    main()
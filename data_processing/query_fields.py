@@ -0,0 +1,78 @@
+"""Build and query the SQLite field store of a dump.
+
+``build`` parses the dump once and loads every record, subfield and 049
+holding into ``<dump>.fields.sqlite`` (see ``utilities.field_store``).
+``query`` then answers questions from the indexes only, e.g. records held by
+a library that have no ISBN, or all records with a language name in 041::
+
+    python data_processing/query_fields.py query dump.xml --held-by DE-1a --missing 020
+    python data_processing/query_fields.py query dump.xml --has '041$a=deutsch' --export deutsch.xml
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from utilities.field_store import FieldCondition, FieldStore, build_field_store
+from utilities.marc_fields import iter_flat_records
+from utilities.record_offsets import export_records
+
+DEFAULT_FILE_NAME = 'voebvoll-20241027.xml'
+STORE_SUFFIX = '.fields.sqlite'
+DEFAULT_LIMIT = 20
+
+
+def store_path(dump_path: str) -> str:
+    """Default location of the field store for ``dump_path``."""
+    return dump_path + STORE_SUFFIX
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='SQLite field store: build once, query in milliseconds')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    build = sub.add_parser('build', help='load all records and subfields into the store')
+    build.add_argument('file', nargs='?', default=DEFAULT_FILE_NAME, help='XML file to load')
+    build.add_argument('--store', default=None, help=f'store file (default: <file>{STORE_SUFFIX})')
+
+    query = sub.add_parser('query', help='select records from a built store')
+    query.add_argument('file', nargs='?', default=DEFAULT_FILE_NAME, help='XML file the store belongs to')
+    query.add_argument('--store', default=None, help=f'store file (default: <file>{STORE_SUFFIX})')
+    query.add_argument('--held-by', nargs='*', default=[], help='ISIL(s) in 049 $a the records must have')
+    query.add_argument('--has', nargs='*', default=[], type=FieldCondition.parse,
+                       help="field conditions the records must meet: TAG, TAG$CODE or TAG$CODE=VALUE")
+    query.add_argument('--missing', nargs='*', default=[], type=FieldCondition.parse,
+                       help='field conditions the records must not meet')
+    query.add_argument('--id', default=None, help='001 of the record')
+    query.add_argument('--sql', default=None, help='run a read-only SQL statement instead')
+    query.add_argument('--limit', type=int, default=DEFAULT_LIMIT, help='matches to print (0 = none)')
+    query.add_argument('--export', default=None, help='write the matching records to this XML file')
+    args = parser.parse_args()
+
+    path = args.store or store_path(args.file)
+    if args.command == 'build':
+        started = time.perf_counter()
+        count = build_field_store(iter_flat_records(args.file), path, args.file)
+        print(f'{count} Datensätze geladen in {time.perf_counter() - started:.1f} s -> {path}')
+        return
+
+    with FieldStore(path, args.file) as store:
+        started = time.perf_counter()
+        if args.sql:
+            for row in store.execute(args.sql):
+                print(';'.join(str(value) for value in row))
+            return
+        matches = store.select(args.held_by, args.has, args.missing, args.id)
+        elapsed = (time.perf_counter() - started) * 1000
+        print(f'Treffer: {len(matches)} von {len(store)} Datensätzen ({elapsed:.0f} ms)')
+        for pos, record_id, _, _ in matches[:args.limit]:
+            print(f'  {pos}: {record_id}')
+        if args.export:
+            written = export_records(args.file, ((start, end) for _, _, start, end in matches), args.export)
+            print(f'{written} Datensätze exportiert nach: {args.export}')
+
+
+if __name__ == '__main__':
+    main()
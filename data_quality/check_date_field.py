@@ -1,18 +1,21 @@
-import xml.etree.ElementTree as ET
 import sys
 from pathlib import Path
+from typing import Optional
 sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
-from utilities.marc_utils import percentage_of_records
+from utilities.fixed_fields import FixedFields, extract_fixed_fields
 
+DATE_PREFIX = '991231'
 
-def calculate_008_date_percentage(xml_file_path: str) -> float:
-    """Return percentage of records whose 008 field starts with ``991231``."""
 
-    def predicate(elem: ET.Element) -> bool:
-        controlfield_008 = elem.find('./controlfield[@tag="008"]')
-        return bool(controlfield_008 is not None and controlfield_008.text and controlfield_008.text.startswith('991231'))
+def calculate_008_date_percentage(xml_file_path: str, fields: Optional[FixedFields] = None) -> float:
+    """Return percentage of records whose 008 field starts with ``991231``.
 
-    return percentage_of_records(xml_file_path, predicate)
+    ``fields`` reuses leader/008 columns already extracted from the same file.
+    """
+    fields = fields if fields is not None else extract_fixed_fields(xml_file_path)
+    if not len(fields):
+        return 0.0
+    return float(fields.f008_prefix(DATE_PREFIX).mean() * 100)
 
 
 if __name__ == '__main__':
@@ -1,36 +1,189 @@
+import argparse
+import html
 import sys
 import xml.etree.ElementTree as ET
 import tkinter as tk
 from tkinter import messagebox
-from typing import Dict, List, Set, Tuple
+from array import array
+from hashlib import blake2b
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from utilities.external_sort import ExternalSorter
+from utilities.isbn_batch import normalize_isbn_keys
+from utilities.record_offsets import iter_first_subfields
+from utilities.sampling import Estimate
+from utilities.sketches import HyperLogLog, SpaceSaving
 
 DEFAULT_FILE_NAME = "voebvoll-20241027.xml"
+NORMALIZE_BATCH_SIZE = 10000  # records per vectorized ISBN normalization
+PREVIEW_PRECISION = 14  # HyperLogLog registers 2**14: ±1.6 % (95 %)
+PREVIEW_TOP = 10
+PREVIEW_CANDIDATES = 10  # Space-Saving counters per reported value
 
 
-def analyze_identifier_duplicates(
-    file_path: str,
-) -> Tuple[int, int, int, int, int, int]:
-    """Return statistics about duplicate ISBNs and ISSNs.
+class HoldingsInterner:
+    """Maps ISIL codes to small ints and holdings sets (049 $a) to set ids.
 
-    The returned tuple contains:
-        total number of ISBNs,
-        number of duplicate ISBN occurrences,
-        number of real ISBN duplicates (same holdings),
-        total number of ISSNs,
-        number of duplicate ISSN occurrences,
-        number of real ISSN duplicates (same holdings).
+    A dump has only a few thousand distinct holdings combinations, so every
+    record's holdings shrink to one integer.
+    """
+
+    def __init__(self) -> None:
+        self.isil_ids: Dict[str, int] = {}
+        self.set_ids: Dict[Tuple[int, ...], int] = {}
+
+    def intern(self, holdings: Iterable[str]) -> int:
+        isils = self.isil_ids
+        key = tuple(sorted({isils.setdefault(code, len(isils)) for code in holdings}))
+        return self.set_ids.setdefault(key, len(self.set_ids))
+
+
+def identifier_hash(identifier: str) -> int:
+    """Stable 64-bit hash of an identifier (blake2b)."""
+    return int.from_bytes(blake2b(identifier.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+class IdentifierOccurrences:
+    """Append-only ``(identifier hash, holdings set id)`` pairs, 12 bytes each.
+
+    Replaces a dict of identifier -> list of holdings sets. Duplicates are
+    found afterwards by sorting the pairs: an identifier occurring more than
+    once is a real duplicate if all its occurrences share one set id.
+    """
+
+    def __init__(self) -> None:
+        self.hashes = array("Q")
+        self.set_ids = array("I")
+
+    def __len__(self) -> int:
+        return len(self.hashes)
+
+    def add(self, identifier: str, set_id: int, position: int = 0) -> None:
+        self.hashes.append(identifier_hash(identifier))
+        self.set_ids.append(set_id)
+
+    def duplicate_counts(self) -> Tuple[int, int]:
+        """Return ``(duplicate occurrences, real duplicates)``."""
+        n = len(self.hashes)
+        if n == 0:
+            return 0, 0
+        hashes = np.frombuffer(self.hashes, dtype=np.uint64)
+        set_ids = np.frombuffer(self.set_ids, dtype=np.uint32)
+        order = np.lexsort((set_ids, hashes))
+        hashes, set_ids = hashes[order], set_ids[order]
+        return count_sorted_duplicates(hashes, set_ids)
+
+
+def count_sorted_duplicates(hashes: np.ndarray, set_ids: np.ndarray) -> Tuple[int, int]:
+    """Duplicate statistics for pairs sorted by ``(hash, set id)``."""
+    n = len(hashes)
+    if n == 0:
+        return 0, 0
+    starts = np.flatnonzero(np.concatenate(([True], hashes[1:] != hashes[:-1])))
+    ends = np.append(starts[1:], n)
+    sizes = ends - starts
+    # Sorted by set id within a group: first == last means all occurrences agree
+    same_holdings = set_ids[starts] == set_ids[ends - 1]
+    return n - len(starts), int(np.count_nonzero((sizes > 1) & same_holdings))
+
+
+class PositionedOccurrences:
+    """``(identifier hash, record position)`` pairs for locating duplicated identifiers."""
+
+    def __init__(self) -> None:
+        self.hashes = array("Q")
+        self.positions = array("I")
+
+    def __len__(self) -> int:
+        return len(self.hashes)
+
+    def add(self, identifier: str, set_id: int, position: int = 0) -> None:
+        self.hashes.append(identifier_hash(identifier))
+        self.positions.append(position)
+
+    def duplicate_positions(self) -> np.ndarray:
+        """Sorted positions of the records holding an identifier that occurs more than once."""
+        hashes = np.frombuffer(self.hashes, dtype=np.uint64)
+        if len(hashes) < 2:
+            return np.zeros(0, dtype=np.uint32)
+        order = np.argsort(hashes, kind="stable")
+        same_as_next = hashes[order][1:] == hashes[order][:-1]
+        duplicated = np.zeros(len(hashes), dtype=bool)
+        duplicated[:-1] |= same_as_next
+        duplicated[1:] |= same_as_next
+        return np.unique(np.frombuffer(self.positions, dtype=np.uint32)[order[duplicated]])
+
+
+OCCURRENCE_DTYPE = np.dtype([("hash", "<u8"), ("set_id", "<u4"), ("position", "<u4")])
+
+
+class SpilledIdentifierOccurrences:
+    """Disk-backed variant of :class:`IdentifierOccurrences` with bounded memory.
+
+    Stores ``(identifier hash, holdings set id, record position)`` rows in an
+    :class:`ExternalSorter`; sorted runs are spilled to ``tmp_dir`` and
+    merged while counting.
     """
+
+    def __init__(self, max_memory_bytes: int, tmp_dir: Optional[str] = None) -> None:
+        self.sorter = ExternalSorter(OCCURRENCE_DTYPE, max_memory_bytes, tmp_dir)
+
+    def __len__(self) -> int:
+        return len(self.sorter)
+
+    def add(self, identifier: str, set_id: int, position: int = 0) -> None:
+        self.sorter.append((identifier_hash(identifier), set_id, position))
+
+    def duplicate_counts(self) -> Tuple[int, int]:
+        """Return ``(duplicate occurrences, real duplicates)`` from the merged runs."""
+        total = groups = real = 0
+        current = first = last = None
+        size = 0
+        for key, set_id, _ in self.sorter:
+            total += 1
+            if key != current:
+                if size > 1 and first == last:
+                    real += 1
+                current, first, size = key, set_id, 0
+                groups += 1
+            size += 1
+            last = set_id
+        if size > 1 and first == last:
+            real += 1
+        return total - groups, real
+
+    def close(self) -> None:
+        self.sorter.close()
+
+
+def _add_isbn_batch(
+    occurrences,
+    records: List[Tuple[List[str], int, int]],
+    normalize: bool,
+) -> None:
+    """Register the ISBNs of ``(isbns, holdings set id, record position)`` records."""
+    flat = [isbn for isbns, _, _ in records for isbn in isbns]
+    keys = iter(normalize_isbn_keys(flat) if normalize else flat)
+    for isbns, set_id, position in records:
+        for _ in isbns:
+            occurrences.add(next(keys), set_id, position)
+
+
+def _collect_occurrences(file_path: str, isbn_occurrences, issn_occurrences, normalize_isbns: bool) -> None:
+    """Stream ``file_path`` and register every ISBN/ISSN occurrence with its holdings."""
     ns = {"marc": "http://www.loc.gov/MARC21/slim"}
-    isbn_data: Dict[str, List[Set[str]]] = {}
-    issn_data: Dict[str, List[Set[str]]] = {}
-    dup_isbn = 0
-    dup_issn = 0
-    total_isbn = 0
-    total_issn = 0
+    holdings_ids = HoldingsInterner()
+    pending: List[Tuple[List[str], int, int]] = []
+    position = 0
 
     for _, elem in ET.iterparse(file_path, events=("end",)):
         if elem.tag.replace(f"{{{ns['marc']}}}", "") != "record":
             continue
+        position += 1
 
         isbns = [
             sf.text.strip()
@@ -44,54 +197,188 @@ def analyze_identifier_duplicates(
             for sf in df.findall('subfield')
             if sf.get('code') == 'a' and sf.text
         ]
-        total_isbn += len(isbns)
-        total_issn += len(issns)
-        holdings = {
-            sf.text.strip()
-            for df in elem.findall('datafield[@tag="049"]')
-            for sf in df.findall('subfield')
-            if sf.get('code') == 'a' and sf.text
-        }
+        if isbns or issns:
+            set_id = holdings_ids.intern(
+                sf.text.strip()
+                for df in elem.findall('datafield[@tag="049"]')
+                for sf in df.findall('subfield')
+                if sf.get('code') == 'a' and sf.text
+            )
+            if isbns:
+                pending.append((isbns, set_id, position))
+                if len(pending) >= NORMALIZE_BATCH_SIZE:
+                    _add_isbn_batch(isbn_occurrences, pending, normalize_isbns)
+                    pending = []
+            for issn in issns:
+                issn_occurrences.add(issn, set_id, position)
 
-        for isbn in isbns:
-            if isbn in isbn_data:
-                dup_isbn += 1
-                isbn_data[isbn].append(holdings)
-            else:
-                isbn_data[isbn] = [holdings]
+        elem.clear()
 
-        for issn in issns:
-            if issn in issn_data:
-                dup_issn += 1
-                issn_data[issn].append(holdings)
-            else:
-                issn_data[issn] = [holdings]
+    if pending:
+        _add_isbn_batch(isbn_occurrences, pending, normalize_isbns)
 
-        elem.clear()
 
-    real_isbn_count = sum(
-        1
-        for sets in isbn_data.values()
-        if len(sets) > 1 and len({frozenset(s) for s in sets}) == 1
-    )
-    real_issn_count = sum(
-        1
-        for sets in issn_data.values()
-        if len(sets) > 1 and len({frozenset(s) for s in sets}) == 1
-    )
+def analyze_identifier_duplicates(
+    file_path: str,
+    normalize_isbns: bool = False,
+    max_memory_mb: Optional[float] = None,
+    tmp_dir: Optional[str] = None,
+) -> Tuple[int, int, int, int, int, int]:
+    """Return statistics about duplicate ISBNs and ISSNs.
+
+    ISBNs are compared as written by default. With ``normalize_isbns``
+    valid ISBNs are compared by their ISBN-13, so hyphenated and ISBN-10
+    forms of the same book count as duplicates; invalid values are still
+    compared as they are.
+
+    Identifiers are kept as 64-bit hashes and holdings as interned set ids
+    (see :class:`IdentifierOccurrences`), which needs a fraction of the
+    memory of per-identifier lists of holdings sets. With ``max_memory_mb``
+    the occurrences are sorted externally instead: sorted runs are spilled to
+    ``tmp_dir`` (default: system temp directory) and k-way merged, so memory
+    stays bounded for dumps of any size.
+
+    The returned tuple contains:
+        total number of ISBNs,
+        number of duplicate ISBN occurrences,
+        number of real ISBN duplicates (same holdings),
+        total number of ISSNs,
+        number of duplicate ISSN occurrences,
+        number of real ISSN duplicates (same holdings).
+    """
+    if max_memory_mb is None:
+        isbn_occurrences = IdentifierOccurrences()
+        issn_occurrences = IdentifierOccurrences()
+    else:
+        budget = int(max_memory_mb * 1024 * 1024) // 2
+        isbn_occurrences = SpilledIdentifierOccurrences(budget, tmp_dir)
+        issn_occurrences = SpilledIdentifierOccurrences(budget, tmp_dir)
+
+    try:
+        _collect_occurrences(file_path, isbn_occurrences, issn_occurrences, normalize_isbns)
+        dup_isbn, real_isbn_count = isbn_occurrences.duplicate_counts()
+        dup_issn, real_issn_count = issn_occurrences.duplicate_counts()
+    finally:
+        if max_memory_mb is not None:
+            isbn_occurrences.close()
+            issn_occurrences.close()
 
     return (
-        total_isbn,
+        len(isbn_occurrences),
         dup_isbn,
         real_isbn_count,
-        total_issn,
+        len(issn_occurrences),
         dup_issn,
         real_issn_count,
     )
 
 
+def find_duplicate_positions(file_path: str, normalize_isbns: bool = False) -> Dict[str, np.ndarray]:
+    """Return the 1-based positions of records with a duplicated ISBN or ISSN.
+
+    An identifier counts as duplicated exactly as in
+    :func:`analyze_identifier_duplicates` (same ``normalize_isbns``); every
+    record holding one of its occurrences is reported, keyed ``"ISBN"`` and
+    ``"ISSN"``.
+    """
+    isbn_occurrences = PositionedOccurrences()
+    issn_occurrences = PositionedOccurrences()
+    _collect_occurrences(file_path, isbn_occurrences, issn_occurrences, normalize_isbns)
+    return {
+        "ISBN": isbn_occurrences.duplicate_positions(),
+        "ISSN": issn_occurrences.duplicate_positions(),
+    }
+
+
+def preview_identifier_duplicates(
+    file_path: str,
+    precision: int = PREVIEW_PRECISION,
+    top: int = PREVIEW_TOP,
+    normalize_isbns: bool = False,
+) -> Dict[str, Dict]:
+    """Approximate ISBN/ISSN duplicate statistics in seconds (``--preview``).
+
+    One regex pass over the raw bytes (``iter_first_subfields``) counts the
+    identifiers exactly; distinct values are estimated with a HyperLogLog
+    sketch, the most frequent values with Space-Saving. Real duplicates
+    (same holdings) are not estimated. ``normalize_isbns`` as in
+    :func:`analyze_identifier_duplicates`.
+
+    Returns per ``"ISBN"``/``"ISSN"``: ``total``, ``distinct`` and
+    ``duplicates`` (:class:`Estimate` with 95 % margin) and ``top``
+    (``(value, count, max overcount)``, only values guaranteed to repeat).
+    """
+    names = {"020": "ISBN", "022": "ISSN"}
+    sketches = {tag: HyperLogLog(precision) for tag in names}
+    heavy = {tag: SpaceSaving(top * PREVIEW_CANDIDATES) for tag in names}
+    totals = {tag: 0 for tag in names}
+    pending: Dict[str, List[bytes]] = {tag: [] for tag in names}
+
+    def flush(tag: str) -> None:
+        values = [html.unescape(v.decode("utf-8", "replace")).strip() for v in pending[tag]]
+        if tag == "020" and normalize_isbns:
+            values = normalize_isbn_keys(values)
+        sketches[tag].add(v.encode("utf-8") for v in values)
+        heavy[tag].update(values)
+        pending[tag] = []
+
+    for tag, value in iter_first_subfields(file_path, tuple(names)):
+        totals[tag] += 1
+        pending[tag].append(value)
+        if len(pending[tag]) >= NORMALIZE_BATCH_SIZE:
+            flush(tag)
+
+    result = {}
+    for tag, name in names.items():
+        flush(tag)
+        distinct = Estimate(min(sketches[tag].estimate(), totals[tag]), sketches[tag].margin())
+        result[name] = {
+            "total": totals[tag],
+            "distinct": distinct,
+            "duplicates": Estimate(totals[tag] - distinct.value, distinct.margin),
+            "top": [entry for entry in heavy[tag].top(top) if entry[1] - entry[2] > 1],
+        }
+    return result
+
+
 def main() -> None:
-    file_path = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_FILE_NAME
+    parser = argparse.ArgumentParser(description="ISBN/ISSN-Dubletten")
+    parser.add_argument("file", nargs="?", default=DEFAULT_FILE_NAME, help="XML file to analyze")
+    parser.add_argument(
+        "--max-memory-mb",
+        type=float,
+        default=None,
+        help="sort identifiers externally (spill to disk) with at most this much memory",
+    )
+    parser.add_argument("--tmp-dir", default=None, help="directory for sorted runs")
+    parser.add_argument(
+        "--preview",
+        action="store_true",
+        help="approximate counts in seconds (HyperLogLog/Space-Saving, 95%% margins)",
+    )
+    parser.add_argument(
+        "--normalize-isbns",
+        action="store_true",
+        help="compare valid ISBNs by their ISBN-13 (ISBN-10 and hyphenated forms count as duplicates)",
+    )
+    args = parser.parse_args()
+
+    if args.preview:
+        lines = []
+        for name, stats in preview_identifier_duplicates(args.file, normalize_isbns=args.normalize_isbns).items():
+            if not stats["total"]:
+                continue
+            lines.append(
+                f"{name}: {stats['total']}, davon ca. {stats['distinct']} verschieden, "
+                f"ca. {stats['duplicates']} doppelte Vorkommen"
+            )
+            for value, count, error in stats["top"][:5]:
+                lines.append(f"  {value}: {count - error}–{count}x")
+        message = "\n".join(["Vorschau (Schätzung):"] + lines) if lines else "Keine ISBN/ISSN gefunden."
+        root = tk.Tk()
+        root.withdraw()
+        messagebox.showinfo("ISBN/ISSN-Dubletten (Vorschau)", message)
+        return
     (
         total_isbn,
         dup_isbn,
@@ -99,7 +386,12 @@ def main() -> None:
         total_issn,
         dup_issn,
         real_issn,
-    ) = analyze_identifier_duplicates(file_path)
+    ) = analyze_identifier_duplicates(
+        args.file,
+        normalize_isbns=args.normalize_isbns,
+        max_memory_mb=args.max_memory_mb,
+        tmp_dir=args.tmp_dir,
+    )
 
     lines = []
     if total_isbn:
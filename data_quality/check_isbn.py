@@ -1,14 +1,38 @@
 import xml.etree.ElementTree as ET
 import tkinter as tk
 from tkinter import messagebox
-import urllib.request
-import json
-from typing import Callable, Dict, Iterable, Set, Tuple
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, List, Optional, Sequence, Set, Tuple
+from array import array
 import argparse
+import html
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from metadata_enrichment.enrichment_metrics import JobProgress, register_job
+from utilities.isbn_batch import validate_isbn_batch
+from utilities.record_offsets import first_subfield_pattern, iter_first_subfields
+from utilities.sampling import DEFAULT_SAMPLE_FRACTION, BlockSample, Estimate, estimate_ratio, estimate_total
+from utilities.sketches import HyperLogLog
+from data_quality.isbn_existence import (
+    DEFAULT_REQUESTS_PER_SECOND,
+    EXISTS,
+    MISSING,
+    UNKNOWN,
+    ExistenceCache,
+    ExistenceChecker,
+    bool_lookup,
+    google_books_lookup,
+)
 
 DEFAULT_FILE_NAME = "voebvoll-20241027.xml"
 DEFAULT_MAX_WORKERS = 100
+DEFAULT_CACHE_FILE = "isbn_exists_cache.sqlite"
+VALIDATION_BATCH_SIZE = 10000  # records per vectorized checksum batch
+PREVIEW_PRECISION = 14  # HyperLogLog registers 2**14: ±1.6 % (95 %)
+ISBN_FIELD = first_subfield_pattern(["020"])
 
 
 def is_valid_isbn10(isbn: str) -> bool:
@@ -35,104 +59,149 @@ def is_valid_isbn13(isbn: str) -> bool:
 
 
 def isbn_exists(isbn: str) -> bool:
-    """Return ``True`` if the Google Books API knows the given ISBN."""
+    """Return ``True`` if the Google Books API knows the given ISBN.
 
-    url = f"https://www.googleapis.com/books/v1/volumes?q=isbn:{isbn}"
+    A single uncached lookup through :class:`ExistenceChecker`; a transient
+    failure (rate limit, server or network error) counts as ``False``.
+    """
     try:
-        with urllib.request.urlopen(url, timeout=5) as f:
-            data = json.loads(f.read().decode())
-        return data.get("totalItems", 0) > 0
+        return ExistenceChecker(requests_per_second=0, max_retries=0).check_one(isbn) == EXISTS
     except Exception:
         return False
 
 
-def _collect_isbns(
-    file_path: str,
-    ns: Dict[str, str],
-) -> Tuple[int, int, Set[str]]:
-    """Return ``total_with_isbn``, ``invalid_syntax`` and all unique valid ISBNs."""
-
-    total_with_isbn = 0
-    invalid_syntax = 0
-    unique_valid: Set[str] = set()
-
-    for _, elem in ET.iterparse(file_path, events=("end",)):
-        if elem.tag.replace(f"{{{ns['marc']}}}", "") != "record":
-            continue
-
-        isbns = [
-            sf.text.strip()
-            for df in elem.findall('datafield[@tag="020"]')
-            for sf in df.findall('subfield')
-            if sf.get('code') == 'a' and sf.text
-        ]
-
-        if not isbns:
-            elem.clear()
-            continue
+class IsbnIndex:
+    """Compact per-record ISBN index built during the single XML pass.
 
-        total_with_isbn += 1
-        syntax_ok = True
+    Every syntactically valid ISBN is interned (as ISBN-13) to an integer id. The ids of
+    each record with ISBNs are stored in CSR layout: record ``r`` owns
+    ``isbn_ids[offsets[r]:offsets[r + 1]]``. ``syntax_ok`` is a bitmap with
+    one bit per record that is set when all of its ISBNs are syntactically
+    valid. After the existence check records can be classified from these
+    arrays without parsing the XML again. ``positions`` holds the 1-based
+    file position of each record; it stays empty unless every record was
+    added with one, so it is either aligned with the records or empty.
+    """
 
-        for raw in isbns:
-            clean = raw.replace('-', '').replace(' ', '')
-            if len(clean) == 10 and is_valid_isbn10(clean):
-                unique_valid.add(clean)
-            elif len(clean) == 13 and is_valid_isbn13(clean):
-                unique_valid.add(clean)
+    def __init__(self) -> None:
+        self.ids: Dict[str, int] = {}
+        self.isbns: List[str] = []
+        self.positions = array("I")
+        self.offsets = array("Q", [0])
+        self.isbn_ids = array("I")
+        self.syntax_ok = bytearray()
+        self.invalid_syntax = 0
+
+    @property
+    def total_with_isbn(self) -> int:
+        return len(self.offsets) - 1
+
+    def add_record(self, raw_isbns: Sequence[str], position: Optional[int] = None) -> None:
+        """Append one record given the raw ``020 $a`` values (at least one)."""
+        self.add_records([raw_isbns], () if position is None else (position,))
+
+    def add_records(self, records: Sequence[Sequence[str]], positions: Sequence[int] = ()) -> None:
+        """Append a batch of records; all ISBNs are validated in one vectorized call.
+
+        ISBNs are interned by their normalized ISBN-13, so the ISBN-10 and
+        ISBN-13 form of the same book are looked up only once. ``positions``
+        gives one position per record or none; a batch without positions
+        drops those of all records.
+        """
+        if positions and len(positions) != len(records):
+            raise ValueError(f"{len(positions)} positions for {len(records)} records")
+        if len(positions) == len(records) and len(self.positions) == self.total_with_isbn:
+            self.positions.extend(positions)
+        else:
+            self.positions = array("I")
+        flat = [raw for raw_isbns in records for raw in raw_isbns]
+        valid, _, isbn13 = validate_isbn_batch(flat)
+        valid = valid.tolist()
+
+        pos = 0
+        for raw_isbns in records:
+            record = self.total_with_isbn
+            seen: Set[int] = set()
+            syntax_ok = True
+
+            for i in range(pos, pos + len(raw_isbns)):
+                if not valid[i]:
+                    syntax_ok = False
+                    continue
+                isbn_id = self.ids.get(isbn13[i])
+                if isbn_id is None:
+                    isbn_id = self.ids[isbn13[i]] = len(self.isbns)
+                    self.isbns.append(isbn13[i])
+                if isbn_id not in seen:
+                    seen.add(isbn_id)
+                    self.isbn_ids.append(isbn_id)
+            pos += len(raw_isbns)
+
+            self.offsets.append(len(self.isbn_ids))
+            if record % 8 == 0:
+                self.syntax_ok.append(0)
+            if syntax_ok:
+                self.syntax_ok[record >> 3] |= 1 << (record & 7)
             else:
-                syntax_ok = False
-
-        if not syntax_ok:
-            invalid_syntax += 1
-
-        elem.clear()
-
-    return total_with_isbn, invalid_syntax, unique_valid
-
-
-def _check_exists_parallel(
-    isbns: Iterable[str],
-    isbn_exist_func: Callable[[str], bool],
-    max_workers: int = DEFAULT_MAX_WORKERS,
-) -> Dict[str, bool]:
-    """Check ISBN existence in parallel and return a cache dict."""
-
-    results: Dict[str, bool] = {}
-    with ThreadPoolExecutor(max_workers=max_workers) as exe:
-        future_map = {exe.submit(isbn_exist_func, i): i for i in isbns}
-        processed = 0
-        total = len(future_map)
-        for future in as_completed(future_map):
-            isbn = future_map[future]
-            try:
-                results[isbn] = future.result()
-            except Exception:
-                results[isbn] = False
-            processed += 1
-            if processed % 1000 == 0 or processed == total:
-                print(
-                    f"Prüfe ISBN-Existenz: {processed}/{total}",
-                    flush=True,
-                )
-    return results
-
-
-def _count_invalid_real(
+                self.invalid_syntax += 1
+
+    def is_syntax_ok(self, record: int) -> bool:
+        return bool(self.syntax_ok[record >> 3] & (1 << (record & 7)))
+
+    def record_states(self, statuses: Dict[str, str]) -> np.ndarray:
+        """Per record: 0 = correct, 1 = unknown, 2 = not assigned, 3 = syntax error.
+
+        A record with only syntactically valid ISBNs is not assigned if one of
+        them is ``MISSING``; otherwise unknown if the existence of one of them
+        could not be determined (or was never checked).
+        """
+        records = self.total_with_isbn
+        if not records:
+            return np.zeros(0, dtype=np.uint8)
+        keys = np.array(list(statuses), dtype=str)
+        values = np.array(list(statuses.values()), dtype=str)
+        isbns = np.array(self.isbns, dtype=str)
+        # Per interned ISBN: 2 = missing, 1 = unknown (or never checked), 0 = exists
+        state_by_id = np.where(
+            np.isin(isbns, keys[values == MISSING]), 2, np.where(np.isin(isbns, keys[values != UNKNOWN]), 0, 1)
+        ).astype(np.uint8)
+        states = state_by_id[np.frombuffer(self.isbn_ids, dtype=np.uint32)]
+
+        offsets = np.frombuffer(self.offsets, dtype=np.uint64).astype(np.intp)
+        record_states = np.zeros(records, dtype=np.uint8)
+        filled = offsets[1:] > offsets[:-1]
+        if filled.any():  # worst state per record; records without valid ISBNs stay 0
+            record_states[filled] = np.maximum.reduceat(states, offsets[:-1][filled])
+        syntax_ok = np.unpackbits(np.frombuffer(bytes(self.syntax_ok), dtype=np.uint8), bitorder="little")[:records]
+        record_states[~syntax_ok.astype(bool)] = 3
+        return record_states
+
+    def classify(self, statuses: Dict[str, str]) -> Tuple[int, int]:
+        """Return ``(invalid_real, unknown)`` for the given existence statuses (see :meth:`record_states`)."""
+        record_states = self.record_states(statuses)
+        return int(np.count_nonzero(record_states == 2)), int(np.count_nonzero(record_states == 1))
+
+
+def collect_isbns(
     file_path: str,
-    ns: Dict[str, str],
-    cache: Dict[str, bool],
-    invalid_syntax: int,
-    total_with_isbn: int,
-) -> Tuple[int, int, int]:
-    """Second pass that counts invalid_real while printing progress."""
+    ns: Optional[Dict[str, str]] = None,
+    job: Optional[JobProgress] = None,
+) -> IsbnIndex:
+    """Parse ``file_path`` once and return the ISBN index of all records (with positions)."""
 
-    invalid_real = 0
-    processed = 0
+    ns = ns or {"marc": "http://www.loc.gov/MARC21/slim"}
+    index = IsbnIndex()
+    batch: List[List[str]] = []
+    positions: List[int] = []
+    position = 0
 
     for _, elem in ET.iterparse(file_path, events=("end",)):
         if elem.tag.replace(f"{{{ns['marc']}}}", "") != "record":
             continue
+        position += 1
+
+        if job is not None:
+            job.add_records()
 
         isbns = [
             sf.text.strip()
@@ -140,62 +209,180 @@ def _count_invalid_real(
             for sf in df.findall('subfield')
             if sf.get('code') == 'a' and sf.text
         ]
+        if isbns:
+            batch.append(isbns)
+            positions.append(position)
+            if len(batch) >= VALIDATION_BATCH_SIZE:
+                index.add_records(batch, positions)
+                batch, positions = [], []
 
-        if not isbns:
-            elem.clear()
-            continue
+        elem.clear()
 
-        processed += 1
-        syntax_ok = True
-        valid_isbns: Set[str] = set()
+    if batch:
+        index.add_records(batch, positions)
+    return index
 
-        for raw in isbns:
-            clean = raw.replace('-', '').replace(' ', '')
-            if len(clean) == 10 and is_valid_isbn10(clean):
-                valid_isbns.add(clean)
-            elif len(clean) == 13 and is_valid_isbn13(clean):
-                valid_isbns.add(clean)
-            else:
-                syntax_ok = False
 
-        if syntax_ok and any(not cache.get(i, False) for i in valid_isbns):
-            invalid_real += 1
+def analyze_isbn_status(
+    file_path: str,
+    isbn_exist_func: Optional[Callable[[str], bool]] = None,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    metrics_port: Optional[int] = None,
+    cache_path: Optional[str] = None,
+    requests_per_second: float = DEFAULT_REQUESTS_PER_SECOND,
+) -> Dict[str, int]:
+    """Analyze ISBN syntax and existence and return all counters.
+
+    The XML file is parsed only once: all syntactically valid ISBNs are
+    interned into an :class:`IsbnIndex`, their existence is then checked
+    concurrently (each unique ISBN once) and the records are classified from
+    the index without a second parse.
+
+    Existence lookups share a token bucket of ``requests_per_second`` and are
+    retried with backoff. ISBNs that still fail are ``unknown`` and never
+    counted as not assigned. With ``cache_path`` the results are kept in a
+    SQLite file, so a rerun only queries new and unknown ISBNs.
+    ``isbn_exist_func`` replaces the Google Books lookup (``f(isbn) -> bool``).
+
+    If ``metrics_port`` is given, live progress is served in Prometheus text
+    format on that port while the check runs; the port is released afterwards.
+
+    Returns:
+        dict with ``total``, ``invalid_syntax``, ``invalid_real``, ``unknown``,
+        ``cached`` and ``queried``
+    """
 
-        if processed % 1000 == 0 or processed == total_with_isbn:
-            correct = processed - invalid_syntax - invalid_real
-            print(
-                f"Datensätze: {processed}/{total_with_isbn} | "
-                f"korrekt: {correct} | "
-                f"Syntaxfehler: {invalid_syntax} | "
-                f"nicht belegt: {invalid_real}",
-                flush=True,
-            )
+    ns = {"marc": "http://www.loc.gov/MARC21/slim"}
+    job = register_job("isbn_check")
+    metrics_server = None
+    if metrics_port is not None:
+        from metadata_enrichment.enrichment_stats_server import start_metrics_server
+        metrics_server = start_metrics_server(metrics_port)
+    try:
+        return _check_isbns(file_path, ns, job, isbn_exist_func, max_workers, cache_path, requests_per_second)
+    finally:
+        if metrics_server is not None:
+            metrics_server.shutdown()
+            metrics_server.server_close()
 
-        elem.clear()
 
-    return total_with_isbn, invalid_syntax, invalid_real
+def _check_isbns(
+    file_path: str,
+    ns: Dict[str, str],
+    job: JobProgress,
+    isbn_exist_func: Optional[Callable[[str], bool]],
+    max_workers: int,
+    cache_path: Optional[str],
+    requests_per_second: float,
+) -> Dict[str, int]:
+    """The run of :func:`analyze_isbn_status` without the metrics endpoint."""
+    index = collect_isbns(file_path, ns, job)
+
+    lookup = bool_lookup(isbn_exist_func) if isbn_exist_func is not None else google_books_lookup
+    with ExistenceCache(cache_path) as cache:
+        checker = ExistenceChecker(lookup, cache, requests_per_second=requests_per_second)
+        statuses = checker.check_many(index.isbns, max_workers=max_workers, job=job)
+
+    total_with_isbn = index.total_with_isbn
+    invalid_syntax = index.invalid_syntax
+    invalid_real, unknown = index.classify(statuses)
+    correct = total_with_isbn - invalid_syntax - invalid_real - unknown
+    print(
+        f"Datensätze: {total_with_isbn}/{total_with_isbn} | "
+        f"korrekt: {correct} | "
+        f"Syntaxfehler: {invalid_syntax} | "
+        f"nicht belegt: {invalid_real} | "
+        f"unbekannt: {unknown}",
+        flush=True,
+    )
+    job.finish()
+    return {
+        "total": total_with_isbn,
+        "invalid_syntax": invalid_syntax,
+        "invalid_real": invalid_real,
+        "unknown": unknown,
+        "cached": checker.stats["cached"],
+        "queried": checker.stats["queried"],
+    }
 
 
 def analyze_isbn(
     file_path: str,
-    isbn_exist_func: Callable[[str], bool] = isbn_exists,
+    isbn_exist_func: Optional[Callable[[str], bool]] = None,
     max_workers: int = DEFAULT_MAX_WORKERS,
+    metrics_port: Optional[int] = None,
+    cache_path: Optional[str] = None,
+    requests_per_second: float = DEFAULT_REQUESTS_PER_SECOND,
 ) -> Tuple[int, int, int]:
-    """Analyze ISBN syntax and existence.
+    """Return ``(total, invalid_syntax, invalid_real)``; see :func:`analyze_isbn_status`."""
 
-    The XML file is processed in two passes. First all unique, syntactically
-    valid ISBNs are collected. Their existence is then checked concurrently.
-    During the second pass the numbers of valid and invalid ISBNs are printed
-    as progress information.
-    """
+    result = analyze_isbn_status(
+        file_path, isbn_exist_func, max_workers, metrics_port, cache_path, requests_per_second
+    )
+    return result["total"], result["invalid_syntax"], result["invalid_real"]
 
-    ns = {"marc": "http://www.loc.gov/MARC21/slim"}
 
-    total_with_isbn, invalid_syntax, unique_valid = _collect_isbns(file_path, ns)
+def _decode(value: bytes) -> str:
+    return html.unescape(value.decode("utf-8", "replace")).strip()
 
-    cache = _check_exists_parallel(unique_valid, isbn_exist_func, max_workers=max_workers)
 
-    return _count_invalid_real(file_path, ns, cache, invalid_syntax, total_with_isbn)
+def estimate_distinct_isbns(file_path: str, precision: int = PREVIEW_PRECISION) -> Estimate:
+    """Distinct valid ISBNs (as ISBN-13) = existence lookups of a full run.
+
+    One regex pass over the raw bytes into a HyperLogLog sketch.
+    """
+    sketch = HyperLogLog(precision)
+    batch: List[str] = []
+
+    def flush() -> None:
+        valid, _, isbn13 = validate_isbn_batch(batch)
+        sketch.add(isbn.encode("ascii") for isbn, ok in zip(isbn13, valid.tolist()) if ok)
+        batch.clear()
+
+    for _, value in iter_first_subfields(file_path, ["020"]):
+        batch.append(_decode(value))
+        if len(batch) >= VALIDATION_BATCH_SIZE:
+            flush()
+    flush()
+    return Estimate(sketch.estimate(), sketch.margin())
+
+
+def preview_isbn(
+    file_path: str, fraction: float = DEFAULT_SAMPLE_FRACTION, seed: int = 0
+) -> Dict[str, Estimate]:
+    """Estimate the ISBN statistics from a block sample (``--preview``), without lookups.
+
+    Only the syntax is checked, on the first ``$a`` of each 020 field of the
+    sampled records. Returns :class:`Estimate` values (95 % margins) for
+    ``records``, ``total`` (records with ISBN), ``share``, ``invalid_syntax``,
+    ``invalid_share`` (of the records with ISBN) and ``distinct`` (see
+    :func:`estimate_distinct_isbns`).
+    """
+    sample = BlockSample(file_path, fraction, seed=seed)
+    records: List[int] = []
+    with_isbn: List[int] = []
+    invalid: List[int] = []
+    for block in sample:
+        per_record = [[_decode(m.group(2)) for m in ISBN_FIELD.finditer(data)] for data in block]
+        per_record = [isbns for isbns in per_record if isbns]
+        valid = validate_isbn_batch([isbn for isbns in per_record for isbn in isbns])[0].tolist()
+        bad = pos = 0
+        for isbns in per_record:
+            bad += not all(valid[pos:pos + len(isbns)])
+            pos += len(isbns)
+        records.append(len(block))
+        with_isbn.append(len(per_record))
+        invalid.append(bad)
+
+    blocks = sample.population_blocks
+    return {
+        "records": estimate_total(records, blocks),
+        "total": estimate_total(with_isbn, blocks),
+        "share": estimate_ratio(with_isbn, records, blocks),
+        "invalid_syntax": estimate_total(invalid, blocks),
+        "invalid_share": estimate_ratio(invalid, with_isbn, blocks),
+        "distinct": estimate_distinct_isbns(file_path),
+    }
 
 
 def main() -> None:
@@ -208,11 +395,63 @@ def main() -> None:
         default=DEFAULT_MAX_WORKERS,
         help="number of parallel requests to Google Books API",
     )
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        default=None,
+        help="serve live progress metrics (Prometheus format) on this port",
+    )
+    parser.add_argument(
+        "--cache",
+        default=DEFAULT_CACHE_FILE,
+        help="SQLite file with existence results from earlier runs ('' disables the cache)",
+    )
+    parser.add_argument(
+        "--rate",
+        type=float,
+        default=DEFAULT_REQUESTS_PER_SECOND,
+        help="maximum Google Books requests per second (0 = unlimited)",
+    )
+    parser.add_argument(
+        "--preview",
+        action="store_true",
+        help="estimate the syntax statistics from a block sample in seconds (no lookups)",
+    )
+    parser.add_argument(
+        "--sample-fraction",
+        type=float,
+        default=DEFAULT_SAMPLE_FRACTION,
+        help="share of the file read in preview mode",
+    )
+    parser.add_argument("--seed", type=int, default=0, help="random seed of the preview sample")
     args = parser.parse_args()
 
-    total, invalid_syntax, invalid_real = analyze_isbn(args.file, max_workers=args.workers)
+    if args.preview:
+        stats = preview_isbn(args.file, args.sample_fraction, args.seed)
+        message = "\n".join([
+            f"Vorschau ({args.sample_fraction:.0%} Stichprobe, 95%-Intervalle):",
+            f"Datensätze mit ISBN: ca. {stats['total']} ({stats['share'].percent()})",
+            f"Syntaktisch inkorrekt: ca. {stats['invalid_syntax']} ({stats['invalid_share'].percent()})",
+            f"Verschiedene gültige ISBNs (Abfragen): ca. {stats['distinct']}",
+        ])
+        root = tk.Tk()
+        root.withdraw()
+        messagebox.showinfo("ISBN-Check (Vorschau)", message)
+        return
+
+    result = analyze_isbn_status(
+        args.file,
+        max_workers=args.workers,
+        metrics_port=args.metrics_port,
+        cache_path=args.cache or None,
+        requests_per_second=args.rate,
+    )
+    total = result["total"]
+    invalid_syntax = result["invalid_syntax"]
+    invalid_real = result["invalid_real"]
+    unknown = result["unknown"]
 
-    if invalid_syntax == 0 and invalid_real == 0:
+    if invalid_syntax == 0 and invalid_real == 0 and unknown == 0:
         message = f"Alle {total} Datensätze mit ISBN sind korrekt."
     else:
         parts = []
@@ -222,6 +461,8 @@ def main() -> None:
         if invalid_real:
             percent = (invalid_real / total * 100) if total else 0
             parts.append(f"Nicht belegte ISBNs: {invalid_real} von {total} ({percent:.2f}%)")
+        if unknown:
+            parts.append(f"Existenz nicht prüfbar (erneut ausführen): {unknown} von {total}")
         message = "\n".join(parts)
 
     root = tk.Tk()
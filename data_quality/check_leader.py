@@ -1,18 +1,21 @@
-import xml.etree.ElementTree as ET
 import sys
 from pathlib import Path
+from typing import Optional
 sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
-from utilities.marc_utils import percentage_of_records
+from utilities.fixed_fields import FixedFields, extract_fixed_fields
 
+LEADER_PREFIX = '01234cam'
 
-def calculate_leader_01234cam_percentage(xml_file_path: str) -> float:
-    """Return percentage of records with leader starting ``01234cam``."""
 
-    def predicate(elem: ET.Element) -> bool:
-        leader = elem.find('leader')
-        return bool(leader is not None and leader.text and leader.text.startswith('01234cam'))
+def calculate_leader_01234cam_percentage(xml_file_path: str, fields: Optional[FixedFields] = None) -> float:
+    """Return percentage of records with leader starting ``01234cam``.
 
-    return percentage_of_records(xml_file_path, predicate)
+    ``fields`` reuses leader/008 columns already extracted from the same file.
+    """
+    fields = fields if fields is not None else extract_fixed_fields(xml_file_path)
+    if not len(fields):
+        return 0.0
+    return float(fields.leader_prefix(LEADER_PREFIX).mean() * 100)
 
 
 if __name__ == '__main__':
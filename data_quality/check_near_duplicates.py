@@ -0,0 +1,403 @@
+import argparse
+import csv
+import html
+import mmap
+import re
+import sys
+import tempfile
+import tkinter as tk
+import unicodedata
+from tkinter import messagebox
+from array import array
+from bisect import bisect_right
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from utilities.external_sort import DEFAULT_MAX_MEMORY_BYTES, ExternalSorter
+from utilities.record_offsets import iter_record_chunks
+from utilities.sketches import MinHash, hash64_batch
+
+DEFAULT_FILE_NAME = "voebvoll-20241027.xml"
+DEFAULT_BANDS = 8
+DEFAULT_ROWS = 4  # 8 bands of 4: pairs from a token Jaccard similarity of about 0.6 meet
+DEFAULT_MAX_EDIT_RATIO = 0.1
+DEFAULT_MAX_BUCKET = 200  # larger candidate groups (titles like "Gedichte" without author) are skipped
+BLOCK_PREFIX_CHARS = 12
+MAX_TITLE_CHARS = 200
+
+KEY_DTYPE = np.dtype([("key", "<u8"), ("position", "<u4")])
+FIELD = re.compile(
+    rb"""tag\s*=\s*["'](001|008|100|245)["']([^>]*?)(?:/>|>(.*?)</(?:[\w.-]+:)?(?:control|data)field\s*>)""",
+    re.DOTALL,
+)
+SUBFIELD = re.compile(rb"""code\s*=\s*["']([0-9a-z])["']\s*>([^<]*)<""")
+IND2 = re.compile(rb"""ind2\s*=\s*["'](\d)["']""")
+NONSORT = re.compile("\x98.*?\x9c|<<.*?>>|¬[^¬]*¬")  # MARC-8, RAK and MAB non-sorting markers
+COMBINING = re.compile("[\u0300-\u036f]")
+NON_WORD = re.compile(r"[\W_]+")
+DIGITS = re.compile(r"\d+")
+TITLE_SUBFIELDS = "abnp"
+SEPARATOR = "\x1f"
+
+
+def normalize_text(text: str) -> str:
+    """Casefolded words without diacritics and punctuation, separated by single spaces."""
+    text = COMBINING.sub("", unicodedata.normalize("NFKD", NONSORT.sub("", text).casefold()))
+    return NON_WORD.sub(" ", text).strip()
+
+
+@dataclass
+class TitleRecord:
+    """What two records are compared by: 245 $a$b$n$p, 100 $a surname and the 008 year."""
+
+    record_id: str = ""
+    surname: str = ""
+    year: str = ""
+    title: str = ""  # normalized, at most MAX_TITLE_CHARS
+    display_title: str = ""
+
+    def encode(self) -> bytes:
+        fields = (self.record_id, self.surname, self.year, self.title, self.display_title)
+        return SEPARATOR.join(value.replace(SEPARATOR, " ") for value in fields).encode("utf-8")
+
+    @classmethod
+    def decode(cls, data: bytes) -> "TitleRecord":
+        return cls(*data.decode("utf-8").split(SEPARATOR))
+
+    def tokens(self) -> List[bytes]:
+        """MinHash tokens: the title words plus the surname, which keeps buckets of common titles small."""
+        tokens = {word.encode("utf-8") for word in self.title.split()}
+        if self.surname:
+            tokens.add(b"\x00" + self.surname.encode("utf-8"))
+        return sorted(tokens)
+
+    def block_key(self) -> bytes:
+        return f"{self.title[:BLOCK_PREFIX_CHARS]}{SEPARATOR}{self.surname}".encode("utf-8")
+
+
+def _text(raw: bytes) -> str:
+    text = raw.decode("utf-8", "replace")
+    return html.unescape(text) if "&" in text else text
+
+
+def _subfields(content: bytes) -> List[Tuple[str, str]]:
+    return [(code.decode("ascii"), _text(value)) for code, value in SUBFIELD.findall(content)]
+
+
+def extract_title_records(chunk: bytes, starts: Sequence[int]) -> List[TitleRecord]:
+    """One :class:`TitleRecord` per record of a run from ``iter_record_chunks``.
+
+    A single regex pass over the raw bytes finds 001, 008, 100 and 245; only
+    the first occurrence of each counts. Non-filing characters (245 second
+    indicator) are dropped from $a.
+    """
+    base = starts[0]
+    relative = [start - base for start in starts]
+    records = [TitleRecord() for _ in starts]
+    last = {b"001": -1, b"008": -1, b"100": -1, b"245": -1}  # record that last got each tag
+    for match in FIELD.finditer(chunk):
+        i = bisect_right(relative, match.start()) - 1
+        tag = match.group(1)
+        if i < 0 or last[tag] == i:
+            continue
+        last[tag] = i
+        content = match.group(3) or b""
+        record = records[i]
+        if tag == b"001":
+            record.record_id = _text(content).strip()
+        elif tag == b"008":
+            year = _text(content)[7:11]
+            record.year = year if year.isdigit() else ""
+        elif tag == b"100":
+            name = next((value for code, value in _subfields(content) if code == "a"), "")
+            record.surname = normalize_text(name.split(",", 1)[0])
+        else:
+            ind2 = IND2.search(match.group(2))
+            skip = int(ind2.group(1)) if ind2 else 0
+            parts = []
+            for code, value in _subfields(content):
+                if code not in TITLE_SUBFIELDS:
+                    continue
+                if code == "a" and not parts:
+                    value = value[skip:]
+                parts.append(value.strip())
+            display = " ".join(part for part in parts if part)
+            record.display_title = display
+            record.title = normalize_text(display)[:MAX_TITLE_CHARS]
+    return records
+
+
+def bounded_edit_distance(a: str, b: str, max_distance: int) -> int:
+    """Levenshtein distance of ``a`` and ``b``, or ``max_distance + 1`` if it is larger.
+
+    Bit-parallel (Myers/Hyyrö): one column of the DP matrix is a pair of bit
+    vectors, so each character of ``b`` costs a few integer operations, and
+    the loop stops as soon as the bound can no longer be met.
+    """
+    if a == b:
+        return 0
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    if not a or not b:
+        return min(len(a) + len(b), max_distance + 1)
+    m = len(a)
+    mask = (1 << m) - 1
+    high = 1 << (m - 1)
+    peq: Dict[str, int] = {}
+    for i, char in enumerate(a):
+        peq[char] = peq.get(char, 0) | (1 << i)
+    pv, mv, score = mask, 0, m
+    remaining = len(b)
+    for char in b:
+        eq = peq.get(char, 0)
+        xv = eq | mv
+        xh = (((eq & pv) + pv) ^ pv) | eq
+        ph = (mv | ~(xh | pv)) & mask
+        mh = pv & xh
+        if ph & high:
+            score += 1
+        elif mh & high:
+            score -= 1
+        remaining -= 1
+        if score - remaining > max_distance:  # each further character lowers the score by at most 1
+            return max_distance + 1
+        ph = ((ph << 1) | 1) & mask
+        mh = (mh << 1) & mask
+        pv = (mh | ~(xv | ph)) & mask
+        mv = ph & xv
+    return min(score, max_distance + 1)
+
+
+def is_near_duplicate(a: TitleRecord, b: TitleRecord, max_edit_ratio: float = DEFAULT_MAX_EDIT_RATIO) -> bool:
+    """Whether two records describe the same title.
+
+    Required: the same surname, no conflicting year, the same numbers in the
+    title and a title edit distance of at most ``max_edit_ratio`` of the
+    longer title (at least 1).
+    """
+    if a.surname != b.surname or (a.year and b.year and a.year != b.year):
+        return False
+    if DIGITS.findall(a.title) != DIGITS.findall(b.title):  # volumes, parts and editions differ
+        return False
+    limit = max(1, int(max(len(a.title), len(b.title)) * max_edit_ratio))
+    return bounded_edit_distance(a.title, b.title, limit) <= limit
+
+
+class _Clusters:
+    """Union-find over the record positions that matched at least once."""
+
+    def __init__(self) -> None:
+        self.parent: Dict[int, int] = {}
+
+    def find(self, x: int) -> int:
+        parent = self.parent
+        while parent.get(x, x) != x:
+            parent[x] = parent.get(parent[x], parent[x])
+            x = parent[x]
+        return x
+
+    def union(self, a: int, b: int) -> None:
+        a, b = self.find(a), self.find(b)
+        if a != b:
+            self.parent[max(a, b)] = min(a, b)
+
+    def groups(self) -> List[List[int]]:
+        members: Dict[int, List[int]] = {}
+        for x in list(self.parent):
+            root = self.find(x)
+            members.setdefault(root, [root]).append(x)
+        return sorted(sorted(group) for group in members.values())
+
+
+def _candidate_groups(sorter: ExternalSorter) -> Iterator[List[int]]:
+    """Positions sharing a key, per key with at least two records."""
+    current, group = None, []
+    for key, position in sorter:
+        if key != current:
+            if len(group) > 1:
+                yield group
+            current, group = key, []
+        group.append(position)
+    if len(group) > 1:
+        yield group
+
+
+def _partitions(group: List[int], load) -> Iterator[List[Tuple[int, TitleRecord]]]:
+    """Split a candidate group by surname and title numbers, which must be equal to match.
+
+    Each part is sorted by title length, so a pair loop can stop at the
+    first title that is too long for the edit distance limit.
+    """
+    parts: Dict[Tuple[str, Tuple[str, ...]], List[Tuple[int, TitleRecord]]] = {}
+    for position in group:
+        record = load(position)
+        parts.setdefault((record.surname, tuple(DIGITS.findall(record.title))), []).append((position, record))
+    for members in parts.values():
+        if len(members) > 1:
+            members.sort(key=lambda member: len(member[1].title))
+            yield members
+
+
+def find_near_duplicates(
+    file_path: str,
+    bands: int = DEFAULT_BANDS,
+    rows: int = DEFAULT_ROWS,
+    max_edit_ratio: float = DEFAULT_MAX_EDIT_RATIO,
+    max_bucket: int = DEFAULT_MAX_BUCKET,
+    max_memory_mb: Optional[float] = None,
+    tmp_dir: Optional[str] = None,
+) -> Tuple[int, List[Dict], Dict[str, int]]:
+    """Cluster records with nearly the same title and the same author.
+
+    Comparing all pairs is quadratic, so pairs are only checked if they
+    share a key in one sort: a blocking key (first ``BLOCK_PREFIX_CHARS`` of
+    the normalized title plus the 100 surname) catches variants at the end
+    of a title, ``bands`` MinHash LSH band keys of the title tokens catch
+    variants anywhere else. The ``(key, position)`` rows go through an
+    :class:`ExternalSorter` with at most ``max_memory_mb``; the compared
+    fields of every record wait in a temporary file in ``tmp_dir``, so
+    memory stays bounded apart from 16 bytes of offsets per record. Keys
+    shared by more than ``max_bucket`` records with the same surname and
+    title numbers are skipped. Candidate pairs are verified with
+    :func:`is_near_duplicate`, and matches are joined transitively into
+    clusters.
+
+    Returns:
+        ``(total, clusters, stats)``: number of records, a list of
+        ``{"ids", "positions", "offsets", "surname", "years", "titles"}``
+        dicts (1-based positions, ordered by first position) and
+        ``{"compared", "skipped_buckets"}``
+    """
+    minhash = MinHash(bands, rows)
+    budget = DEFAULT_MAX_MEMORY_BYTES if max_memory_mb is None else int(max_memory_mb * 1024 * 1024)
+    offsets = array("Q", [0])
+    starts = array("Q")
+    compared = skipped = 0
+    clusters = _Clusters()
+    with tempfile.TemporaryFile(dir=tmp_dir) as store, ExternalSorter(KEY_DTYPE, budget, tmp_dir) as sorter:
+        for chunk, chunk_starts, _ in iter_record_chunks(file_path):
+            first = len(starts)
+            starts.extend(chunk_starts)
+            records = extract_title_records(chunk, chunk_starts)
+            for record in records:
+                data = record.encode()
+                store.write(data)
+                offsets.append(offsets[-1] + len(data))
+            titled = [(first + i, record) for i, record in enumerate(records) if record.title]
+            if not titled:
+                continue
+            positions = np.array([position for position, _ in titled], dtype=np.uint32)
+            keys = np.column_stack((
+                hash64_batch([record.block_key() for _, record in titled]),
+                minhash.band_keys(minhash.signatures([record.tokens() for _, record in titled])),
+            ))
+            key_rows = np.zeros(keys.size, dtype=KEY_DTYPE)
+            key_rows["key"] = keys.ravel()
+            key_rows["position"] = np.repeat(positions, keys.shape[1])
+            sorter.extend(key_rows)
+        store.flush()
+
+        total = len(starts)
+        result = []
+        if not total:
+            return total, result, {"compared": compared, "skipped_buckets": skipped}
+        with mmap.mmap(store.fileno(), 0, access=mmap.ACCESS_READ) as features:
+            def load(position: int) -> TitleRecord:
+                return TitleRecord.decode(features[offsets[position]:offsets[position + 1]])
+
+            for group in _candidate_groups(sorter):
+                for members in _partitions(group, load):
+                    if len(members) > max_bucket:
+                        skipped += 1
+                        continue
+                    for i, (a, record_a) in enumerate(members):
+                        for b, record_b in members[i + 1:]:
+                            longer = len(record_b.title)
+                            if longer - len(record_a.title) > max(1, int(longer * max_edit_ratio)):
+                                break  # all further titles are longer still
+                            if record_a.year and record_b.year and record_a.year != record_b.year:
+                                continue
+                            if clusters.find(a) == clusters.find(b):
+                                continue
+                            compared += 1
+                            if is_near_duplicate(record_a, record_b, max_edit_ratio):
+                                clusters.union(a, b)
+
+            for group in clusters.groups():
+                members = [load(position) for position in group]
+                result.append({
+                    "ids": [member.record_id for member in members],
+                    "positions": [position + 1 for position in group],
+                    "offsets": [starts[position] for position in group],
+                    "surname": members[0].surname,
+                    "years": [member.year for member in members],
+                    "titles": [member.display_title for member in members],
+                })
+    return total, result, {"compared": compared, "skipped_buckets": skipped}
+
+
+def write_cluster_report(clusters: List[Dict], output_path: str) -> None:
+    """Write one ``;``-separated CSV row per record of every cluster."""
+    with open(output_path, "w", newline="", encoding="utf-8-sig") as f:
+        writer = csv.writer(f, delimiter=";")
+        writer.writerow(["Cluster", "Anzahl", "001", "Position", "Byte-Offset", "Verfasser", "Jahr", "Titel"])
+        for number, cluster in enumerate(clusters, 1):
+            for record_id, position, offset, year, title in zip(
+                cluster["ids"], cluster["positions"], cluster["offsets"], cluster["years"], cluster["titles"]
+            ):
+                size = len(cluster["positions"])
+                writer.writerow([number, size, record_id, position, offset, cluster["surname"], year, title])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Ähnliche Datensätze (Titel/Verfasser, MinHash-LSH)")
+    parser.add_argument("file", nargs="?", default=DEFAULT_FILE_NAME, help="XML file to analyze")
+    parser.add_argument("--report", default=None, help="write every cluster with 001, positions and titles to this CSV")
+    parser.add_argument(
+        "--max-edit-ratio",
+        type=float,
+        default=DEFAULT_MAX_EDIT_RATIO,
+        help="maximum title edit distance relative to the longer title (default: 0.1)",
+    )
+    parser.add_argument("--bands", type=int, default=DEFAULT_BANDS, help="LSH bands (more: higher recall)")
+    parser.add_argument("--rows", type=int, default=DEFAULT_ROWS, help="MinHash values per band (more: fewer candidates)")
+    parser.add_argument(
+        "--max-bucket", type=int, default=DEFAULT_MAX_BUCKET, help="skip keys shared by more records than this"
+    )
+    parser.add_argument(
+        "--max-memory-mb", type=float, default=None, help="memory for sorting the candidate keys (default: 256)"
+    )
+    parser.add_argument("--tmp-dir", default=None, help="directory for sorted runs and the temporary field store")
+    args = parser.parse_args()
+
+    total, clusters, stats = find_near_duplicates(
+        args.file, args.bands, args.rows, args.max_edit_ratio, args.max_bucket, args.max_memory_mb, args.tmp_dir
+    )
+    if args.report:
+        write_cluster_report(clusters, args.report)
+        print(f"{len(clusters)} Gruppen ähnlicher Datensätze geschrieben nach: {args.report}")
+
+    if not clusters:
+        message = f"Keine ähnlichen Datensätze unter {total} gefunden."
+    else:
+        members = sum(len(cluster["positions"]) for cluster in clusters)
+        percent = members / total * 100 if total else 0
+        message = (
+            f"{len(clusters)} Gruppen ähnlicher Datensätze (Titel und Verfasser).\n"
+            f"Betroffene Datensätze: {members} von {total} ({percent:.2f}%)"
+        )
+    message += f"\nGeprüfte Kandidatenpaare: {stats['compared']}"
+    if stats["skipped_buckets"]:
+        message += f"\nÜbersprungene Schlüssel mit mehr als {args.max_bucket} Datensätzen: {stats['skipped_buckets']}"
+
+    root = tk.Tk()
+    root.withdraw()
+    messagebox.showinfo("Ähnliche Datensätze", message)
+
+
+if __name__ == "__main__":
+    main()
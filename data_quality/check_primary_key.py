@@ -1,33 +1,225 @@
+import argparse
+import csv
+import html
+import re
 import sys
 import xml.etree.ElementTree as ET
 import tkinter as tk
 from tkinter import messagebox
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from utilities.external_sort import ExternalSorter
+from utilities.record_offsets import iter_record_bytes, parse_record, read_record_bytes
 
 DEFAULT_FILE_NAME = "voebvoll-20241027.xml"
+KEY_DTYPE = np.dtype([("hash", "<u8"), ("position", "<u4"), ("start", "<u8"), ("end", "<u8")])
+# First 001 of a record; an empty (also self-closing) field is the empty key
+CONTROL_NUMBER = re.compile(rb"""<(?:[\w.-]+:)?controlfield\s+tag=["']001["']\s*(?:/>|>([^<]*)</)""")
+HASH_WIDTH = 32  # bytes of the 001 value that enter the vectorized hash
+HASH_CHUNK_RECORDS = 100000
+FNV_OFFSET = np.uint64(0xCBF29CE484222325)
+FNV_PRIME = np.uint64(0x100000001B3)
+
+
+def analyze_primary_key_unique(
+    file_path: str,
+    max_memory_mb: Optional[float] = None,
+    tmp_dir: Optional[str] = None,
+):
+    """Return ``(total, duplicates)`` for the 001 control numbers.
+
+    ``total`` is the number of records with a 001; the first 001 of a
+    record is its key, an empty 001 the empty key (as in
+    :func:`find_duplicate_keys`). By default all keys are held in a set. With ``max_memory_mb`` the check
+    runs :func:`find_duplicate_keys` with an external sort of that budget,
+    so the counts are verified against the exact 001 values.
+    """
+    if max_memory_mb:
+        total, groups = find_duplicate_keys(file_path, max_memory_mb, tmp_dir)
+        return total, sum(len(g["positions"]) - 1 for g in groups)
 
-def analyze_primary_key_unique(file_path: str):
-    ns = {'marc': 'http://www.loc.gov/MARC21/slim'}
     seen = set()
     duplicates = 0
     total = 0
     for event, elem in ET.iterparse(file_path, events=("end",)):
-        if (
-            elem.tag.replace(f"{{{ns['marc']}}}", "") == "controlfield"
-            and elem.get("tag") == "001"
-        ):
-            total += 1
-            value = (elem.text or "").strip()
-            if value in seen:
-                duplicates += 1
-            else:
-                seen.add(value)
+        if elem.tag.rsplit("}", 1)[-1] != "record":
+            continue
+        value = _control_number(elem)
         elem.clear()
+        if value is None:
+            continue
+        total += 1
+        if value in seen:
+            duplicates += 1
+        else:
+            seen.add(value)
+    return total, duplicates
+
+
+def hash_control_numbers(values: List[bytes]) -> np.ndarray:
+    """Vectorized 64-bit FNV-1a over the first ``HASH_WIDTH`` bytes of each value.
+
+    Values longer than ``HASH_WIDTH`` may collide; callers verify candidates.
+    """
+    matrix = np.array(values, dtype=f"S{HASH_WIDTH}").view(np.uint8).reshape(len(values), HASH_WIDTH)
+    hashes = np.full(len(values), FNV_OFFSET, dtype=np.uint64)
+    for column in range(HASH_WIDTH):
+        hashes ^= matrix[:, column]
+        hashes *= FNV_PRIME
+    return hashes
+
+
+def _control_number(record) -> Optional[str]:
+    for elem in record.iter():
+        if elem.tag.rsplit("}", 1)[-1] == "controlfield" and elem.get("tag") == "001":
+            return (elem.text or "").strip()
+    return None
+
+
+def _iter_key_chunks(file_path: str) -> Iterator[np.ndarray]:
+    """Yield ``KEY_DTYPE`` rows (hash, position, byte span) per ``HASH_CHUNK_RECORDS`` records with 001."""
+    chunk: List[bytes] = []
+    spans: List[Tuple[int, int, int]] = []
+
+    def rows() -> np.ndarray:
+        result = np.zeros(len(chunk), dtype=KEY_DTYPE)
+        result["hash"] = hash_control_numbers(chunk)
+        result["position"], result["start"], result["end"] = zip(*spans)
+        return result
+
+    for position, (start, end, data) in enumerate(iter_record_bytes(file_path), 1):
+        match = CONTROL_NUMBER.search(data)
+        if match is None:
+            continue
+        value = (match.group(1) or b"").strip()
+        if b"&" in value:  # compare entity-escaped values by their text
+            value = html.unescape(value.decode("utf-8")).encode("utf-8")
+        chunk.append(value)
+        spans.append((position, start, end))
+        if len(chunk) >= HASH_CHUNK_RECORDS:
+            yield rows()
+            chunk, spans = [], []
+    if chunk:
+        yield rows()
+
+
+def _iter_candidate_groups(rows: Iterable[tuple]) -> Iterator[List[tuple]]:
+    """Group hash-sorted ``KEY_DTYPE`` tuples by hash; yield groups of two or more."""
+    group: List[tuple] = []
+    for row in rows:
+        if group and row[0] != group[0][0]:
+            if len(group) > 1:
+                yield group
+            group = []
+        group.append(row)
+    if len(group) > 1:
+        yield group
+
+
+def find_duplicate_keys(
+    file_path: str,
+    max_memory_mb: Optional[float] = None,
+    tmp_dir: Optional[str] = None,
+) -> Tuple[int, List[Dict]]:
+    """Report every duplicated 001 with all record positions and byte offsets.
+
+    One byte-level scan extracts the 001 of every record together with the
+    record's byte offsets; the values are hashed to 64-bit ints in NumPy
+    chunks. Sorting the hashes yields candidate groups. Only the records of
+    those groups are read again (by offset) and their 001 compared exactly,
+    so hash collisions never show up as duplicates.
+
+    With ``max_memory_mb`` the ``(hash, position, offsets)`` rows go through
+    an external sort with that budget (runs spilled to ``tmp_dir``) instead
+    of being held in memory; the candidates are verified the same way, so
+    both modes return the same groups.
+
+    Returns:
+        ``(total, duplicates)``: number of records with 001 and a list of
+        ``{"key", "positions", "offsets"}`` dicts (1-based record positions,
+        byte offsets of the ``<record>`` start tags), ordered by first position
+    """
+    groups: Dict[str, Dict] = {}
+
+    def confirm(f, candidates: Iterable[tuple]) -> None:
+        for _, position, start, end in candidates:
+            key = _control_number(parse_record(read_record_bytes(f, start, end)))
+            group = groups.setdefault(key, {"key": key, "positions": [], "offsets": []})
+            group["positions"].append(position)
+            group["offsets"].append(start)
+
+    if max_memory_mb:
+        with ExternalSorter(KEY_DTYPE, int(max_memory_mb * 1024 * 1024), tmp_dir) as sorter:
+            for rows in _iter_key_chunks(file_path):
+                sorter.extend(rows)
+            total = len(sorter)
+            with open(file_path, "rb") as f:
+                # sorted by (hash, position): equal keys arrive together in file order
+                for candidates in _iter_candidate_groups(sorter):
+                    confirm(f, candidates)
+    else:
+        chunks = list(_iter_key_chunks(file_path))
+        rows = np.concatenate(chunks) if chunks else np.zeros(0, dtype=KEY_DTYPE)
+        total = len(rows)
+        if total < 2:
+            return total, []
+        order = np.argsort(rows["hash"], kind="stable")
+        sorted_hashes = rows["hash"][order]
+        same_as_next = sorted_hashes[1:] == sorted_hashes[:-1]
+        candidate_mask = np.zeros(total, dtype=bool)
+        candidate_mask[:-1] |= same_as_next
+        candidate_mask[1:] |= same_as_next
+        with open(file_path, "rb") as f:
+            confirm(f, rows[np.sort(order[candidate_mask])].tolist())
+
+    duplicates = [g for g in groups.values() if len(g["positions"]) > 1]
+    duplicates.sort(key=lambda g: g["positions"][0])
     return total, duplicates
 
 
+def write_duplicate_report(duplicates: List[Dict], output_path: str) -> None:
+    """Write the duplicate keys as ``;``-separated CSV (one row per key)."""
+    with open(output_path, "w", newline="", encoding="utf-8-sig") as f:
+        writer = csv.writer(f, delimiter=";")
+        writer.writerow(["001", "Anzahl", "Positionen", "Byte-Offsets"])
+        for group in duplicates:
+            writer.writerow([
+                group["key"],
+                len(group["positions"]),
+                ",".join(map(str, group["positions"])),
+                ",".join(map(str, group["offsets"])),
+            ])
+
+
 def main() -> None:
-    file_path = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_FILE_NAME
-    total, duplicates = analyze_primary_key_unique(file_path)
+    parser = argparse.ArgumentParser(description="Primärschlüssel-Check")
+    parser.add_argument("file", nargs="?", default=DEFAULT_FILE_NAME, help="XML file to analyze")
+    parser.add_argument(
+        "--max-memory-mb",
+        type=float,
+        default=None,
+        help="sort keys externally (spill to disk) with at most this much memory",
+    )
+    parser.add_argument("--tmp-dir", default=None, help="directory for sorted runs")
+    parser.add_argument(
+        "--report",
+        default=None,
+        help="write every duplicate 001 with record positions and byte offsets to this CSV",
+    )
+    args = parser.parse_args()
+    if args.report:
+        total, groups = find_duplicate_keys(args.file, max_memory_mb=args.max_memory_mb, tmp_dir=args.tmp_dir)
+        write_duplicate_report(groups, args.report)
+        duplicates = sum(len(g["positions"]) - 1 for g in groups)
+        print(f"{len(groups)} doppelte Primärschlüssel geschrieben nach: {args.report}")
+    else:
+        total, duplicates = analyze_primary_key_unique(
+            args.file, max_memory_mb=args.max_memory_mb, tmp_dir=args.tmp_dir
+        )
 
     if duplicates == 0:
         message = f"Alle {total} Primärschlüssel sind eindeutig."
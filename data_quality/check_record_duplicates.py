@@ -0,0 +1,199 @@
+import argparse
+import csv
+import re
+import sys
+import tkinter as tk
+from tkinter import messagebox
+from array import array
+from hashlib import blake2b
+from pathlib import Path
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from utilities.dump_diff import record_id
+from utilities.marc_fields import flatten_record
+from utilities.record_offsets import iter_record_chunks, parse_record, read_record_bytes
+
+try:
+    import xxhash
+    XXHASH_AVAILABLE = True
+except ImportError:
+    XXHASH_AVAILABLE = False
+
+DEFAULT_FILE_NAME = "voebvoll-20241027.xml"
+DEFAULT_EXCLUDED_TAGS = ("001", "049")  # record number and holdings differ between otherwise equal copies
+FINGERPRINT_BYTES = 16
+
+RECORD_PREFIX = re.compile(rb"<[\w.-]+:record[\s>]")
+TAG_PREFIX = re.compile(rb"<(/?)[\w.-]+:")
+CONTROL_WHITESPACE = b"\t\n\r\x0b\x0c"
+SPACE_RUN = re.compile(rb"  +")
+
+
+def _fingerprint(data: bytes) -> bytes:
+    """128-bit hash: XXH3 if ``xxhash`` is installed, else blake2b (slower, same grouping)."""
+    if XXHASH_AVAILABLE:
+        return xxhash.xxh3_128_digest(data)
+    return blake2b(data, digest_size=FINGERPRINT_BYTES).digest()
+
+
+def excluded_field_patterns(tags: Sequence[str]) -> List["re.Pattern[bytes]"]:
+    """Regexes matching whole control fields and data fields with a tag in ``tags``.
+
+    One pattern per element name: each starts with a literal the regex
+    engine searches for quickly, unlike an alternation of both names.
+    """
+    alternatives = b"|".join(re.escape(tag.encode("ascii")) for tag in tags)
+    start = rb"""\s[^>]*?\btag\s*=\s*["'](?:""" + alternatives + rb""")["']"""
+    return [
+        re.compile(rb"<controlfield" + start + rb"[^>]*?(?:/>|>[^<]*</controlfield\s*>)"),
+        re.compile(rb"<datafield" + start + rb"[^>]*?(?:/>|>.*?</datafield\s*>)", re.DOTALL),
+    ]
+
+
+class RecordCanonicalizer:
+    """Turns raw records into a canonical form for comparison.
+
+    Namespace prefixes and fields with an excluded tag are removed, tabs and
+    line breaks are dropped, runs of spaces become one space and spaces next
+    to ``<``/``>`` are dropped, so layout and leading/trailing blanks in
+    values do not matter. Field order and all other content do.
+
+    ``canonical`` accepts one record or a run of records (see
+    ``iter_record_chunks``); every step is a single C-level call over the
+    whole input.
+    """
+
+    def __init__(self, excluded_tags: Sequence[str] = DEFAULT_EXCLUDED_TAGS) -> None:
+        self.excluded_tags = tuple(excluded_tags)
+        self._excluded = excluded_field_patterns(self.excluded_tags) if self.excluded_tags else []
+
+    def canonical(self, data: bytes) -> bytes:
+        if RECORD_PREFIX.match(data):  # prefixed dumps prefix every element like their records
+            data = TAG_PREFIX.sub(rb"<\1", data)
+        for pattern in self._excluded:
+            data = pattern.sub(b"", data)
+        data = SPACE_RUN.sub(b" ", data.translate(None, CONTROL_WHITESPACE))
+        return data.replace(b"> ", b">").replace(b" <", b"<").replace(b" >", b">").strip()
+
+    def fingerprint(self, data: bytes) -> bytes:
+        return _fingerprint(self.canonical(data))
+
+    def chunk_fingerprints(self, chunk: bytes, starts: Sequence[int], ends: Sequence[int]) -> bytes:
+        """Fingerprints of the records of a run (file offsets ``starts``/``ends``), concatenated.
+
+        Equal to ``fingerprint`` of every record on its own: the canonical run
+        is cut at ``</record>`` and each piece starts at its ``<record``.
+        """
+        pieces = self.canonical(chunk).split(b"</record>")
+        if len(pieces) != len(starts) + 1:  # "</record>" inside a value: fall back to single records
+            base = starts[0]
+            return b"".join(self.fingerprint(chunk[start - base:end - base]) for start, end in zip(starts, ends))
+        return b"".join(_fingerprint(piece[piece.find(b"<record"):] + b"</record>") for piece in pieces[:-1])
+
+
+def find_record_duplicates(
+    file_path: str, excluded_tags: Sequence[str] = DEFAULT_EXCLUDED_TAGS
+) -> Tuple[int, List[Dict]]:
+    """Find clusters of records that are identical apart from ``excluded_tags``.
+
+    One byte-level scan over runs of records stores a 128-bit fingerprint
+    of every canonical record (see :class:`RecordCanonicalizer`) plus its
+    byte offsets, 32 bytes per record. Sorting the fingerprints as a NumPy array puts equal
+    records next to each other. Only the records of candidate groups are
+    read again and compared by their canonical bytes, so a hash collision
+    never merges different records.
+
+    Returns:
+        ``(total, clusters)``: number of records and a list of
+        ``{"ids", "positions", "offsets", "holdings"}`` dicts (1-based record
+        positions, 049 $a per record), ordered by first position
+    """
+    canonicalizer = RecordCanonicalizer(excluded_tags)
+    fingerprints = bytearray()
+    starts = array("Q")
+    ends = array("Q")
+    for chunk, chunk_starts, chunk_ends in iter_record_chunks(file_path):
+        fingerprints += canonicalizer.chunk_fingerprints(chunk, chunk_starts, chunk_ends)
+        starts.extend(chunk_starts)
+        ends.extend(chunk_ends)
+
+    total = len(starts)
+    if total < 2:
+        return total, []
+    keys = np.frombuffer(bytes(fingerprints), dtype="<u8").reshape(total, 2)
+    order = np.lexsort((keys[:, 1], keys[:, 0]))
+    sorted_keys = keys[order]
+    first = np.concatenate(([True], (sorted_keys[1:] != sorted_keys[:-1]).any(axis=1)))
+    group_starts = np.flatnonzero(first)
+    sizes = np.diff(np.append(group_starts, total))
+
+    clusters = []
+    with open(file_path, "rb") as f:
+        for group_start, size in zip(group_starts[sizes > 1].tolist(), sizes[sizes > 1].tolist()):
+            members: Dict[bytes, List[Tuple[int, bytes]]] = {}
+            for i in sorted(order[group_start:group_start + size].tolist()):
+                data = read_record_bytes(f, starts[i], ends[i])
+                members.setdefault(canonicalizer.canonical(data), []).append((i, data))
+            for records in members.values():
+                if len(records) < 2:
+                    continue
+                clusters.append({
+                    "ids": [record_id(data).decode("utf-8") for _, data in records],
+                    "positions": [i + 1 for i, _ in records],
+                    "offsets": [starts[i] for i, _ in records],
+                    "holdings": [flatten_record(i, 0, 0, parse_record(data)).holdings for i, data in records],
+                })
+    clusters.sort(key=lambda cluster: cluster["positions"][0])
+    return total, clusters
+
+
+def write_cluster_report(clusters: List[Dict], output_path: str) -> None:
+    """Write one ``;``-separated CSV row per record of every cluster."""
+    with open(output_path, "w", newline="", encoding="utf-8-sig") as f:
+        writer = csv.writer(f, delimiter=";")
+        writer.writerow(["Cluster", "Anzahl", "001", "Position", "Byte-Offset", "Besitz (049 $a)"])
+        for number, cluster in enumerate(clusters, 1):
+            for record_id_, position, offset, holdings in zip(
+                cluster["ids"], cluster["positions"], cluster["offsets"], cluster["holdings"]
+            ):
+                writer.writerow([number, len(cluster["positions"]), record_id_, position, offset, ",".join(holdings)])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Identische Datensätze (Fingerabdruck über den ganzen Datensatz)")
+    parser.add_argument("file", nargs="?", default=DEFAULT_FILE_NAME, help="XML file to analyze")
+    parser.add_argument(
+        "--exclude",
+        nargs="*",
+        default=list(DEFAULT_EXCLUDED_TAGS),
+        help="tags ignored in the comparison (default: 001 049; no tags: compare whole records)",
+    )
+    parser.add_argument("--report", default=None, help="write every cluster with 001, positions and holdings to this CSV")
+    args = parser.parse_args()
+
+    total, clusters = find_record_duplicates(args.file, args.exclude)
+    if args.report:
+        write_cluster_report(clusters, args.report)
+        print(f"{len(clusters)} Gruppen identischer Datensätze geschrieben nach: {args.report}")
+
+    ignored = ", ".join(args.exclude) if args.exclude else "keine"
+    if not clusters:
+        message = f"Keine identischen Datensätze unter {total} gefunden (ignorierte Felder: {ignored})."
+    else:
+        redundant = sum(len(cluster["positions"]) - 1 for cluster in clusters)
+        percent = redundant / total * 100 if total else 0
+        message = (
+            f"{len(clusters)} Gruppen identischer Datensätze (ignorierte Felder: {ignored}).\n"
+            f"Überzählige Kopien: {redundant} von {total} ({percent:.2f}%)"
+        )
+
+    root = tk.Tk()
+    root.withdraw()
+    messagebox.showinfo("Identische Datensätze", message)
+
+
+if __name__ == "__main__":
+    main()
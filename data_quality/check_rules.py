@@ -0,0 +1,375 @@
+"""Declarative data-quality rules (YAML) evaluated in one streaming pass.
+
+A rule file lists rules of five types::
+
+    rules:
+      - id: leader_01234cam
+        type: position          # positional substring of leader/control field
+        field: leader
+        positions: 00-07        # MARC positions, inclusive
+        not_equals: 01234cam    # or "equals" / "in: [...]" / "pattern: ..."
+      - id: title_present
+        type: presence
+        field: 245$a
+      - id: isbn_characters
+        type: regex             # every value must match (re.search)
+        field: 020$a
+        pattern: '^[0-9Xx -]+$'
+      - id: language_008_041
+        type: consistency       # left values must occur among right values
+        left: {field: "008", positions: 35-37}
+        right: {field: 041$a}
+      - id: one_main_title
+        type: cardinality
+        field: "245"
+        min: 1
+        max: 1
+
+Field references are ``leader``, a control field (``001``-``009``), a data
+field (``245``, one value per occurrence) or a subfield (``245$a``).
+``compile_rules`` turns each rule into a closure over a ``ProjectedRecord``
+that holds only the fields referenced by any rule; ``run_rules`` parses the
+dump once and evaluates all rules per record.
+"""
+
+import argparse
+import csv
+import re
+import sys
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, FrozenSet, Iterator, List, Optional, Sequence, Tuple
+
+import yaml
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+DEFAULT_FILE_NAME = "voebvoll-20241027.xml"
+DEFAULT_RULES_FILE = str(Path(__file__).with_name("rules.yaml"))
+DEFAULT_OUTPUT_FILE = "rule_violations.csv"
+DEFAULT_SAMPLE_SIZE = 10
+
+FIELD_REF = re.compile(r"^(leader|\d{3})(?:\$([0-9a-z]))?$")
+POSITIONS = re.compile(r"^(\d{1,2})(?:-(\d{1,2}))?$")
+
+
+class RuleError(ValueError):
+    """Raised for an invalid rule definition."""
+
+
+class ProjectedRecord:
+    """The parts of one record that the compiled rules look at.
+
+    ``controls`` maps control field tags to their values, ``datafields`` maps
+    data field tags to ``(ind1, ind2, [(code, value), ...])`` per occurrence.
+    """
+
+    __slots__ = ("position", "record_id", "leader", "controls", "datafields")
+
+    def __init__(self, position: int = 0) -> None:
+        self.position = position
+        self.record_id = ""
+        self.leader: Optional[str] = None
+        self.controls: Dict[str, List[str]] = {}
+        self.datafields: Dict[str, List[Tuple[str, str, List[Tuple[str, str]]]]] = {}
+
+
+@dataclass
+class CompiledRule:
+    id: str
+    description: str
+    tags: FrozenSet[str]
+    # Returns True if the record violates the rule
+    check: Callable[[ProjectedRecord], bool]
+
+
+@dataclass
+class RuleReport:
+    total: int = 0
+    violations: Dict[str, int] = field(default_factory=dict)
+    samples: Dict[str, List[str]] = field(default_factory=dict)
+
+
+def _local_name(tag: str) -> str:
+    return tag.rpartition("}")[2]
+
+
+def project_record(elem: ET.Element, tags: FrozenSet[str], position: int = 0) -> ProjectedRecord:
+    """Copy the leader, 001 and the fields in ``tags`` out of a record element."""
+    record = ProjectedRecord(position)
+    for child in elem:
+        name = _local_name(child.tag)
+        if name == "leader":
+            record.leader = child.text or ""
+            continue
+        tag = child.get("tag")
+        if name == "controlfield":
+            if tag == "001":
+                record.record_id = (child.text or "").strip()
+            if tag in tags:
+                record.controls.setdefault(tag, []).append(child.text or "")
+        elif name == "datafield" and tag in tags:
+            subfields = [(sub.get("code", ""), sub.text or "") for sub in child]
+            record.datafields.setdefault(tag, []).append(
+                (child.get("ind1", " "), child.get("ind2", " "), subfields)
+            )
+    return record
+
+
+def _parse_ref(ref) -> Tuple[str, Optional[str]]:
+    match = FIELD_REF.match(str(ref).strip())
+    if match is None:
+        raise RuleError(f"invalid field reference {ref!r}")
+    tag, code = match.groups()
+    if code is not None and (tag == "leader" or tag < "010"):
+        raise RuleError(f"{tag} has no subfields: {ref!r}")
+    return tag, code
+
+
+def _compile_getter(ref) -> Tuple[str, Callable[[ProjectedRecord], List[str]]]:
+    """Return the tag and a function yielding the values of ``ref`` in a record."""
+    tag, code = _parse_ref(ref)
+    if tag == "leader":
+        return tag, lambda r: [] if r.leader is None else [r.leader]
+    if tag < "010":
+        return tag, lambda r: r.controls.get(tag, [])
+    if code is None:
+        return tag, lambda r: [" ".join(v for _, v in subs) for _, _, subs in r.datafields.get(tag, ())]
+    return tag, lambda r: [v for _, _, subs in r.datafields.get(tag, ()) for c, v in subs if c == code]
+
+
+def _parse_positions(spec) -> Tuple[int, int]:
+    match = POSITIONS.match(str(spec).strip())
+    if match is None:
+        raise RuleError(f"invalid positions {spec!r} (expected e.g. '06' or '35-37')")
+    start = int(match.group(1))
+    end = int(match.group(2) or start) + 1
+    if end <= start:
+        raise RuleError(f"invalid positions {spec!r}")
+    return start, end
+
+
+def _compile_operand(spec: dict) -> Tuple[FrozenSet[str], Callable[[ProjectedRecord], List[str]]]:
+    """Getter for one side of a consistency rule: field(s), optional positions and pattern."""
+    refs = spec.get("field")
+    if refs is None:
+        raise RuleError("consistency operand needs a 'field'")
+    if isinstance(refs, str):
+        refs = [refs]
+    compiled = [_compile_getter(ref) for ref in refs]
+    tags = frozenset(tag for tag, _ in compiled)
+    getters = [getter for _, getter in compiled]
+    span = _parse_positions(spec["positions"]) if "positions" in spec else None
+    pattern = re.compile(spec["pattern"]) if "pattern" in spec else None
+
+    def values(record: ProjectedRecord) -> List[str]:
+        out = []
+        for getter in getters:
+            for value in getter(record):
+                if span is not None:
+                    if len(value) < span[1]:
+                        continue
+                    value = value[span[0]:span[1]]
+                if pattern is not None:
+                    match = pattern.search(value)
+                    if match is None:
+                        continue
+                    value = match.group(1) if pattern.groups else match.group(0)
+                value = value.strip().lower()
+                if value:
+                    out.append(value)
+        return out
+
+    return tags, values
+
+
+def _compile_presence(rule: dict):
+    tag, getter = _compile_getter(rule["field"])
+    return frozenset([tag]), lambda r: not getter(r)
+
+
+def _compile_position(rule: dict):
+    tag, getter = _compile_getter(rule["field"])
+    start, end = _parse_positions(rule["positions"])
+    required = rule.get("required", True)
+    if "equals" in rule or "not_equals" in rule:
+        key = "equals" if "equals" in rule else "not_equals"
+        expected = str(rule[key])
+        if len(expected) != end - start:
+            raise RuleError(f"'{key}' must have {end - start} characters")
+        ok = expected.__eq__ if key == "equals" else expected.__ne__
+    elif "in" in rule:
+        allowed = frozenset(str(v) for v in rule["in"])
+        ok = allowed.__contains__
+    elif "pattern" in rule:
+        ok = re.compile(rule["pattern"]).fullmatch
+    else:
+        raise RuleError("position rule needs 'equals', 'not_equals', 'in' or 'pattern'")
+
+    def check(record: ProjectedRecord) -> bool:
+        values = getter(record)
+        if not values:
+            return required
+        return any(len(value) < end or not ok(value[start:end]) for value in values)
+
+    return frozenset([tag]), check
+
+
+def _compile_regex(rule: dict):
+    tag, getter = _compile_getter(rule["field"])
+    search = re.compile(rule["pattern"]).search
+    required = rule.get("required", False)
+
+    def check(record: ProjectedRecord) -> bool:
+        values = getter(record)
+        if not values:
+            return required
+        return any(search(value) is None for value in values)
+
+    return frozenset([tag]), check
+
+
+def _compile_consistency(rule: dict):
+    if "left" not in rule or "right" not in rule:
+        raise RuleError("consistency rule needs 'left' and 'right'")
+    left_tags, left = _compile_operand(rule["left"])
+    right_tags, right = _compile_operand(rule["right"])
+    relation = rule.get("relation", "in")
+    if relation not in ("in", "equal"):
+        raise RuleError(f"unknown relation {relation!r}")
+
+    def check(record: ProjectedRecord) -> bool:
+        left_values = left(record)
+        if not left_values:
+            return False
+        right_values = right(record)
+        if not right_values:
+            return False
+        if relation == "equal":
+            return set(left_values) != set(right_values)
+        return not set(left_values).issubset(right_values)
+
+    return left_tags | right_tags, check
+
+
+def _compile_cardinality(rule: dict):
+    tag, getter = _compile_getter(rule["field"])
+    minimum = int(rule.get("min", 0))
+    maximum = rule.get("max")
+    maximum = None if maximum is None else int(maximum)
+
+    def check(record: ProjectedRecord) -> bool:
+        count = len(getter(record))
+        return count < minimum or (maximum is not None and count > maximum)
+
+    return frozenset([tag]), check
+
+
+RULE_TYPES = {
+    "presence": _compile_presence,
+    "position": _compile_position,
+    "regex": _compile_regex,
+    "consistency": _compile_consistency,
+    "cardinality": _compile_cardinality,
+}
+
+
+def compile_rules(specs: Sequence[dict]) -> List[CompiledRule]:
+    """Validate rule definitions and compile them into predicates."""
+    compiled = []
+    seen = set()
+    for index, spec in enumerate(specs):
+        rule_id = str(spec.get("id") or f"rule_{index + 1}")
+        if rule_id in seen:
+            raise RuleError(f"duplicate rule id {rule_id!r}")
+        seen.add(rule_id)
+        rule_type = spec.get("type")
+        if rule_type not in RULE_TYPES:
+            raise RuleError(f"{rule_id}: unknown rule type {rule_type!r}")
+        try:
+            tags, check = RULE_TYPES[rule_type](spec)
+        except KeyError as e:
+            raise RuleError(f"{rule_id}: missing key {e.args[0]!r}") from None
+        except (RuleError, re.error) as e:
+            raise RuleError(f"{rule_id}: {e}") from None
+        compiled.append(CompiledRule(rule_id, str(spec.get("description", "")), tags, check))
+    return compiled
+
+
+def load_rules(path: str) -> List[CompiledRule]:
+    """Read a YAML rule file (``rules:`` list or a plain list) and compile it."""
+    with open(path, encoding="utf-8") as f:
+        data = yaml.safe_load(f) or []
+    specs = data.get("rules", []) if isinstance(data, dict) else data
+    return compile_rules(specs)
+
+
+def iter_rule_violations(
+    file_path: str, rules: Sequence[CompiledRule]
+) -> Iterator[Tuple[ProjectedRecord, List[int]]]:
+    """Parse ``file_path`` once; yield each record with the indexes of the rules it violates."""
+    tags = frozenset().union(*(rule.tags for rule in rules)) if rules else frozenset()
+    checks = [rule.check for rule in rules]
+    position = 0
+    for _, elem in ET.iterparse(file_path, events=("end",)):
+        if _local_name(elem.tag) != "record":
+            continue
+        record = project_record(elem, tags, position)
+        elem.clear()
+        position += 1
+        yield record, [i for i, check in enumerate(checks) if check(record)]
+
+
+def run_rules(
+    file_path: str, rules: Sequence[CompiledRule], sample_size: int = DEFAULT_SAMPLE_SIZE
+) -> RuleReport:
+    """Count violations per rule and keep up to ``sample_size`` record ids each."""
+    report = RuleReport(
+        violations={rule.id: 0 for rule in rules},
+        samples={rule.id: [] for rule in rules},
+    )
+    ids = [rule.id for rule in rules]
+    for record, violated in iter_rule_violations(file_path, rules):
+        report.total += 1
+        for index in violated:
+            rule_id = ids[index]
+            report.violations[rule_id] += 1
+            samples = report.samples[rule_id]
+            if len(samples) < sample_size:
+                samples.append(record.record_id or f"#{record.position}")
+    return report
+
+
+def write_report(report: RuleReport, rules: Sequence[CompiledRule], csv_file: str) -> None:
+    with open(csv_file, mode="w", newline="", encoding="utf-8-sig") as file:
+        writer = csv.writer(file, delimiter=";", quoting=csv.QUOTE_MINIMAL)
+        writer.writerow(["Regel", "Beschreibung", "Verstöße", "Anteil (%)", "Beispiel-IDs"])
+        for rule in rules:
+            count = report.violations[rule.id]
+            share = count / report.total * 100 if report.total else 0.0
+            writer.writerow([rule.id, rule.description, count, f"{share:.2f}", ", ".join(report.samples[rule.id])])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Regelbasierte Datenqualitätsprüfung (YAML)")
+    parser.add_argument("file", nargs="?", default=DEFAULT_FILE_NAME, help="XML file to analyze")
+    parser.add_argument("--rules", default=DEFAULT_RULES_FILE, help="YAML rule file")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT_FILE, help="CSV result file")
+    parser.add_argument("--samples", type=int, default=DEFAULT_SAMPLE_SIZE, help="sample record ids per rule")
+    args = parser.parse_args()
+
+    rules = load_rules(args.rules)
+    report = run_rules(args.file, rules, sample_size=args.samples)
+    write_report(report, rules, args.output)
+
+    print(f"Datensätze: {report.total}")
+    for rule in rules:
+        count = report.violations[rule.id]
+        share = count / report.total * 100 if report.total else 0.0
+        print(f"{rule.id}: {count} Verstöße ({share:.2f}%)")
+    print(f"Ergebnisse geschrieben nach: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+"""Rate-limited, cached ISBN existence lookups against Google Books.
+
+Results are stored in a small SQLite file so that a rerun on the same (or a
+newer) dump only queries ISBNs that have never been checked or whose last
+check ended in the ``unknown`` state. ``unknown`` is distinct from
+``missing``: HTTP 429, server errors and timeouts say nothing about whether an
+ISBN exists, so they are retried with backoff and, if they keep failing, kept
+out of the "not assigned" count. Other HTTP errors (e.g. an exhausted daily
+quota, HTTP 403) and unreadable responses are not retried but recorded as
+``unknown`` as well, so a single ISBN never aborts a run.
+"""
+
+import json
+import random
+import sqlite3
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, Iterable, Optional
+
+from utilities.api_endpoints import google_books_volumes_url
+
+EXISTS = "exists"
+MISSING = "missing"
+UNKNOWN = "unknown"
+
+DEFAULT_REQUESTS_PER_SECOND = 10.0
+DEFAULT_MAX_RETRIES = 4
+DEFAULT_BACKOFF_BASE_SECONDS = 1.0
+RETRYABLE_HTTP_CODES = (429, 500, 502, 503, 504)
+
+
+class RetryableLookupError(Exception):
+    """A lookup failed in a way that says nothing about the ISBN itself."""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def google_books_lookup(isbn: str, timeout: float = 5.0) -> str:
+    """Return ``EXISTS`` or ``MISSING`` for ``isbn``; ``UNKNOWN`` if the answer cannot be used.
+
+    Raises:
+        RetryableLookupError: on rate limiting, server errors and network failures
+    """
+    url = f"{google_books_volumes_url()}?q=isbn:{isbn}"
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as f:
+            data = json.loads(f.read().decode())
+    except urllib.error.HTTPError as e:
+        if e.code in RETRYABLE_HTTP_CODES:
+            retry_after = e.headers.get("Retry-After") if e.headers else None
+            try:
+                retry_after = float(retry_after) if retry_after else None
+            except ValueError:
+                retry_after = None
+            raise RetryableLookupError(f"HTTP {e.code}", retry_after) from e
+        return UNKNOWN
+    except (urllib.error.URLError, TimeoutError, OSError) as e:
+        raise RetryableLookupError(str(e)) from e
+    except ValueError:  # no JSON (or not UTF-8)
+        return UNKNOWN
+    if not isinstance(data, dict):
+        return UNKNOWN
+    return EXISTS if data.get("totalItems", 0) > 0 else MISSING
+
+
+def bool_lookup(isbn_exist_func: Callable[[str], bool]) -> Callable[[str], str]:
+    """Adapt a ``f(isbn) -> bool`` function to the three-state lookup interface."""
+
+    def lookup(isbn: str) -> str:
+        return EXISTS if isbn_exist_func(isbn) else MISSING
+
+    return lookup
+
+
+class TokenBucket:
+    """Thread-safe token bucket: ``rate`` tokens per second, at most ``capacity`` stored."""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Take one token, sleeping until one is available; return the wait in seconds."""
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1.0
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+class ExistenceCache:
+    """Persistent ``isbn -> status`` store backed by SQLite.
+
+    ``path=None`` keeps the cache in memory only.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._conn = sqlite3.connect(path or ":memory:", check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS isbn_status ("
+            "isbn TEXT PRIMARY KEY, status TEXT NOT NULL, checked_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def load(self) -> Dict[str, str]:
+        return dict(self._conn.execute("SELECT isbn, status FROM isbn_status"))
+
+    def put_many(self, statuses: Dict[str, str]) -> None:
+        now = time.time()
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO isbn_status (isbn, status, checked_at) VALUES (?, ?, ?)",
+            ((isbn, status, now) for isbn, status in statuses.items()),
+        )
+        self._conn.commit()
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def __enter__(self) -> "ExistenceCache":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class ExistenceChecker:
+    """Checks ISBNs concurrently with a shared token bucket, retries and a cache.
+
+    Args:
+        lookup: ``f(isbn) -> EXISTS | MISSING | UNKNOWN``; raises :class:`RetryableLookupError` on transient failures
+        cache: persistent cache; ISBNs with a final status are not queried again
+        requests_per_second: token-bucket rate shared by all workers (0 = unlimited)
+        max_retries: retries of a :class:`RetryableLookupError` before the ISBN is recorded as ``UNKNOWN``
+        backoff_base: base of the exponential backoff (``Retry-After`` wins if sent)
+    """
+
+    def __init__(
+        self,
+        lookup: Callable[[str], str] = google_books_lookup,
+        cache: Optional[ExistenceCache] = None,
+        requests_per_second: float = DEFAULT_REQUESTS_PER_SECOND,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        backoff_base: float = DEFAULT_BACKOFF_BASE_SECONDS,
+    ):
+        self.lookup = lookup
+        self.cache = cache or ExistenceCache()
+        self.bucket = TokenBucket(requests_per_second)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.stats = {"cached": 0, "queried": 0, "retries": 0, "unknown": 0}
+        self._stats_lock = threading.Lock()
+
+    def check_one(self, isbn: str) -> str:
+        """Look up ``isbn``; only :class:`RetryableLookupError` is retried, other errors propagate."""
+        for attempt in range(self.max_retries + 1):
+            self.bucket.acquire()
+            try:
+                return self.lookup(isbn)
+            except RetryableLookupError as e:
+                if attempt == self.max_retries:
+                    break
+                wait = e.retry_after if e.retry_after else self.backoff_base * (2 ** attempt)
+                with self._stats_lock:
+                    self.stats["retries"] += 1
+                time.sleep(wait * random.uniform(1.0, 1.25))
+        return UNKNOWN
+
+    def check_many(
+        self,
+        isbns: Iterable[str],
+        max_workers: int,
+        job=None,
+        commit_every: int = 1000,
+    ) -> Dict[str, str]:
+        """Return the status of every ISBN, querying only new and ``UNKNOWN`` ones.
+
+        Every ISBN counts as one cache lookup of ``job``: a hit if its final
+        status was cached, a miss if it is sent to the API. An exception from
+        ``lookup`` other than :class:`RetryableLookupError` is a bug; the run
+        is then aborted after saving what was checked so far.
+        """
+        known = self.cache.load()
+        results: Dict[str, str] = {}
+        todo = []
+        for isbn in isbns:
+            status = known.get(isbn)
+            if status in (EXISTS, MISSING):
+                results[isbn] = status
+            else:
+                todo.append(isbn)
+            if job is not None:
+                job.record_cache_lookup(status in (EXISTS, MISSING))
+        self.stats["cached"] = len(results)
+        if results:
+            print(f"Aus Cache übernommen: {len(results)} ISBNs, neu zu prüfen: {len(todo)}", flush=True)
+
+        def check(isbn: str) -> str:
+            if job is None:
+                return self.check_one(isbn)
+            job.add_in_flight(1)
+            try:
+                return self.check_one(isbn)
+            finally:
+                job.add_in_flight(-1)
+
+        pending: Dict[str, str] = {}
+        total = len(todo)
+        with ThreadPoolExecutor(max_workers=max_workers) as exe:
+            future_map = {exe.submit(check, isbn): isbn for isbn in todo}
+            processed = 0
+            for future in as_completed(future_map):
+                isbn = future_map[future]
+                try:
+                    status = future.result()
+                except BaseException:
+                    # Keep what was checked so far, then let the error through
+                    for other in future_map:
+                        other.cancel()
+                    if pending:
+                        self.cache.put_many(pending)
+                    raise
+                results[isbn] = pending[isbn] = status
+                processed += 1
+                self.stats["queried"] += 1
+                if status == UNKNOWN:
+                    self.stats["unknown"] += 1
+                if len(pending) >= commit_every:
+                    self.cache.put_many(pending)
+                    pending = {}
+                if job is not None:
+                    job.add_isbns()
+                    job.set_queue_depth("existence_check", total - processed)
+                if processed % 1000 == 0 or processed == total:
+                    print(f"Prüfe ISBN-Existenz: {processed}/{total}", flush=True)
+        if pending:
+            self.cache.put_many(pending)
+        return results
@@ -0,0 +1,150 @@
+"""Build and query the per-record violation store of a dump.
+
+``build`` runs all rules of a rule file in one pass (see ``check_rules``) and
+the record-level checks in ``CHECKS`` (duplicate 001, ISBN syntax and
+existence, duplicate ISBN/ISSN), and saves one bit per check and record next
+to the dump (``<dump>.violations.npz``). ``query`` selects records by failing
+and passing checks from that file only, e.g. records with placeholder leader
+and date but having an ISBN::
+
+    python data_quality/query_violations.py query dump.xml \\
+        --failing leader_01234cam date_991231 --passing isbn_present --export failing.xml
+"""
+
+import argparse
+import os
+import sys
+from pathlib import Path
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from data_quality.check_duplicate_identifiers import find_duplicate_positions
+from data_quality.check_isbn import DEFAULT_CACHE_FILE, collect_isbns
+from data_quality.check_primary_key import find_duplicate_keys
+from data_quality.check_rules import DEFAULT_RULES_FILE, CompiledRule, iter_rule_violations, load_rules
+from data_quality.isbn_existence import ExistenceCache
+from utilities.record_offsets import iter_record_spans
+from utilities.violation_store import ViolationStore, store_path
+
+DEFAULT_FILE_NAME = "voebvoll-20241027.xml"
+# Record-level checks besides the rules; each needs one extra pass over the dump
+CHECKS = (
+    "primary_key_duplicate",  # 001 shared with another record
+    "isbn_syntax",  # an 020 $a with invalid check digit or format
+    "isbn_missing",  # an ISBN cached as not assigned by check_isbn.py (no lookups)
+    "isbn_duplicate",  # an ISBN that occurs more than once in the dump
+    "issn_duplicate",  # an ISSN that occurs more than once in the dump
+)
+
+
+def _load_isbn_statuses(cache_path: Optional[str]) -> Dict[str, str]:
+    if not cache_path or not os.path.exists(cache_path):
+        return {}
+    with ExistenceCache(cache_path) as cache:
+        return cache.load()
+
+
+def run_checks(
+    file_path: str, store: ViolationStore, checks: Sequence[str], isbn_cache_path: Optional[str] = None
+) -> None:
+    """Set the bits of the record-level ``checks`` (see ``CHECKS``) in ``store``.
+
+    The checks report 1-based record positions; the store is 0-based.
+    ``isbn_missing`` reads the existence results of ``isbn_cache_path`` only.
+    """
+    if "primary_key_duplicate" in checks:
+        _, groups = find_duplicate_keys(file_path)
+        store.set_positions(
+            "primary_key_duplicate", (position - 1 for group in groups for position in group["positions"])
+        )
+    if "isbn_syntax" in checks or "isbn_missing" in checks:
+        index = collect_isbns(file_path)
+        states = index.record_states(_load_isbn_statuses(isbn_cache_path) if "isbn_missing" in checks else {})
+        positions = np.frombuffer(index.positions, dtype=np.uint32).astype(np.int64) - 1
+        if "isbn_syntax" in checks:
+            store.set_positions("isbn_syntax", positions[states == 3])
+        if "isbn_missing" in checks:
+            store.set_positions("isbn_missing", positions[states == 2])
+    if "isbn_duplicate" in checks or "issn_duplicate" in checks:
+        duplicates = find_duplicate_positions(file_path)
+        for name, key in (("isbn_duplicate", "ISBN"), ("issn_duplicate", "ISSN")):
+            if name in checks:
+                store.set_positions(name, duplicates[key].astype(np.int64) - 1)
+
+
+def build_violation_store(
+    file_path: str,
+    rules: Sequence[CompiledRule],
+    out_path: Optional[str] = None,
+    checks: Sequence[str] = (),
+    isbn_cache_path: Optional[str] = None,
+) -> ViolationStore:
+    """Evaluate ``rules`` and the record-level ``checks`` for every record and save the bitmask store."""
+    unknown = [name for name in checks if name not in CHECKS]
+    if unknown:
+        raise ValueError(f"unknown checks: {', '.join(unknown)}; known: {', '.join(CHECKS)}")
+    spans = np.fromiter(
+        (value for span in iter_record_spans(file_path) for value in span), dtype=np.uint64
+    ).reshape(-1, 2)
+    store = ViolationStore.empty([rule.id for rule in rules] + list(checks), spans[:, 0], spans[:, 1])
+    bits = [store.bit(rule.id) for rule in rules]
+
+    count = 0
+    for record, violated in iter_rule_violations(file_path, rules):
+        if record.position >= len(store):
+            raise ValueError("record scan and XML parse disagree on the number of records")
+        mask = np.uint64(0)
+        for index in violated:
+            mask |= bits[index]
+        store.bits[record.position] = mask
+        count += 1
+    if count != len(store):
+        raise ValueError("record scan and XML parse disagree on the number of records")
+    run_checks(file_path, store, checks, isbn_cache_path)
+
+    store.record_source(file_path)
+    store.save(out_path or store_path(file_path))
+    return store
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Fehler-Bitmasken je Datensatz erstellen und abfragen")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build = sub.add_parser("build", help="run all rules once and save the bitmask store")
+    build.add_argument("file", nargs="?", default=DEFAULT_FILE_NAME, help="XML file to analyze")
+    build.add_argument("--rules", default=DEFAULT_RULES_FILE, help="YAML rule file")
+    build.add_argument("--store", default=None, help="store file (default: <file>.violations.npz)")
+    build.add_argument("--checks", nargs="*", default=list(CHECKS), choices=CHECKS,
+                       help="record-level checks besides the rules (default: all)")
+    build.add_argument("--isbn-cache", default=DEFAULT_CACHE_FILE,
+                       help="existence results of check_isbn.py used for isbn_missing")
+
+    query = sub.add_parser("query", help="select records from a saved store")
+    query.add_argument("file", nargs="?", default=DEFAULT_FILE_NAME, help="XML file the store belongs to")
+    query.add_argument("--store", default=None, help="store file (default: <file>.violations.npz)")
+    query.add_argument("--failing", nargs="*", default=[], help="checks the records must fail")
+    query.add_argument("--passing", nargs="*", default=[], help="checks the records must pass")
+    query.add_argument("--export", default=None, help="write the selected records to this XML file")
+    args = parser.parse_args()
+
+    path = args.store or store_path(args.file)
+    if args.command == "build":
+        store = build_violation_store(args.file, load_rules(args.rules), path, args.checks, args.isbn_cache)
+        print(f"{len(store)} Datensätze, {len(store.names)} Prüfungen -> {path}")
+        for name, count in store.counts().items():
+            print(f"{name}: {count}")
+        return
+
+    store = ViolationStore.load(path, args.file)
+    positions = store.select(args.failing, args.passing)
+    print(f"Treffer: {len(positions)} von {len(store)} Datensätzen")
+    if args.export:
+        written = store.export(args.file, positions, args.export)
+        print(f"{written} Datensätze exportiert nach: {args.export}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,66 +1,256 @@
-from lxml import etree
-import requests
-import re
+import argparse
 import csv
-import time
+import json
+import os
+import re
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set
+
+import requests
+from lxml import etree
+from requests.adapters import HTTPAdapter
 from tqdm import tqdm
+from urllib3.util.retry import Retry
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from data_quality.isbn_existence import TokenBucket
+from utilities.api_endpoints import sigel_org_url
+
+DEFAULT_FILE_NAME = "voebvoll-20241027.xml"
+DEFAULT_OUTPUT_FILE = "isil_matching_results.csv"
+DEFAULT_CACHE_FILE = "isil_cache.json"
+DEFAULT_MAX_WORKERS = 8
+DEFAULT_REQUESTS_PER_SECOND = 20.0  # previously a fixed 0.05 s pause between requests
+REQUEST_TIMEOUT = 8
+
+STATUS_VALID = "VALID ISILs"
+STATUS_INVALID = "INVALID ISILs"
+STATUS_NO_NAME = "UNKNOWN_NO_NAME"
+# Answers that describe the ISIL itself and may be cached; 429/5xx/errors are retried next run
+CACHEABLE_STATUSES = (STATUS_VALID, STATUS_INVALID, STATUS_NO_NAME, "HTTP_404", "HTTP_410")
+
+
+def clean_isil(code: str) -> str:
+    """Remove 'V' or 'V0' directly after 'DE-' (e.g. DE-V0123 -> DE-123)."""
+    return re.sub(r"^DE-?V0?", "DE-", code)
 
-# 1) Read XML file
-xml_file = "voebvoll-20241027.xml"
-isil_codes = set()
-
-# 2) Extract ISIL codes from all records
-print("Starte Extraktion der ISIL-Codes ...")
-
-context = etree.iterparse(xml_file, events=("end",), tag="record")
-
-for _, record in tqdm(context, desc="Lese XML", unit="record"):
-    for field in record.findall(".//datafield[@tag='049']"):
-        for sub in field.findall(".//subfield[@code='a']"):
-            if sub.text:
-                code = sub.text.strip()
-                # Note: To use a specific option, uncomment/comment the corresponding line
-                if code.startswith("DE-"):
-                    # Option 1: Send the found ISIL code directly to the API
-                    # isil_codes.add(code)
-                    
-                    # Option 2: Remove 'V' or 'V0' directly after 'DE-' and send the cleaned code to the API
-                    cleaned_code = re.sub(r"^DE-?V0?", "DE-", code)
-                    isil_codes.add(cleaned_code)
-    record.clear()
-    while record.getprevious() is not None:
-        del record.getparent()[0]
-
-print(f"Anzahl unterschiedlicher ISIL-Codes gefunden: {len(isil_codes)}")
-
-# 3) Check codes with API
-results = []
-base_url = "https://sigel.staatsbibliothek-berlin.de/api/org/"
-
-for code in tqdm(sorted(isil_codes), desc="Prüfe ISILs", unit="code"):
+
+def extract_isil_codes(xml_file: str, clean: bool = True) -> Set[str]:
+    """Collect all German ISIL codes from 049 $a.
+
+    With ``clean=False`` the codes are returned as found (option 1), otherwise
+    'V'/'V0' after 'DE-' is removed before the lookup (option 2).
+    """
+    isil_codes = set()
+    context = etree.iterparse(xml_file, events=("end",), tag="record")
+
+    for _, record in tqdm(context, desc="Lese XML", unit="record"):
+        for field in record.findall(".//datafield[@tag='049']"):
+            for sub in field.findall(".//subfield[@code='a']"):
+                if sub.text:
+                    code = sub.text.strip()
+                    if code.startswith("DE-"):
+                        isil_codes.add(clean_isil(code) if clean else code)
+        record.clear()
+        while record.getprevious() is not None:
+            del record.getparent()[0]
+
+    return isil_codes
+
+
+def make_session(pool_size: int = DEFAULT_MAX_WORKERS) -> requests.Session:
+    """HTTP session with a connection pool for ``pool_size`` threads.
+
+    429 and 5xx answers are retried with exponential backoff, honouring
+    ``Retry-After``.
+    """
+    retry = Retry(
+        total=3,
+        backoff_factor=0.5,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=("GET",),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def check_isil(session: requests.Session, code: str, base_url: str) -> Dict[str, Optional[str]]:
+    """Look up one ISIL in the SIGEL API and return its result row."""
     bibliothek_name = None
     try:
-        resp = requests.get(f"{base_url}{code}.jsonld", timeout=8)
+        resp = session.get(f"{base_url}{code}.jsonld", timeout=REQUEST_TIMEOUT)
         if resp.status_code == 200:
             data = resp.json()
-            bibliothek_name = data.get("member", [{}])[0].get("name", "") if "member" in data else ""
-            status = "VALID ISILs" if bibliothek_name else "UNKNOWN_NO_NAME"
+            if "member" in data and not data["member"]:
+                status = STATUS_INVALID
+            else:
+                bibliothek_name = data.get("member", [{}])[0].get("name", "") if "member" in data else ""
+                status = STATUS_VALID if bibliothek_name else STATUS_NO_NAME
         else:
             status = f"HTTP_{resp.status_code}"
     except Exception as e:
         status = f"ERROR_{str(e)}"
-        # Special replacement:
-        if "list index out of range" in status:
-            status = "INVALID ISILs"
 
-    results.append({"ISIL": code, "Status": status, "Name": bibliothek_name})
-    time.sleep(0.05)  # Small pause for API stability
+    return {"ISIL": code, "Status": status, "Name": bibliothek_name}
+
+
+def load_registry_snapshot(path: str) -> Dict[str, str]:
+    """Load a local SIGEL export into an ``ISIL -> name`` index.
+
+    Supported formats: CSV with ``ISIL`` and ``Name`` columns (delimiter
+    detected), a JSON object mapping ISIL to name, a JSON list or JSON lines
+    of organisations with ``isil`` and ``name``.
+    """
+    index: Dict[str, str] = {}
+    with open(path, encoding="utf-8-sig") as f:
+        if path.lower().endswith(".csv"):
+            sample = f.read(4096)
+            f.seek(0)
+            dialect = csv.Sniffer().sniff(sample, delimiters=";,\t")
+            for row in csv.DictReader(f, dialect=dialect):
+                row = {k.strip().lower(): (v or "").strip() for k, v in row.items() if k}
+                if row.get("isil"):
+                    index[row["isil"]] = row.get("name", "")
+            return index
+
+        text = f.read()
+    try:
+        data = json.loads(text)
+        entries = data.items() if isinstance(data, dict) else ((e.get("isil"), e.get("name")) for e in data)
+    except json.JSONDecodeError:
+        rows = (json.loads(line) for line in text.splitlines() if line.strip())
+        entries = ((e.get("isil"), e.get("name")) for e in rows)
+    for isil, name in entries:
+        if isil:
+            index[isil] = name or ""
+    return index
+
+
+def _load_cache(cache_path: Optional[str]) -> Dict[str, Dict[str, Optional[str]]]:
+    if not cache_path or not os.path.exists(cache_path):
+        return {}
+    with open(cache_path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _save_cache(cache_path: str, cache: Dict[str, Dict[str, Optional[str]]]) -> None:
+    tmp_path = cache_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(cache, f, ensure_ascii=False, indent=1, sort_keys=True)
+    os.replace(tmp_path, cache_path)
+
+
+def validate_isil_codes(
+    codes: Iterable[str],
+    base_url: Optional[str] = None,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    requests_per_second: float = DEFAULT_REQUESTS_PER_SECOND,
+    cache_path: Optional[str] = None,
+    registry: Optional[Dict[str, str]] = None,
+    offline: bool = False,
+) -> List[Dict[str, Optional[str]]]:
+    """Validate ISIL codes and return one ``{"ISIL", "Status", "Name"}`` row per code.
+
+    Codes are resolved in this order: the local ``registry`` snapshot index,
+    the persistent ``cache_path`` (JSON) from earlier runs, then the SIGEL API
+    (``base_url``, default from ``utilities.api_endpoints``) queried by
+    ``max_workers`` threads over one pooled session at no more than
+    ``requests_per_second``. With ``offline`` codes missing from the snapshot
+    are reported as invalid without any request; it requires a ``registry``.
+    """
+    if offline and registry is None:
+        raise ValueError("offline validation needs a registry snapshot")
+    base_url = base_url or sigel_org_url()
+    cache = _load_cache(cache_path)
+    results: Dict[str, Dict[str, Optional[str]]] = {}
+    to_query = []
+
+    for code in sorted(set(codes)):
+        if registry is not None and code in registry:
+            results[code] = {"ISIL": code, "Status": STATUS_VALID, "Name": registry[code]}
+        elif offline:
+            results[code] = {"ISIL": code, "Status": STATUS_INVALID, "Name": None}
+        elif code in cache:
+            results[code] = {"ISIL": code, **cache[code]}
+        else:
+            to_query.append(code)
+
+    if to_query:
+        bucket = TokenBucket(requests_per_second)
+        session = make_session(max_workers)
+
+        def lookup(code: str) -> Dict[str, Optional[str]]:
+            bucket.acquire()
+            return check_isil(session, code, base_url)
+
+        try:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = [executor.submit(lookup, code) for code in to_query]
+                for future in tqdm(as_completed(futures), total=len(futures), desc="Prüfe ISILs", unit="code"):
+                    row = future.result()
+                    results[row["ISIL"]] = row
+                    if row["Status"] in CACHEABLE_STATUSES:
+                        cache[row["ISIL"]] = {"Status": row["Status"], "Name": row["Name"]}
+        finally:
+            session.close()
+            if cache_path:
+                _save_cache(cache_path, cache)
+
+    return [results[code] for code in sorted(results)]
+
+
+def write_results(results: List[Dict[str, Optional[str]]], csv_file: str) -> None:
+    with open(csv_file, mode="w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=["ISIL", "Status", "Name"])
+        writer.writeheader()
+        writer.writerows(results)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="ISIL-Codes gegen die SIGEL-Datenbank prüfen")
+    parser.add_argument("file", nargs="?", default=DEFAULT_FILE_NAME, help="XML file to analyze")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT_FILE, help="CSV result file")
+    parser.add_argument("--workers", type=int, default=DEFAULT_MAX_WORKERS, help="parallel API requests")
+    parser.add_argument("--rate", type=float, default=DEFAULT_REQUESTS_PER_SECOND,
+                        help="maximum API requests per second (0 = unlimited)")
+    parser.add_argument("--cache", default=DEFAULT_CACHE_FILE,
+                        help="JSON file with results of earlier runs ('' disables the cache)")
+    parser.add_argument("--registry", default=None,
+                        help="local SIGEL snapshot (CSV/JSON) used before the API")
+    parser.add_argument("--offline", action="store_true",
+                        help="with --registry: do not query the API for unknown codes")
+    parser.add_argument("--raw", action="store_true",
+                        help="send codes as found (do not remove 'V'/'V0' after 'DE-')")
+    args = parser.parse_args()
+    if args.offline and not args.registry:
+        parser.error("--offline requires --registry")
+
+    print("Starte Extraktion der ISIL-Codes ...")
+    isil_codes = extract_isil_codes(args.file, clean=not args.raw)
+    print(f"Anzahl unterschiedlicher ISIL-Codes gefunden: {len(isil_codes)}")
+
+    registry = load_registry_snapshot(args.registry) if args.registry else None
+    if registry is not None:
+        print(f"Lokaler SIGEL-Abzug geladen: {len(registry)} ISILs")
+
+    results = validate_isil_codes(
+        isil_codes,
+        max_workers=args.workers,
+        requests_per_second=args.rate,
+        cache_path=args.cache or None,
+        registry=registry,
+        offline=args.offline,
+    )
+    write_results(results, args.output)
+    print("Fertig! Ergebnisse geschrieben nach:", args.output)
 
-# 4) Write results to CSV
-csv_file = "isil_matching_results.csv"
-with open(csv_file, mode="w", newline="", encoding="utf-8") as f:
-    writer = csv.DictWriter(f, fieldnames=["ISIL", "Status", "Name"])
-    writer.writeheader()
-    writer.writerows(results)
 
-print("Fertig! Ergebnisse geschrieben nach:", csv_file)
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Streaming-Änderungsprotokoll für die Metadaten-Anreicherung.
+
+Jede Änderung wird als strukturierte JSON-Zeile (JSONL) geschrieben, statt sie
+in einer Liste im Speicher zu sammeln. Das Schreiben übernimmt ein
+Hintergrund-Thread mit Puffer, damit die Anreicherung nicht auf die Festplatte
+warten muss. Der Speicherbedarf bleibt damit auch bei >1 Mio. Records konstant.
+"""
+
+import gzip
+import json
+import queue
+import threading
+from typing import Any, Dict, Iterator, Optional
+
+# Felder eines Protokolleintrags (Reihenfolge = Reihenfolge in der JSON-Zeile)
+CHANGE_LOG_FIELDS = (
+    "position",
+    "record_id",
+    "isbn",
+    "field",
+    "marc_field",
+    "action",
+    "old_value",
+    "new_value",
+    "similarity",
+    "service",
+)
+
+_SENTINEL = object()
+
+
+class ChangeLogWriter:
+    """Schreibt Änderungseinträge gepuffert als JSONL (optional gzip-komprimiert).
+
+    Einträge werden über eine begrenzte Queue an einen Hintergrund-Thread
+    übergeben. Ist die Queue voll, blockiert ``write`` kurz (Backpressure),
+    sodass der Speicherverbrauch nach oben begrenzt bleibt.
+    """
+
+    def __init__(self, path: str, compress: Optional[bool] = None,
+                 batch_size: int = 1000, max_queue: int = 10000):
+        """
+        Args:
+            path: Zieldatei (z.B. ``..._changes.jsonl`` oder ``..._changes.jsonl.gz``)
+            compress: gzip-Komprimierung; ``None`` = anhand der Endung ``.gz`` entscheiden
+            batch_size: Anzahl Zeilen, die gesammelt in die Datei geschrieben werden
+            max_queue: Maximale Anzahl wartender Einträge
+        """
+        self.path = path
+        self.compress = path.endswith(".gz") if compress is None else compress
+        self.batch_size = max(1, batch_size)
+        self.count = 0
+        self._count_lock = threading.Lock()
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=max_queue)
+        self._error: Optional[BaseException] = None
+        self._closed = False
+
+        if self.compress:
+            self._file = gzip.open(path, "wt", encoding="utf-8")
+        else:
+            self._file = open(path, "w", encoding="utf-8", buffering=1024 * 1024)
+
+        self._thread = threading.Thread(target=self._run, name="change-log-writer", daemon=True)
+        self._thread.start()
+
+    @property
+    def pending(self) -> int:
+        """Anzahl noch nicht geschriebener Einträge in der Queue."""
+        return self._queue.qsize()
+
+    def write(self, entry: Dict[str, Any]) -> None:
+        """Reiht einen Eintrag zum Schreiben ein (threadsicher)."""
+        if self._closed:
+            raise ValueError("ChangeLogWriter ist bereits geschlossen")
+        if self._error is not None:
+            raise RuntimeError(f"Änderungsprotokoll konnte nicht geschrieben werden: {self._error}")
+        self._queue.put(entry)
+        with self._count_lock:
+            self.count += 1
+
+    def _run(self) -> None:
+        """Hintergrund-Thread: Einträge sammeln und blockweise schreiben."""
+        batch = []
+        while True:
+            item = self._queue.get()
+            if item is not _SENTINEL:
+                batch.append(json.dumps(item, ensure_ascii=False))
+            # Blockweise schreiben, sobald der Puffer voll ist oder gerade nichts nachkommt
+            if batch and (item is _SENTINEL or len(batch) >= self.batch_size or self._queue.empty()):
+                try:
+                    self._file.write("\n".join(batch) + "\n")
+                except Exception as e:  # pragma: no cover - Festplattenfehler
+                    self._error = e
+                batch = []
+            if item is _SENTINEL:
+                break
+
+    def close(self) -> None:
+        """Schreibt alle ausstehenden Einträge und schließt die Datei."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_SENTINEL)
+        self._thread.join()
+        self._file.close()
+        if self._error is not None:
+            raise RuntimeError(f"Änderungsprotokoll konnte nicht geschrieben werden: {self._error}")
+
+    def __enter__(self) -> "ChangeLogWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+
+def make_change_entry(position, record_id, isbn, field, marc_field, action, old_value, new_value,
+                      similarity=None, service=None) -> Dict[str, Any]:
+    """Erstellt einen Protokolleintrag mit den Feldern aus ``CHANGE_LOG_FIELDS``."""
+    return {
+        "position": position,
+        "record_id": record_id,
+        "isbn": isbn,
+        "field": field,
+        "marc_field": marc_field,
+        "action": action,
+        "old_value": old_value,
+        "new_value": new_value,
+        "similarity": round(similarity, 4) if similarity is not None else None,
+        "service": service,
+    }
+
+
+def read_change_log(path: str) -> Iterator[Dict[str, Any]]:
+    """Liest ein (optional gzip-komprimiertes) Änderungsprotokoll zeilenweise."""
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
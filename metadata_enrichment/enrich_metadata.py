@@ -9,7 +9,13 @@ import threading
 import json
 from datetime import datetime
 from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
 from urllib.error import URLError
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from metadata_enrichment.change_log import ChangeLogWriter, make_change_entry
+from metadata_enrichment.enrichment_metrics import EnrichmentMetrics, register_job
+from utilities.api_endpoints import api_base_url, redirect_isbnlib_services
+from utilities.isbn_batch import validate_isbn_batch
 try:
     import isbnlib
 except ImportError:
@@ -55,6 +61,11 @@ if not logger.handlers:
 
 # In-Memory-Cache für bereits abgefragte ISBNs
 isbn_cache = {}
+# Service, der die Metadaten für eine (normalisierte) ISBN geliefert hat
+isbn_service_cache = {}
+
+# Laufzeit-Metriken (Latenzen pro Service, Wartezeiten, Pass-Dauer)
+metrics = EnrichmentMetrics()
 
 # Globaler, threadsicherer Rate-Limiter (Token-ähnlich)
 _rate_lock = threading.Lock()
@@ -78,6 +89,7 @@ def _acquire_rate_slot():
     # Außerhalb des Locks schlafen und danach Slot finalisieren
     if wait > 0:
         time.sleep(wait)
+        metrics.record_rate_limit_wait(wait)
     with _rate_lock:
         now2 = time.monotonic()
         _next_allowed_time = max(_next_allowed_time, now2 + RATE_LIMIT_SECONDS)
@@ -165,10 +177,31 @@ def convert_author_to_marc_format(api_author, marc_author):
     # Baue MARC-Format mit vollständigem Vornamen von API
     return f"{marc_lastname}, {api_firstname}"
 
-def _enrich_single_record(idx, record, isbn, norm13, meta, stats, change_log, use_tqdm, progress_callback):
+def _get_record_id(record):
+    """Liefert den Inhalt von Controlfield 001 oder 'unbekannt'."""
+    return next((cf.text for cf in record.findall('controlfield') if cf.get('tag') == '001'), 'unbekannt')
+
+
+def _log_change(change_log, idx, record, isbn, key, action, old_value, new_value, sim=None, service=None):
+    """Schreibt eine strukturierte Änderung ins Änderungsprotokoll (falls aktiv)."""
+    if change_log is None:
+        return
+    marc_tag, sub_code = ISBNLIB_MARC_MAP[key]
+    change_log.write(make_change_entry(
+        idx, _get_record_id(record), isbn, key, f"{marc_tag}${sub_code}", action,
+        old_value, new_value, similarity=sim, service=service
+    ))
+
+
+def _enrich_single_record(idx, record, isbn, norm13, meta, stats, change_log, use_tqdm, progress_callback,
+                          service=None):
     """
     Reichert einen einzelnen Record mit ISBN-Metadaten an.
     
+    Args:
+        change_log: ChangeLogWriter (oder None) für strukturierte Änderungseinträge
+        service: isbnlib-Service, von dem ``meta`` stammt (für das Änderungsprotokoll)
+    
     Returns:
         bool: True wenn Änderungen vorgenommen wurden, sonst False
     """
@@ -243,7 +276,7 @@ def _enrich_single_record(idx, record, isbn, norm13, meta, stats, change_log, us
             conflicts += 1
 
     if comparable > 0 and conflicts > (comparable / 2):
-        rec_id = next((cf.text for cf in record.findall('controlfield') if cf.get('tag') == '001'), 'unbekannt')
+        rec_id = _get_record_id(record)
         msg = f"[{idx}] Konfliktquote zu hoch (Konflikte: {conflicts}/{comparable}) für Record {rec_id} (ISBN {isbn}) – Datensatz übersprungen."
         if not use_tqdm and not progress_callback:
             print(msg)
@@ -320,7 +353,7 @@ def _enrich_single_record(idx, record, isbn, norm13, meta, stats, change_log, us
                 
                 marc_subfield.text = meta_value
                 msg = f"[{idx}] {key}: Leeres Feld befüllt mit '{meta_value}'"
-                change_log.append(msg)
+                _log_change(change_log, idx, record, isbn, key, 'filled', marc_value, meta_value, service=service)
                 logger.info(msg)
                 has_changes = True
         # Abkürzung erkennen und ersetzen
@@ -329,7 +362,8 @@ def _enrich_single_record(idx, record, isbn, norm13, meta, stats, change_log, us
                 stats['field_stats'][key]['abbreviation_replaced'] += 1
                 marc_subfield.text = meta_value
                 msg = f"[{idx}] {key}: Abkürzung '{marc_value}' ersetzt durch '{meta_value}'"
-                change_log.append(msg)
+                _log_change(change_log, idx, record, isbn, key, 'abbreviation_replaced', marc_value, meta_value,
+                            service=service)
                 logger.info(msg)
                 has_changes = True
         # Falsch befülltes Feld korrigieren
@@ -341,17 +375,19 @@ def _enrich_single_record(idx, record, isbn, norm13, meta, stats, change_log, us
                         stats['field_stats'][key]['corrected'] += 1
                         marc_subfield.text = meta_value
                         msg = f"[{idx}] {key}: Wert '{marc_value}' korrigiert zu '{meta_value}' (Ähnlichkeit: {sim:.2f})"
-                        change_log.append(msg)
+                        _log_change(change_log, idx, record, isbn, key, 'corrected', marc_value, meta_value,
+                                    sim=sim, service=service)
                         logger.info(msg)
                         has_changes = True
     
     return has_changes
 
 
-def _enrich_record_inline(idx, elem, isbn, norm13, meta, stats, use_tqdm):
+def _enrich_record_inline(idx, elem, isbn, norm13, meta, stats, use_tqdm, change_log=None, service=None):
     """
     Inline-Anreicherung eines einzelnen Records (direkt am ET.Element während iterparse).
-    Basiert auf _enrich_single_record, aber ohne change_log (da zu memory-intensiv).
+    Basiert auf _enrich_single_record. Änderungen werden über den ChangeLogWriter
+    gestreamt, statt sie im Speicher zu sammeln.
     
     WICHTIG: Zählt auch Baseline-Statistiken (total_records, empty_before, etc.)
     
@@ -363,6 +399,8 @@ def _enrich_record_inline(idx, elem, isbn, norm13, meta, stats, use_tqdm):
         meta: Metadaten-Dict von isbnlib
         stats: Statistik-Dict (wird in-place modifiziert)
         use_tqdm: Boolean ob tqdm verwendet wird
+        change_log: Optionaler ChangeLogWriter für strukturierte Änderungseinträge
+        service: isbnlib-Service, von dem ``meta`` stammt
         
     Returns:
         bool: True wenn Änderungen vorgenommen wurden
@@ -511,6 +549,7 @@ def _enrich_record_inline(idx, elem, isbn, norm13, meta, stats, use_tqdm):
                         meta_value = f"{lastname}, {firstname}"
                 
                 marc_subfield.text = meta_value
+                _log_change(change_log, idx, elem, isbn, key, 'filled', marc_value, meta_value, service=service)
                 has_changes = True
         
         elif marc_value and is_abbreviation(str(marc_value), str(meta_value)):
@@ -518,6 +557,8 @@ def _enrich_record_inline(idx, elem, isbn, norm13, meta, stats, use_tqdm):
             if marc_subfield is not None:
                 stats['field_stats'][key]['abbreviation_replaced'] += 1
                 marc_subfield.text = meta_value
+                _log_change(change_log, idx, elem, isbn, key, 'abbreviation_replaced', marc_value, meta_value,
+                            service=service)
                 has_changes = True
         
         else:
@@ -528,6 +569,8 @@ def _enrich_record_inline(idx, elem, isbn, norm13, meta, stats, use_tqdm):
                     if marc_subfield is not None:
                         stats['field_stats'][key]['corrected'] += 1
                         marc_subfield.text = meta_value
+                        _log_change(change_log, idx, elem, isbn, key, 'corrected', marc_value, meta_value,
+                                    sim=sim, service=service)
                         has_changes = True
     
     return has_changes
@@ -547,7 +590,9 @@ def fetch_isbn_metadata(idx, isbn):
 
     # Cache prüfen
     if norm13 in isbn_cache:
+        metrics.record_cache_lookup(True)
         return idx, norm13, isbn_cache[norm13], None, 0
+    metrics.record_cache_lookup(False)
 
     meta = None
     error_msg = None
@@ -564,16 +609,22 @@ def fetch_isbn_metadata(idx, isbn):
             # Wir holen für jeden Service separat einen Slot.
             for svc in services_to_try:
                 _acquire_rate_slot()
+                metrics.begin_request()
+                request_start = time.perf_counter()
                 try:
                     meta = isbnlib.meta(norm13, service=svc)
+                    metrics.record_request(svc, time.perf_counter() - request_start, "hit" if meta else "miss")
                 except Exception as e_meta:
                     # Wenn ein Service einen expliziten Fehler wirft, loggen und zum nächsten Service
+                    is_429 = "429" in str(e_meta) or "many requests" in str(e_meta).lower()
+                    metrics.record_request(svc, time.perf_counter() - request_start, "429" if is_429 else "error")
                     logger.debug(f"Service {svc} Fehler für ISBN {norm13}: {e_meta}")
                     meta = None
 
                 # Wenn Meta gefunden, abbrechen
                 if meta:
                     isbn_cache[norm13] = meta
+                    isbn_service_cache[norm13] = svc
                     break
 
             # Wenn Meta gefunden wurde, beende die Retry-Schleife
@@ -584,12 +635,14 @@ def fetch_isbn_metadata(idx, isbn):
             retry_attempt = attempt  # Markiere, dass ein Retry nötig war
             wait = BACKOFF_BASE_SECONDS * (2 ** (attempt - 1))
             error_msg = f"Netzwerkfehler (Versuch {attempt}/{MAX_RETRIES}): {e}"
+            metrics.record_backoff(wait)
             time.sleep(wait)
         except (URLError, socket.timeout) as e:
             # Netzwerkfehler behandeln (wie vorher)
             retry_attempt = attempt  # Markiere, dass ein Retry nötig war
             wait = BACKOFF_BASE_SECONDS * (2 ** (attempt - 1))
             error_msg = f"Netzwerkfehler (Versuch {attempt}/{MAX_RETRIES}): {e}"
+            metrics.record_backoff(wait)
             time.sleep(wait)
         except Exception as e:
             # Bei 429 (Rate Limit) längere Wartezeit
@@ -597,6 +650,7 @@ def fetch_isbn_metadata(idx, isbn):
                 retry_attempt = attempt  # Markiere, dass einRetry nötig war
                 wait = BACKOFF_BASE_SECONDS * (3 ** attempt)  # Exponentiell länger
                 error_msg = f"Rate Limit (429) erreicht (Versuch {attempt}/{MAX_RETRIES})"
+                metrics.record_backoff(wait)
                 time.sleep(wait)
             else:
                 error_msg = f"Fehler: {e}"
@@ -608,7 +662,8 @@ def fetch_isbn_metadata(idx, isbn):
 
     return idx, norm13, meta, error_msg, retry_attempt
 
-def main(xml_path, progress_callback=None, check_cancelled=None):
+def main(xml_path, progress_callback=None, check_cancelled=None, change_log_path=None,
+         compress_change_log=False, metrics_port=None):
     """
     Hauptfunktion für die Metadaten-Anreicherung mit ITERATIVEM 3-PASS-PARSING.
     Speicherschonend - funktioniert auch mit sehr großen Dateien (>2GB).
@@ -621,10 +676,30 @@ def main(xml_path, progress_callback=None, check_cancelled=None):
         xml_path: Pfad zur XML-Datei
         progress_callback: Optional callback(processed, successful, failed, rate_limit_retries, isbn_not_found, conflicts_skipped)
         check_cancelled: Optional callback() -> bool für Abbruchprüfung
+        change_log_path: Ziel für das JSONL-Änderungsprotokoll
+            (Standard: <ausgabe>_changes.jsonl bzw. .jsonl.gz)
+        compress_change_log: Änderungsprotokoll gzip-komprimiert schreiben
+        metrics_port: Optionaler Port für einen Prometheus-/metrics-Endpunkt
+            während des Laufs (siehe enrichment_stats_server.start_metrics_server)
         
     Returns:
         dict mit Statistiken (inkl. 'output_path' statt 'tree') oder None bei Fehler
     """
+    metrics_server = None
+    if metrics_port is not None:
+        from metadata_enrichment.enrichment_stats_server import start_metrics_server
+        metrics_server = start_metrics_server(metrics_port)
+    try:
+        return _enrich(xml_path, progress_callback, check_cancelled, change_log_path, compress_change_log)
+    finally:
+        # Port freigeben, damit ein weiterer Lauf im selben Prozess ihn nutzen kann
+        if metrics_server is not None:
+            metrics_server.shutdown()
+            metrics_server.server_close()
+
+
+def _enrich(xml_path, progress_callback, check_cancelled, change_log_path, compress_change_log):
+    """Der eigentliche Lauf von ``main`` (ohne Metrik-Endpunkt)."""
     # Prüfe Dateigröße
     file_size_mb = os.path.getsize(xml_path) / (1024 * 1024)
     print(f"\n📁 Datei: {os.path.basename(xml_path)} ({file_size_mb:.0f} MB)")
@@ -642,6 +717,7 @@ def main(xml_path, progress_callback=None, check_cancelled=None):
         'rate_limit_retry_2': 0,
         'rate_limit_retry_3': 0,
         'isbn_not_found': 0,
+        'invalid_isbn_skipped': 0,
         'conflicts_skipped': 0,
         'multi_isbn_warnings': 0,
         'cancelled': False,
@@ -655,11 +731,22 @@ def main(xml_path, progress_callback=None, check_cancelled=None):
             'Year': {'total_records': 0, 'empty_before': 0, 'filled_after': 0, 'had_abbreviation': 0,
                     'abbreviation_replaced': 0, 'potentially_incorrect': 0, 'corrected': 0, 'conflicts': 0},
         },
-        'change_log': []
+        'total_changes': 0,
+        'change_log_path': None,
+        'max_workers': MAX_WORKERS,
+        'rate_limit_seconds': RATE_LIMIT_SECONDS,
     }
+    metrics.reset()
+    job = register_job('enrichment', metrics)
+    base_url = api_base_url()
+    if base_url:
+        # z. B. lokaler api_simulator für Last- und Fehlertests
+        redirect_isbnlib_services(base_url)
+        print(f"   🔀 API-Anfragen werden umgeleitet auf: {base_url}")
     
     # ==================== PASS 1: ISBN-Sammlung & Record-Zählung ====================
     print("\n🔍 Pass 1/3: Sammle ISBNs (iterativ, speicherschonend)...")
+    pass_start = time.perf_counter()
     
     isbn_map = {}  # isbn -> record_position (1-based)
     record_position = 0
@@ -671,6 +758,7 @@ def main(xml_path, progress_callback=None, check_cancelled=None):
             if elem.tag == 'record':
                 record_position += 1
                 total_records_in_file += 1
+                job.add_records()
                 
                 if record_position % 100000 == 0:
                     print(f"   {record_position:,} Records durchsucht...")
@@ -699,13 +787,16 @@ def main(xml_path, progress_callback=None, check_cancelled=None):
     except MemoryError:
         print("\n❌ FEHLER: Nicht genug Speicher verfügbar!")
         print("   Die Datei ist extrem groß. Bitte in kleinere Teile aufteilen.")
+        job.finish()
         return None
     except Exception as e:
         print(f"\n❌ Fehler beim Parsen: {e}")
         import traceback
         traceback.print_exc()
+        job.finish()
         return None
     
+    metrics.record_pass('pass_1', time.perf_counter() - pass_start)
     stats['total_records'] = len(isbn_map)
     print(f"   ✓ {len(isbn_map):,} eindeutige ISBNs gefunden (von {total_records_in_file:,} Records)")
     if stats['multi_isbn_warnings'] > 0:
@@ -723,13 +814,25 @@ def main(xml_path, progress_callback=None, check_cancelled=None):
     
     if len(isbn_map) == 0:
         print("❌ Keine ISBNs zum Anreichern gefunden!")
+        job.finish()
         return stats
     
     # ==================== PASS 2: Metadaten abrufen ====================
     print(f"\n📚 Pass 2/3: Hole Metadaten für {len(isbn_map):,} ISBNs...")
+    pass_start = time.perf_counter()
     
     isbn_meta_cache = {}  # isbn -> (norm13, meta)
     
+    # Syntaktisch ungültige ISBNs gar nicht erst anfragen (Prüfsummen vektorisiert)
+    isbns_to_fetch = list(isbn_map.keys())
+    canonical = [isbnlib.canonical(i) if hasattr(isbnlib, 'canonical') else i for i in isbns_to_fetch]
+    valid_mask, _, _ = validate_isbn_batch(canonical)
+    skipped = len(isbns_to_fetch) - int(valid_mask.sum())
+    if skipped:
+        isbns_to_fetch = [isbn for isbn, ok in zip(isbns_to_fetch, valid_mask.tolist()) if ok]
+        stats['invalid_isbn_skipped'] = skipped
+        print(f"   ⚠  {skipped:,} ISBNs mit ungültiger Prüfziffer übersprungen")
+    
     try:
         from tqdm import tqdm
         use_tqdm = True and not progress_callback
@@ -738,19 +841,26 @@ def main(xml_path, progress_callback=None, check_cancelled=None):
     
     with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
         futures = {executor.submit(fetch_isbn_metadata, idx, isbn): (idx, isbn) 
-                  for idx, isbn in enumerate(isbn_map.keys(), 1)}
+                  for idx, isbn in enumerate(isbns_to_fetch, 1)}
         
+        completed_fetches = 0
+        job.set_queue_depth('fetch', len(futures))
         iterator = as_completed(futures)
         if use_tqdm:
-            iterator = tqdm(iterator, total=len(isbn_map), desc="Metadaten abrufen")
+            iterator = tqdm(iterator, total=len(futures), desc="Metadaten abrufen")
         
         for future in iterator:
             if check_cancelled and check_cancelled():
                 stats['cancelled'] = True
+                stats['metrics'] = metrics.snapshot()
+                job.finish()
                 print("\n⛔ Vom Benutzer abgebrochen!")
                 return stats
             
             idx, norm13, meta, error_msg, retry_attempt = future.result()
+            completed_fetches += 1
+            job.add_isbns()
+            job.set_queue_depth('fetch', len(futures) - completed_fetches)
             
             # Retry-Statistik
             if retry_attempt > 0:
@@ -788,17 +898,25 @@ def main(xml_path, progress_callback=None, check_cancelled=None):
                         stats['isbn_not_found'], stats['conflicts_skipped']
                     )
     
+    metrics.record_pass('pass_2', time.perf_counter() - pass_start)
     print(f"   ✓ {len(isbn_meta_cache):,} Metadaten erfolgreich abgerufen")
     if stats['isbn_not_found'] > 0:
         print(f"   ⚠  {stats['isbn_not_found']:,} ISBNs nicht gefunden")
     
     # ==================== PASS 3: Anreicherung & Schreiben ====================
     print(f"\n📝 Pass 3/3: Reichere Records an & schreibe Ausgabedatei...")
+    pass_start = time.perf_counter()
     
     output_path = xml_path.replace(".xml", "_enriched.xml")
+    if change_log_path is None:
+        change_log_path = output_path.replace(".xml", "_changes.jsonl")
+        if compress_change_log:
+            change_log_path += ".gz"
     
     try:
-        with open(output_path, 'w', encoding='utf-8') as out_file:
+        with open(output_path, 'w', encoding='utf-8') as out_file, \
+                ChangeLogWriter(change_log_path, compress=compress_change_log or None) as change_log:
+            stats['change_log_path'] = change_log_path
             # XML Header
             out_file.write('<?xml version="1.0" encoding="UTF-8"?>\n')
             out_file.write('<collection xmlns:marc="http://www.loc.gov/MARC21/slim">\n')
@@ -815,6 +933,8 @@ def main(xml_path, progress_callback=None, check_cancelled=None):
                     continue
                 
                 record_position += 1
+                job.add_records()
+                job.set_queue_depth('change_log', change_log.pending)
                 
                 if record_position % 50000 == 0:
                     print(f"   {record_position:,} / {total_records_in_file:,} verarbeitet ({enriched_count:,} angereichert)...")
@@ -842,7 +962,8 @@ def main(xml_path, progress_callback=None, check_cancelled=None):
                         # Inline-Anreicherung (direkt am ET.Element)
                         has_changes = _enrich_record_inline(
                             isbn_record_position, elem, current_isbn, norm13, meta,
-                            stats, use_tqdm
+                            stats, use_tqdm, change_log=change_log,
+                            service=isbn_service_cache.get(norm13)
                         )
                         
                         if has_changes:
@@ -859,6 +980,9 @@ def main(xml_path, progress_callback=None, check_cancelled=None):
                 # Abbruchprüfung
                 if check_cancelled and check_cancelled():
                     stats['cancelled'] = True
+                    stats['total_changes'] = change_log.count
+                    stats['metrics'] = metrics.snapshot()
+                    job.finish()
                     out_file.write('</collection>\n')
                     print("\n⛔ Vom Benutzer abgebrochen!")
                     return stats
@@ -882,18 +1006,24 @@ def main(xml_path, progress_callback=None, check_cancelled=None):
             
             # XML Footer
             out_file.write('</collection>\n')
+            stats['total_changes'] = change_log.count
         
+        metrics.record_pass('pass_3', time.perf_counter() - pass_start)
+        stats['metrics'] = metrics.snapshot()
+        job.finish()
         stats['successful_enrichments'] = enriched_count
         stats['processed_records'] = isbn_record_position  # Nur Records mit ISBN
         stats['output_path'] = output_path  # WICHTIG: Statt 'tree' für start.py
         
         print(f"\n✅ Fertig! {enriched_count:,} von {record_position:,} Records angereichert")
         print(f"   Ausgabedatei: {output_path}")
+        print(f"   Änderungsprotokoll: {change_log_path} ({stats['total_changes']:,} Einträge)")
         
     except Exception as e:
         print(f"\n❌ Fehler beim Schreiben: {e}")
         import traceback
         traceback.print_exc()
+        job.finish()
         return None
     
     # Zusammenfassung
@@ -903,7 +1033,14 @@ def main(xml_path, progress_callback=None, check_cancelled=None):
     print(f"Fehler: {stats['failed_enrichments']:,}")
     print(f"Rate-Limit Retries: {stats['rate_limit_retry_1'] + stats['rate_limit_retry_2'] + stats['rate_limit_retry_3']:,}")
     print(f"ISBN nicht gefunden: {stats['isbn_not_found']:,}")
+    print(f"Ungültige ISBN übersprungen: {stats['invalid_isbn_skipped']:,}")
     print(f"Konflikte übersprungen: {stats['conflicts_skipped']:,}")
+    for svc, svc_stats in stats['metrics']['services'].items():
+        latency = svc_stats['latency']
+        print(f"Service {svc}: {svc_stats['requests']:,} Anfragen, Trefferquote {svc_stats['hit_rate_percent']:.1f}%, "
+              f"429: {svc_stats['http_429']:,}, p50/p95/p99: "
+              f"{latency['p50_ms']:.0f}/{latency['p95_ms']:.0f}/{latency['p99_ms']:.0f} ms")
+    print(f"Wartezeit Rate-Limiter: {stats['metrics']['rate_limit_wait_seconds']:.1f} s")
     
     return stats
 
@@ -922,7 +1059,7 @@ def export_stats_to_json(stats: dict, xml_path: str, output_path: str) -> str:
     """
     json_path = output_path.replace(".xml", "_stats.json")
     
-    # Erstelle exportierbare Struktur (ohne tree und change_log für kompakte JSON)
+    # Erstelle exportierbare Struktur (ohne tree; das vollständige Änderungsprotokoll liegt als JSONL daneben)
     export_data = {
         "metadata": {
             "timestamp": datetime.now().isoformat(),
@@ -935,6 +1072,7 @@ def export_stats_to_json(stats: dict, xml_path: str, output_path: str) -> str:
             "successful_enrichments": stats.get('successful_enrichments', 0),
             "failed_enrichments": stats.get('failed_enrichments', 0),
             "isbn_not_found": stats.get('isbn_not_found', 0),
+            "invalid_isbn_skipped": stats.get('invalid_isbn_skipped', 0),
             "conflicts_skipped": stats.get('conflicts_skipped', 0),
             "multi_isbn_warnings": stats.get('multi_isbn_warnings', 0),
         },
@@ -949,9 +1087,16 @@ def export_stats_to_json(stats: dict, xml_path: str, output_path: str) -> str:
             ),
         },
         "field_statistics": stats.get('field_stats', {}),
+        "performance": {
+            "max_workers": stats.get('max_workers', MAX_WORKERS),
+            "rate_limit_seconds": stats.get('rate_limit_seconds', RATE_LIMIT_SECONDS),
+            **stats.get('metrics', {}),
+        },
         "changes": {
-            "total_changes": len(stats.get('change_log', [])),
-            "change_log": stats.get('change_log', [])[:100]  # Nur erste 100 für Übersicht
+            "total_changes": stats.get('total_changes', 0),
+            "change_log_file": (
+                os.path.basename(stats['change_log_path']) if stats.get('change_log_path') else None
+            ),
         }
     }
     
@@ -972,15 +1117,21 @@ def export_stats_to_json(stats: dict, xml_path: str, output_path: str) -> str:
     return json_path
 
 if __name__ == "__main__":
-    # Standarddatei, kann später per Argument angepasst werden
-    xml_path = "example.voebvoll-20241027.xml"
-    if len(sys.argv) > 1:
-        xml_path = sys.argv[1]
+    import argparse
+    parser = argparse.ArgumentParser(description="Metadaten-Anreicherung")
+    # Standarddatei, kann per Argument angepasst werden
+    parser.add_argument("file", nargs="?", default="example.voebvoll-20241027.xml", help="XML-Datei")
+    parser.add_argument("--compress-changes", action="store_true",
+                        help="Änderungsprotokoll gzip-komprimiert schreiben")
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help="Prometheus-Metriken während des Laufs auf diesem Port anbieten")
+    args = parser.parse_args()
+    xml_path = args.file
     if not os.path.exists(xml_path):
         print(f"Datei nicht gefunden: {xml_path}")
         sys.exit(1)
     
-    result = main(xml_path)
+    result = main(xml_path, compress_change_log=args.compress_changes, metrics_port=args.metrics_port)
     if result and not result.get('cancelled'):
         # Optional: XML speichern
         output_path = xml_path.replace(".xml", "_enriched.xml")
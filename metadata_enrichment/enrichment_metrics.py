@@ -0,0 +1,365 @@
+"""
+Leichtgewichtige Laufzeit-Metriken für die Metadaten-Anreicherung.
+
+Erfasst pro isbnlib-Service Anzahl Anfragen, Treffer, Fehler, 429-Antworten und
+ein Latenz-Histogramm (p50/p95/p99), dazu die Wartezeit im Rate-Limiter, die
+Backoff-Zeit und die Laufzeit der einzelnen Pässe. Die Werte dienen dazu,
+``MAX_WORKERS`` und ``RATE_LIMIT_SECONDS`` anhand echter Messdaten einzustellen.
+"""
+
+import bisect
+import os
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+# Histogramm-Grenzen in Sekunden: geometrisch von 1 ms bis ca. 2 min (Faktor 1,25)
+_BUCKET_FACTOR = 1.25
+LATENCY_BUCKETS: List[float] = []
+_bound = 0.001
+while _bound < 120.0:
+    LATENCY_BUCKETS.append(_bound)
+    _bound *= _BUCKET_FACTOR
+del _bound
+
+
+class LatencyHistogram:
+    """Histogramm mit festen, logarithmischen Buckets (nicht threadsicher).
+
+    Perzentile werden aus den Bucket-Grenzen interpoliert; der relative Fehler
+    ist durch den Bucket-Faktor (25 %) begrenzt. Speicherbedarf ist konstant.
+    """
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float) -> None:
+        """Fügt eine Messung (in Sekunden) hinzu."""
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, q: float) -> float:
+        """Liefert das (interpolierte) q-Perzentil in Sekunden, q in [0, 1]."""
+        if self.count == 0:
+            return 0.0
+        rank = q * self.count
+        cumulative = 0
+        for i, c in enumerate(self.counts):
+            if c and cumulative + c >= rank:
+                lower = LATENCY_BUCKETS[i - 1] if i > 0 else 0.0
+                upper = LATENCY_BUCKETS[i] if i < len(LATENCY_BUCKETS) else self.max
+                fraction = (rank - cumulative) / c
+                return min(lower + (upper - lower) * fraction, self.max)
+            cumulative += c
+        return self.max
+
+    def summary(self) -> Dict[str, float]:
+        """Kompakte Zusammenfassung in Millisekunden."""
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total / self.count * 1000, 2) if self.count else 0.0,
+            "p50_ms": round(self.percentile(0.50) * 1000, 2),
+            "p95_ms": round(self.percentile(0.95) * 1000, 2),
+            "p99_ms": round(self.percentile(0.99) * 1000, 2),
+            "max_ms": round(self.max * 1000, 2),
+        }
+
+
+class _ServiceStats:
+    __slots__ = ("requests", "hits", "misses", "errors", "http_429", "latency")
+
+    def __init__(self):
+        self.requests = 0
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self.http_429 = 0
+        self.latency = LatencyHistogram()
+
+
+class EnrichmentMetrics:
+    """Threadsichere Sammlung aller Laufzeit-Metriken eines Anreicherungslaufs."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        """Setzt alle Metriken zurück (zu Beginn eines Laufs)."""
+        with self._lock:
+            self._services: Dict[str, _ServiceStats] = {}
+            self.cache_hits = 0
+            self.cache_lookups = 0
+            self.in_flight = 0
+            self.rate_limit_waits = 0
+            self.rate_limit_wait_seconds = 0.0
+            self.backoff_waits = 0
+            self.backoff_wait_seconds = 0.0
+            self.pass_seconds: Dict[str, float] = {}
+
+    def begin_request(self) -> None:
+        """Markiert den Start einer Anfrage (für die In-Flight-Anzeige)."""
+        with self._lock:
+            self.in_flight += 1
+
+    def record_request(self, service: str, seconds: float, outcome: str) -> None:
+        """Erfasst eine (mit ``begin_request`` gestartete) Service-Anfrage.
+
+        Args:
+            service: isbnlib-Service (z.B. 'dnb', 'goob')
+            seconds: Dauer der Anfrage
+            outcome: 'hit', 'miss', 'error' oder '429'
+        """
+        with self._lock:
+            self.in_flight = max(0, self.in_flight - 1)
+            svc = self._services.get(service)
+            if svc is None:
+                svc = self._services[service] = _ServiceStats()
+            svc.requests += 1
+            svc.latency.observe(seconds)
+            if outcome == "hit":
+                svc.hits += 1
+            elif outcome == "miss":
+                svc.misses += 1
+            elif outcome == "429":
+                svc.http_429 += 1
+                svc.errors += 1
+            else:
+                svc.errors += 1
+
+    def record_cache_lookup(self, hit: bool) -> None:
+        """Erfasst einen Zugriff auf den ISBN-Cache."""
+        with self._lock:
+            self.cache_lookups += 1
+            if hit:
+                self.cache_hits += 1
+
+    def record_rate_limit_wait(self, seconds: float) -> None:
+        """Erfasst Wartezeit im globalen Rate-Limiter."""
+        with self._lock:
+            self.rate_limit_waits += 1
+            self.rate_limit_wait_seconds += seconds
+
+    def record_backoff(self, seconds: float) -> None:
+        """Erfasst Wartezeit durch Retry-Backoff."""
+        with self._lock:
+            self.backoff_waits += 1
+            self.backoff_wait_seconds += seconds
+
+    def record_pass(self, name: str, seconds: float) -> None:
+        """Erfasst die Laufzeit (Wall-Clock) eines Passes."""
+        with self._lock:
+            self.pass_seconds[name] = self.pass_seconds.get(name, 0.0) + seconds
+
+    def latency_histograms(self) -> Dict[str, Tuple[List[int], float, int]]:
+        """Kopie der Latenz-Histogramme je Service: (Bucket-Zähler, Summe in s, Anzahl)."""
+        with self._lock:
+            return {
+                name: (list(svc.latency.counts), svc.latency.total, svc.latency.count)
+                for name, svc in sorted(self._services.items())
+            }
+
+    def snapshot(self) -> Dict[str, Any]:
+        """JSON-serialisierbare Momentaufnahme aller Metriken."""
+        with self._lock:
+            services = {}
+            for name, svc in sorted(self._services.items()):
+                services[name] = {
+                    "requests": svc.requests,
+                    "hits": svc.hits,
+                    "misses": svc.misses,
+                    "errors": svc.errors,
+                    "http_429": svc.http_429,
+                    "hit_rate_percent": round(svc.hits / svc.requests * 100, 2) if svc.requests else 0.0,
+                    "latency": svc.latency.summary(),
+                }
+            return {
+                "services": services,
+                "cache_hits": self.cache_hits,
+                "cache_lookups": self.cache_lookups,
+                "rate_limit_waits": self.rate_limit_waits,
+                "rate_limit_wait_seconds": round(self.rate_limit_wait_seconds, 3),
+                "backoff_waits": self.backoff_waits,
+                "backoff_wait_seconds": round(self.backoff_wait_seconds, 3),
+                "pass_wall_time_seconds": {k: round(v, 3) for k, v in self.pass_seconds.items()},
+            }
+
+
+def current_rss_bytes() -> Optional[int]:
+    """Aktueller Arbeitsspeicher (RSS) des Prozesses in Bytes, falls ermittelbar."""
+    try:
+        import psutil  # optional
+        return psutil.Process(os.getpid()).memory_info().rss
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux liefert KiB, macOS Bytes; dient nur als Näherung (Spitzenwert)
+        return peak if sys.platform == "darwin" else peak * 1024
+    except ImportError:
+        return None
+
+
+class JobProgress:
+    """Live-Fortschritt eines laufenden Jobs für den ``/metrics``-Endpunkt.
+
+    Die Zähler werden vom Job selbst fortgeschrieben; Raten (Records/s,
+    ISBNs/s) werden beim Abruf aus der Laufzeit berechnet.
+    """
+
+    def __init__(self, name: str, service_metrics: Optional[EnrichmentMetrics] = None):
+        self.name = name
+        self.service_metrics = service_metrics
+        self.started = time.monotonic()
+        self.finished = False
+        self.records = 0
+        self.isbns = 0
+        self.in_flight = 0
+        self.cache_hits = 0
+        self.cache_lookups = 0
+        self.queue_depths: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def add_records(self, n: int = 1) -> None:
+        with self._lock:
+            self.records += n
+
+    def add_isbns(self, n: int = 1) -> None:
+        with self._lock:
+            self.isbns += n
+
+    def add_in_flight(self, delta: int) -> None:
+        with self._lock:
+            self.in_flight += delta
+
+    def record_cache_lookup(self, hit: bool) -> None:
+        with self._lock:
+            self.cache_lookups += 1
+            if hit:
+                self.cache_hits += 1
+
+    def set_queue_depth(self, queue: str, depth: int) -> None:
+        with self._lock:
+            self.queue_depths[queue] = depth
+
+    def finish(self) -> None:
+        """Markiert den Job als beendet (Werte bleiben abrufbar)."""
+        with self._lock:
+            self.finished = True
+            self.in_flight = 0
+            self.queue_depths = {k: 0 for k in self.queue_depths}
+
+
+_jobs: Dict[str, JobProgress] = {}
+_jobs_lock = threading.Lock()
+
+
+def register_job(name: str, service_metrics: Optional[EnrichmentMetrics] = None) -> JobProgress:
+    """Legt einen neuen Job-Fortschritt an (ersetzt einen gleichnamigen Vorgänger)."""
+    job = JobProgress(name, service_metrics)
+    with _jobs_lock:
+        _jobs[name] = job
+    return job
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    parts = []
+    for key, value in sorted(labels.items()):
+        value = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        parts.append(f'{key}="{value}"')
+    return "{" + ",".join(parts) + "}"
+
+
+def render_prometheus() -> str:
+    """Rendert alle registrierten Jobs im Prometheus-Textformat (Version 0.0.4)."""
+    families: Dict[str, Any] = {}
+
+    def add(name, kind, help_text, value, sample_suffix="", **labels):
+        family = families.setdefault(name, (kind, help_text, []))
+        family[2].append((sample_suffix, labels, value))
+
+    with _jobs_lock:
+        jobs = list(_jobs.values())
+
+    for job in jobs:
+        with job._lock:
+            elapsed = max(time.monotonic() - job.started, 1e-9)
+            records, isbns = job.records, job.isbns
+            in_flight = job.in_flight
+            cache_hits, cache_lookups = job.cache_hits, job.cache_lookups
+            queue_depths = dict(job.queue_depths)
+            finished = job.finished
+
+        svc_snapshot = None
+        if job.service_metrics is not None:
+            in_flight += job.service_metrics.in_flight
+            svc_snapshot = job.service_metrics.snapshot()
+            cache_hits += svc_snapshot["cache_hits"]
+            cache_lookups += svc_snapshot["cache_lookups"]
+
+        add("fhp_job_running", "gauge", "1 solange der Job läuft, 0 danach", 0 if finished else 1, job=job.name)
+        add("fhp_job_elapsed_seconds", "gauge", "Laufzeit des Jobs in Sekunden", round(elapsed, 3), job=job.name)
+        add("fhp_records_processed_total", "counter", "Verarbeitete MARC-Records", records, job=job.name)
+        add("fhp_records_per_second", "gauge", "Durchschnittliche Records pro Sekunde",
+            round(records / elapsed, 3), job=job.name)
+        add("fhp_isbns_processed_total", "counter", "Verarbeitete ISBNs", isbns, job=job.name)
+        add("fhp_isbns_per_second", "gauge", "Durchschnittliche ISBNs pro Sekunde",
+            round(isbns / elapsed, 3), job=job.name)
+        add("fhp_in_flight_requests", "gauge", "Laufende API-Anfragen", in_flight, job=job.name)
+        for queue_name, depth in sorted(queue_depths.items()):
+            add("fhp_queue_depth", "gauge", "Wartende Einträge je Queue", depth, job=job.name, queue=queue_name)
+        add("fhp_cache_lookups_total", "counter", "Cache-Zugriffe", cache_lookups, job=job.name)
+        add("fhp_cache_hits_total", "counter", "Cache-Treffer", cache_hits, job=job.name)
+        add("fhp_cache_hit_ratio", "gauge", "Anteil Cache-Treffer (0-1)",
+            round(cache_hits / cache_lookups, 4) if cache_lookups else 0, job=job.name)
+
+        if svc_snapshot is not None:
+            for svc, data in svc_snapshot["services"].items():
+                add("fhp_service_requests_total", "counter", "API-Anfragen je Service",
+                    data["requests"], job=job.name, service=svc)
+                add("fhp_service_http_429_total", "counter", "429-Antworten je Service",
+                    data["http_429"], job=job.name, service=svc)
+                add("fhp_service_errors_total", "counter", "Fehlgeschlagene Anfragen je Service",
+                    data["errors"], job=job.name, service=svc)
+            for svc, (counts, total, count) in job.service_metrics.latency_histograms().items():
+                # Prometheus-Histogramm: kumulative Bucket-Zähler, Summe und Anzahl
+                cumulative = 0
+                for bound, bucket_count in zip(LATENCY_BUCKETS, counts):
+                    cumulative += bucket_count
+                    add("fhp_service_latency_seconds", "histogram", "Latenz der API-Anfragen je Service",
+                        cumulative, "_bucket", job=job.name, service=svc, le=format(bound, ".6g"))
+                add("fhp_service_latency_seconds", "histogram", "Latenz der API-Anfragen je Service",
+                    count, "_bucket", job=job.name, service=svc, le="+Inf")
+                add("fhp_service_latency_seconds", "histogram", "Latenz der API-Anfragen je Service",
+                    round(total, 6), "_sum", job=job.name, service=svc)
+                add("fhp_service_latency_seconds", "histogram", "Latenz der API-Anfragen je Service",
+                    count, "_count", job=job.name, service=svc)
+            add("fhp_rate_limit_wait_seconds_total", "counter", "Wartezeit im Rate-Limiter",
+                svc_snapshot["rate_limit_wait_seconds"], job=job.name)
+
+    rss = current_rss_bytes()
+    if rss is not None:
+        add("process_resident_memory_bytes", "gauge", "Resident Set Size des Prozesses", rss)
+
+    lines = []
+    for name, (kind, help_text, samples) in families.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for sample_suffix, labels, value in samples:
+            lines.append(f"{name}{sample_suffix}{_format_labels(labels)} {value}")
+    return "\n".join(lines) + "\n"
@@ -4,14 +4,35 @@
 Webserver für die Anreicherungsstatistik-Anzeige.
 
 Startet einen lokalen HTTP-Server und stellt eine interaktive Webseite
-mit den Anreicherungsstatistiken bereit.
+mit den Anreicherungsstatistiken bereit. Zusätzlich kann während eines
+laufenden Jobs ein ``/metrics``-Endpunkt im Prometheus-Textformat
+bereitgestellt werden (siehe ``start_metrics_server``).
 """
 
 import json
 import os
-from http.server import HTTPServer, BaseHTTPRequestHandler
+import sys
+import threading
+from http.server import HTTPServer, ThreadingHTTPServer, BaseHTTPRequestHandler
+from pathlib import Path
 from urllib.parse import urlparse
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from metadata_enrichment.enrichment_metrics import render_prometheus
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+DEFAULT_METRICS_PORT = 9108
+
+
+def _send_metrics(handler: BaseHTTPRequestHandler) -> None:
+    """Sendet die aktuellen Job-Metriken im Prometheus-Textformat."""
+    body = render_prometheus().encode('utf-8')
+    handler.send_response(200)
+    handler.send_header('Content-type', PROMETHEUS_CONTENT_TYPE)
+    handler.send_header('Content-Length', str(len(body)))
+    handler.end_headers()
+    handler.wfile.write(body)
+
 
 class StatsRequestHandler(BaseHTTPRequestHandler):
     """HTTP Request Handler für Statistik-Anzeige."""
@@ -48,6 +69,10 @@ class StatsRequestHandler(BaseHTTPRequestHandler):
                 error_data = json.dumps({"error": str(e)})
                 self.wfile.write(error_data.encode('utf-8'))
         
+        elif parsed_path.path == '/metrics':
+            # Live-Metriken laufender Jobs (Prometheus-Textformat)
+            _send_metrics(self)
+        
         elif parsed_path.path.startswith('/charts/'):
             # Diagramm-Bilder ausliefern
             chart_name = parsed_path.path[8:]  # Entferne '/charts/'
@@ -391,6 +416,46 @@ class StatsRequestHandler(BaseHTTPRequestHandler):
 </html>"""
 
 
+class MetricsRequestHandler(BaseHTTPRequestHandler):
+    """Minimaler Handler, der nur ``/metrics`` ausliefert (für Headless-Läufe)."""
+    
+    def log_message(self, format, *args):
+        """Keine Konsolenausgabe pro Scrape."""
+        pass
+    
+    def do_GET(self):
+        """Handle GET requests."""
+        if urlparse(self.path).path == '/metrics':
+            _send_metrics(self)
+        else:
+            self.send_response(404)
+            self.send_header('Content-type', 'text/plain')
+            self.end_headers()
+            self.wfile.write(b'Not found - use /metrics')
+
+
+def start_metrics_server(port: int = DEFAULT_METRICS_PORT, host: str = 'localhost') -> ThreadingHTTPServer:
+    """
+    Startet den Prometheus-Metrik-Endpunkt in einem Hintergrund-Thread.
+    
+    Der Server läuft, bis ``shutdown()`` auf dem Rückgabewert aufgerufen wird
+    oder der Prozess endet (Daemon-Thread).
+    
+    Args:
+        port: Port für den Endpunkt (0 = freien Port wählen)
+        host: Bind-Adresse (default: localhost)
+        
+    Returns:
+        Der laufende Server (``server.server_address`` enthält den Port)
+    """
+    server = ThreadingHTTPServer((host, port), MetricsRequestHandler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, name='metrics-server', daemon=True)
+    thread.start()
+    print(f"✓ Metrik-Endpunkt läuft auf http://{host}:{server.server_address[1]}/metrics")
+    return server
+
+
 def start_stats_server(stats_file_path: str, charts_dir_path: str, port: int = 8080):
     """
     Startet einen HTTP-Server für die Statistik-Anzeige.
@@ -119,6 +119,7 @@ class StatisticsDialog:
         right_col.pack(side=tk.RIGHT, fill=tk.BOTH, expand=True, padx=(20, 0))
         
         self._add_stat_row(right_col, "ISBN nicht gefunden:", str(self.stats.get('isbn_not_found', 0)))
+        self._add_stat_row(right_col, "Ungültige ISBN übersprungen:", str(self.stats.get('invalid_isbn_skipped', 0)))
         self._add_stat_row(right_col, "Konflikte übersprungen:", str(self.stats.get('conflicts_skipped', 0)))
         
         # Erfolgsrate prominent anzeigen
@@ -396,7 +396,10 @@ def main() -> None:
         ("ISBN prüfen", "data_quality/check_isbn.py"),
         ("Leader prüfen", "data_quality/check_leader.py"),
         ("Datum prüfen", "data_quality/check_date_field.py"),
+        ("Regeln prüfen (YAML)", "data_quality/check_rules.py"),
         ("Doppelte ISBN/ISSN prüfen", "data_quality/check_duplicate_identifiers.py"),
+        ("Identische Datensätze prüfen", "data_quality/check_record_duplicates.py"),
+        ("Ähnliche Datensätze prüfen", "data_quality/check_near_duplicates.py"),
         ("ISIL-Codes validieren", "data_quality/validate_isil_codes.py"),
         ("Besitznachweise zählen", "data_analysis/analyze_possession_counts.py"),
         ("Sprachcodes korrigieren+anreichern", "data_processing/enrich_language.py"),
@@ -0,0 +1,63 @@
+from pathlib import Path
+import textwrap
+import sys
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from data_analysis.analyze_elements_list import parse_marc21, scan_elements
+
+SAMPLE_XML = textwrap.dedent(
+    """
+    <collection xmlns:marc="http://www.loc.gov/MARC21/slim">
+    <record>
+    <leader>01234cam  22002771i 4500</leader>
+    <controlfield tag="001">1</controlfield>
+    <controlfield tag="008">991231s2005    nyuuun              ger</controlfield>
+    <datafield tag="245" ind1="0" ind2="4">
+      <subfield code="a">Titel</subfield>
+    </datafield>
+    <datafield ind2=" " ind1="1" tag="100">
+      <subfield code="a">Autor</subfield>
+    </datafield>
+    </record>
+    <marc:record>
+    <marc:controlfield tag='001'>2</marc:controlfield>
+    <marc:datafield tag="653" ind1=" " ind2="&#x36;">
+      <marc:subfield code="a">Schlagwort</marc:subfield>
+    </marc:datafield>
+    </marc:record>
+    </collection>
+    """
+).strip()
+
+
+def test_scan_elements(tmp_path):
+    xml_file = tmp_path / "sample.xml"
+    xml_file.write_text(SAMPLE_XML, encoding="utf-8")
+
+    expected = {
+        ("001", "", ""),
+        ("008", "", ""),
+        ("245", "0", "4"),
+        ("100", "1", " "),
+        ("653", " ", "6"),
+    }
+    assert scan_elements(str(xml_file)) == expected
+
+    # Bereiche dürfen mitten in einem Tag beginnen oder enden
+    size = xml_file.stat().st_size
+    for split in range(1, size, 7):
+        assert scan_elements(str(xml_file), 0, split) | scan_elements(str(xml_file), split) == expected
+
+
+def test_parse_marc21(tmp_path):
+    xml_file = tmp_path / "sample.xml"
+    xml_file.write_text(SAMPLE_XML, encoding="utf-8")
+    out = tmp_path / "elements_list.txt"
+
+    parse_marc21(str(xml_file), str(out))
+
+    lines = out.read_text(encoding="utf-8").splitlines()
+    assert len(lines) == 5
+    assert lines[0].startswith('<controlfield tag="001"> -> ')
+    assert lines[2].startswith('<datafield tag="100" ind1="1" ind2=" "> -> ')
@@ -5,7 +5,14 @@ import sys
 
 sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
 
-from data_analysis.analyze_elements_quantity import parse_008_field, parse_marc21_quantity
+from data_analysis.analyze_elements_quantity import (
+    count_elements,
+    merge_counts,
+    parse_008_field,
+    parse_marc21_quantity,
+)
+from utilities.dense_counter import DenseCounter
+from utilities.record_offsets import collection_namespaces, iter_record_bytes, parse_record
 
 SAMPLE_XML = textwrap.dedent(
     """
@@ -272,6 +279,10 @@ SAMPLE_XML = textwrap.dedent(
     """
 ).strip()
 
+def _read_rows(path):
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        return list(csv.reader(f, delimiter=";"))
+
 def test_parse_008_field():
     example = "991231s2005    nyuuun              ger"
     result = parse_008_field(example)
@@ -307,3 +318,52 @@ def test_parse_marc21_quantity(tmp_path):
         details = list(csv.reader(f, delimiter=";"))
     assert details[1] == ['Eingabedatum', '4', '100.00%', '100.00%']
     assert details[2][0] == 'Publikationsstatus'
+
+
+def test_sharded_counts_match_single_pass(tmp_path):
+    xml_file = tmp_path / "sample.xml"
+    xml_file.write_text(SAMPLE_XML, encoding="utf-8")
+    size = xml_file.stat().st_size
+
+    single = count_elements(str(xml_file))
+    bounds = [0, size // 3, size // 2, size]
+    sharded = merge_counts(
+        count_elements(str(xml_file), begin, stop) for begin, stop in zip(bounds[:-1], bounds[1:])
+    )
+
+    assert sharded['records'] == single['records'] == 4
+    for key in ('elements', 'details_008', 'details_969', 'pub_status', 'pub_country', 'language'):
+        assert sharded[key].most_common() == single[key].most_common()
+
+
+def test_dense_counter_merge_keeps_first_seen_order():
+    first = DenseCounter()
+    first.update(["b", "a"])
+    first.add("a")
+    second = DenseCounter()
+    second.update(["c", "b"])
+
+    first.merge(second)
+
+    assert first.items() == [("b", 2), ("a", 2), ("c", 1)]
+    assert first.most_common() == [("b", 2), ("a", 2), ("c", 1)]
+
+
+def test_default_namespace_dump_parses_like_iterparse(tmp_path):
+    xml_file = tmp_path / "sample.xml"
+    xml_file.write_text(
+        SAMPLE_XML.replace('xmlns:marc="http://www.loc.gov/MARC21/slim"', 'xmlns="http://www.loc.gov/MARC21/slim"'),
+        encoding="utf-8",
+    )
+    namespaces = collection_namespaces(str(xml_file))
+    assert namespaces == {"": "http://www.loc.gov/MARC21/slim"}
+    _, _, data = next(iter_record_bytes(str(xml_file)))
+    assert parse_record(data, namespaces).tag == "{http://www.loc.gov/MARC21/slim}record"
+
+    out_csv = tmp_path / "result.csv"
+    parse_marc21_quantity(str(xml_file), str(out_csv))
+
+    data = {row[0]: row[2] for row in _read_rows(out_csv)[1:]}
+    assert data['<datafield tag="969" ind1="#" ind2="#">'] == '4'
+    # parse_969_field looks for unqualified subfields, so namespaced 969 fields yield no details
+    assert _read_rows(out_csv.with_name(out_csv.stem + "_969_details.csv"))[1:] == []
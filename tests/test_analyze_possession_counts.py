@@ -0,0 +1,85 @@
+import csv
+import os
+from pathlib import Path
+import sys
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from data_analysis.analyze_bib_counts_stats import count_occurrences, load_distribution, read_distribution
+from data_analysis.analyze_possession_counts import (
+    analyze_possession_counts,
+    count_049_tags,
+    distribution_file,
+    top_file,
+    write_distribution,
+)
+
+
+def _record(record_id: str, holdings: int) -> str:
+    fields = "".join(
+        f'<datafield tag="049" ind1=" " ind2=" "><subfield code="a">DE-{i}</subfield></datafield>'
+        for i in range(holdings)
+    )
+    return f'<record><controlfield tag="001">{record_id}</controlfield>{fields}</record>\n'
+
+
+COUNTS = [("A", 1), ("B", 3), ("C", 0), ("D", 3), ("E", 1), ("F&amp;G", 2)]
+SAMPLE_XML = (
+    '<collection xmlns:marc="http://www.loc.gov/MARC21/slim">\n'
+    + "".join(_record(record_id, n) for record_id, n in COUNTS)
+    + "<record><datafield tag='049' ind1=' ' ind2=' '/></record>\n</collection>\n"
+)
+
+
+def test_streaming_histogram_and_top_k(tmp_path):
+    xml_file = tmp_path / "sample.xml"
+    xml_file.write_text(SAMPLE_XML, encoding="utf-8")
+
+    stats = analyze_possession_counts(str(xml_file), top_k=3)
+
+    assert stats.total_records == 7
+    assert stats.total_049 == 11
+    assert stats.distribution() == {0: 1, 1: 3, 2: 1, 3: 2}
+    # Ties keep file order, like the sorted per-record CSV
+    assert stats.top() == [("B", 3), ("D", 3), ("F&G", 2)]
+
+
+def test_full_csv_via_external_sort(tmp_path):
+    xml_file = tmp_path / "sample.xml"
+    xml_file.write_text(SAMPLE_XML, encoding="utf-8")
+    out = tmp_path / "possession_counts.csv"
+
+    stats = count_049_tags(str(xml_file), str(out), max_memory_mb=0.0001, tmp_dir=str(tmp_path))
+
+    with open(out, newline="", encoding="utf-8-sig") as f:
+        rows = list(csv.reader(f, delimiter=";"))
+    assert rows == [
+        ["Datensatz ID", "Anzahl 049"],
+        ["B", "3"], ["D", "3"], ["F&G", "2"], ["A", "1"], ["E", "1"], ["Unknown", "1"], ["C", "0"],
+    ]
+    assert count_occurrences(str(out), 1) == 3
+
+    write_distribution(stats, distribution_file(str(out)))
+    assert load_distribution(distribution_file(str(out))) == {0: 1, 1: 3, 2: 1, 3: 2}
+    assert read_distribution(str(out)) == {0: 1, 1: 3, 2: 1, 3: 2}
+
+
+def test_stale_distribution_is_ignored(tmp_path):
+    out = tmp_path / "possession_counts.csv"
+    out.write_text("Datensatz ID;Anzahl 049\nA;5\n", encoding="utf-8-sig")
+    summary = Path(distribution_file(str(out)))
+    summary.write_text("Anzahl 049;Datensätze\n1;7\n", encoding="utf-8-sig")
+
+    os.utime(out, (summary.stat().st_mtime - 10,) * 2)
+    assert read_distribution(str(out)) == {1: 7}
+    os.utime(out, (summary.stat().st_mtime + 10,) * 2)
+    assert read_distribution(str(out)) == {5: 1}
+    out.unlink()
+    assert read_distribution(str(out)) == {1: 7}
+
+
+def test_sidecar_names_never_equal_the_output():
+    assert distribution_file("out/counts.csv") == str(Path("out/counts_distribution.csv"))
+    assert top_file("out/counts.csv") == str(Path("out/counts_top.csv"))
+    assert len({"counts", distribution_file("counts"), top_file("counts")}) == 3
+    assert distribution_file("data.csv/counts") == str(Path("data.csv/counts_distribution.csv"))
@@ -0,0 +1,57 @@
+from pathlib import Path
+import sys
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import data_analysis.analyze_value_profiles as value_profiles
+from data_analysis.analyze_value_profiles import profile_rows, profile_values
+
+
+def _record(number: int) -> str:
+    placeholder = number % 4 == 0
+    leader = "01234cam  2200000 i 4500" if placeholder else f"{number:05d}nam  2200000 i 4500"
+    date = "991231" if placeholder else f"{200101 + number % 28:06d}"
+    language = "Deutsch" if placeholder else f"l{number:02d}"
+    return (
+        f"<marc:record><marc:leader>{leader}</marc:leader>"
+        f'<marc:controlfield tag="001">{number}</marc:controlfield>'
+        f'<marc:controlfield tag="008">{date}s2001    gw            000 0 ger d</marc:controlfield>'
+        f'<marc:datafield tag="041" ind1=" " ind2=" "><marc:subfield code="a">{language}</marc:subfield></marc:datafield>'
+        f'<marc:datafield tag="245" ind1="1" ind2="0"><marc:subfield code="a">Titel {number} &amp; mehr</marc:subfield>'
+        f'<marc:subfield code="c">x</marc:subfield></marc:datafield>'
+        "</marc:record>\n"
+    )
+
+
+def _dump(tmp_path: Path, records: int = 400) -> Path:
+    path = tmp_path / "sample.xml"
+    body = "".join(_record(number) for number in range(records))
+    path.write_text(f'<marc:collection xmlns:marc="http://www.loc.gov/MARC21/slim">\n{body}</marc:collection>\n', encoding="utf-8")
+    return path
+
+
+def test_profiles_per_tag_and_code(tmp_path, monkeypatch):
+    # Small blocks: the field state must survive block boundaries
+    monkeypatch.setattr(value_profiles, "SCAN_CHUNK_BYTES", 1000)
+    profiles = profile_values(str(_dump(tmp_path)), top_k=3)
+
+    assert profiles[("001", "")].total == 400
+    assert profiles[("001", "")].top() == []  # no value repeats
+    assert profiles[("245", "c")].top() == [(b"x", 400, 400)]
+    assert profiles[("041", "a")].top()[0] == (b"Deutsch", 100, 100)
+    assert profiles[("008", "Pos. 00-05")].top()[0] == (b"991231", 100, 100)
+    assert profiles[("LDR", "Pos. 00-07")].top()[0] == (b"01234cam", 100, 100)
+    assert round(profiles[("245", "a")].distinct_count()) == 400
+
+
+def test_dominant_values_are_flagged(tmp_path):
+    rows = profile_rows(profile_values(str(_dump(tmp_path))))
+    flagged = {(row[0], row[1], row[5]) for row in rows if row[-1]}
+
+    assert flagged == {
+        ("LDR", "Pos. 00-07", "01234cam"),
+        ("LDR", "", "01234cam  2200000 i 4500"),
+        ("041", "a", "Deutsch"),
+    }
+    # 008/00-05 has too few distinct values in this sample to count as varied
+    assert ("008", "Pos. 00-05", "991231", "") in {(row[0], row[1], row[5], row[-1]) for row in rows}
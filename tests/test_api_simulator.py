@@ -0,0 +1,107 @@
+"""
+Tests für api_simulator.py - lokaler Simulator mit Störungseinspielung
+"""
+
+import json
+import os
+import sys
+import unittest
+import urllib.error
+import urllib.request
+from pathlib import Path
+from unittest.mock import patch
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from api_simulator import ApiSimulator, FaultProfile, isbn10_to_isbn13, start_simulator
+from data_quality.check_isbn import isbn_exists
+from utilities.api_endpoints import (
+    API_BASE_URL_ENV,
+    google_books_volumes_url,
+    redirect_isbnlib_services,
+    restore_isbnlib_services,
+)
+
+
+class TestFaultDecisions(unittest.TestCase):
+    """Tests für die Störungsentscheidungen ohne HTTP"""
+
+    def test_burst_of_429(self):
+        """Test: Nach burst_every Anfragen folgen burst_length 429-Antworten"""
+        sim = ApiSimulator(faults=FaultProfile(burst_every=5, burst_length=2, retry_after=3))
+        outcomes = [sim.decide("dnb")[0] for _ in range(12)]
+        self.assertEqual(outcomes[:5], ["ok"] * 5)
+        self.assertEqual(outcomes[5:7], ["http_429"] * 2)
+        self.assertEqual(outcomes[7:10], ["ok"] * 3)
+        self.assertEqual(outcomes[10:12], ["http_429"] * 2)
+        self.assertEqual(sim.decide("goob")[0], "ok")  # Zähler pro Service
+
+    def test_outage_window_and_service_override(self):
+        """Test: Ausfallfenster gilt nur für den überschriebenen Service"""
+        sim = ApiSimulator(service_faults={"sigel": FaultProfile(outages=[(0, 60)])})
+        self.assertEqual(sim.decide("sigel")[0], "outage")
+        self.assertEqual(sim.decide("dnb")[0], "ok")
+
+    def test_seeded_latency_is_reproducible(self):
+        """Test: Gleiche Saat liefert gleiche Latenzen"""
+        profile = FaultProfile(latency="lognormal", latency_ms=100, latency_sigma=0.8)
+        a = [ApiSimulator(faults=profile, seed=7).decide("dnb")[1] for _ in range(3)]
+        self.assertEqual(len(set(a)), 1)
+        self.assertGreater(a[0], 0)
+
+    def test_isbn10_is_mapped_to_isbn13(self):
+        """Test: ISBN-10-Anfragen treffen die ISBN-13-Fixtures"""
+        self.assertEqual(isbn10_to_isbn13("3453350618"), "9783453350618")
+
+
+class TestSimulatorServer(unittest.TestCase):
+    """Tests gegen den laufenden Simulator"""
+
+    def setUp(self):
+        self.server = start_simulator(seed=1)
+        self.base_url = self.server.base_url
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_isbn_exists_uses_simulator(self):
+        """Test: check_isbn.isbn_exists folgt FHP_API_BASE_URL"""
+        with patch.dict(os.environ, {API_BASE_URL_ENV: self.base_url}):
+            self.assertTrue(google_books_volumes_url().startswith(self.base_url))
+            self.assertTrue(isbn_exists("3453350618"))
+            self.assertFalse(isbn_exists("9783161484100"))
+        stats = self.server.simulator.stats()["google_books"]
+        self.assertEqual(stats["ok"], 1)
+        self.assertEqual(stats["not_found"], 1)
+
+    def test_sigel_and_retry_after(self):
+        """Test: SIGEL-Antwortformat und 429 mit Retry-After"""
+        with urllib.request.urlopen(f"{self.base_url}/api/org/DE-202.jsonld", timeout=5) as resp:
+            data = json.loads(resp.read().decode())
+        self.assertEqual(data["member"][0]["name"], "Beispielbibliothek Berlin")
+
+        self.server.simulator.service_faults["sigel"] = FaultProfile(rate_429=1.0, retry_after=4)
+        with self.assertRaises(urllib.error.HTTPError) as ctx:
+            urllib.request.urlopen(f"{self.base_url}/api/org/DE-202.jsonld", timeout=5)
+        self.assertEqual(ctx.exception.code, 429)
+        self.assertEqual(ctx.exception.headers["Retry-After"], "4")
+
+    def test_isbnlib_services_are_redirected(self):
+        """Test: isbnlib-Abfragen (goob, openl) landen beim Simulator"""
+        import isbnlib
+
+        previous = redirect_isbnlib_services(self.base_url)
+        try:
+            goob = isbnlib.meta("9780306406157", service="goob")
+            openl = isbnlib.meta("9780306406157", service="openl")
+        finally:
+            restore_isbnlib_services(previous)
+
+        self.assertEqual(goob["Title"], "Sample Title")
+        self.assertEqual(openl["Publisher"], "Plenum Press")
+        self.assertTrue(isbnlib._goob.SERVICE_URL.startswith("https://www.googleapis.com"))
+
+
+if __name__ == '__main__':
+    unittest.main()
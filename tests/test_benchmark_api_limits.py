@@ -197,5 +197,49 @@ class TestBenchmarkRecommendations(unittest.TestCase):
         self.assertAlmostEqual(estimated_hours, 55.56, places=1)
 
 
+
+@unittest.skipUnless(BENCHMARK_AVAILABLE, "benchmark_api_limits.py noch nicht implementiert")
+class TestSweepAndRecommendation(unittest.TestCase):
+    """Tests für Gittersuche und Empfehlung mit austauschbarer Abruffunktion"""
+
+    def test_429_rate_is_measured(self):
+        """Test: 429-Fehler werden getrennt von anderen Fehlern gezählt"""
+        from benchmark_api_limits import run_sweep
+
+        calls = []
+
+        def flaky_fetch(isbn):
+            calls.append(isbn)
+            if len(calls) % 2 == 0:
+                raise Exception("HTTP Error 429: Too Many Requests")
+            return {"Title": "Test"}
+
+        results = run_sweep([2], [0.01], ["9783453350618"], 0.3, fetch_func=flaky_fetch)
+
+        self.assertEqual(len(results), 1)
+        result = results[0]
+        self.assertGreater(result['http_429'], 0)
+        self.assertEqual(result['errors'], 0)
+        self.assertAlmostEqual(result['rate_429'], 0.5, delta=0.1)
+        self.assertIn('p95_ms', result['latency_ms'])
+
+    def test_recommendation_skips_unsafe_configurations(self):
+        """Test: Schnellste Konfiguration mit 429-Fehlern wird nicht empfohlen"""
+        from benchmark_api_limits import recommend_configuration
+
+        results = [
+            {'max_workers': 4, 'rate_limit_seconds': 0.1, 'requests_made': 50,
+             'requests_per_second': 8.0, 'error_rate': 0.0, 'rate_429': 0.0},
+            {'max_workers': 32, 'rate_limit_seconds': 0.02, 'requests_made': 200,
+             'requests_per_second': 40.0, 'error_rate': 0.2, 'rate_429': 0.2},
+            {'max_workers': 8, 'rate_limit_seconds': 0.05, 'requests_made': 100,
+             'requests_per_second': 15.0, 'error_rate': 0.01, 'rate_429': 0.0},
+        ]
+
+        best = recommend_configuration(results)
+        self.assertEqual(best['max_workers'], 8)
+        self.assertIsNone(recommend_configuration(results[1:2]))
+
+
 if __name__ == '__main__':
     unittest.main()
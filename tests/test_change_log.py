@@ -0,0 +1,105 @@
+"""
+Tests für change_log.py - Streaming-Änderungsprotokoll (JSONL)
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from metadata_enrichment.change_log import ChangeLogWriter, make_change_entry, read_change_log
+from metadata_enrichment.enrich_metadata import _enrich_record_inline
+
+
+def _empty_stats():
+    field = {'total_records': 0, 'empty_before': 0, 'filled_after': 0, 'had_abbreviation': 0,
+             'abbreviation_replaced': 0, 'potentially_incorrect': 0, 'corrected': 0, 'conflicts': 0}
+    return {
+        'conflicts_skipped': 0,
+        'field_stats': {key: dict(field) for key in ('Title', 'Authors', 'Publisher', 'Year')},
+    }
+
+
+class TestChangeLogWriter(unittest.TestCase):
+    """Tests für den gepufferten JSONL-Writer"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        import shutil
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_writes_all_entries_in_order(self):
+        """Test: Alle Einträge landen in Reihenfolge in der Datei"""
+        path = os.path.join(self.temp_dir, "changes.jsonl")
+        with ChangeLogWriter(path, batch_size=7) as writer:
+            for i in range(100):
+                writer.write(make_change_entry(i, f"id{i}", "123", "Title", "245$a", "filled", None, "T"))
+
+        entries = list(read_change_log(path))
+        self.assertEqual(len(entries), 100)
+        self.assertEqual(writer.count, 100)
+        self.assertEqual([e['position'] for e in entries], list(range(100)))
+        self.assertEqual(entries[0]['marc_field'], "245$a")
+
+    def test_gzip_compression(self):
+        """Test: Endung .gz schreibt ein komprimiertes Protokoll"""
+        path = os.path.join(self.temp_dir, "changes.jsonl.gz")
+        with ChangeLogWriter(path) as writer:
+            writer.write(make_change_entry(1, "id1", "123", "Year", "260$c", "corrected", "2O05", "2005",
+                                           similarity=0.6666666))
+
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(2), b'\x1f\x8b')
+        entries = list(read_change_log(path))
+        self.assertEqual(entries[0]['similarity'], 0.6667)
+
+    def test_write_after_close_fails(self):
+        """Test: Schreiben nach dem Schließen ist ein Fehler"""
+        writer = ChangeLogWriter(os.path.join(self.temp_dir, "changes.jsonl"))
+        writer.close()
+        with self.assertRaises(ValueError):
+            writer.write({})
+
+
+class TestInlineEnrichmentLogging(unittest.TestCase):
+    """Tests für die Protokollierung in _enrich_record_inline"""
+
+    def test_filled_field_is_logged(self):
+        """Test: Befülltes Feld erzeugt einen strukturierten Eintrag"""
+        record = ET.fromstring(
+            '<record>'
+            '<controlfield tag="001">D-i123</controlfield>'
+            '<datafield tag="260" ind1=" " ind2=" ">'
+            '<subfield code="b"></subfield><subfield code="c">2005</subfield>'
+            '</datafield>'
+            '</record>'
+        )
+        temp_dir = tempfile.mkdtemp()
+        path = os.path.join(temp_dir, "changes.jsonl")
+        with ChangeLogWriter(path) as writer:
+            changed = _enrich_record_inline(
+                5, record, "3453350618", "9783453350618", {"Publisher": "Heyne", "Year": "2005"},
+                _empty_stats(), False, change_log=writer, service="dnb"
+            )
+
+        self.assertTrue(changed)
+        entries = list(read_change_log(path))
+        self.assertEqual(len(entries), 1)
+        self.assertEqual(entries[0]['record_id'], "D-i123")
+        self.assertEqual(entries[0]['field'], "Publisher")
+        self.assertEqual(entries[0]['action'], "filled")
+        self.assertEqual(entries[0]['new_value'], "Heyne")
+        self.assertEqual(entries[0]['service'], "dnb")
+
+        import shutil
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    unittest.main()
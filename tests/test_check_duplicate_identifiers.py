@@ -4,7 +4,12 @@ import sys
 
 sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
 
-from data_quality.check_duplicate_identifiers import analyze_identifier_duplicates
+from data_quality.check_duplicate_identifiers import (
+    HoldingsInterner,
+    IdentifierOccurrences,
+    analyze_identifier_duplicates,
+    preview_identifier_duplicates,
+)
 
 SAMPLE_XML = textwrap.dedent(
     """
@@ -72,4 +77,74 @@ def test_analyze_identifier_duplicates(tmp_path: Path) -> None:
     assert real_isbn == 0
     assert total_issn == 2
     assert dup_issn == 1
-    assert real_issn == 1
\ No newline at end of file
+    assert real_issn == 1
+
+def test_isbn10_and_isbn13_forms_are_duplicates_when_normalized(tmp_path: Path) -> None:
+    xml_file = tmp_path / "sample.xml"
+    xml_file.write_text(
+        textwrap.dedent(
+            """
+            <collection>
+              <record>
+                <datafield tag="020" ind1=" " ind2=" "><subfield code="a">3453350618</subfield></datafield>
+                <datafield tag="049" ind1=" " ind2=" "><subfield code="a">A</subfield></datafield>
+              </record>
+              <record>
+                <datafield tag="020" ind1=" " ind2=" "><subfield code="a">978-3-453-35061-8</subfield></datafield>
+                <datafield tag="049" ind1=" " ind2=" "><subfield code="a">A</subfield></datafield>
+              </record>
+            </collection>
+            """
+        ).strip(),
+        encoding="utf-8",
+    )
+
+    assert analyze_identifier_duplicates(str(xml_file))[:3] == (2, 0, 0)
+    assert analyze_identifier_duplicates(str(xml_file), normalize_isbns=True)[:3] == (2, 1, 1)
+    assert round(preview_identifier_duplicates(str(xml_file))["ISBN"]["duplicates"].value) == 0
+    assert round(preview_identifier_duplicates(str(xml_file), normalize_isbns=True)["ISBN"]["duplicates"].value) == 1
+
+
+def test_compact_occurrences_match_holdings_semantics() -> None:
+    holdings = HoldingsInterner()
+    same = holdings.intern(["DE-1", "DE-2"])
+    assert holdings.intern(["DE-2", "DE-1", "DE-2"]) == same
+    empty = holdings.intern([])
+    other = holdings.intern(["DE-1"])
+    assert len({same, empty, other}) == 3
+
+    occurrences = IdentifierOccurrences()
+    for key, set_id in [("a", same), ("a", same), ("a", same), ("b", same), ("b", other),
+                        ("c", empty), ("c", empty), ("d", other)]:
+        occurrences.add(key, set_id)
+
+    assert len(occurrences) == 8
+    assert occurrences.duplicate_counts() == (4, 2)
+    assert IdentifierOccurrences().duplicate_counts() == (0, 0)
+
+
+def test_external_sort_mode_matches_in_memory(tmp_path: Path) -> None:
+    xml_file = tmp_path / "sample.xml"
+    xml_file.write_text(SAMPLE_XML, encoding="utf-8")
+
+    in_memory = analyze_identifier_duplicates(str(xml_file))
+    spilled = analyze_identifier_duplicates(
+        str(xml_file), max_memory_mb=0.0001, tmp_dir=str(tmp_path)
+    )
+
+    assert spilled == in_memory
+
+
+def test_preview_estimates_duplicates(tmp_path: Path) -> None:
+    xml_file = tmp_path / "sample.xml"
+    xml_file.write_text(SAMPLE_XML, encoding="utf-8")
+
+    preview = preview_identifier_duplicates(str(xml_file))
+
+    # Small cardinalities are exact (linear counting); real duplicates are not estimated
+    assert preview["ISBN"]["total"] == 3
+    assert round(preview["ISBN"]["distinct"].value) == 1
+    assert round(preview["ISBN"]["duplicates"].value) == 2
+    assert preview["ISBN"]["top"] == [("123", 3, 0)]
+    assert preview["ISSN"]["total"] == 2
+    assert round(preview["ISSN"]["duplicates"].value) == 1
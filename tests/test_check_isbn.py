@@ -1,14 +1,36 @@
+import io
+import random
+import socket
 import textwrap
+import time
+import urllib.error
 from pathlib import Path
 import sys
 
+import pytest
+
 sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
 
 from data_quality.check_isbn import (
+    IsbnIndex,
     analyze_isbn,
+    analyze_isbn_status,
     is_valid_isbn10,
+    isbn_exists,
     is_valid_isbn13,
+    preview_isbn,
+)
+from data_quality.isbn_existence import (
+    EXISTS,
+    MISSING,
+    UNKNOWN,
+    ExistenceCache,
+    ExistenceChecker,
+    RetryableLookupError,
+    TokenBucket,
+    google_books_lookup,
 )
+from metadata_enrichment.enrichment_metrics import JobProgress
 
 SAMPLE_XML = textwrap.dedent(
     """
@@ -51,4 +73,172 @@ def test_analyze_isbn(tmp_path: Path) -> None:
 
     assert total == 3
     assert invalid_syntax == 1
-    assert invalid_real == 1
\ No newline at end of file
+    assert invalid_real == 1
+
+def test_metrics_port_is_released_after_the_run(tmp_path: Path) -> None:
+    xml_file = tmp_path / "sample.xml"
+    xml_file.write_text(SAMPLE_XML, encoding="utf-8")
+    with socket.socket() as probe:
+        probe.bind(("localhost", 0))
+        port = probe.getsockname()[1]
+    for _ in range(2):
+        analyze_isbn_status(str(xml_file), isbn_exist_func=lambda isbn: True, metrics_port=port)
+    with socket.socket() as probe:
+        probe.bind(("localhost", port))
+
+
+def test_preview_isbn_full_sample(tmp_path: Path) -> None:
+    xml_file = tmp_path / "sample.xml"
+    xml_file.write_text(SAMPLE_XML, encoding="utf-8")
+
+    preview = preview_isbn(str(xml_file), fraction=1.0)
+
+    assert preview["total"].value == 3
+    assert preview["invalid_syntax"].value == 1
+    assert round(preview["distinct"].value) == 2
+
+
+def test_isbn_index_interns_and_classifies() -> None:
+    index = IsbnIndex()
+    index.add_record(["3453350618", "978-0-306-40615-7"], position=2)
+    index.add_records([["978-3-453-35061-8"], ["1234567890", "9780306406157"]], [5, 9])
+    assert list(index.positions) == [2, 5, 9]
+
+    assert index.isbns == ["9783453350618", "9780306406157"]
+    assert list(index.offsets) == [0, 2, 3, 4]
+    assert list(index.isbn_ids) == [0, 1, 0, 1]
+    assert [index.is_syntax_ok(r) for r in range(3)] == [True, True, False]
+    assert index.invalid_syntax == 1
+
+    statuses = {"9783453350618": "exists", "9780306406157": "missing"}
+    assert index.classify(statuses) == (1, 0)
+    statuses["9780306406157"] = "unknown"
+    assert index.classify(statuses) == (0, 1)
+    assert IsbnIndex().classify(statuses) == (0, 0)
+
+
+def test_isbn_index_positions_stay_aligned() -> None:
+    index = IsbnIndex()
+    index.add_records([["3453350618"]], [1])
+    index.add_record(["9780306406157"])
+    index.add_records([["9783453350618"]], [3])
+    assert index.total_with_isbn == 3
+    assert list(index.positions) == []
+    with pytest.raises(ValueError):
+        IsbnIndex().add_records([["3453350618"], ["9780306406157"]], [1])
+
+
+def test_isbn_index_classify_matches_per_record_rules() -> None:
+    rng = random.Random(11)
+    pool = [next(f"978{n:09d}{d}" for d in range(10) if is_valid_isbn13(f"978{n:09d}{d}")) for n in range(40)]
+    records = [
+        [rng.choice(pool) if rng.random() < 0.9 else "1234567890" for _ in range(rng.randint(1, 3))]
+        for _ in range(500)
+    ]
+    index = IsbnIndex()
+    index.add_records(records)
+    statuses = {isbn: rng.choice(["exists", "missing", "unknown"]) for isbn in pool[:35]}
+
+    expected_invalid = expected_unknown = 0
+    for isbns in records:
+        if "1234567890" in isbns:
+            continue
+        found = [statuses.get(isbn, "unknown") for isbn in isbns]
+        if "missing" in found:
+            expected_invalid += 1
+        elif "unknown" in found:
+            expected_unknown += 1
+    assert index.classify(statuses) == (expected_invalid, expected_unknown)
+
+
+def test_unknown_is_not_invalid_and_is_retried_from_cache(tmp_path: Path) -> None:
+    xml_file = tmp_path / "sample.xml"
+    xml_file.write_text(SAMPLE_XML, encoding="utf-8")
+    cache_file = str(tmp_path / "cache.sqlite")
+    calls = []
+
+    def flaky_exists(isbn: str) -> bool:
+        calls.append(isbn)
+        if isbn == "9780306406157":
+            raise RetryableLookupError("HTTP 429", retry_after=0.001)
+        return True
+
+    first = analyze_isbn_status(str(xml_file), isbn_exist_func=flaky_exists, cache_path=cache_file)
+    assert first["invalid_real"] == 0
+    assert first["unknown"] == 1
+    assert first["queried"] == 2
+
+    calls.clear()
+    second = analyze_isbn_status(
+        str(xml_file), isbn_exist_func=lambda isbn: isbn != "9780306406157", cache_path=cache_file
+    )
+    assert second["cached"] == 1
+    assert second["queried"] == 1
+    assert second["invalid_real"] == 1
+    assert second["unknown"] == 0
+
+
+def test_only_retryable_errors_are_retried(tmp_path: Path) -> None:
+    calls = []
+
+    def lookup(isbn: str) -> str:
+        calls.append(isbn)
+        if isbn == "broken":
+            raise KeyError("programming error")
+        if len(calls) < 3:
+            raise RetryableLookupError("HTTP 503")
+        return MISSING
+
+    checker = ExistenceChecker(lookup, requests_per_second=0, max_retries=3, backoff_base=0.001)
+    assert checker.check_one("9780306406157") == MISSING
+    assert checker.stats["retries"] == 2
+
+    calls.clear()
+    with pytest.raises(KeyError):
+        checker.check_one("broken")
+    assert calls == ["broken"]
+
+    def rate_limited(isbn: str) -> str:
+        raise RetryableLookupError("HTTP 429")
+
+    exhausted = ExistenceChecker(rate_limited, requests_per_second=0, max_retries=1, backoff_base=0.001)
+    assert exhausted.check_one("9780306406157") == UNKNOWN
+
+    cache = ExistenceCache(str(tmp_path / "cache.sqlite"))
+    with pytest.raises(KeyError):
+        ExistenceChecker(lookup, cache, requests_per_second=0).check_many(["broken"], max_workers=2)
+
+
+def test_unusable_answers_are_unknown(monkeypatch: pytest.MonkeyPatch) -> None:
+    def forbidden(url, timeout):
+        raise urllib.error.HTTPError(url, 403, "dailyLimitExceeded", None, None)
+
+    monkeypatch.setattr("urllib.request.urlopen", forbidden)
+    assert google_books_lookup("9780306406157") == UNKNOWN
+    assert isbn_exists("9780306406157") is False
+    statuses = ExistenceChecker(requests_per_second=0).check_many(["9780306406157"], max_workers=2)
+    assert statuses == {"9780306406157": UNKNOWN}
+
+    monkeypatch.setattr("urllib.request.urlopen", lambda url, timeout: io.BytesIO(b"<html>"))
+    assert google_books_lookup("9780306406157") == UNKNOWN
+    assert isbn_exists("9780306406157") is False
+
+    monkeypatch.setattr("urllib.request.urlopen", lambda url, timeout: io.BytesIO(b'{"totalItems": 1}'))
+    assert google_books_lookup("9780306406157") == EXISTS
+
+
+def test_cache_lookups_are_reported_to_the_job() -> None:
+    cache = ExistenceCache()
+    cache.put_many({"9780306406157": MISSING, "9783161484100": UNKNOWN})
+    job = JobProgress("isbn_check")
+    checker = ExistenceChecker(lambda isbn: MISSING, cache, requests_per_second=0)
+    checker.check_many(["9780306406157", "9783161484100", "9783453350618"], max_workers=2, job=job)
+    assert (job.cache_hits, job.cache_lookups) == (1, 3)
+
+
+def test_token_bucket_limits_rate() -> None:
+    bucket = TokenBucket(rate=50, capacity=1)
+    start = time.monotonic()
+    for _ in range(6):
+        bucket.acquire()
+    assert time.monotonic() - start >= 0.09
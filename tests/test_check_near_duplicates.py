@@ -0,0 +1,135 @@
+import csv
+import random
+import textwrap
+from pathlib import Path
+import sys
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from data_quality.check_near_duplicates import (
+    TitleRecord,
+    bounded_edit_distance,
+    extract_title_records,
+    find_near_duplicates,
+    is_near_duplicate,
+    normalize_text,
+    write_cluster_report,
+)
+from utilities.record_offsets import iter_record_chunks
+
+
+def _record(record_id: str, title: str, author: str = "", year: str = "1986", ind2: str = "0") -> str:
+    author_field = (
+        f'<datafield tag="100" ind1="1" ind2=" "><subfield code="a">{author}</subfield></datafield>' if author else ""
+    )
+    return textwrap.dedent(
+        f"""
+        <record>
+          <controlfield tag="001">{record_id}</controlfield>
+          <controlfield tag="008">860101s{year}    gw            000 0 ger d</controlfield>
+          {author_field}
+          <datafield tag="245" ind1="1" ind2="{ind2}">{title}<subfield code="c">x</subfield></datafield>
+        </record>
+        """
+    ).strip()
+
+
+def _title(a: str, b: str = "") -> str:
+    subfields = f'<subfield code="a">{a}</subfield>'
+    if b:
+        subfields += f'<subfield code="b">{b}</subfield>'
+    return subfields
+
+
+RECORDS = [
+    _record("1", _title("Faust", "eine Trag&#246;die"), "Goethe, Johann Wolfgang von"),
+    _record("2", _title("Faust :", "eine Tragoedie"), "Goethe, Johann Wolfgang"),
+    _record("3", _title("Der Faust", "eine Tragödie"), "Goethe, J. W.", ind2="4"),
+    _record("4", _title("Faust 2", "eine Tragödie"), "Goethe, Johann Wolfgang von"),
+    _record("5", _title("Faust", "eine Tragödie"), "Schiller, Friedrich"),
+    _record("6", _title("Faust", "eine Tragödie"), "Goethe, Johann Wolfgang von", year="2001"),
+    _record("7", _title("Die Leiden des jungen Werthers"), "Goethe, Johann Wolfgang von"),
+    _record("8", _title("Dei Leiden des jungen Werthers"), "Goethe, Johann Wolfgang von"),
+    _record("9", _title("Gedichte")),
+    _record("10", _title("Gedichte")),
+    _record("11", "", "Goethe, Johann Wolfgang von"),
+]
+
+
+@pytest.fixture
+def xml_file(tmp_path: Path) -> Path:
+    path = tmp_path / "sample.xml"
+    body = "\n".join(RECORDS)
+    path.write_text(f'<collection xmlns:marc="http://www.loc.gov/MARC21/slim">\n{body}\n</collection>\n', encoding="utf-8")
+    return path
+
+
+def _levenshtein(a: str, b: str) -> int:
+    previous = list(range(len(b) + 1))
+    for i, x in enumerate(a, 1):
+        current = [i]
+        for j, y in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (x != y)))
+        previous = current
+    return previous[-1]
+
+
+def test_bounded_edit_distance_matches_dynamic_programming() -> None:
+    rng = random.Random(7)
+    for _ in range(2000):
+        a = "".join(rng.choice("abc ") for _ in range(rng.randrange(0, 15)))
+        b = "".join(rng.choice("abc ") for _ in range(rng.randrange(0, 15)))
+        bound = rng.randrange(0, 6)
+        assert bounded_edit_distance(a, b, bound) == min(_levenshtein(a, b), bound + 1)
+    long_a = "die leiden des jungen werthers " * 5
+    assert bounded_edit_distance(long_a, long_a.replace("w", "v"), 10) == 5
+
+
+def test_extract_title_records(xml_file: Path) -> None:
+    records = [
+        record for chunk, starts, _ in iter_record_chunks(str(xml_file)) for record in extract_title_records(chunk, starts)
+    ]
+    assert len(records) == len(RECORDS)
+    assert records[0] == TitleRecord("1", "goethe", "1986", "faust eine tragodie", "Faust eine Tragödie")
+    assert records[2].title == "faust eine tragodie"  # "Der " is non-filing (ind2 4)
+    assert records[8].surname == "" and records[10].title == ""
+    assert normalize_text("<<Die>> Straße, ¬Der¬ Teil Ⅱ") == "strasse teil ii"
+
+
+def test_is_near_duplicate_rules() -> None:
+    faust = TitleRecord("1", "goethe", "1986", "faust eine tragodie")
+    assert is_near_duplicate(faust, TitleRecord("2", "goethe", "", "faust eine tragoedie"))
+    assert not is_near_duplicate(faust, TitleRecord("3", "goethe", "1986", "faust 2 eine tragodie"))
+    assert not is_near_duplicate(faust, TitleRecord("4", "schiller", "1986", "faust eine tragodie"))
+    assert not is_near_duplicate(faust, TitleRecord("5", "goethe", "2001", "faust eine tragodie"))
+    assert not is_near_duplicate(faust, TitleRecord("6", "goethe", "1986", "faust eine komodie"))
+
+
+def test_clusters_from_blocking_and_lsh(xml_file: Path) -> None:
+    total, clusters, stats = find_near_duplicates(str(xml_file), bands=32)
+    assert total == len(RECORDS)
+    assert [cluster["positions"] for cluster in clusters] == [[1, 2, 3], [7, 8], [9, 10]]
+    assert clusters[0]["ids"] == ["1", "2", "3"]
+    assert clusters[1]["surname"] == "goethe"
+    assert stats["compared"] > 0 and stats["skipped_buckets"] == 0
+
+
+def test_spilled_keys_and_bucket_limit(xml_file: Path, tmp_path: Path) -> None:
+    _, in_memory, _ = find_near_duplicates(str(xml_file), bands=32)
+    _, spilled, _ = find_near_duplicates(str(xml_file), bands=32, max_memory_mb=0.001, tmp_dir=str(tmp_path))
+    assert spilled == in_memory
+    _, clusters, stats = find_near_duplicates(str(xml_file), bands=32, max_bucket=1)
+    assert clusters == [] and stats["skipped_buckets"] > 0
+
+
+def test_write_cluster_report(xml_file: Path, tmp_path: Path) -> None:
+    _, clusters, _ = find_near_duplicates(str(xml_file), bands=32)
+    report = tmp_path / "report.csv"
+    write_cluster_report(clusters, str(report))
+    with open(report, encoding="utf-8-sig", newline="") as f:
+        rows = list(csv.reader(f, delimiter=";"))
+    assert rows[0] == ["Cluster", "Anzahl", "001", "Position", "Byte-Offset", "Verfasser", "Jahr", "Titel"]
+    assert rows[1][:4] == ["1", "3", "1", "1"]
+    assert rows[2][7] == "Faust : eine Tragoedie"
@@ -4,7 +4,11 @@ import sys
 
 sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
 
-from data_quality.check_primary_key import analyze_primary_key_unique
+from data_quality.check_primary_key import (
+    HASH_WIDTH,
+    analyze_primary_key_unique,
+    find_duplicate_keys,
+)
 
 SAMPLE_XML = textwrap.dedent(
     """
@@ -31,3 +35,91 @@ def test_analyze_primary_key_unique(tmp_path: Path) -> None:
 
     assert total == 3
     assert duplicates == 1
+
+
+def test_external_sort_mode(tmp_path: Path) -> None:
+    xml_file = tmp_path / "sample.xml"
+    xml_file.write_text(SAMPLE_XML, encoding="utf-8")
+
+    assert analyze_primary_key_unique(str(xml_file), max_memory_mb=0.0001) == (3, 1)
+
+
+def test_find_duplicate_keys_reports_positions_and_offsets(tmp_path: Path) -> None:
+    xml_file = tmp_path / "sample.xml"
+    xml_file.write_text(
+        '<marc:collection xmlns:marc="http://www.loc.gov/MARC21/slim">'
+        '<marc:record><marc:controlfield tag="001">A&amp;1</marc:controlfield></marc:record>'
+        '<marc:record><marc:controlfield tag="001">B</marc:controlfield></marc:record>'
+        '<marc:record><marc:leader>x</marc:leader></marc:record>'
+        '<marc:record><marc:controlfield tag="001"> A&amp;1 </marc:controlfield></marc:record>'
+        '</marc:collection>',
+        encoding="utf-8",
+    )
+    data = xml_file.read_bytes()
+
+    total, duplicates = find_duplicate_keys(str(xml_file))
+
+    assert total == 3
+    assert len(duplicates) == 1
+    assert duplicates[0]["key"] == "A&1"
+    assert duplicates[0]["positions"] == [1, 4]
+    for offset in duplicates[0]["offsets"]:
+        assert data[offset:offset + 12] == b"<marc:record"
+
+
+def test_hash_collisions_are_verified(tmp_path: Path) -> None:
+    prefix = "X" * HASH_WIDTH
+    xml_file = tmp_path / "sample.xml"
+    xml_file.write_text(
+        f"<collection><record><controlfield tag=\"001\">{prefix}1</controlfield></record>"
+        f"<record><controlfield tag=\"001\">{prefix}2</controlfield></record></collection>",
+        encoding="utf-8",
+    )
+
+    assert find_duplicate_keys(str(xml_file)) == (2, [])
+
+
+def test_external_sort_mode_reports_same_groups(tmp_path: Path) -> None:
+    prefix = "X" * HASH_WIDTH
+    keys = ["A", f"{prefix}1", "B", f"{prefix}2", "A", "C", f"{prefix}1", "B", "A"]
+    xml_file = tmp_path / "sample.xml"
+    xml_file.write_text(
+        "<collection>"
+        + "".join(f'<record><controlfield tag="001">{key}</controlfield></record>' for key in keys)
+        + "</collection>",
+        encoding="utf-8",
+    )
+
+    in_memory = find_duplicate_keys(str(xml_file))
+    # A budget of a few rows forces several spilled runs
+    spilled = find_duplicate_keys(str(xml_file), max_memory_mb=0.0001, tmp_dir=str(tmp_path))
+
+    assert spilled == in_memory
+    assert [(g["key"], g["positions"]) for g in spilled[1]] == [
+        ("A", [1, 5, 9]),
+        (f"{prefix}1", [2, 7]),
+        ("B", [3, 8]),
+    ]
+    assert analyze_primary_key_unique(str(xml_file), max_memory_mb=0.0001) == (9, 4)
+
+
+def test_all_modes_count_records_with_001_alike(tmp_path: Path) -> None:
+    xml_file = tmp_path / "sample.xml"
+    xml_file.write_text(
+        '<marc:collection xmlns:marc="http://www.loc.gov/MARC21/slim">'
+        '<marc:record><marc:controlfield tag="001"/></marc:record>'
+        '<marc:record><marc:controlfield tag="001">A</marc:controlfield>'
+        '<marc:controlfield tag="001">B</marc:controlfield></marc:record>'
+        '<marc:record><marc:leader>x</marc:leader></marc:record>'
+        '<marc:record><marc:controlfield tag="001"></marc:controlfield></marc:record>'
+        '<marc:record><marc:controlfield tag="001">B</marc:controlfield></marc:record>'
+        '</marc:collection>',
+        encoding="utf-8",
+    )
+
+    total, groups = find_duplicate_keys(str(xml_file))
+    assert total == 4
+    assert [(g["key"], g["positions"]) for g in groups] == [("", [1, 4])]
+    assert find_duplicate_keys(str(xml_file), max_memory_mb=0.0001) == (total, groups)
+    assert analyze_primary_key_unique(str(xml_file)) == (4, 1)
+    assert analyze_primary_key_unique(str(xml_file), max_memory_mb=0.0001) == (4, 1)
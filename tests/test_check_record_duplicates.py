@@ -0,0 +1,104 @@
+import csv
+import textwrap
+from pathlib import Path
+import sys
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import data_quality.check_record_duplicates as record_duplicates
+from data_quality.check_record_duplicates import (
+    RecordCanonicalizer,
+    find_record_duplicates,
+    write_cluster_report,
+)
+from utilities.record_offsets import iter_record_bytes, iter_record_chunks
+
+SAMPLE_XML = textwrap.dedent(
+    """
+    <collection xmlns:marc="http://www.loc.gov/MARC21/slim">
+      <record>
+        <controlfield tag="001">A</controlfield>
+        <datafield tag="245" ind1="0" ind2="0"><subfield code="a">Faust</subfield></datafield>
+        <datafield tag="049" ind1=" " ind2=" "><subfield code="a">DE-1</subfield></datafield>
+      </record>
+      <record>
+        <controlfield tag="001">B</controlfield>
+        <datafield tag="245" ind1="0" ind2="0"><subfield code="a">Faust</subfield></datafield>
+        <datafield tag="049" ind1=" " ind2=" "><subfield code="a">DE-2</subfield></datafield>
+        <datafield tag="049" ind1=" " ind2=" "><subfield code="a">DE-3</subfield></datafield>
+      </record>
+      <record>
+        <controlfield tag="001">C</controlfield>
+        <datafield tag="245" ind1="0" ind2="0"><subfield code="a">Faust II</subfield></datafield>
+      </record>
+      <record><controlfield tag="001">A</controlfield><datafield tag="245" ind1="0" ind2="0">
+        <subfield code="a"> Faust </subfield></datafield>
+        <datafield tag="049" ind1=" " ind2=" "><subfield code="a">DE-1</subfield></datafield></record>
+    </collection>
+    """
+).strip()
+
+
+@pytest.fixture
+def xml_file(tmp_path: Path) -> Path:
+    path = tmp_path / "sample.xml"
+    path.write_text(SAMPLE_XML, encoding="utf-8")
+    return path
+
+
+def test_clusters_ignore_excluded_tags_and_layout(xml_file: Path) -> None:
+    total, clusters = find_record_duplicates(str(xml_file))
+    assert total == 4
+    assert len(clusters) == 1
+    assert clusters[0]["positions"] == [1, 2, 4]
+    assert clusters[0]["ids"] == ["A", "B", "A"]
+    assert clusters[0]["holdings"] == [["DE-1"], ["DE-2", "DE-3"], ["DE-1"]]
+
+
+def test_without_excluded_tags_only_copies_match(xml_file: Path) -> None:
+    _, clusters = find_record_duplicates(str(xml_file), excluded_tags=())
+    assert [cluster["positions"] for cluster in clusters] == [[1, 4]]
+
+
+def test_blake2b_fallback_finds_the_same_clusters(xml_file: Path, monkeypatch) -> None:
+    monkeypatch.setattr(record_duplicates, "XXHASH_AVAILABLE", False)
+    _, clusters = find_record_duplicates(str(xml_file))
+    assert [cluster["positions"] for cluster in clusters] == [[1, 2, 4]]
+
+
+def test_chunk_fingerprints_equal_single_records(xml_file: Path) -> None:
+    canonicalizer = RecordCanonicalizer()
+    single = [canonicalizer.fingerprint(data) for _, _, data in iter_record_bytes(str(xml_file))]
+    for chunk_bytes in (1, 200, 1 << 20):
+        chunks = list(iter_record_chunks(str(xml_file), chunk_bytes))
+        spans = [span for _, starts, ends in chunks for span in zip(starts, ends)]
+        assert spans == [(start, end) for start, end, _ in iter_record_bytes(str(xml_file))]
+        fingerprints = b"".join(canonicalizer.chunk_fingerprints(*chunk) for chunk in chunks)
+        assert fingerprints == b"".join(single)
+
+
+def test_canonical_form() -> None:
+    canonicalizer = RecordCanonicalizer(["049"])
+    prefixed = (
+        b'<marc:record>\n  <marc:controlfield tag="001">A</marc:controlfield>\n'
+        b'  <marc:datafield tag="049" ind1=" " ind2=" "/>\n'
+        b'  <marc:datafield tag="245" ind1=" " ind2=" "><marc:subfield code="a">Der  Titel </marc:subfield>'
+        b"</marc:datafield>\n</marc:record>"
+    )
+    assert canonicalizer.canonical(prefixed) == (
+        b'<record><controlfield tag="001">A</controlfield>'
+        b'<datafield tag="245" ind1=" " ind2=" "><subfield code="a">Der Titel</subfield></datafield></record>'
+    )
+
+
+def test_write_cluster_report(xml_file: Path, tmp_path: Path) -> None:
+    _, clusters = find_record_duplicates(str(xml_file))
+    report = tmp_path / "report.csv"
+    write_cluster_report(clusters, str(report))
+    with open(report, encoding="utf-8-sig", newline="") as f:
+        rows = list(csv.reader(f, delimiter=";"))
+    assert rows[0] == ["Cluster", "Anzahl", "001", "Position", "Byte-Offset", "Besitz (049 $a)"]
+    assert [row[2] for row in rows[1:]] == ["A", "B", "A"]
+    assert rows[2][5] == "DE-2,DE-3"
@@ -0,0 +1,126 @@
+import textwrap
+from pathlib import Path
+import sys
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from data_quality.check_rules import (
+    DEFAULT_RULES_FILE,
+    RuleError,
+    compile_rules,
+    load_rules,
+    run_rules,
+    write_report,
+)
+
+SAMPLE_XML = textwrap.dedent(
+    """
+    <collection xmlns:marc="http://www.loc.gov/MARC21/slim">
+      <record>
+        <leader>01234cam a2200000   4500</leader>
+        <controlfield tag="001">1</controlfield>
+        <controlfield tag="008">991231s2005    gw            000 0 ger d</controlfield>
+        <datafield tag="041" ind1=" " ind2=" "><subfield code="a">ger</subfield></datafield>
+        <datafield tag="245" ind1="1" ind2="0"><subfield code="a">Titel</subfield></datafield>
+        <datafield tag="260" ind1=" " ind2=" "><subfield code="c">2005</subfield></datafield>
+      </record>
+      <record>
+        <leader>00000nam a2200000   4500</leader>
+        <controlfield tag="001">2</controlfield>
+        <controlfield tag="008">201005s1994    xxu           000 0 eng d</controlfield>
+        <datafield tag="041" ind1=" " ind2=" "><subfield code="a">ger</subfield></datafield>
+        <datafield tag="245" ind1="1" ind2="0"><subfield code="a">A</subfield></datafield>
+        <datafield tag="245" ind1="1" ind2="0"><subfield code="a">B</subfield></datafield>
+        <datafield tag="264" ind1=" " ind2="1"><subfield code="c">c1995</subfield></datafield>
+      </record>
+      <record>
+        <controlfield tag="001">3</controlfield>
+        <controlfield tag="008">991231s19uu    gw            000 0 ger d</controlfield>
+        <datafield tag="020" ind1=" " ind2=" "><subfield code="a">kein ISBN</subfield></datafield>
+      </record>
+    </collection>
+    """
+).strip()
+
+RULES = [
+    {"id": "leader", "type": "position", "field": "leader", "positions": "00-07", "equals": "01234cam"},
+    {"id": "status", "type": "position", "field": "008", "positions": "06", "in": ["s", "m"]},
+    {"id": "title", "type": "presence", "field": "245$a"},
+    {"id": "one_title", "type": "cardinality", "field": "245", "min": 1, "max": 1},
+    {"id": "isbn", "type": "regex", "field": "020$a", "pattern": r"^\s*[0-9]"},
+    {
+        "id": "language",
+        "type": "consistency",
+        "left": {"field": "008", "positions": "35-37"},
+        "right": {"field": "041$a"},
+    },
+    {
+        "id": "year",
+        "type": "consistency",
+        "left": {"field": "008", "positions": "07-10", "pattern": r"^\d{4}$"},
+        "right": {"field": ["260$c", "264$c"], "pattern": r"\d{4}"},
+        "relation": "equal",
+    },
+]
+
+
+def test_run_rules(tmp_path: Path) -> None:
+    xml_file = tmp_path / "sample.xml"
+    xml_file.write_text(SAMPLE_XML, encoding="utf-8")
+
+    report = run_rules(str(xml_file), compile_rules(RULES))
+
+    assert report.total == 3
+    assert report.violations == {
+        "leader": 2,
+        "status": 0,
+        "title": 1,
+        "one_title": 2,
+        "isbn": 1,
+        "language": 1,
+        "year": 1,
+    }
+    assert report.samples["leader"] == ["2", "3"]
+    assert report.samples["language"] == ["2"]
+
+
+def test_report_and_default_rules(tmp_path: Path) -> None:
+    xml_file = tmp_path / "sample.xml"
+    xml_file.write_text(SAMPLE_XML, encoding="utf-8")
+    rules = load_rules(DEFAULT_RULES_FILE)
+    report = run_rules(str(xml_file), rules, sample_size=1)
+    out = tmp_path / "violations.csv"
+
+    write_report(report, rules, str(out))
+
+    lines = out.read_text(encoding="utf-8-sig").splitlines()
+    assert lines[0] == "Regel;Beschreibung;Verstöße;Anteil (%);Beispiel-IDs"
+    assert lines[1] == "leader_01234cam;Leader beginnt nicht mit dem Platzhalter 01234cam;1;33.33;1"
+    assert lines[2] == "date_991231;008 beginnt nicht mit dem Platzhalterdatum 991231;2;66.67;1"
+
+
+def test_default_placeholder_rules_accept_normal_records(tmp_path: Path) -> None:
+    xml_file = tmp_path / "sample.xml"
+    xml_file.write_text(SAMPLE_XML, encoding="utf-8")
+    rules = [rule for rule in load_rules(DEFAULT_RULES_FILE) if rule.id in ("leader_01234cam", "date_991231")]
+
+    report = run_rules(str(xml_file), rules)
+
+    # Record 2 has a real leader and 008; record 3 has no leader at all
+    assert report.samples == {"leader_01234cam": ["1"], "date_991231": ["1", "3"]}
+
+
+@pytest.mark.parametrize(
+    "rule",
+    [
+        {"id": "x", "type": "unknown", "field": "245"},
+        {"id": "x", "type": "presence", "field": "001$a"},
+        {"id": "x", "type": "position", "field": "leader", "positions": "00-07", "equals": "abc"},
+        {"id": "x", "type": "regex", "field": "245$a"},
+    ],
+)
+def test_invalid_rules(rule: dict) -> None:
+    with pytest.raises(RuleError):
+        compile_rules([rule])
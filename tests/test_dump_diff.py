@@ -0,0 +1,201 @@
+import textwrap
+from pathlib import Path
+import sys
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from data_processing.diff_dumps import DumpCounters, merge_enriched, write_reports
+from data_quality.check_duplicate_identifiers import analyze_identifier_duplicates
+from utilities.dump_diff import RecordIndex, diff_indexes, load_or_build_index, record_digest
+from utilities.record_offsets import export_records, iter_record_bytes
+
+
+def _dump(*records: str) -> str:
+    body = "\n".join(textwrap.dedent(record).strip() for record in records)
+    return f'<collection xmlns:marc="http://www.loc.gov/MARC21/slim">\n{body}\n</collection>\n'
+
+
+A = """
+    <record>
+      <controlfield tag="001">A</controlfield>
+      <datafield tag="020" ind1=" " ind2=" "><subfield code="a">3453350618</subfield></datafield>
+      <datafield tag="049" ind1=" " ind2=" "><subfield code="a">DE-1</subfield></datafield>
+    </record>
+"""
+B = """
+    <record>
+      <controlfield tag="001">B</controlfield>
+      <datafield tag="020" ind1=" " ind2=" "><subfield code="a">978-3-453-35061-8</subfield></datafield>
+      <datafield tag="049" ind1=" " ind2=" "><subfield code="a">DE-1</subfield></datafield>
+    </record>
+"""
+B_CHANGED = B.replace("DE-1", "DE-2")
+# Same content as A, other layout
+A_REFORMATTED = """
+    <record><controlfield tag="001">A</controlfield>
+    <datafield tag="020" ind1=" " ind2=" "><subfield code="a">3453350618</subfield></datafield>
+    <datafield tag="049" ind1=" " ind2=" "><subfield code="a">DE-1</subfield></datafield></record>
+"""
+C = """
+    <record>
+      <controlfield tag="001">C</controlfield>
+      <datafield tag="022" ind1=" " ind2=" "><subfield code="a">0317-8471</subfield></datafield>
+    </record>
+"""
+D = """
+    <record>
+      <controlfield tag="001">D</controlfield>
+      <datafield tag="022" ind1=" " ind2=" "><subfield code="a">0317-8471</subfield></datafield>
+      <datafield tag="049" ind1=" " ind2=" "><subfield code="a">DE-3</subfield></datafield>
+      <datafield tag="049" ind1=" " ind2=" "><subfield code="a">DE-4</subfield></datafield>
+    </record>
+"""
+
+
+@pytest.fixture
+def dumps(tmp_path: Path):
+    old = tmp_path / "old.xml"
+    new = tmp_path / "new.xml"
+    old.write_text(_dump(A, B, C), encoding="utf-8")
+    new.write_text(_dump(D, B_CHANGED, A_REFORMATTED), encoding="utf-8")
+    return str(old), str(new)
+
+
+def _ids(index, positions):
+    return [index.ids[p].decode() for p in positions]
+
+
+def test_diff_matches_by_001_and_content(dumps) -> None:
+    old_path, new_path = dumps
+    old, new = RecordIndex.build(old_path), RecordIndex.build(new_path)
+    diff = diff_indexes(old, new)
+    assert diff.counts() == {"added": 1, "removed": 1, "changed": 1, "unchanged": 1}
+    assert _ids(new, diff.added) == ["D"]
+    assert _ids(old, diff.removed) == ["C"]
+    assert _ids(new, diff.changed_new) == ["B"]
+    assert _ids(new, diff.unchanged_new) == ["A"]
+    assert diff.refreshed().tolist() == [0, 1]
+
+
+def test_digest_ignores_prefixes_and_layout() -> None:
+    plain = textwrap.dedent(A).strip().encode()
+    prefixed = plain.replace(b"<", b"<marc:").replace(b"<marc:/", b"</marc:")
+    assert record_digest(prefixed) == record_digest(plain) == record_digest(plain.replace(b">\n  <", b"><"))
+    assert record_digest(plain) != record_digest(plain.replace(b"DE-1", b"DE-2"))
+
+
+def test_repeated_001_pairs_by_order(tmp_path: Path) -> None:
+    old_path, new_path = tmp_path / "old.xml", tmp_path / "new.xml"
+    old_path.write_text(_dump(A, A.replace("DE-1", "DE-9")), encoding="utf-8")
+    new_path.write_text(_dump(A, A.replace("DE-1", "DE-8"), A), encoding="utf-8")
+    diff = diff_indexes(RecordIndex.build(str(old_path)), RecordIndex.build(str(new_path)))
+    assert diff.counts() == {"added": 1, "removed": 0, "changed": 1, "unchanged": 1}
+    assert diff.changed_new.tolist() == [1]
+    assert diff.added.tolist() == [2]
+
+
+def test_index_roundtrip_and_stale_index(dumps) -> None:
+    old_path, _ = dumps
+    index = load_or_build_index(old_path)
+    loaded = RecordIndex.load(old_path + ".records.npz", old_path)
+    assert loaded.ids.tolist() == index.ids.tolist()
+    assert (loaded.digests == index.digests).all()
+    with open(old_path, "a", encoding="utf-8") as f:
+        f.write("\n")
+    with pytest.raises(ValueError):
+        RecordIndex.load(old_path + ".records.npz", old_path)
+
+
+def test_updated_counters_equal_full_count(dumps, tmp_path: Path) -> None:
+    old_path, new_path = dumps
+    old, new = RecordIndex.build(old_path), RecordIndex.build(new_path)
+    counters = DumpCounters.build(old_path, old, normalize_isbns=True)
+    counters.save(str(tmp_path / "old.counters.npz"))
+    counters = DumpCounters.load(str(tmp_path / "old.counters.npz"), old_path)
+    assert counters.normalize_isbns
+    counters.update(diff_indexes(old, new), old_path, old, new_path, new)
+    full = DumpCounters.build(new_path, new, normalize_isbns=True)
+
+    assert counters.elements == full.elements
+    assert counters.holdings == full.holdings == {"DE-1": 1, "DE-2": 1, "DE-3": 1, "DE-4": 1}
+    assert counters.possession.tolist() == full.possession.tolist() == [2, 1, 1]
+    # B keeps ISBN 978-3-453-35061-8 (= A's ISBN-10) but moves to DE-2: no longer a real duplicate
+    assert counters.duplicates() == full.duplicates()
+    total_isbn, dup_isbn, real_isbn, total_issn, dup_issn, real_issn = analyze_identifier_duplicates(
+        new_path, normalize_isbns=True
+    )
+    assert counters.duplicates() == {"ISBN": (total_isbn, dup_isbn, real_isbn), "ISSN": (total_issn, dup_issn, real_issn)}
+    assert counters.duplicates()["ISBN"] == (2, 1, 0)
+    # Without normalization the ISBN-10 and ISBN-13 forms stay distinct, as in the full check
+    plain = DumpCounters.build(new_path, new)
+    assert plain.duplicates()["ISBN"] == analyze_identifier_duplicates(new_path)[:3] == (2, 0, 0)
+
+
+def _record(record_id: str, fixed: str, *fields: str) -> str:
+    datafields = "".join(
+        f'<datafield tag="{tag}" ind1="{ind1}" ind2=" "><subfield code="a">{value}</subfield></datafield>'
+        for tag, ind1, value in (field.split("|") for field in fields)
+    )
+    return f'<record><controlfield tag="001">{record_id}</controlfield><controlfield tag="008">{fixed}</controlfield>{datafields}</record>'
+
+
+GER = "991231s2020    gw |||||||||||||||||ger c"
+ENG = "991231s2019    xxu||||||||||||||||||eng c"
+P = _record("P", GER, "100|1|x", "650| |x", "049| |DE-1")
+Q = _record("Q", ENG, "245|1|x", "650| |x", "049| |DE-2")
+R = _record("R", GER, "245|1|x", "700|1|x", "100|1|x", "049| |DE-1")
+S = _record("S", ENG, "700|1|x", "049| |DE-3")
+
+
+@pytest.mark.parametrize("old_records, new_records", [
+    # P is changed: 650 and DE-1 are next seen in Q and R, after keys with the same count
+    ((P, Q, R), (P.replace("650", "500").replace("DE-1", "DE-3"), Q, R)),
+    # P is removed and S added in front; 100 is next seen in R
+    ((P, Q, R), (S, Q, R)),
+    # Unchanged records swap places
+    ((P, Q, R, S), (R, Q, P, S)),
+])
+def test_updated_reports_equal_full_count(tmp_path: Path, old_records, new_records) -> None:
+    old_path, new_path = tmp_path / "old.xml", tmp_path / "new.xml"
+    old_path.write_text(_dump(*old_records), encoding="utf-8")
+    new_path.write_text(_dump(*new_records), encoding="utf-8")
+    old, new = RecordIndex.build(str(old_path)), RecordIndex.build(str(new_path))
+    DumpCounters.build(str(old_path), old).save(str(tmp_path / "old.counters.npz"))
+    counters = DumpCounters.load(str(tmp_path / "old.counters.npz"), str(old_path))
+    counters.update(diff_indexes(old, new), str(old_path), old, str(new_path), new)
+    counters.save(str(tmp_path / "new.counters.npz"))
+    counters = DumpCounters.load(str(tmp_path / "new.counters.npz"), str(new_path))
+
+    updated = write_reports(counters, new, str(tmp_path / "updated"))
+    full = write_reports(DumpCounters.build(str(new_path), new), new, str(tmp_path / "full"))
+    for updated_csv, full_csv in zip(updated, full):
+        assert Path(updated_csv).read_bytes() == Path(full_csv).read_bytes(), Path(full_csv).name
+
+
+def test_merge_enriched_reuses_unchanged_records(dumps, tmp_path: Path) -> None:
+    old_path, new_path = dumps
+    old, new = RecordIndex.build(old_path), RecordIndex.build(new_path)
+    diff = diff_indexes(old, new)
+    # Stand-ins for enrich_metadata output: every record gets a marker field
+    marker = '<datafield tag="245" ind1=" " ind2=" "><subfield code="a">enriched</subfield></datafield></record>'
+    old_enriched = tmp_path / "old_enriched.xml"
+    old_enriched.write_text(Path(old_path).read_text(encoding="utf-8").replace("</record>", marker), encoding="utf-8")
+    delta = tmp_path / "delta.xml"
+    assert export_records(new_path, new.spans(diff.refreshed()), str(delta)) == 2
+    delta_enriched = tmp_path / "delta_enriched.xml"
+    delta_enriched.write_text(delta.read_text(encoding="utf-8").replace("</record>", marker), encoding="utf-8")
+
+    out = tmp_path / "new_enriched.xml"
+    assert merge_enriched(diff, old, new, str(old_enriched), str(delta_enriched), str(out)) == {
+        "reused": 1, "enriched": 2
+    }
+    merged = RecordIndex.build(str(out))
+    assert merged.ids.tolist() == new.ids.tolist()
+    records = [data for _, _, data in iter_record_bytes(str(out))]
+    assert all(b"enriched" in data for data in records)
+    assert b"<record>\n" in records[2]  # A comes from the old enriched dump, not the reformatted new one
+
+    with pytest.raises(ValueError):
+        merge_enriched(diff, old, new, old_path, str(old_enriched), str(out))
@@ -0,0 +1,84 @@
+"""
+Tests für enrichment_metrics.py - Latenz-Histogramme und Service-Metriken
+"""
+
+import json
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from metadata_enrichment.enrichment_metrics import EnrichmentMetrics, LatencyHistogram
+from metadata_enrichment.enrich_metadata import export_stats_to_json
+
+
+class TestLatencyHistogram(unittest.TestCase):
+    """Tests für das logarithmische Histogramm"""
+
+    def test_empty_histogram(self):
+        """Test: Leeres Histogramm liefert Nullwerte"""
+        hist = LatencyHistogram()
+        self.assertEqual(hist.percentile(0.5), 0.0)
+        self.assertEqual(hist.summary()['count'], 0)
+
+    def test_percentiles_within_bucket_error(self):
+        """Test: Perzentile liegen innerhalb der Bucket-Genauigkeit (25 %)"""
+        hist = LatencyHistogram()
+        for i in range(1, 1001):
+            hist.observe(i / 1000)  # 1 ms .. 1 s gleichverteilt
+
+        self.assertAlmostEqual(hist.percentile(0.50), 0.5, delta=0.5 * 0.25)
+        self.assertAlmostEqual(hist.percentile(0.95), 0.95, delta=0.95 * 0.25)
+        self.assertLessEqual(hist.percentile(0.99), hist.max)
+        self.assertEqual(hist.max, 1.0)
+
+
+class TestEnrichmentMetrics(unittest.TestCase):
+    """Tests für die Metrik-Sammlung"""
+
+    def test_service_counters(self):
+        """Test: Anfragen werden pro Service und Ergebnis gezählt"""
+        metrics = EnrichmentMetrics()
+        metrics.record_request("dnb", 0.1, "hit")
+        metrics.record_request("dnb", 0.2, "miss")
+        metrics.record_request("dnb", 0.3, "429")
+        metrics.record_request("goob", 0.05, "error")
+        metrics.record_rate_limit_wait(0.5)
+        metrics.record_pass("pass_2", 12.0)
+
+        snap = metrics.snapshot()
+        dnb = snap['services']['dnb']
+        self.assertEqual(dnb['requests'], 3)
+        self.assertEqual(dnb['hits'], 1)
+        self.assertEqual(dnb['http_429'], 1)
+        self.assertAlmostEqual(dnb['hit_rate_percent'], 33.33)
+        self.assertEqual(snap['services']['goob']['errors'], 1)
+        self.assertEqual(snap['rate_limit_wait_seconds'], 0.5)
+        self.assertEqual(snap['pass_wall_time_seconds'], {"pass_2": 12.0})
+
+        metrics.reset()
+        self.assertEqual(metrics.snapshot()['services'], {})
+
+    def test_export_contains_performance_section(self):
+        """Test: export_stats_to_json schreibt die Metriken mit"""
+        metrics = EnrichmentMetrics()
+        metrics.record_request("dnb", 0.1, "hit")
+        temp_dir = tempfile.mkdtemp()
+        output_path = os.path.join(temp_dir, "test_enriched.xml")
+        json_path = export_stats_to_json({'metrics': metrics.snapshot()}, "test.xml", output_path)
+
+        with open(json_path, encoding='utf-8') as f:
+            data = json.load(f)
+        self.assertIn('performance', data)
+        self.assertEqual(data['performance']['services']['dnb']['requests'], 1)
+        self.assertIn('max_workers', data['performance'])
+
+        import shutil
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    unittest.main()
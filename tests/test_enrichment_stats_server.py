@@ -14,7 +14,7 @@ from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
 
-from metadata_enrichment.enrichment_stats_server import StatsRequestHandler, start_stats_server
+from metadata_enrichment.enrichment_stats_server import StatsRequestHandler, start_metrics_server, start_stats_server
 
 
 class TestWebserverBasics(unittest.TestCase):
@@ -330,5 +330,86 @@ class TestServerConfiguration(unittest.TestCase):
             self.assertIn("'localhost'", content)
 
 
+
+class TestMetricsEndpoint(unittest.TestCase):
+    """Tests für den Prometheus-Metrik-Endpunkt"""
+
+    def setUp(self):
+        """Starte Metrik-Server auf freiem Port"""
+        self.server = start_metrics_server(port=0)
+        self.port = self.server.server_address[1]
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _get(self, path):
+        conn = HTTPConnection('localhost', self.port, timeout=5)
+        conn.request('GET', path)
+        response = conn.getresponse()
+        body = response.read().decode('utf-8')
+        content_type = response.getheader('Content-type')
+        conn.close()
+        return response.status, content_type, body
+
+    def test_metrics_in_prometheus_format(self):
+        """Test: /metrics liefert Zähler und Gauges eines laufenden Jobs"""
+        from metadata_enrichment.enrichment_metrics import EnrichmentMetrics, register_job
+
+        service_metrics = EnrichmentMetrics()
+        job = register_job('test_job', service_metrics)
+        job.add_records(10)
+        job.add_isbns(4)
+        job.set_queue_depth('fetch', 7)
+        service_metrics.begin_request()
+        service_metrics.record_cache_lookup(True)
+        service_metrics.record_cache_lookup(False)
+
+        status, content_type, body = self._get('/metrics')
+
+        self.assertEqual(status, 200)
+        self.assertTrue(content_type.startswith('text/plain; version=0.0.4'))
+        self.assertIn('# TYPE fhp_records_processed_total counter', body)
+        self.assertIn('fhp_records_processed_total{job="test_job"} 10', body)
+        self.assertIn('fhp_isbns_processed_total{job="test_job"} 4', body)
+        self.assertIn('fhp_queue_depth{job="test_job",queue="fetch"} 7', body)
+        self.assertIn('fhp_in_flight_requests{job="test_job"} 1', body)
+        self.assertIn('fhp_cache_hit_ratio{job="test_job"} 0.5', body)
+        self.assertIn('fhp_job_running{job="test_job"} 1', body)
+
+        job.finish()
+        _, _, body = self._get('/metrics')
+        self.assertIn('fhp_job_running{job="test_job"} 0', body)
+
+    def test_latency_exported_as_histogram(self):
+        """Test: Latenzen erscheinen als Prometheus-Histogramm, nicht als Gauge mit quantile-Label"""
+        from metadata_enrichment.enrichment_metrics import EnrichmentMetrics, register_job
+
+        service_metrics = EnrichmentMetrics()
+        register_job('latency_job', service_metrics)
+        for seconds in (0.0005, 0.2, 0.2, 3.0):
+            service_metrics.begin_request()
+            service_metrics.record_request('dnb', seconds, 'hit')
+
+        _, _, body = self._get('/metrics')
+
+        self.assertIn('# TYPE fhp_service_latency_seconds histogram', body)
+        self.assertNotIn('quantile=', body)
+        self.assertIn('fhp_service_latency_seconds_bucket{job="latency_job",le="0.001",service="dnb"} 1', body)
+        self.assertIn('fhp_service_latency_seconds_bucket{job="latency_job",le="+Inf",service="dnb"} 4', body)
+        self.assertIn('fhp_service_latency_seconds_count{job="latency_job",service="dnb"} 4', body)
+        self.assertIn('fhp_service_latency_seconds_sum{job="latency_job",service="dnb"} 3.4005', body)
+        buckets = [
+            int(line.rsplit(' ', 1)[1]) for line in body.splitlines()
+            if line.startswith('fhp_service_latency_seconds_bucket{job="latency_job"')
+        ]
+        self.assertEqual(buckets, sorted(buckets))  # kumulativ
+
+    def test_unknown_path(self):
+        """Test: Andere Pfade liefern 404"""
+        status, _, _ = self._get('/')
+        self.assertEqual(status, 404)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,87 @@
+import textwrap
+from pathlib import Path
+import sys
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+pytest.importorskip("pyarrow")
+
+from data_analysis.analyze_elements_quantity import count_elements
+from data_processing.export_columnar import (
+    element_record_counts,
+    export_columnar,
+    open_fields,
+    open_records,
+)
+
+SAMPLE_XML = textwrap.dedent(
+    """
+    <marc:collection xmlns:marc="http://www.loc.gov/MARC21/slim">
+      <marc:record>
+        <marc:leader>00000nam a2200000 i 4500</marc:leader>
+        <marc:controlfield tag="001">A1</marc:controlfield>
+        <marc:controlfield tag="008">991231s2001    gw            000 0 ger d</marc:controlfield>
+        <marc:datafield tag="020" ind1=" " ind2=" ">
+          <marc:subfield code="a">3453350618</marc:subfield>
+        </marc:datafield>
+        <marc:datafield tag="049" ind1=" " ind2=" ">
+          <marc:subfield code="a">DE-1</marc:subfield>
+        </marc:datafield>
+        <marc:datafield tag="049" ind1=" " ind2=" ">
+          <marc:subfield code="a">DE-2</marc:subfield>
+        </marc:datafield>
+        <marc:datafield tag="245" ind1="1" ind2="0">
+          <marc:subfield code="a">Titel &amp; Untertitel</marc:subfield>
+          <marc:subfield code="c">Autor</marc:subfield>
+        </marc:datafield>
+      </marc:record>
+      <marc:record>
+        <marc:controlfield tag="001">B2</marc:controlfield>
+        <marc:datafield tag="245" ind1="0" ind2="0">
+          <marc:subfield code="a">Anderer Titel</marc:subfield>
+        </marc:datafield>
+        <marc:datafield tag="500" ind1=" " ind2=" "/>
+      </marc:record>
+    </marc:collection>
+    """
+).strip()
+
+
+def test_export_fields_and_records(tmp_path: Path) -> None:
+    xml_file = tmp_path / "sample.xml"
+    xml_file.write_text(SAMPLE_XML, encoding="utf-8")
+    out = tmp_path / "export"
+
+    totals = export_columnar(str(xml_file), str(out), batch_records=1)
+
+    assert totals == {"records": 2, "field_rows": 10, "partitions": 3}
+    assert sorted(p.name for p in (out / "fields").iterdir()) == ["tag_block=0xx", "tag_block=2xx", "tag_block=5xx"]
+
+    fields = open_fields(str(out)).to_table()
+    rows = sorted(
+        zip(*(fields[name].to_pylist() for name in ["record_pos", "001", "tag", "ind1", "ind2", "code", "value", "occurrence"]))
+    )
+    assert (0, "A1", "049", " ", " ", "a", "DE-2", 2) in rows
+    assert (0, "A1", "245", "1", "0", "a", "Titel & Untertitel", 1) in rows
+    assert (1, "B2", "500", " ", " ", "", "", 1) in rows  # field without subfields
+
+    records = open_records(str(out)).to_table().to_pylist()
+    assert records[0]["holdings"] == ["DE-1", "DE-2"]
+    assert records[0]["008"].startswith("991231")
+    assert records[1]["leader"] == "" and records[1]["holdings_count"] == 0
+    data = xml_file.read_bytes()
+    assert data[records[1]["start"]:records[1]["end"]].startswith(b"<marc:record>")
+
+
+def test_vectorized_counts_match_element_quantity(tmp_path: Path) -> None:
+    xml_file = tmp_path / "sample.xml"
+    xml_file.write_text(SAMPLE_XML, encoding="utf-8")
+    export_columnar(str(xml_file), str(tmp_path / "export"))
+
+    expected = {
+        (tag, ind1 or "", ind2 or ""): count
+        for (tag, ind1, ind2), count in count_elements(str(xml_file))["elements"].items()
+    }
+    assert element_record_counts(str(tmp_path / "export")) == expected
@@ -0,0 +1,49 @@
+from pathlib import Path
+import random
+import sys
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from utilities.external_sort import ExternalSorter
+
+ROW_DTYPE = np.dtype([("key", "<u8"), ("position", "<u4")])
+
+
+def test_spilled_runs_merge_in_order(tmp_path: Path) -> None:
+    rng = random.Random(3)
+    rows = [(rng.randrange(500), i) for i in range(5000)]
+
+    with ExternalSorter(ROW_DTYPE, max_memory_bytes=8 * 1024, tmp_dir=str(tmp_path)) as sorter:
+        for row in rows:
+            sorter.append(row)
+        merged = list(sorter)
+        assert len(sorter.runs) > 1
+
+    assert merged == sorted(rows)
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_in_memory_when_budget_suffices() -> None:
+    with ExternalSorter(ROW_DTYPE) as sorter:
+        for row in [(3, 1), (1, 2), (3, 0)]:
+            sorter.append(row)
+        assert list(sorter) == [(1, 2), (3, 0), (3, 1)]
+        assert sorter.runs == []
+
+
+def test_extend_spills_like_append(tmp_path: Path) -> None:
+    rng = np.random.default_rng(5)
+    rows = np.zeros(5000, dtype=ROW_DTYPE)
+    rows["key"] = rng.integers(0, 500, size=len(rows))
+    rows["position"] = np.arange(len(rows))
+
+    with ExternalSorter(ROW_DTYPE, max_memory_bytes=8 * 1024, tmp_dir=str(tmp_path)) as sorter:
+        sorter.extend(rows[:1234])
+        sorter.extend(rows[1234:])
+        assert len(sorter) == len(rows)
+        assert len(sorter.runs) > 1
+        merged = list(sorter)
+
+    assert merged == sorted(rows.tolist())
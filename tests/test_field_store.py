@@ -0,0 +1,87 @@
+import os
+import textwrap
+from pathlib import Path
+import sys
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from utilities.field_store import FieldCondition, FieldStore, build_field_store
+from utilities.marc_fields import iter_flat_records
+from utilities.record_offsets import export_records
+
+SAMPLE_XML = textwrap.dedent(
+    """
+    <collection xmlns:marc="http://www.loc.gov/MARC21/slim">
+      <record>
+        <leader>00000nam a2200000 i 4500</leader>
+        <controlfield tag="001">A</controlfield>
+        <datafield tag="020" ind1=" " ind2=" "><subfield code="a">3453350618</subfield></datafield>
+        <datafield tag="041" ind1=" " ind2=" "><subfield code="a">Deutsch</subfield></datafield>
+        <datafield tag="049" ind1=" " ind2=" "><subfield code="a">DE-1</subfield></datafield>
+      </record>
+      <record>
+        <controlfield tag="001">B</controlfield>
+        <datafield tag="041" ind1=" " ind2=" "><subfield code="a">ger</subfield></datafield>
+        <datafield tag="049" ind1=" " ind2=" "><subfield code="a">DE-1</subfield></datafield>
+        <datafield tag="049" ind1=" " ind2=" "><subfield code="a">DE-2</subfield></datafield>
+      </record>
+      <record>
+        <controlfield tag="001">C</controlfield>
+        <datafield tag="041" ind1=" " ind2=" "><subfield code="a">deutsch</subfield></datafield>
+        <datafield tag="049" ind1=" " ind2=" "><subfield code="a">DE-2</subfield></datafield>
+      </record>
+    </collection>
+    """
+).strip()
+
+
+@pytest.fixture
+def store(tmp_path: Path):
+    xml_file = tmp_path / "sample.xml"
+    xml_file.write_text(SAMPLE_XML, encoding="utf-8")
+    path = str(tmp_path / "sample.fields.sqlite")
+    assert build_field_store(iter_flat_records(str(xml_file)), path, str(xml_file), batch_records=2) == 3
+    with FieldStore(path, str(xml_file)) as opened:
+        yield opened, xml_file
+
+
+def _ids(rows):
+    return [record_id for _, record_id, _, _ in rows]
+
+
+def test_queries(store) -> None:
+    fields, _ = store
+    assert len(fields) == 3
+    assert _ids(fields.select(held_by=["DE-1"], missing=[FieldCondition("020")])) == ["B"]
+    # Values compare case-insensitively
+    assert _ids(fields.select(having=[FieldCondition.parse("041$a=deutsch")])) == ["A", "C"]
+    assert _ids(fields.select(held_by=["DE-1", "DE-2"])) == ["B"]
+    assert _ids(fields.select(record_id="C")) == ["C"]
+    assert _ids(fields.select()) == ["A", "B", "C"]
+    assert fields.values(0)[:2] == [("001", "", "", "", "A", 1), ("020", " ", " ", "a", "3453350618", 1)]
+    # The query plan uses the indexes instead of scanning the field table
+    plan = " ".join(row[-1] for row in fields.execute(
+        "EXPLAIN QUERY PLAN SELECT pos FROM fields WHERE tag = '041' AND code = 'a' AND value = 'deutsch'"
+    ))
+    assert "fields_tag_code_value" in plan
+
+
+def test_export_and_staleness(store, tmp_path: Path) -> None:
+    fields, xml_file = store
+    rows = fields.select(held_by=["DE-2"])
+    out = tmp_path / "selected.xml"
+    assert export_records(str(xml_file), [(start, end) for _, _, start, end in rows], str(out)) == 2
+    assert [r.record_id for r in iter_flat_records(str(out))] == ["B", "C"]
+
+    os.utime(xml_file, (0, 0))
+    with pytest.raises(ValueError):
+        FieldStore(fields.path, str(xml_file))
+
+
+def test_condition_syntax() -> None:
+    assert FieldCondition.parse("020") == FieldCondition("020")
+    assert FieldCondition.parse("245$a") == FieldCondition("245", "a")
+    with pytest.raises(ValueError):
+        FieldCondition.parse("041=deutsch")
@@ -0,0 +1,64 @@
+import textwrap
+from pathlib import Path
+import sys
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from data_analysis.analyze_fixed_fields import fixed_field_histograms
+from data_quality.check_date_field import calculate_008_date_percentage
+from data_quality.check_leader import calculate_leader_01234cam_percentage
+from utilities.fixed_fields import extract_fixed_fields
+
+SAMPLE_XML = textwrap.dedent(
+    """
+    <collection xmlns:marc="http://www.loc.gov/MARC21/slim">
+      <record>
+        <leader>01234cam a2200000   4500</leader>
+        <controlfield tag="001">1</controlfield>
+        <controlfield tag="008">991231s2005    gw            000 0 ger d</controlfield>
+      </record>
+      <record>
+        <leader>00000nam a2200000   4500</leader>
+        <controlfield tag="008">201005s1994    xxu           000 0 eng d</controlfield>
+      </record>
+      <record>
+        <leader>01234cam a2200000   4500</leader>
+        <controlfield tag="008">9912</controlfield>
+      </record>
+      <record>
+        <controlfield tag="001">4</controlfield>
+      </record>
+    </collection>
+    """
+).strip()
+
+
+def test_extract_fixed_fields(tmp_path: Path) -> None:
+    xml_file = tmp_path / "sample.xml"
+    xml_file.write_text(SAMPLE_XML, encoding="utf-8")
+
+    fields = extract_fixed_fields(str(xml_file))
+
+    assert len(fields) == 4
+    assert fields.leader.shape == (4, 24)
+    assert fields.f008.shape == (4, 40)
+    assert fields.leader_length.tolist() == [24, 24, 24, 0]
+    assert fields.f008_length.tolist() == [40, 40, 4, 0]
+    assert fields.leader_prefix("01234cam").tolist() == [True, False, True, False]
+    # A truncated 008 never matches a longer prefix
+    assert fields.f008_prefix("991231").tolist() == [True, False, False, False]
+    assert fields.f008_histogram("language") == {"ger": 1, "eng": 1}
+    assert fields.f008_histogram("date_1") == {"2005": 1, "1994": 1}
+    assert fields.leader_histogram("record_status") == {"c": 2, "n": 1}
+
+
+def test_prefix_percentages(tmp_path: Path) -> None:
+    xml_file = tmp_path / "sample.xml"
+    xml_file.write_text(SAMPLE_XML, encoding="utf-8")
+    fields = extract_fixed_fields(str(xml_file))
+
+    assert calculate_leader_01234cam_percentage(str(xml_file)) == 50.0
+    assert calculate_008_date_percentage(str(xml_file), fields) == 25.0
+
+    rows = fixed_field_histograms(fields)
+    assert ("008", "35-37 language", "ger", "Deutsch", 1) in rows
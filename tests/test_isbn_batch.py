@@ -0,0 +1,42 @@
+from pathlib import Path
+import sys
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from data_quality.check_isbn import is_valid_isbn10, is_valid_isbn13
+from utilities.isbn_batch import clean_isbn, normalize_isbn_keys, validate_isbn_batch
+
+
+def test_validate_isbn_batch_matches_scalar_checks() -> None:
+    values = [
+        "3453350618",
+        "3-453-35061-8",
+        "080442957X",
+        "080442957x",
+        "1234567890",
+        "9780306406157",
+        "9780306406158",
+        "97803064061570",
+        "123",
+        "",
+        "34533506ä8",
+    ]
+    valid, is_isbn10, isbn13 = validate_isbn_batch(values)
+
+    for value, ok, ok10 in zip(values, valid.tolist(), is_isbn10.tolist()):
+        clean = clean_isbn(value)
+        expected10 = len(clean) == 10 and is_valid_isbn10(clean)
+        expected13 = len(clean) == 13 and is_valid_isbn13(clean)
+        assert ok == (expected10 or expected13), value
+        assert ok10 == expected10, value
+
+    assert isbn13[0] == isbn13[1] == "9783453350618"
+    assert isbn13[2] == "9780804429573"
+    assert isbn13[5] == "9780306406157"
+    assert isbn13[4] == ""
+
+
+def test_normalize_isbn_keys_keeps_invalid_values() -> None:
+    assert normalize_isbn_keys(["3453350618", " 123 "]) == ["9783453350618", "123"]
+    valid, _, isbn13 = validate_isbn_batch([])
+    assert len(valid) == 0 and isbn13 == []
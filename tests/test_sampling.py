@@ -0,0 +1,114 @@
+import csv
+import math
+from pathlib import Path
+import sys
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from data_analysis.analyze_elements_quantity import write_preview as elements_preview
+from data_processing.split_by_possession import preview_possession, split_by_besitz
+from data_processing.split_by_possession import write_preview as write_possession_preview
+from utilities.sampling import BlockSample, Estimate, estimate_ratio, estimate_total
+
+
+def _dump(tmp_path: Path, records: int) -> Path:
+    body = "".join(
+        f'<record><controlfield tag="001">{i}</controlfield>'
+        + ('<datafield tag="020" ind1=" " ind2=" "><subfield code="a">x</subfield></datafield>' if i % 4 == 0 else "")
+        + "</record>\n"
+        for i in range(records)
+    )
+    path = tmp_path / "dump.xml"
+    path.write_text(f"<collection>\n{body}</collection>\n", encoding="utf-8")
+    return path
+
+
+def test_full_sample_is_exact(tmp_path: Path) -> None:
+    path = _dump(tmp_path, 1000)
+    sample = BlockSample(str(path), fraction=1.0, block_bytes=4096)
+    blocks = list(sample)
+
+    assert sample.fraction == 1.0
+    assert sum(len(block) for block in blocks) == 1000
+    records = [len(block) for block in blocks]
+    isbn = [sum(b"020" in data for data in block) for block in blocks]
+    total = estimate_total(records, sample.population_blocks)
+    share = estimate_ratio(isbn, records, sample.population_blocks)
+    # No sampling error left: the finite population correction is zero
+    assert total.value == pytest.approx(1000) and total.margin == pytest.approx(0)
+    assert share.value == pytest.approx(0.25) and share.margin == pytest.approx(0)
+
+
+def test_partial_sample_covers_truth(tmp_path: Path) -> None:
+    path = _dump(tmp_path, 20000)
+    covered = 0
+    for seed in range(20):
+        sample = BlockSample(str(path), fraction=0.2, block_bytes=8192, seed=seed)
+        records = [len(block) for block in sample]
+        estimate = estimate_total(records, sample.population_blocks)
+        covered += abs(estimate.value - 20000) <= estimate.margin
+    assert covered >= 16
+
+
+def test_estimate_formatting_and_validation(tmp_path: Path) -> None:
+    assert str(Estimate(1234.4, 56.6)) == "1,234 ± 57"
+    assert str(Estimate(3, math.nan)) == "3"
+    assert Estimate(0.25, 0.012).percent() == "25.00% ± 1.20"
+    with pytest.raises(ValueError):
+        BlockSample(str(_dump(tmp_path, 1)), fraction=0)
+
+
+HOLDINGS_RECORDS = [
+    '<datafield tag="049" ind1=" " ind2=" "><subfield code="b">x</subfield><subfield code="a">DE-1</subfield></datafield>',
+    '<datafield tag="049" ind1=" " ind2=" "><subfield code="a">DE-1</subfield><subfield code="a">DE-2</subfield></datafield>',
+    '<datafield tag="049" ind1=" " ind2=" "/>',
+    '',
+    '<datafield tag="049" ind1=" " ind2=" "><subfield code="a"> </subfield></datafield>',
+]
+
+
+def _holdings_dump(tmp_path: Path, repeat: int) -> Path:
+    body = "".join(
+        # Record tags on their own lines like in the catalogue dumps (split_records reads line by line)
+        f'<record>\n<controlfield tag="001">{i}</controlfield>{HOLDINGS_RECORDS[i % len(HOLDINGS_RECORDS)]}\n</record>\n'
+        for i in range(repeat * len(HOLDINGS_RECORDS))
+    )
+    path = tmp_path / "dump.xml"
+    path.write_text(f"<collection>\n{body}</collection>\n", encoding="utf-8")
+    return path
+
+
+def _rows(path: Path) -> list:
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        return list(csv.reader(f, delimiter=";"))
+
+
+def test_possession_preview_matches_split(tmp_path: Path) -> None:
+    path = _holdings_dump(tmp_path, 2)
+    book_counts = tmp_path / "book_counts.csv"
+    split_by_besitz(str(path), str(tmp_path / "split"), str(book_counts))
+    expected = {name: int(count) for name, count in _rows(book_counts)[1:]}
+
+    stats = preview_possession(str(path))
+
+    assert {value: high for value, _, high in stats["top"]} == {k: v for k, v in expected.items() if k != "unknown"}
+    # A file of one block is sampled completely: exact, without sampling error
+    assert (stats["unknown"].value, stats["unknown"].margin) == (expected["unknown"], 0)
+
+
+def test_previews_write_na_without_margin(tmp_path: Path) -> None:
+    # About 3 blocks of 256 KB, of which the default 2 % sample draws only one
+    path = _holdings_dump(tmp_path, 1000)
+    out = tmp_path / "elements.csv"
+
+    elements_preview(str(path), str(out))
+    possession_csv = tmp_path / "book_counts_preview.csv"
+    stats = preview_possession(str(path))
+    write_possession_preview(stats, str(possession_csv))
+
+    assert math.isnan(stats["unknown"].margin)
+    rows = _rows(tmp_path / "elements_preview.csv")
+    assert rows[1][3] == "n/a" and rows[1][5] == "n/a"
+    assert _rows(possession_csv)[-1] == ["unknown (Stichprobe, 95%)", "n/a", "n/a"]
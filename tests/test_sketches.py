@@ -0,0 +1,81 @@
+from collections import Counter
+from pathlib import Path
+import random
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from utilities.sketches import HyperLogLog, MinHash, SpaceSaving, hash64_batch
+
+
+def test_hashes_are_deterministic_and_spread() -> None:
+    values = [f"value-{i}".encode() for i in range(10000)]
+    hashes = hash64_batch(values)
+    assert np.array_equal(hashes, hash64_batch(values))
+    # Independent of the longest value in the batch
+    assert hash64_batch([b"a"])[0] == hash64_batch([b"a", b"a much longer value"])[0]
+    assert len(np.unique(hashes)) == len(values)
+    # The top bits select the HyperLogLog register: all buckets are used evenly
+    buckets = np.bincount((hashes >> np.uint64(60)).astype(np.intp), minlength=16)
+    assert buckets.min() > 500
+
+
+@pytest.mark.parametrize("distinct", [100, 5000, 200000])
+def test_hyperloglog_estimate_within_margin(distinct: int) -> None:
+    sketch = HyperLogLog(12)
+    values = [f"ISBN{i}".encode() for i in range(distinct)]
+    sketch.add(values)
+    sketch.add(values[: distinct // 2])  # repeats do not change the estimate
+    assert abs(sketch.estimate() - distinct) <= max(sketch.margin(), 2)
+
+
+def test_hyperloglog_merge_equals_union() -> None:
+    left, right, union = HyperLogLog(), HyperLogLog(), HyperLogLog()
+    a = [f"a{i}".encode() for i in range(3000)]
+    b = [f"b{i}".encode() for i in range(3000)]
+    left.add(a)
+    right.add(b)
+    union.add(a + b)
+    left.merge(right)
+    assert left.estimate() == union.estimate()
+    with pytest.raises(ValueError):
+        left.merge(HyperLogLog(11))
+
+
+def test_space_saving_error_bounds() -> None:
+    rng = random.Random(1)
+    stream = [f"DE-{int(rng.paretovariate(1.2))}" for _ in range(20000)]
+    exact = Counter(stream)
+    sketch = SpaceSaving(50)
+    sketch.update(stream)
+
+    assert sketch.total == len(stream)
+    for value, count, error in sketch.top():
+        assert count - error <= exact[value] <= count
+        assert error <= sketch.max_error
+    # Every value above total / k is guaranteed to be kept
+    reported = {value for value, _, _ in sketch.top()}
+    assert {value for value, count in exact.items() if count > sketch.max_error} <= reported
+    assert [value for value, _, _ in sketch.top(5)] == [value for value, _ in exact.most_common(5)]
+
+
+def test_minhash_band_collisions_follow_jaccard() -> None:
+    minhash = MinHash(bands=16, rows=4)
+    base = [f"token{i}".encode() for i in range(20)]
+    similar = base[:18] + [b"other1", b"other2"]  # Jaccard 18/22
+    unrelated = [f"word{i}".encode() for i in range(20)]
+    signatures = minhash.signatures([base, list(reversed(base)), similar, unrelated])
+    assert signatures.shape == (4, 64)
+    assert np.array_equal(signatures[0], signatures[1])  # order does not matter
+    agreement = float(np.mean(signatures[0] == signatures[2]))
+    assert abs(agreement - 18 / 22) < 0.15
+    keys = minhash.band_keys(signatures)
+    assert (keys[0] == keys[2]).any()
+    assert not (keys[0] == keys[3]).any()
+    # Equal bands in different columns get different keys
+    assert len(np.unique(minhash.band_keys(np.zeros((1, 64), dtype=np.uint32)))) == 16
+    with pytest.raises(ValueError):
+        minhash.signatures([[]])
@@ -0,0 +1,69 @@
+import json
+from pathlib import Path
+import sys
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from api_simulator import start_simulator
+from data_quality.validate_isil_codes import (
+    clean_isil,
+    extract_isil_codes,
+    load_registry_snapshot,
+    validate_isil_codes,
+)
+
+SAMPLE_XML = """<collection>
+  <record>
+    <datafield tag="049" ind1=" " ind2=" "><subfield code="a">DE-V0202</subfield></datafield>
+    <datafield tag="049" ind1=" " ind2=" "><subfield code="a">AT-OBV</subfield></datafield>
+  </record>
+  <record>
+    <datafield tag="049" ind1=" " ind2=" "><subfield code="a">DE-999</subfield></datafield>
+  </record>
+</collection>"""
+
+
+def test_extract_and_clean(tmp_path: Path) -> None:
+    xml_file = tmp_path / "sample.xml"
+    xml_file.write_text(SAMPLE_XML, encoding="utf-8")
+
+    assert clean_isil("DE-V0202") == "DE-202"
+    assert extract_isil_codes(str(xml_file)) == {"DE-202", "DE-999"}
+    assert extract_isil_codes(str(xml_file), clean=False) == {"DE-V0202", "DE-999"}
+
+
+def test_validate_against_simulator_with_cache(tmp_path: Path) -> None:
+    server = start_simulator()
+    cache_file = tmp_path / "cache.json"
+    try:
+        base_url = f"{server.base_url}/api/org/"
+        results = validate_isil_codes(["DE-202", "DE-999"], base_url=base_url, cache_path=str(cache_file))
+        assert results == [
+            {"ISIL": "DE-202", "Status": "VALID ISILs", "Name": "Beispielbibliothek Berlin"},
+            {"ISIL": "DE-999", "Status": "HTTP_404", "Name": None},
+        ]
+        assert server.simulator.stats()["sigel"]["requests"] == 2
+
+        assert validate_isil_codes(["DE-202", "DE-999"], base_url=base_url, cache_path=str(cache_file)) == results
+        assert server.simulator.stats()["sigel"]["requests"] == 2
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_registry_snapshot_offline(tmp_path: Path) -> None:
+    snapshot = tmp_path / "sigel.csv"
+    snapshot.write_text("ISIL;Name\nDE-202;Stadtbibliothek\n", encoding="utf-8")
+    registry = load_registry_snapshot(str(snapshot))
+    assert registry == {"DE-202": "Stadtbibliothek"}
+
+    json_snapshot = tmp_path / "sigel.json"
+    json_snapshot.write_text(json.dumps([{"isil": "DE-1a", "name": "Staatsbibliothek"}]), encoding="utf-8")
+    assert load_registry_snapshot(str(json_snapshot)) == {"DE-1a": "Staatsbibliothek"}
+
+    results = validate_isil_codes(["DE-202", "DE-999"], registry=registry, offline=True)
+    assert [r["Status"] for r in results] == ["VALID ISILs", "INVALID ISILs"]
+    with pytest.raises(ValueError):
+        validate_isil_codes(["DE-202"], offline=True)
@@ -0,0 +1,111 @@
+import textwrap
+import xml.etree.ElementTree as ET
+from pathlib import Path
+import sys
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from data_quality.check_rules import compile_rules
+from data_quality.isbn_existence import EXISTS, MISSING, ExistenceCache
+from data_quality.query_violations import CHECKS, build_violation_store
+from utilities.violation_store import ViolationStore, store_path
+
+SAMPLE_XML = textwrap.dedent(
+    """
+    <collection xmlns:marc="http://www.loc.gov/MARC21/slim">
+      <record>
+        <leader>01234cam a2200000   4500</leader>
+        <controlfield tag="001">1</controlfield>
+        <controlfield tag="008">991231s2005    gw            000 0 ger d</controlfield>
+        <datafield tag="020" ind1=" " ind2=" "><subfield code="a">9783453350618</subfield></datafield>
+      </record>
+      <record>
+        <leader>00000nam a2200000   4500</leader>
+        <controlfield tag="001">2</controlfield>
+        <controlfield tag="008">201005s1994    xxu           000 0 eng d</controlfield>
+        <datafield tag="020" ind1=" " ind2=" "><subfield code="a">9783453350618</subfield></datafield>
+      </record>
+      <record>
+        <leader>00000nam a2200000   4500</leader>
+        <controlfield tag="001">3</controlfield>
+        <controlfield tag="008">201005s1994    xxu           000 0 eng d</controlfield>
+      </record>
+    </collection>
+    """
+).strip()
+
+RULES = [
+    {"id": "leader", "type": "position", "field": "leader", "positions": "00-07", "not_equals": "01234cam"},
+    {"id": "date", "type": "position", "field": "008", "positions": "00-05", "not_equals": "991231"},
+    {"id": "isbn_present", "type": "presence", "field": "020$a"},
+]
+
+
+def test_build_query_and_export(tmp_path: Path) -> None:
+    xml_file = tmp_path / "sample.xml"
+    xml_file.write_text(SAMPLE_XML, encoding="utf-8")
+
+    build_violation_store(str(xml_file), compile_rules(RULES))
+    store = ViolationStore.load(store_path(str(xml_file)), str(xml_file))
+
+    assert store.bits.tolist() == [3, 0, 4]
+    assert store.counts() == {"leader": 1, "date": 1, "isbn_present": 1}
+    positions = store.select(failing=["leader", "date"], passing=["isbn_present"])
+    assert positions.tolist() == [0]
+
+    out = tmp_path / "failing.xml"
+    assert store.export(str(xml_file), positions, str(out)) == 1
+    records = ET.parse(out).getroot().findall("record")
+    assert [r.findtext('controlfield[@tag="001"]') for r in records] == ["1"]
+
+
+def test_stale_store_and_unknown_check(tmp_path: Path) -> None:
+    xml_file = tmp_path / "sample.xml"
+    xml_file.write_text(SAMPLE_XML, encoding="utf-8")
+    store = build_violation_store(str(xml_file), compile_rules(RULES))
+
+    with pytest.raises(KeyError):
+        store.select(failing=["isbn"])
+
+    xml_file.write_text(SAMPLE_XML.replace("<collection", "<collection "), encoding="utf-8")
+    with pytest.raises(ValueError):
+        ViolationStore.load(store_path(str(xml_file)), str(xml_file))
+
+
+def test_record_level_checks(tmp_path: Path) -> None:
+    def record(number: str, isbn: str, issn: str = "") -> str:
+        issn_field = f'<datafield tag="022" ind1=" " ind2=" "><subfield code="a">{issn}</subfield></datafield>'
+        return (
+            f'<record><controlfield tag="001">{number}</controlfield>'
+            f'<datafield tag="020" ind1=" " ind2=" "><subfield code="a">{isbn}</subfield></datafield>'
+            f'{issn_field if issn else ""}</record>'
+        )
+
+    xml_file = tmp_path / "sample.xml"
+    xml_file.write_text(
+        "<collection>"
+        + record("A", "9783453350618", "1234-5678")
+        + record("A", "9783453350618")
+        + record("B", "9783453350619")
+        + record("C", "9780306406157", "1234-5678")
+        + "</collection>",
+        encoding="utf-8",
+    )
+    cache_path = tmp_path / "isbn_cache.sqlite"
+    with ExistenceCache(str(cache_path)) as cache:
+        cache.put_many({"9780306406157": MISSING, "9783453350618": EXISTS})
+
+    store = build_violation_store(str(xml_file), [], checks=CHECKS, isbn_cache_path=str(cache_path))
+
+    failing = {name: store.select(failing=[name]).tolist() for name in CHECKS}
+    assert failing == {
+        "primary_key_duplicate": [0, 1],
+        "isbn_syntax": [2],
+        "isbn_missing": [3],
+        "isbn_duplicate": [0, 1],
+        "issn_duplicate": [0, 3],
+    }
+    with pytest.raises(ValueError):
+        build_violation_store(str(xml_file), [], checks=["isbn"])
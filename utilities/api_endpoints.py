@@ -0,0 +1,93 @@
+"""Base URLs of the external web services used by the project.
+
+All clients resolve their endpoints through this module so that a whole run
+can be pointed at another host, e.g. the local ``api_simulator`` used for
+load and fault-tolerance tests. Set ``FHP_API_BASE_URL`` (for example
+``http://localhost:8099``) to redirect every service at once; without it the
+public production endpoints are used.
+"""
+
+import importlib
+import os
+from typing import Dict, Optional
+
+API_BASE_URL_ENV = "FHP_API_BASE_URL"
+
+GOOGLE_BOOKS_VOLUMES_URL = "https://www.googleapis.com/books/v1/volumes"
+SIGEL_ORG_URL = "https://sigel.staatsbibliothek-berlin.de/api/org/"
+
+# Paths below the base URL; the simulator serves exactly these routes.
+GOOGLE_BOOKS_PATH = "/books/v1/volumes"
+OPENLIBRARY_PATH = "/api/books"
+WIKIPEDIA_PATH = "/api/rest_v1/data/citation/mediawiki/"
+DNB_PATH = "/opac.htm"
+SIGEL_PATH = "/api/org/"
+
+# isbnlib modules whose ``SERVICE_URL`` template is read on every query.
+ISBNLIB_SERVICE_MODULES = {
+    "goob": "isbnlib._goob",
+    "openl": "isbnlib._openl",
+    "wiki": "isbnlib._wiki",
+    "dnb": "isbnlib_dnb._dnb",
+}
+
+
+def api_base_url() -> Optional[str]:
+    """Return the override base URL from the environment, if any."""
+    base = os.environ.get(API_BASE_URL_ENV, "").strip()
+    return base.rstrip("/") or None
+
+
+def google_books_volumes_url() -> str:
+    """Return the Google Books volumes endpoint (``?q=isbn:...`` is appended by callers)."""
+    base = api_base_url()
+    return f"{base}{GOOGLE_BOOKS_PATH}" if base else GOOGLE_BOOKS_VOLUMES_URL
+
+
+def sigel_org_url() -> str:
+    """Return the SIGEL organisation endpoint (``<ISIL>.jsonld`` is appended by callers)."""
+    base = api_base_url()
+    return f"{base}{SIGEL_PATH}" if base else SIGEL_ORG_URL
+
+
+def isbnlib_service_urls(base_url: str) -> Dict[str, str]:
+    """Return isbnlib ``SERVICE_URL`` templates for all services below ``base_url``."""
+    base = base_url.rstrip("/")
+    return {
+        "goob": (
+            f"{base}{GOOGLE_BOOKS_PATH}?q={{isbn}}&fields=items/volumeInfo(title,subtitle,"
+            "authors,publisher,publishedDate,language,industryIdentifiers,description,"
+            "imageLinks)&maxResults=1"
+        ),
+        "openl": f"{base}{OPENLIBRARY_PATH}?bibkeys=ISBN:{{isbn}}&format=json&jscmd=data",
+        "wiki": f"{base}{WIKIPEDIA_PATH}{{isbn}}",
+        "dnb": (
+            f'{base}{DNB_PATH}?method=showFullRecord&currentResultId="{{isbn}}"'
+            "%26any&currentPosition=0"
+        ),
+    }
+
+
+def redirect_isbnlib_services(base_url: str) -> Dict[str, str]:
+    """Point the isbnlib service modules (and isbnlib-dnb, if installed) at ``base_url``.
+
+    isbnlib formats the module-level ``SERVICE_URL`` on every query, so
+    rewriting it redirects all later ``isbnlib.meta`` calls. Returns the
+    previous templates so callers can restore them.
+    """
+    urls = isbnlib_service_urls(base_url)
+    previous: Dict[str, str] = {}
+    for service, module_name in ISBNLIB_SERVICE_MODULES.items():
+        try:
+            module = importlib.import_module(module_name)
+        except ImportError:
+            continue
+        previous[service] = module.SERVICE_URL
+        module.SERVICE_URL = urls[service]
+    return previous
+
+
+def restore_isbnlib_services(previous: Dict[str, str]) -> None:
+    """Undo :func:`redirect_isbnlib_services` with its return value."""
+    for service, url in previous.items():
+        importlib.import_module(ISBNLIB_SERVICE_MODULES[service]).SERVICE_URL = url
@@ -0,0 +1,97 @@
+"""Counting with dense integer ids and NumPy arrays.
+
+``DenseCounter`` assigns every new key the next integer id (first-seen
+order) and records observations as ids in a compact ``array``; the counts
+are one ``np.bincount``. Partial counters from different shards of a file
+are merged in file order with ``merge``, which keeps the global first-seen
+order, so sorting the merged result by count (stable) gives the same order
+as a single sequential pass.
+"""
+
+from array import array
+from typing import Collection, Dict, Hashable, List, Tuple
+
+import numpy as np
+
+FLUSH_OBSERVATIONS = 1 << 20
+
+
+class DenseCounter:
+    def __init__(self) -> None:
+        self.ids: Dict[Hashable, int] = {}
+        self.keys: List[Hashable] = []
+        self._counts = np.zeros(0, dtype=np.int64)
+        self._pending = array("I")
+
+    def add(self, key: Hashable) -> None:
+        key_id = self.ids.get(key)
+        if key_id is None:
+            key_id = self.ids[key] = len(self.keys)
+            self.keys.append(key)
+        self._pending.append(key_id)
+        if len(self._pending) >= FLUSH_OBSERVATIONS:
+            self._flush()
+
+    def update(self, keys: Collection[Hashable]) -> None:
+        """Count every key in ``keys`` once (fast path when all keys are known)."""
+        ids = self.ids
+        try:
+            key_ids = [ids[key] for key in keys]
+        except KeyError:
+            for key in keys:
+                self.add(key)
+            return
+        self._pending.extend(key_ids)
+        if len(self._pending) >= FLUSH_OBSERVATIONS:
+            self._flush()
+
+    def _flush(self) -> None:
+        if self._pending or len(self._counts) < len(self.keys):
+            pending = np.frombuffer(self._pending, dtype=np.uint32) if self._pending else np.zeros(0, np.uint32)
+            counts = np.bincount(pending, minlength=len(self.keys)).astype(np.int64)
+            counts[: len(self._counts)] += self._counts
+            self._counts = counts
+            self._pending = array("I")
+
+    def counts(self) -> np.ndarray:
+        """Counts indexed by key id."""
+        self._flush()
+        return self._counts
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def __bool__(self) -> bool:
+        return bool(self.keys)
+
+    def merge(self, other: "DenseCounter") -> None:
+        """Add the counts of ``other`` (a later part of the same input)."""
+        self._flush()
+        mapping = np.empty(len(other.keys), dtype=np.int64)
+        for key_id, key in enumerate(other.keys):
+            own = self.ids.get(key)
+            if own is None:
+                own = self.ids[key] = len(self.keys)
+                self.keys.append(key)
+            mapping[key_id] = own
+        counts = np.zeros(len(self.keys), dtype=np.int64)
+        counts[: len(self._counts)] = self._counts
+        np.add.at(counts, mapping, other.counts())
+        self._counts = counts
+
+    def items(self) -> List[Tuple[Hashable, int]]:
+        """``(key, count)`` pairs in first-seen order."""
+        return list(zip(self.keys, self.counts().tolist()))
+
+    def most_common(self) -> List[Tuple[Hashable, int]]:
+        """``(key, count)`` pairs by count descending; ties keep first-seen order."""
+        return sorted(self.items(), key=lambda x: x[1], reverse=True)
+
+    def __getstate__(self):
+        return {"keys": self.keys, "counts": self.counts()}
+
+    def __setstate__(self, state) -> None:
+        self.keys = state["keys"]
+        self.ids = {key: key_id for key_id, key in enumerate(self.keys)}
+        self._counts = state["counts"]
+        self._pending = array("I")
@@ -0,0 +1,211 @@
+"""Record-level differences between two versions of a dump.
+
+A :class:`RecordIndex` keeps the 001, a 128-bit content hash and the byte
+offsets of every record, about 40 bytes per record. Two indexes are matched
+by 001 in one sort (records sharing a 001 are paired by their order within
+the file, records without 001 by their order among each other), and the
+hashes tell changed from unchanged records. Neither dump has to be parsed
+as XML, and a saved index of the old dump is enough to diff against it.
+"""
+
+import html
+import os
+import re
+from dataclasses import dataclass
+from hashlib import blake2b
+from typing import Dict, Optional
+
+import numpy as np
+
+from utilities.record_offsets import iter_record_bytes
+
+DIGEST_BYTES = 16
+INDEX_SUFFIX = ".records.npz"
+
+FIELD_001 = re.compile(rb"""<(?:[\w.-]+:)?controlfield\s+tag\s*=\s*["']001["']\s*>([^<]*)<""")
+# Serialisation details that do not change the content of a record
+TAG_PREFIX = re.compile(rb"<(/?)[\w.-]+:")
+SPACE_BETWEEN_TAGS = re.compile(rb">\s+<")
+
+
+def canonical_record_bytes(data: bytes) -> bytes:
+    """Record bytes without namespace prefixes and whitespace between tags."""
+    return SPACE_BETWEEN_TAGS.sub(b"><", TAG_PREFIX.sub(rb"<\1", data)).strip()
+
+
+def record_digest(data: bytes) -> bytes:
+    """128-bit content hash (blake2b) of the canonical record bytes."""
+    return blake2b(canonical_record_bytes(data), digest_size=DIGEST_BYTES).digest()
+
+
+def record_id(data: bytes) -> bytes:
+    """The 001 of a record as UTF-8 (character references resolved), empty if missing."""
+    match = FIELD_001.search(data)
+    if match is None:
+        return b""
+    return html.unescape(match.group(1).decode("utf-8")).strip().encode("utf-8")
+
+
+class RecordIndex:
+    """001, content hash and ``(start, end)`` offsets of every record of a dump."""
+
+    def __init__(
+        self,
+        ids: np.ndarray,
+        digests: np.ndarray,
+        starts: np.ndarray,
+        ends: np.ndarray,
+        source_size: int = -1,
+        source_mtime: float = -1.0,
+    ):
+        digests = digests.astype(np.uint64, copy=False).reshape(-1, DIGEST_BYTES // 8)
+        if not len(ids) == len(digests) == len(starts) == len(ends):
+            raise ValueError("ids, digests and offsets must cover the same records")
+        self.ids = ids.astype(bytes, copy=False) if len(ids) else np.zeros(0, dtype="S1")
+        self.digests = digests
+        self.starts = starts.astype(np.uint64, copy=False)
+        self.ends = ends.astype(np.uint64, copy=False)
+        self.source_size = source_size
+        self.source_mtime = source_mtime
+
+    @classmethod
+    def build(cls, dump_path: str) -> "RecordIndex":
+        """Scan ``dump_path`` once and index every record."""
+        stat = os.stat(dump_path)
+        ids, digests, starts, ends = [], bytearray(), [], []
+        for start, end, data in iter_record_bytes(dump_path):
+            ids.append(record_id(data))
+            digests += record_digest(data)
+            starts.append(start)
+            ends.append(end)
+        return cls(
+            np.array(ids, dtype=bytes) if ids else np.zeros(0, dtype="S1"),
+            np.frombuffer(bytes(digests), dtype="<u8"),
+            np.array(starts, dtype=np.uint64),
+            np.array(ends, dtype=np.uint64),
+            stat.st_size,
+            stat.st_mtime,
+        )
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def spans(self, positions: np.ndarray):
+        """``(start, end)`` offsets of the records at ``positions``."""
+        return zip(self.starts[positions].tolist(), self.ends[positions].tolist())
+
+    def match_keys(self) -> np.ndarray:
+        """001 per record, made unique by appending the occurrence number of repeated 001s."""
+        n = len(self.ids)
+        if n == 0:
+            return self.ids
+        order = np.argsort(self.ids, kind="stable")
+        sorted_ids = self.ids[order]
+        first = np.concatenate(([True], sorted_ids[1:] != sorted_ids[:-1]))
+        group_start = np.maximum.accumulate(np.where(first, np.arange(n), 0))
+        ranks = np.empty(n, dtype=np.int64)
+        ranks[order] = np.arange(n) - group_start
+        repeated = np.flatnonzero(ranks)
+        if not len(repeated):
+            return self.ids
+        keys = self.ids.astype(f"S{self.ids.itemsize + 21}")
+        for position in repeated.tolist():
+            keys[position] = self.ids[position] + b"\x00" + str(ranks[position]).encode("ascii")
+        return keys
+
+    def save(self, path: str) -> None:
+        tmp_path = path + ".tmp.npz"
+        np.savez(
+            tmp_path,
+            ids=self.ids,
+            digests=self.digests,
+            starts=self.starts,
+            ends=self.ends,
+            source=np.array([self.source_size, self.source_mtime], dtype=np.float64),
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str, dump_path: Optional[str] = None) -> "RecordIndex":
+        """Load an index; with ``dump_path`` an index built for another file version is rejected."""
+        with np.load(path, allow_pickle=False) as data:
+            size, mtime = data["source"].tolist()
+            index = cls(data["ids"], data["digests"], data["starts"], data["ends"], int(size), mtime)
+        if dump_path is not None:
+            stat = os.stat(dump_path)
+            if stat.st_size != index.source_size or stat.st_mtime != index.source_mtime:
+                raise ValueError(f"{path} was built for another version of {dump_path}; rebuild it")
+        return index
+
+
+def index_path(dump_path: str) -> str:
+    """Default location of the record index for ``dump_path``."""
+    return dump_path + INDEX_SUFFIX
+
+
+def load_or_build_index(dump_path: str, path: Optional[str] = None) -> RecordIndex:
+    """Load the saved index of ``dump_path`` if it is current, else build and save it."""
+    path = path or index_path(dump_path)
+    if os.path.exists(path):
+        try:
+            return RecordIndex.load(path, dump_path)
+        except ValueError:
+            pass
+    index = RecordIndex.build(dump_path)
+    index.save(path)
+    return index
+
+
+@dataclass
+class DumpDiff:
+    """Record positions in the old and new dump, by outcome.
+
+    ``unchanged_old[i]`` and ``unchanged_new[i]`` (likewise ``changed_*``)
+    are the same record in both versions; all arrays are sorted by the new
+    position, ``removed`` by the old one.
+    """
+
+    added: np.ndarray
+    removed: np.ndarray
+    changed_old: np.ndarray
+    changed_new: np.ndarray
+    unchanged_old: np.ndarray
+    unchanged_new: np.ndarray
+
+    def counts(self) -> Dict[str, int]:
+        return {
+            "added": len(self.added),
+            "removed": len(self.removed),
+            "changed": len(self.changed_new),
+            "unchanged": len(self.unchanged_new),
+        }
+
+    def refreshed(self) -> np.ndarray:
+        """New positions of added and changed records, in file order."""
+        return np.union1d(self.added, self.changed_new)
+
+    def dropped(self) -> np.ndarray:
+        """Old positions of removed and changed records, in file order."""
+        return np.union1d(self.removed, self.changed_old)
+
+
+def diff_indexes(old: RecordIndex, new: RecordIndex) -> DumpDiff:
+    """Match two indexes by 001 and compare the content hashes of the pairs."""
+    old_keys, new_keys = old.match_keys(), new.match_keys()
+    _, old_matched, new_matched = np.intersect1d(old_keys, new_keys, assume_unique=True, return_indices=True)
+    order = np.argsort(new_matched, kind="stable")
+    old_matched, new_matched = old_matched[order], new_matched[order]
+    changed = (old.digests[old_matched] != new.digests[new_matched]).any(axis=1)
+
+    added = np.ones(len(new), dtype=bool)
+    added[new_matched] = False
+    removed = np.ones(len(old), dtype=bool)
+    removed[old_matched] = False
+    return DumpDiff(
+        added=np.flatnonzero(added),
+        removed=np.flatnonzero(removed),
+        changed_old=old_matched[changed],
+        changed_new=new_matched[changed],
+        unchanged_old=old_matched[~changed],
+        unchanged_new=new_matched[~changed],
+    )
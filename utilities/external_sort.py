@@ -0,0 +1,114 @@
+"""Bounded-memory external sort for fixed-width key tuples.
+
+Rows (e.g. ``(key hash, holdings set id, record position)``) are collected in
+a NumPy structured buffer of fixed size. A full buffer is sorted and written
+to a temporary run file; iterating the sorter k-way merges all runs while
+reading each of them in small blocks. Memory use is bounded by
+``max_memory_bytes`` regardless of the size of the dump.
+"""
+
+import heapq
+import os
+import shutil
+import tempfile
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+DEFAULT_MAX_MEMORY_BYTES = 256 * 1024 * 1024
+MERGE_BLOCK_ROWS = 65536
+
+
+class ExternalSorter:
+    """Sorts rows of a structured ``dtype`` with at most ``max_memory_bytes`` in memory.
+
+    Rows are ordered lexicographically by the dtype's fields. The budget
+    covers the collection buffer plus, while sorting, a row copy and an
+    8-byte sort index per row; during the merge each run is read
+    ``MERGE_BLOCK_ROWS`` rows at a time.
+    Use as a context manager so the run files are removed afterwards.
+    """
+
+    def __init__(
+        self,
+        dtype: np.dtype,
+        max_memory_bytes: int = DEFAULT_MAX_MEMORY_BYTES,
+        tmp_dir: Optional[str] = None,
+    ):
+        self.dtype = np.dtype(dtype)
+        self.capacity = max(1, max_memory_bytes // (2 * self.dtype.itemsize + 8))
+        self._buffer = np.empty(self.capacity, dtype=self.dtype)
+        self._size = 0
+        self._count = 0
+        self._tmp_root = tmp_dir
+        self._run_dir: Optional[str] = None
+        self.runs: List[Tuple[str, int]] = []
+
+    def __len__(self) -> int:
+        return self._count
+
+    def append(self, row: Sequence) -> None:
+        if self._size == self.capacity:
+            self._spill()
+        self._buffer[self._size] = tuple(row)
+        self._size += 1
+        self._count += 1
+
+    def extend(self, rows: np.ndarray) -> None:
+        """Append a structured array of rows, spilling as often as the buffer fills."""
+        rows = np.asarray(rows, dtype=self.dtype)
+        done = 0
+        while done < len(rows):
+            if self._size == self.capacity:
+                self._spill()
+            take = min(self.capacity - self._size, len(rows) - done)
+            self._buffer[self._size:self._size + take] = rows[done:done + take]
+            self._size += take
+            done += take
+        self._count += len(rows)
+
+    def _sorted_buffer(self) -> np.ndarray:
+        rows = self._buffer[: self._size]
+        # lexsort over the fields is much faster than ``rows.sort(order=...)``
+        rows[:] = rows[np.lexsort([rows[name] for name in reversed(self.dtype.names)])]
+        return rows
+
+    def _spill(self) -> None:
+        if self._size == 0:
+            return
+        if self._run_dir is None:
+            self._run_dir = tempfile.mkdtemp(prefix="fhp_sort_", dir=self._tmp_root)
+        path = os.path.join(self._run_dir, f"run_{len(self.runs):05d}.bin")
+        self._sorted_buffer().tofile(path)
+        self.runs.append((path, self._size))
+        self._size = 0
+
+    def _read_run(self, path: str, count: int) -> Iterator[tuple]:
+        with open(path, "rb") as f:
+            remaining = count
+            while remaining:
+                block = np.fromfile(f, dtype=self.dtype, count=min(MERGE_BLOCK_ROWS, remaining))
+                remaining -= len(block)
+                yield from block.tolist()
+
+    def __iter__(self) -> Iterator[tuple]:
+        """Yield all rows as tuples in sorted order."""
+        if not self.runs:
+            rows = self._sorted_buffer()
+            for start in range(0, len(rows), MERGE_BLOCK_ROWS):
+                yield from rows[start:start + MERGE_BLOCK_ROWS].tolist()
+            return
+        self._spill()
+        yield from heapq.merge(*(self._read_run(path, count) for path, count in self.runs))
+
+    def close(self) -> None:
+        if self._run_dir is not None:
+            shutil.rmtree(self._run_dir, ignore_errors=True)
+            self._run_dir = None
+        self.runs = []
+
+    def __enter__(self) -> "ExternalSorter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
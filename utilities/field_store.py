@@ -0,0 +1,216 @@
+"""SQLite store of all records and subfields of a dump.
+
+The layout follows ``utilities.marc_fields``: ``records`` holds one row per
+record (001, leader, 008, byte offsets), ``fields`` one row per subfield and
+``holdings`` one row per 049 ``$a``. Indexes on ``fields(tag, code, value)``,
+``records(id)`` and ``holdings(isil)`` make typical catalogue questions
+("records held by DE-xyz without 020", "041 $a = deutsch") index lookups
+instead of a scan of the XML. Values compare case-insensitively (ASCII).
+"""
+
+import os
+import sqlite3
+from dataclasses import dataclass
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from utilities.marc_fields import FlatRecord
+
+LOAD_BATCH_RECORDS = 10000  # records per executemany transaction
+LOAD_CACHE_KIB = 256 * 1024  # page cache while loading and indexing
+
+SCHEMA = """
+CREATE TABLE records (
+    pos INTEGER PRIMARY KEY,
+    id TEXT NOT NULL,
+    leader TEXT NOT NULL,
+    f008 TEXT NOT NULL,
+    start INTEGER NOT NULL,
+    end INTEGER NOT NULL
+);
+CREATE TABLE fields (
+    pos INTEGER NOT NULL,
+    tag TEXT NOT NULL,
+    ind1 TEXT NOT NULL,
+    ind2 TEXT NOT NULL,
+    code TEXT NOT NULL,
+    value TEXT NOT NULL COLLATE NOCASE,
+    occurrence INTEGER NOT NULL
+);
+CREATE TABLE holdings (
+    pos INTEGER NOT NULL,
+    isil TEXT NOT NULL
+);
+CREATE TABLE source (
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL
+);
+"""
+
+# Built after loading: one sort per index instead of updates per row
+INDEXES = """
+CREATE INDEX fields_tag_code_value ON fields (tag, code, value, pos);
+CREATE INDEX fields_pos_tag ON fields (pos, tag, code);
+CREATE INDEX records_id ON records (id);
+CREATE INDEX holdings_isil ON holdings (isil, pos);
+"""
+
+
+@dataclass(frozen=True)
+class FieldCondition:
+    """``tag``, optionally restricted to subfield ``code`` and ``value``."""
+
+    tag: str
+    code: Optional[str] = None
+    value: Optional[str] = None
+
+    @classmethod
+    def parse(cls, text: str) -> "FieldCondition":
+        """Parse ``TAG``, ``TAG$CODE`` or ``TAG$CODE=VALUE`` (e.g. ``041$a=deutsch``)."""
+        field, has_value, value = text.partition("=")
+        tag, has_code, code = field.partition("$")
+        tag = tag.strip()
+        if not tag or (has_code and not code) or (has_value and not has_code):
+            raise ValueError(f"expected TAG, TAG$CODE or TAG$CODE=VALUE, got {text!r}")
+        return cls(tag, code if has_code else None, value if has_value else None)
+
+    def sql(self, alias: str) -> Tuple[str, List[str]]:
+        clauses, params = [f"{alias}.tag = ?"], [self.tag]
+        if self.code is not None:
+            clauses.append(f"{alias}.code = ?")
+            params.append(self.code)
+        if self.value is not None:
+            clauses.append(f"{alias}.value = ?")
+            params.append(self.value)
+        return " AND ".join(clauses), params
+
+
+class FieldStore:
+    """Read access to a field store built with :func:`build_field_store`."""
+
+    def __init__(self, path: str, dump_path: Optional[str] = None):
+        if not os.path.exists(path):
+            raise FileNotFoundError(path)
+        self.path = path
+        self._conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        if dump_path is not None:
+            size, mtime = self._conn.execute("SELECT size, mtime FROM source").fetchone()
+            stat = os.stat(dump_path)
+            if stat.st_size != size or stat.st_mtime != mtime:
+                self.close()
+                raise ValueError(f"{path} was built for another version of {dump_path}; rebuild it")
+
+    def __len__(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM records").fetchone()[0]
+
+    def select(
+        self,
+        held_by: Sequence[str] = (),
+        having: Sequence[FieldCondition] = (),
+        missing: Sequence[FieldCondition] = (),
+        record_id: Optional[str] = None,
+    ) -> List[Tuple[int, str, int, int]]:
+        """``(pos, 001, start, end)`` of records matching all criteria, in file order.
+
+        Positive criteria are intersected through their indexes; ``missing``
+        conditions are then checked per candidate with the ``(pos, tag)``
+        index.
+        """
+        candidates, params = [], []
+        for isil in held_by:
+            candidates.append("SELECT pos FROM holdings WHERE isil = ?")
+            params.append(isil)
+        for condition in having:
+            clause, values = condition.sql("f")
+            candidates.append(f"SELECT f.pos FROM fields f WHERE {clause}")
+            params.extend(values)
+        if record_id is not None:
+            candidates.append("SELECT pos FROM records WHERE id = ?")
+            params.append(record_id)
+
+        where = []
+        if candidates:
+            where.append(f"r.pos IN ({' INTERSECT '.join(candidates)})")
+        for condition in missing:
+            clause, values = condition.sql("m")
+            where.append(f"NOT EXISTS (SELECT 1 FROM fields m WHERE m.pos = r.pos AND {clause})")
+            params.extend(values)
+        sql = "SELECT r.pos, r.id, r.start, r.end FROM records r"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        return self._conn.execute(sql + " ORDER BY r.pos", params).fetchall()
+
+    def values(self, pos: int) -> List[Tuple[str, str, str, str, str, int]]:
+        """All field rows of one record in document order."""
+        return self._conn.execute(
+            "SELECT tag, ind1, ind2, code, value, occurrence FROM fields WHERE pos = ? ORDER BY rowid",
+            (pos,),
+        ).fetchall()
+
+    def execute(self, sql: str, params: Sequence = ()) -> Iterator[tuple]:
+        """Run a read-only SQL statement against the store."""
+        return self._conn.execute(sql, params)
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def __enter__(self) -> "FieldStore":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def build_field_store(
+    records: Iterable[FlatRecord], path: str, dump_path: str, batch_records: int = LOAD_BATCH_RECORDS
+) -> int:
+    """Load flattened records into a new store at ``path`` and return the record count.
+
+    The store is written to a temporary file with journaling and syncing
+    off (it is rebuilt from the dump anyway), loaded in ``executemany``
+    transactions of ``batch_records`` records, indexed at the end and then
+    moved into place.
+    """
+    tmp_path = path + ".tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("PRAGMA synchronous = OFF")
+        conn.execute(f"PRAGMA cache_size = -{LOAD_CACHE_KIB}")
+        conn.executescript(SCHEMA)
+        count = 0
+        batch: List[FlatRecord] = []
+
+        def flush() -> None:
+            with conn:
+                conn.executemany(
+                    "INSERT INTO records VALUES (?, ?, ?, ?, ?, ?)",
+                    [(r.position, r.record_id, r.leader, r.f008, r.start, r.end) for r in batch],
+                )
+                conn.executemany(
+                    "INSERT INTO fields VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [(r.position, *row) for r in batch for row in r.fields],
+                )
+                conn.executemany(
+                    "INSERT INTO holdings VALUES (?, ?)",
+                    [(r.position, isil) for r in batch for isil in r.holdings],
+                )
+            batch.clear()
+
+        for record in records:
+            batch.append(record)
+            count += 1
+            if len(batch) >= batch_records:
+                flush()
+        flush()
+
+        stat = os.stat(dump_path)
+        with conn:
+            conn.execute("INSERT INTO source VALUES (?, ?)", (stat.st_size, stat.st_mtime))
+            conn.executescript(INDEXES)
+        conn.execute("ANALYZE")
+    finally:
+        conn.close()
+    os.replace(tmp_path, path)
+    return count
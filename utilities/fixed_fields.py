@@ -0,0 +1,149 @@
+"""Columnar access to the fixed-length fields (leader and 008) of a dump.
+
+``extract_fixed_fields`` scans the file once at byte level and stores the
+leader (24 bytes) and 008 (40 bytes) of every record in NumPy ``uint8``
+matrices, one row per record. Positional questions then become column
+operations: prefix rules (``01234cam``, ``991231``) are a comparison of a few
+columns, value distributions of a position range are one ``np.unique``.
+"""
+
+import html
+import re
+from typing import Dict, Optional
+
+import numpy as np
+
+from utilities.record_offsets import iter_record_bytes
+
+LEADER_WIDTH = 24
+F008_WIDTH = 40
+EXTRACT_CHUNK_RECORDS = 100000
+
+LEADER_PATTERN = re.compile(rb"<(?:[\w.-]+:)?leader\s*>([^<]*)</")
+F008_PATTERN = re.compile(rb"""<(?:[\w.-]+:)?controlfield\s+tag=["']008["']\s*>([^<]*)</""")
+
+# Position ranges (start, end) used for histograms
+LEADER_POSITIONS = {
+    "record_status": (5, 6),
+    "type_of_record": (6, 7),
+    "bibliographic_level": (7, 8),
+    "encoding_level": (17, 18),
+}
+F008_POSITIONS = {
+    "date_entered": (0, 6),
+    "publication_status": (6, 7),
+    "date_1": (7, 11),
+    "date_2": (11, 15),
+    "country": (15, 18),
+    "language": (35, 38),
+}
+
+
+class FixedFields:
+    """Leader and 008 of all records as fixed-width byte matrices.
+
+    Attributes:
+        leader: ``(n, 24)`` uint8, zero-padded; rows without leader are all zero
+        leader_length: original length of each leader (0 = missing)
+        f008: ``(n, 40)`` uint8, zero-padded; rows without 008 are all zero
+        f008_length: original length of each 008 (0 = missing)
+    """
+
+    def __init__(self, leader: np.ndarray, leader_length: np.ndarray, f008: np.ndarray, f008_length: np.ndarray):
+        self.leader = leader
+        self.leader_length = leader_length
+        self.f008 = f008
+        self.f008_length = f008_length
+
+    def __len__(self) -> int:
+        return len(self.leader)
+
+    def leader_prefix(self, prefix: str) -> np.ndarray:
+        """Mask of records whose leader starts with ``prefix``."""
+        return prefix_mask(self.leader, self.leader_length, prefix.encode("ascii"))
+
+    def f008_prefix(self, prefix: str) -> np.ndarray:
+        """Mask of records whose 008 starts with ``prefix``."""
+        return prefix_mask(self.f008, self.f008_length, prefix.encode("ascii"))
+
+    def leader_histogram(self, name: str) -> Dict[str, int]:
+        start, end = LEADER_POSITIONS[name]
+        return positional_histogram(self.leader, self.leader_length, start, end)
+
+    def f008_histogram(self, name: str) -> Dict[str, int]:
+        start, end = F008_POSITIONS[name]
+        return positional_histogram(self.f008, self.f008_length, start, end)
+
+
+def _field_value(match) -> bytes:
+    if match is None:
+        return b""
+    value = match.group(1)
+    # Entities would shift the positions ("&amp;" is one character)
+    if b"&" in value:
+        value = html.unescape(value.decode("utf-8")).encode("utf-8")
+    return value
+
+
+def _pack(values, width: int):
+    matrix = np.array(values, dtype=f"S{width}").view(np.uint8).reshape(len(values), width)
+    lengths = np.fromiter((len(v) for v in values), dtype=np.int32, count=len(values))
+    return matrix, lengths
+
+
+def extract_fixed_fields(file_path: str) -> FixedFields:
+    """Scan ``file_path`` once and return the leader and 008 columns of all records."""
+    leaders, f008s = [], []
+    parts = {"leader": [], "leader_length": [], "f008": [], "f008_length": []}
+
+    def flush() -> None:
+        matrix, lengths = _pack(leaders, LEADER_WIDTH)
+        parts["leader"].append(matrix)
+        parts["leader_length"].append(lengths)
+        matrix, lengths = _pack(f008s, F008_WIDTH)
+        parts["f008"].append(matrix)
+        parts["f008_length"].append(lengths)
+        leaders.clear()
+        f008s.clear()
+
+    for _, _, data in iter_record_bytes(file_path):
+        leaders.append(_field_value(LEADER_PATTERN.search(data)))
+        f008s.append(_field_value(F008_PATTERN.search(data)))
+        if len(leaders) >= EXTRACT_CHUNK_RECORDS:
+            flush()
+    flush()
+
+    return FixedFields(
+        np.concatenate(parts["leader"]),
+        np.concatenate(parts["leader_length"]),
+        np.concatenate(parts["f008"]),
+        np.concatenate(parts["f008_length"]),
+    )
+
+
+def prefix_mask(matrix: np.ndarray, lengths: np.ndarray, prefix: bytes) -> np.ndarray:
+    """Rows of ``matrix`` starting with ``prefix``."""
+    expected = np.frombuffer(prefix, dtype=np.uint8)
+    return (lengths >= len(prefix)) & (matrix[:, : len(prefix)] == expected).all(axis=1)
+
+
+def positional_histogram(
+    matrix: np.ndarray,
+    lengths: np.ndarray,
+    start: int,
+    end: int,
+    mask: Optional[np.ndarray] = None,
+) -> Dict[str, int]:
+    """Count the distinct values of positions ``start:end`` over all rows long enough.
+
+    ``mask`` restricts the count to selected rows.
+    """
+    rows = lengths >= end
+    if mask is not None:
+        rows &= mask
+    window = np.ascontiguousarray(matrix[rows, start:end]).view(f"S{end - start}").ravel()
+    values, counts = np.unique(window, return_counts=True)
+    return {
+        value.decode("utf-8", "replace"): int(count)
+        for value, count in zip(values.tolist(), counts.tolist())
+    }
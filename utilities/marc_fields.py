@@ -0,0 +1,69 @@
+"""Flatten MARCXML records into one row per subfield.
+
+Columnar and relational stores (``export_columnar``, ``field_store``) share
+this layout: every subfield becomes ``(tag, ind1, ind2, code, value,
+occurrence)``, where ``occurrence`` numbers repeated fields of the same tag
+within a record from 1. Control fields, and data fields without subfields,
+are rows with an empty code. Leader, 008 and the 049 ``$a`` holdings are
+also kept per record.
+"""
+
+from dataclasses import dataclass, field
+from typing import Iterator, List, Tuple
+import xml.etree.ElementTree as ET
+
+from utilities.record_offsets import collection_namespaces, iter_record_bytes, parse_record
+
+FieldRow = Tuple[str, str, str, str, str, int]
+
+
+@dataclass
+class FlatRecord:
+    position: int
+    start: int
+    end: int
+    record_id: str = ""
+    leader: str = ""
+    f008: str = ""
+    holdings: List[str] = field(default_factory=list)
+    fields: List[FieldRow] = field(default_factory=list)
+
+
+def flatten_record(position: int, start: int, end: int, record: ET.Element) -> FlatRecord:
+    """Flatten one parsed record; namespaced and plain element names are accepted."""
+    flat = FlatRecord(position, start, end)
+    occurrences = {}
+    for child in record:
+        name = child.tag.rpartition("}")[2]
+        if name == "leader":
+            flat.leader = child.text or ""
+            continue
+        tag = child.get("tag", "")
+        occurrence = occurrences[tag] = occurrences.get(tag, 0) + 1
+        if name == "controlfield":
+            value = child.text or ""
+            flat.fields.append((tag, "", "", "", value, occurrence))
+            if tag == "001" and not flat.record_id:
+                flat.record_id = value.strip()
+            elif tag == "008" and not flat.f008:
+                flat.f008 = value
+        elif name == "datafield":
+            ind1, ind2 = child.get("ind1", ""), child.get("ind2", "")
+            rows = len(flat.fields)
+            for sub in child:
+                if sub.tag.rpartition("}")[2] != "subfield":
+                    continue
+                code, value = sub.get("code", ""), sub.text or ""
+                flat.fields.append((tag, ind1, ind2, code, value, occurrence))
+                if tag == "049" and code == "a" and value.strip():
+                    flat.holdings.append(value.strip())
+            if len(flat.fields) == rows:  # keep fields without subfields visible
+                flat.fields.append((tag, ind1, ind2, "", "", occurrence))
+    return flat
+
+
+def iter_flat_records(path: str) -> Iterator[FlatRecord]:
+    """Yield every record of ``path`` flattened, in file order."""
+    namespaces = collection_namespaces(path)
+    for position, (start, end, data) in enumerate(iter_record_bytes(path)):
+        yield flatten_record(position, start, end, parse_record(data, namespaces))
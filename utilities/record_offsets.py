@@ -0,0 +1,183 @@
+"""Byte-level access to the records of a MARCXML file.
+
+``iter_record_spans`` scans the memory-mapped file for ``<record>`` start and
+end tags and yields their byte offsets without building any XML tree. The
+spans allow targeted re-reads of single records (``read_record``) and make
+random access, sampling and export by position cheap.
+"""
+
+import mmap
+import os
+import re
+import xml.etree.ElementTree as ET
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+MARC_NS = "http://www.loc.gov/MARC21/slim"
+RECORD_START = re.compile(rb"<(?:[\w.-]+:)?record[\s>]")
+RECORD_END = re.compile(rb"</(?:[\w.-]+:)?record\s*>")
+ROOT_START = re.compile(rb"<(?![?!])[^>]*>")
+NAMESPACE_DECLARATION = re.compile(rb"""\sxmlns(?::([\w.-]+))?\s*=\s*["']([^"']*)["']""")
+HEAD_BYTES = 64 * 1024
+MIN_SHARD_BYTES = 1024 * 1024
+CHUNK_BYTES = 8 * 1024 * 1024
+
+
+def iter_record_bytes(
+    path: str, begin: int = 0, stop: Optional[int] = None
+) -> Iterator[Tuple[int, int, bytes]]:
+    """Yield ``(start, end, raw bytes)`` of every record element in file order.
+
+    With ``begin``/``stop`` only records whose start tag lies in that byte
+    range are returned (a record may end after ``stop``), so adjacent ranges
+    from ``shard_ranges`` cover every record exactly once.
+    """
+    with open(path, "rb") as f:
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # empty file
+            return
+        with mm:
+            pos = begin
+            while True:
+                start = RECORD_START.search(mm, pos)
+                if start is None or (stop is not None and start.start() >= stop):
+                    return
+                end = RECORD_END.search(mm, start.end())
+                if end is None:
+                    return
+                yield start.start(), end.end(), mm[start.start():end.end()]
+                pos = end.end()
+
+
+def iter_record_chunks(
+    path: str, chunk_bytes: int = CHUNK_BYTES
+) -> Iterator[Tuple[bytes, List[int], List[int]]]:
+    """Yield ``(raw bytes, starts, ends)`` for runs of whole records of about ``chunk_bytes``.
+
+    ``starts``/``ends`` are the file offsets of the records in the run, as
+    from ``iter_record_bytes``. Meant for byte-level passes that transform
+    many records with one C-level call instead of one call per record.
+    """
+    with open(path, "rb") as f:
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # empty file
+            return
+        with mm:
+            first = RECORD_START.search(mm)
+            while first is not None:
+                following = RECORD_START.search(mm, first.start() + chunk_bytes)
+                begin, stop = first.start(), following.start() if following else len(mm)
+                chunk = mm[begin:stop]
+                starts = [begin + match.start() for match in RECORD_START.finditer(chunk)]
+                ends = [begin + match.end() for match in RECORD_END.finditer(chunk)]
+                if following is None:  # an unterminated last record is skipped like in iter_record_bytes
+                    starts = starts[:len(ends)]
+                if len(ends) != len(starts):
+                    raise ValueError(f"unbalanced record tags between offsets {begin} and {stop}")
+                yield chunk, starts, ends
+                first = following
+
+
+def shard_ranges(path: str, shards: int, min_shard_bytes: int = MIN_SHARD_BYTES) -> List[Tuple[int, int]]:
+    """Split the file into up to ``shards`` contiguous byte ranges for ``iter_record_bytes``."""
+    size = os.path.getsize(path)
+    shards = max(1, min(shards, size // max(1, min_shard_bytes) + 1))
+    bounds = [size * i // shards for i in range(shards + 1)]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def first_subfield_pattern(tags: Sequence[str], code: str = "a") -> "re.Pattern[bytes]":
+    """Regex matching a data field in ``tags`` whose first subfield has ``code``.
+
+    Groups: tag and raw value. Only the layout of the catalogue dumps is
+    recognised (``tag`` is the first attribute); character references in
+    values are left as they are. Meant for fast approximate statistics, not
+    exact checks.
+    """
+    alternatives = b"|".join(re.escape(tag.encode("ascii")) for tag in tags)
+    return re.compile(
+        rb"datafield\s+tag=[\"'](" + alternatives + rb")[\"'][^>]*>\s*<(?:[\w.-]+:)?subfield\s+code=[\"']"
+        + re.escape(code.encode("ascii")) + rb"[\"']\s*>([^<]*)<"
+    )
+
+
+def iter_first_subfields(path: str, tags: Sequence[str], code: str = "a") -> Iterator[Tuple[str, bytes]]:
+    """Yield ``(tag, value)`` for every match of :func:`first_subfield_pattern`.
+
+    A single regex pass over the memory-mapped file without record boundaries.
+    """
+    pattern = first_subfield_pattern(tags, code)
+    with open(path, "rb") as f:
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # empty file
+            return
+        with mm:
+            for match in pattern.finditer(mm):
+                yield match.group(1).decode("ascii"), match.group(2)
+
+
+def iter_record_spans(path: str) -> Iterator[Tuple[int, int]]:
+    """Yield ``(start, end)`` byte offsets of every record element in file order."""
+    for start, end, _ in iter_record_bytes(path):
+        yield start, end
+
+
+def read_record_bytes(f: BinaryIO, start: int, end: int) -> bytes:
+    """Read the raw bytes of one record from an open binary file."""
+    f.seek(start)
+    return f.read(end - start)
+
+
+def export_records(dump_path: str, spans: Iterable[Tuple[int, int]], out_path: str) -> int:
+    """Copy the records at the given ``(start, end)`` offsets into a new MARCXML collection."""
+    with open(dump_path, "rb") as src, open(out_path, "wb") as out:
+        out.write(b'<?xml version="1.0" encoding="UTF-8"?>\n')
+        # Same wrapper as marc_utils.split_records: unprefixed records stay unprefixed
+        out.write(b'<collection xmlns:marc="' + MARC_NS.encode() + b'">\n')
+        written = 0
+        for start, end in spans:
+            out.write(read_record_bytes(src, int(start), int(end)))
+            out.write(b"\n")
+            written += 1
+        out.write(b"</collection>\n")
+    return written
+
+
+def collection_namespaces(path: str) -> Dict[str, str]:
+    """Namespace declarations of the root element, ``prefix -> URI`` (``""`` = default namespace)."""
+    with open(path, "rb") as f:
+        head = f.read(HEAD_BYTES)
+    root = ROOT_START.search(head)
+    if root is None:
+        return {}
+    return {
+        (prefix or b"").decode("utf-8"): uri.decode("utf-8")
+        for prefix, uri in NAMESPACE_DECLARATION.findall(root.group(0))
+    }
+
+
+def parse_record(data: bytes, namespaces: Optional[Dict[str, str]] = None) -> ET.Element:
+    """Parse raw record bytes.
+
+    With ``namespaces`` (from :func:`collection_namespaces`) the record is
+    parsed inside the collection's declarations, so tags get the same
+    ``{namespace}`` form as with ``iterparse`` over the whole file, including
+    a default namespace. Without them a prefix is bound to the MARC
+    namespace and unprefixed records stay without namespace.
+    """
+    if namespaces:
+        declarations = b"".join(
+            b" xmlns" + (b":" + prefix.encode("utf-8") if prefix else b"") + b'="' + uri.encode("utf-8") + b'"'
+            for prefix, uri in namespaces.items()
+        )
+        return ET.fromstring(b"<w" + declarations + b">" + data + b"</w>")[0]
+    try:
+        return ET.fromstring(data)
+    except ET.ParseError:
+        prefix = re.match(rb"<([\w.-]+):", data)
+        if prefix is None:
+            raise
+        wrapper = b'<w xmlns:' + prefix.group(1) + b'="' + MARC_NS.encode() + b'">' + data + b"</w>"
+        return ET.fromstring(wrapper)[0]
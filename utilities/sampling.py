@@ -0,0 +1,116 @@
+"""Block sampling of records with error bounds for preview runs.
+
+The file is cut into fixed-size byte blocks; a random subset of blocks is
+read and every record whose start tag lies in a chosen block is part of the
+sample (see ``record_offsets.iter_record_bytes``). Each record therefore has
+the same inclusion probability, the sampled fraction of blocks. Blocks are
+clusters of neighbouring records, so the 95 % margins below use the
+between-block variance rather than assuming independent records.
+"""
+
+import math
+import os
+import random
+from dataclasses import dataclass
+from typing import Iterator, List, Sequence, Tuple
+
+from utilities.record_offsets import iter_record_bytes
+from utilities.sketches import Z_95
+
+DEFAULT_SAMPLE_FRACTION = 0.02
+DEFAULT_BLOCK_BYTES = 256 * 1024
+
+# 97.5 % quantiles of Student's t for 1..30 degrees of freedom: with few
+# sampled blocks the estimated variance is itself uncertain
+T_975 = (
+    12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
+    2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
+    2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042,
+)
+
+
+def _quantile(blocks: int) -> float:
+    """Two-sided 95 % quantile for an estimate from ``blocks`` sampled blocks."""
+    degrees = blocks - 1
+    return T_975[degrees - 1] if degrees <= len(T_975) else Z_95
+
+
+@dataclass
+class Estimate:
+    value: float
+    margin: float  # half width of the 95 % interval (nan if unknown)
+
+    def __str__(self) -> str:
+        if math.isnan(self.margin):
+            return f"{self.value:,.0f}"
+        return f"{self.value:,.0f} ± {self.margin:,.0f}"
+
+    def percent(self) -> str:
+        """Format a ratio estimate as percentage with its margin in percentage points."""
+        if math.isnan(self.margin):
+            return f"{self.value * 100:.2f}%"
+        return f"{self.value * 100:.2f}% ± {self.margin * 100:.2f}"
+
+
+class BlockSample:
+    """A random set of equal byte blocks of ``path`` covering about ``fraction`` of the file."""
+
+    def __init__(
+        self,
+        path: str,
+        fraction: float = DEFAULT_SAMPLE_FRACTION,
+        block_bytes: int = DEFAULT_BLOCK_BYTES,
+        seed: int = 0,
+    ) -> None:
+        if not 0 < fraction <= 1:
+            raise ValueError("fraction must be in (0, 1]")
+        self.path = path
+        size = os.path.getsize(path)
+        # Equal blocks of about block_bytes: a short last block would bias the totals
+        blocks = self.population_blocks = max(1, round(size / block_bytes))
+        chosen = max(1, round(fraction * blocks))
+        picks = sorted(random.Random(seed).sample(range(blocks), chosen))
+        self.blocks: List[Tuple[int, int]] = [
+            (block * size // blocks, (block + 1) * size // blocks) for block in picks
+        ]
+
+    @property
+    def fraction(self) -> float:
+        """Actual sampled fraction of the blocks (= inclusion probability of a record)."""
+        return len(self.blocks) / self.population_blocks
+
+    def __iter__(self) -> Iterator[List[bytes]]:
+        """Yield the raw records of each sampled block."""
+        for begin, stop in self.blocks:
+            yield [data for _, _, data in iter_record_bytes(self.path, begin, stop)]
+
+
+def estimate_total(block_totals: Sequence[float], population_blocks: int) -> Estimate:
+    """Population total from per-block totals of a simple random sample of blocks."""
+    n = len(block_totals)
+    if n == 0:
+        return Estimate(0.0, math.nan)
+    mean = sum(block_totals) / n
+    value = population_blocks * mean
+    if n < 2:  # no variance estimate, unless the one block is the whole file
+        return Estimate(value, 0.0 if n == population_blocks else math.nan)
+    variance = sum((y - mean) ** 2 for y in block_totals) / (n - 1)
+    finite = 1 - n / population_blocks
+    return Estimate(value, _quantile(n) * population_blocks * math.sqrt(max(finite, 0.0) * variance / n))
+
+
+def estimate_ratio(
+    numerators: Sequence[float], denominators: Sequence[float], population_blocks: int
+) -> Estimate:
+    """Ratio ``sum(y) / sum(x)`` (e.g. share of records) with its cluster-sample margin."""
+    n = len(numerators)
+    x_total = sum(denominators)
+    if n == 0 or x_total == 0:
+        return Estimate(0.0, math.nan)
+    ratio = sum(numerators) / x_total
+    if n < 2:
+        return Estimate(ratio, 0.0 if n == population_blocks else math.nan)
+    x_mean = x_total / n
+    residual = sum((y - ratio * x) ** 2 for y, x in zip(numerators, denominators)) / (n - 1)
+    finite = 1 - n / population_blocks
+    return Estimate(ratio, _quantile(n) * math.sqrt(max(finite, 0.0) * residual / n) / x_mean)
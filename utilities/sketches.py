@@ -0,0 +1,203 @@
+"""Bounded-memory sketches for approximate statistics.
+
+``HyperLogLog`` estimates the number of distinct values with a relative
+standard error of ``1.04 / sqrt(2 ** precision)`` in ``2 ** precision``
+bytes. ``SpaceSaving`` keeps the ``k`` most frequent values of a stream;
+every value occurring more than ``total / k`` times is guaranteed to be
+reported, and each reported count overestimates the true count by at most
+its ``error``. ``MinHash`` signatures estimate the Jaccard similarity of
+token sets; their LSH band keys let similar sets meet in a sort instead of
+an all-pairs comparison.
+"""
+
+import heapq
+import math
+from typing import Dict, Hashable, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+FNV_OFFSET = np.uint64(0xCBF29CE484222325)
+FNV_PRIME = np.uint64(0x100000001B3)
+Z_95 = 1.96
+HASH_BATCH = 4096
+
+
+def hash64_batch(values: Sequence[bytes]) -> np.ndarray:
+    """Well-mixed 64-bit hashes: vectorized FNV-1a plus the MurmurHash3 finalizer."""
+    if not len(values):
+        return np.zeros(0, dtype=np.uint64)
+    packed = np.array(values, dtype=bytes)
+    width = packed.dtype.itemsize
+    matrix = packed.view(np.uint8).reshape(len(values), width)
+    lengths = np.fromiter((len(v) for v in values), dtype=np.int64, count=len(values))
+    hashes = np.full(len(values), FNV_OFFSET, dtype=np.uint64)
+    for column in range(width):
+        # Skip the padding, so a value hashes the same in every batch
+        mixed = (hashes ^ matrix[:, column]) * FNV_PRIME
+        hashes = np.where(column < lengths, mixed, hashes)
+    # Spreads the entropy into the high bits used as register index
+    return _fmix64(hashes)
+
+
+def _fmix64(hashes: np.ndarray) -> np.ndarray:
+    """MurmurHash3 finalizer (in place)."""
+    hashes ^= hashes >> np.uint64(33)
+    hashes *= np.uint64(0xFF51AFD7ED558CCD)
+    hashes ^= hashes >> np.uint64(33)
+    hashes *= np.uint64(0xC4CEB9FE1A85EC53)
+    hashes ^= hashes >> np.uint64(33)
+    return hashes
+
+
+class HyperLogLog:
+    """Distinct-count sketch over 64-bit hashes (``2 ** precision`` registers)."""
+
+    def __init__(self, precision: int = 14) -> None:
+        # Precision >= 11 keeps the remaining hash bits below 2**53, so the
+        # bit length below is computed exactly in float64
+        if not 11 <= precision <= 18:
+            raise ValueError("precision must be between 11 and 18")
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    @property
+    def relative_error(self) -> float:
+        """Relative standard error of ``estimate``."""
+        return 1.04 / math.sqrt(len(self.registers))
+
+    def add_hashes(self, hashes: np.ndarray) -> None:
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        if not len(hashes):
+            return
+        width = 64 - self.precision
+        index = (hashes >> np.uint64(width)).astype(np.intp)
+        rest = hashes & np.uint64((1 << width) - 1)
+        _, bit_length = np.frexp(rest.astype(np.float64))
+        rank = (width - bit_length + 1).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+
+    def add(self, values: Iterable[bytes]) -> None:
+        # Hash values of similar length together: the batch matrix is as wide as its longest value
+        values = sorted(values, key=len)
+        for start in range(0, len(values), HASH_BATCH):
+            self.add_hashes(hash64_batch(values[start:start + HASH_BATCH]))
+
+    def merge(self, other: "HyperLogLog") -> None:
+        if other.precision != self.precision:
+            raise ValueError("cannot merge sketches of different precision")
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def estimate(self) -> float:
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / float(np.sum(np.ldexp(1.0, -self.registers.astype(np.int64))))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if raw <= 2.5 * m and zeros:
+            return m * math.log(m / zeros)  # linear counting for small cardinalities
+        return raw
+
+    def margin(self) -> float:
+        """Half width of the 95 % interval around ``estimate``."""
+        return Z_95 * self.relative_error * self.estimate()
+
+
+class SpaceSaving:
+    """Top-``k`` heavy hitters with at most ``k`` counters.
+
+    A min-heap over the counters finds the value to replace; its entries are
+    refreshed lazily because counts only grow.
+    """
+
+    def __init__(self, k: int) -> None:
+        if k < 1:
+            raise ValueError("k must be positive")
+        self.k = k
+        self.total = 0
+        self.counts: Dict[Hashable, int] = {}
+        self.errors: Dict[Hashable, int] = {}
+        self._heap: List[Tuple[int, Hashable]] = []
+
+    def add(self, value: Hashable, weight: int = 1) -> None:
+        self.total += weight
+        counts = self.counts
+        if value in counts:
+            counts[value] += weight
+            return
+        if len(counts) < self.k:
+            counts[value] = weight
+            self.errors[value] = 0
+            heapq.heappush(self._heap, (weight, value))
+            return
+        heap = self._heap
+        while True:
+            count, victim = heap[0]
+            current = counts[victim]
+            if current == count:
+                break
+            heapq.heapreplace(heap, (current, victim))
+        del counts[victim]
+        del self.errors[victim]
+        counts[value] = count + weight
+        self.errors[value] = count
+        heapq.heapreplace(heap, (count + weight, value))
+
+    def update(self, values: Iterable[Hashable]) -> None:
+        for value in values:
+            self.add(value)
+
+    def top(self, n: Optional[int] = None) -> List[Tuple[Hashable, int, int]]:
+        """``(value, count, error)`` by count descending; true count is in ``[count - error, count]``."""
+        ranked = sorted(self.counts.items(), key=lambda item: item[1], reverse=True)
+        return [(value, count, self.errors[value]) for value, count in ranked[:n]]
+
+    @property
+    def max_error(self) -> int:
+        """Upper bound of the overestimate of any reported count (``total / k``)."""
+        return self.total // self.k
+
+
+class MinHash:
+    """MinHash signatures of token sets, cut into LSH bands.
+
+    Every token is hashed once (``hash64_batch``) and permuted by
+    ``bands * rows`` multiply-shift functions; a signature keeps the minimum
+    of each. Two sets with Jaccard similarity ``s`` agree in one band of
+    ``rows`` values with probability ``s ** rows``, so they share at least
+    one band key with probability ``1 - (1 - s ** rows) ** bands``.
+    """
+
+    def __init__(self, bands: int = 8, rows: int = 4, seed: int = 1) -> None:
+        if bands < 1 or rows < 1:
+            raise ValueError("bands and rows must be positive")
+        self.bands = bands
+        self.rows = rows
+        rng = np.random.default_rng(seed)
+        # Odd multipliers; the token hashes are already mixed, so the high
+        # 32 bits of a * x + b (mod 2**64) behave like a random permutation
+        self._multipliers = rng.integers(0, 1 << 63, size=bands * rows, dtype=np.uint64) << np.uint64(1)
+        self._multipliers |= np.uint64(1)
+        self._offsets = rng.integers(0, 1 << 63, size=bands * rows, dtype=np.uint64)
+
+    def signatures(self, token_sets: Sequence[Sequence[bytes]]) -> np.ndarray:
+        """``(len(token_sets), bands * rows)`` uint32 signatures; every set must be non-empty."""
+        lengths = np.fromiter((len(tokens) for tokens in token_sets), dtype=np.int64, count=len(token_sets))
+        if not len(lengths):
+            return np.zeros((0, self.bands * self.rows), dtype=np.uint32)
+        if not lengths.all():
+            raise ValueError("MinHash of an empty token set")
+        tokens = [token for tokens in token_sets for token in tokens]
+        hashes = np.concatenate(
+            [hash64_batch(tokens[start:start + HASH_BATCH]) for start in range(0, len(tokens), HASH_BATCH)]
+        )
+        permuted = ((hashes[:, None] * self._multipliers + self._offsets) >> np.uint64(32)).astype(np.uint32)
+        return np.minimum.reduceat(permuted, np.concatenate(([0], np.cumsum(lengths)[:-1])), axis=0)
+
+    def band_keys(self, signatures: np.ndarray) -> np.ndarray:
+        """``(n, bands)`` uint64 keys; equal keys in the same column mean an equal band."""
+        values = signatures.reshape(len(signatures), self.bands, self.rows).astype(np.uint64)
+        keys = np.full((len(signatures), self.bands), FNV_OFFSET, dtype=np.uint64)
+        for row in range(self.rows):
+            keys = (keys ^ values[:, :, row]) * FNV_PRIME
+        # Bands of different columns never share a key
+        keys ^= np.arange(1, self.bands + 1, dtype=np.uint64) * np.uint64(0x9E3779B97F4A7C15)
+        return _fmix64(keys)
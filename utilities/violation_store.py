@@ -0,0 +1,121 @@
+"""Per-record violation bitmasks saved next to a dump.
+
+Bit ``i`` of ``bits[position]`` is set if the record at ``position`` (file
+order, as in ``record_offsets``) fails check ``names[i]``. Together with the
+byte offsets of every record the store answers drill-down questions such as
+"records failing leader and date but having an ISBN" with a few array
+operations and exports the matching records without re-running any check.
+"""
+
+import os
+from typing import Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from utilities.record_offsets import export_records
+
+MAX_CHECKS = 64
+STORE_SUFFIX = ".violations.npz"
+
+
+def store_path(dump_path: str) -> str:
+    """Default location of the store for ``dump_path``."""
+    return dump_path + STORE_SUFFIX
+
+
+class ViolationStore:
+    """``uint64`` violation bits plus byte offsets for every record of a dump."""
+
+    def __init__(
+        self,
+        names: Sequence[str],
+        bits: np.ndarray,
+        starts: np.ndarray,
+        ends: np.ndarray,
+        source_size: int = -1,
+        source_mtime: float = -1.0,
+    ):
+        if len(names) > MAX_CHECKS:
+            raise ValueError(f"at most {MAX_CHECKS} checks fit into one bitmask, got {len(names)}")
+        if len(set(names)) != len(names):
+            raise ValueError("check names must be unique")
+        if not len(bits) == len(starts) == len(ends):
+            raise ValueError("bits and offsets must cover the same records")
+        self.names: List[str] = list(names)
+        self.bits = bits.astype(np.uint64, copy=False)
+        self.starts = starts.astype(np.uint64, copy=False)
+        self.ends = ends.astype(np.uint64, copy=False)
+        self.source_size = source_size
+        self.source_mtime = source_mtime
+
+    @classmethod
+    def empty(cls, names: Sequence[str], starts: np.ndarray, ends: np.ndarray) -> "ViolationStore":
+        return cls(names, np.zeros(len(starts), dtype=np.uint64), starts, ends)
+
+    def __len__(self) -> int:
+        return len(self.bits)
+
+    def bit(self, name: str) -> np.uint64:
+        try:
+            return np.uint64(1) << np.uint64(self.names.index(name))
+        except ValueError:
+            raise KeyError(f"unknown check {name!r}; known: {', '.join(self.names)}") from None
+
+    def set_positions(self, name: str, positions: Iterable[int]) -> None:
+        """Mark the records at ``positions`` as failing ``name``."""
+        index = np.fromiter(positions, dtype=np.int64)
+        self.bits[index] |= self.bit(name)
+
+    def failing(self, name: str) -> np.ndarray:
+        return (self.bits & self.bit(name)) != 0
+
+    def select(self, failing: Sequence[str] = (), passing: Sequence[str] = ()) -> np.ndarray:
+        """Positions of records failing all checks in ``failing`` and none in ``passing``."""
+        fail_mask = np.uint64(0)
+        for name in failing:
+            fail_mask |= self.bit(name)
+        pass_mask = np.uint64(0)
+        for name in passing:
+            pass_mask |= self.bit(name)
+        hit = ((self.bits & fail_mask) == fail_mask) & ((self.bits & pass_mask) == 0)
+        return np.flatnonzero(hit)
+
+    def counts(self) -> dict:
+        """Number of failing records per check."""
+        return {name: int(np.count_nonzero(self.failing(name))) for name in self.names}
+
+    def save(self, path: str) -> None:
+        tmp_path = path + ".tmp.npz"
+        np.savez(
+            tmp_path,
+            names=np.array(self.names, dtype=str),
+            bits=self.bits,
+            starts=self.starts,
+            ends=self.ends,
+            source=np.array([self.source_size, self.source_mtime], dtype=np.float64),
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str, dump_path: Optional[str] = None) -> "ViolationStore":
+        """Load a store; with ``dump_path`` a store built for another file version is rejected."""
+        with np.load(path, allow_pickle=False) as data:
+            size, mtime = data["source"].tolist()
+            store = cls(
+                data["names"].tolist(), data["bits"], data["starts"], data["ends"], int(size), mtime
+            )
+        if dump_path is not None:
+            stat = os.stat(dump_path)
+            if stat.st_size != store.source_size or stat.st_mtime != store.source_mtime:
+                raise ValueError(f"{path} was built for another version of {dump_path}; rebuild it")
+        return store
+
+    def record_source(self, dump_path: str) -> None:
+        stat = os.stat(dump_path)
+        self.source_size = stat.st_size
+        self.source_mtime = stat.st_mtime
+
+    def export(self, dump_path: str, positions: Sequence[int], out_path: str) -> int:
+        """Copy the records at ``positions`` from the dump into a new MARCXML collection."""
+        spans = ((self.starts[position], self.ends[position]) for position in positions)
+        return export_records(dump_path, spans, out_path)